@@ -0,0 +1,568 @@
+## ACTUALIZACIÓN INCREMENTAL DE LAS TABLAS Y EL MODELO
+# Aplica un lote de registros nuevos (juegos, items de usuarios, reviews y calificaciones) sobre las tablas ya
+# calculadas de data/, recalculando solo los usuarios, géneros, desarrolladores, años y juegos que cambian, en lugar
+# de volver a ejecutar todos los notebooks desde los JSON originales.
+# Uso: python actualizacion.py lote/ --directorio data
+# Importaciones
+import argparse
+import os
+import shutil
+import time
+
+import numpy as np
+import pandas as pd
+import pyarrow.parquet as pq
+
+import sentimiento
+from tipos import guardar_compacto, leer_expandido
+from agregados import (ARCHIVO_DEVELOPER_ANIO, ARCHIVO_SENTIMIENTO_ANIO, ARCHIVO_TOP_USUARIOS_GENERO, TOP_USUARIOS_GENERO,
+                       agregado_developer_anio, agregado_sentimiento_anio, agregado_top_usuarios_genero,
+                       ordenar_reviews_por_fecha, porcentaje_gratis)
+from recomendacion import (K_VECINOS, IndiceVecinos, MotorUsuarios, _mejores_k, _tabla_vecinos, construir_indice_vecinos_dispersa,
+                           matriz_calificaciones, normalizar_items)
+
+# Tablas que puede traer un lote, en el orden en que se aplican: los juegos primero, para que los items y las
+# reviews del mismo lote encuentren su precio, género y año. Cada una es un archivo <nombre>.parquet o <nombre>.csv
+# con las columnas de los archivos limpios de los notebooks 01 (y las de df_recomendacion.csv para 'recomendacion')
+TABLAS_LOTE = ['games', 'items', 'reviews', 'recomendacion']
+
+# Funciones
+def leer_tabla(directorio, nombre):
+    '''
+    Lee la tabla `nombre` de un directorio, en parquet o CSV.
+
+    Returns:
+        pandas.DataFrame: La tabla, o None si el directorio no la tiene.
+    '''
+    ruta = os.path.join(directorio, nombre)
+    if os.path.exists(ruta + '.parquet'):
+        return pd.read_parquet(ruta + '.parquet')
+    if os.path.exists(ruta + '.csv'):
+        return pd.read_csv(ruta + '.csv', encoding='utf-8')
+    return None
+
+def _precios(df_games):
+    # Precio de cada juego, como price_juegos del notebook 01d
+    return df_games[['price', 'id']].drop_duplicates(subset='id', keep='first').rename(columns={'id': 'item_id'})
+
+def _generos(df_games):
+    # Géneros de cada juego, como genre_item del notebook 01d
+    return df_games[['genres', 'id']].rename(columns={'id': 'item_id'})
+
+def _anios(df_games):
+    # Año de lanzamiento de cada juego, como anio_lanzamiento_item del notebook 01d
+    return df_games[['id', 'release_anio']].rename(columns={'id': 'reviews_item_id'}).drop_duplicates()
+
+def _items_developer(df_games):
+    # Precio, año y desarrollador de cada juego, como df_items_developer del notebook 01d
+    return df_games[['price', 'release_anio', 'developer', 'id']].rename(columns={'id': 'item_id'}).drop_duplicates()
+
+def actualizar_juegos(df_games, games, df_items_developer, df_developer_anio):
+    '''
+    Agrega juegos nuevos al catálogo y actualiza los items por desarrollador y el agregado por desarrollador y año.
+
+    Solo se admiten juegos nuevos: cambiar el precio o el género de un juego existente cambia los gastos y las horas
+    de todos los usuarios que lo tienen, y para eso hay que reconstruir las tablas.
+
+    Args:
+        df_games (pandas.DataFrame): Catálogo de juegos actual.
+        games (pandas.DataFrame): Juegos nuevos, con las columnas de df_games.
+        df_items_developer (pandas.DataFrame): Items por desarrollador actuales.
+        df_developer_anio (pandas.DataFrame): Agregado por desarrollador y año actual, con la columna 'gratis'.
+
+    Returns:
+        tuple: df_games, df_items_developer y df_developer_anio actualizados, y la cantidad de pares
+        (desarrollador, año) que cambiaron.
+    '''
+    repetidos = np.intersect1d(games['id'].unique(), df_games['id'].unique())
+    if len(repetidos):
+        raise ValueError(f'El lote trae {len(repetidos)} juegos que ya existen (por ejemplo {repetidos[:5].tolist()}): '
+                         'para modificar juegos existentes hay que reconstruir las tablas')
+    if 'gratis' not in df_developer_anio.columns:
+        raise ValueError(f"{ARCHIVO_DEVELOPER_ANIO} no tiene la columna 'gratis': hay que regenerarlo con python agregados.py")
+
+    df_games = pd.concat([df_games, games[df_games.columns]], ignore_index=True)
+
+    # Filas nuevas de df_items_developer (como los juegos son nuevos, ninguna repite una fila existente)
+    nuevas = _items_developer(games)
+    df_items_developer = pd.concat([df_items_developer, nuevas], ignore_index=True)
+
+    # Se suman los conteos de los pares (desarrollador, año) de los juegos nuevos
+    claves = ['developer', 'release_anio']
+    delta = agregado_developer_anio(nuevas).set_index(claves)[['cantidad', 'gratis']]
+    conteos = df_developer_anio.set_index(claves)[['cantidad', 'gratis']].add(delta, fill_value=0).astype('int64')
+    conteos['porcentaje_gratis'] = porcentaje_gratis(conteos['gratis'], conteos['cantidad'])
+    df_developer_anio = conteos.sort_index()[['cantidad', 'porcentaje_gratis', 'gratis']].reset_index()
+
+    return df_games, df_items_developer, df_developer_anio, len(delta)
+
+def actualizar_gastos(df_gastos_items, items, df_games):
+    '''
+    Suma a cada usuario del lote el precio de sus items nuevos y agrega los usuarios nuevos.
+
+    Como en el notebook 01d, los items sin precio cuentan como 0 y 'items_count' es el del primer registro del
+    usuario, así que solo se toma del lote para los usuarios nuevos.
+
+    Args:
+        df_gastos_items (pandas.DataFrame): Gasto por usuario actual.
+        items (pandas.DataFrame): Items nuevos de los usuarios (user_id, items_count, item_id, ...).
+        df_games (pandas.DataFrame): Catálogo de juegos, ya con los juegos del lote.
+
+    Returns:
+        tuple: df_gastos_items actualizado y la cantidad de usuarios que cambiaron.
+    '''
+    nuevos = items[['items_count', 'user_id', 'item_id']].merge(_precios(df_games), on='item_id', how='left')
+    nuevos['price'] = nuevos['price'].fillna(0.0)
+    suma = nuevos.groupby('user_id')['price'].sum()
+    conteo = nuevos.drop_duplicates(subset='user_id', keep='first').set_index('user_id')['items_count']
+
+    df = df_gastos_items.set_index('user_id')[['items_count', 'price']]
+    existentes = suma.index.isin(df.index)
+    df.loc[suma.index[existentes], 'price'] += suma[existentes]
+    usuarios_nuevos = pd.DataFrame({'items_count': conteo.reindex(suma.index[~existentes]), 'price': suma[~existentes]})
+    df = pd.concat([df, usuarios_nuevos]).sort_index(kind='stable')
+    df.index.name = 'user_id'
+    return df.reset_index()[['items_count', 'user_id', 'price']], len(suma)
+
+def actualizar_playtime(df_playtime_forever, items, df_games):
+    '''
+    Suma las horas de juego de los items nuevos a cada par (género, usuario) y agrega los pares nuevos.
+
+    Las horas guardadas son minutos / 60, así que se recuperan los minutos enteros, se suman los del lote y se
+    vuelve a dividir: el resultado es el mismo número que da la suma completa del notebook 01d.
+
+    Args:
+        df_playtime_forever (pandas.DataFrame): Horas por género y usuario actuales, ordenadas por género y usuario.
+        items (pandas.DataFrame): Items nuevos de los usuarios (user_id, user_url, item_id, playtime_forever, ...).
+        df_games (pandas.DataFrame): Catálogo de juegos, ya con los juegos del lote.
+
+    Returns:
+        tuple: df_playtime_forever actualizado y los géneros que cambiaron.
+    '''
+    nuevos = items[['playtime_forever', 'user_id', 'item_id']].merge(_generos(df_games), on='item_id')
+    minutos = nuevos.groupby(['genres', 'user_id'])['playtime_forever'].sum()
+
+    df = df_playtime_forever.set_index(['genres', 'user_id'])[['playtime_horas', 'user_url']]
+    existentes = minutos.index.isin(df.index)
+    pares = minutos.index[existentes]
+    previos = (df.loc[pares, 'playtime_horas'] * 60).round().to_numpy()
+    df.loc[pares, 'playtime_horas'] = (previos + minutos[existentes].to_numpy()) / 60
+
+    # La URL de los pares nuevos es la que ya tenía el usuario o, si es un usuario nuevo, la de su primer registro del lote
+    pares_nuevos = minutos.index[~existentes]
+    usuarios = pares_nuevos.get_level_values('user_id')
+    urls = df_playtime_forever[df_playtime_forever['user_id'].isin(usuarios)].drop_duplicates(subset='user_id').set_index('user_id')['user_url']
+    urls_lote = items.drop_duplicates(subset='user_id').set_index('user_id')['user_url']
+    urls = urls.combine_first(urls_lote)
+    filas_nuevas = pd.DataFrame({'playtime_horas': minutos[~existentes].to_numpy() / 60,
+                                 'user_url': urls.reindex(usuarios).to_numpy()}, index=pares_nuevos)
+
+    df = pd.concat([df, filas_nuevas]).sort_index(kind='stable')
+    generos = minutos.index.get_level_values('genres').unique()
+    return df.reset_index()[['genres', 'user_id', 'playtime_horas', 'user_url']], generos
+
+def ranking_generos(totales):
+    '''
+    Arma el ranking de géneros a partir de las horas totales de cada uno, como df_genre_ranking del notebook 01d.
+    '''
+    df_genre_ranking = totales.rename('playtime_horas').rename_axis('genres').sort_index().reset_index()
+    df_genre_ranking = df_genre_ranking.sort_values(by='playtime_horas', ascending=False)
+    df_genre_ranking['ranking'] = df_genre_ranking['playtime_horas'].rank(ascending=False).astype(int)
+    return df_genre_ranking
+
+def actualizar_ranking(df_genre_ranking, df_playtime_forever, generos):
+    '''
+    Vuelve a sumar las horas de los géneros que cambiaron y recalcula las posiciones del ranking.
+
+    Las horas de cada género se suman sobre sus filas de df_playtime_forever en el mismo orden que la suma completa,
+    así que dan el mismo número. Los demás géneros conservan su total.
+
+    Args:
+        df_genre_ranking (pandas.DataFrame): Ranking actual.
+        df_playtime_forever (pandas.DataFrame): Horas por género y usuario, ya actualizadas.
+        generos (array-like): Géneros que cambiaron.
+
+    Returns:
+        pandas.DataFrame: El ranking actualizado.
+    '''
+    totales = df_genre_ranking.set_index('genres')['playtime_horas']
+    filas = df_playtime_forever[df_playtime_forever['genres'].isin(generos)]
+    recalculados = filas.groupby('genres')['playtime_horas'].sum()
+    return ranking_generos(recalculados.combine_first(totales))
+
+def actualizar_top_usuarios(df_top, df_playtime_forever, generos, n=TOP_USUARIOS_GENERO):
+    '''
+    Vuelve a calcular el top de usuarios de los géneros que cambiaron. Los demás géneros conservan sus filas.
+
+    Args:
+        df_top (pandas.DataFrame): Top de usuarios por género actual.
+        df_playtime_forever (pandas.DataFrame): Horas por género y usuario, ya actualizadas.
+        generos (array-like): Géneros que cambiaron.
+        n (int): Cantidad de usuarios por género.
+
+    Returns:
+        pandas.DataFrame: El top actualizado, ordenado por género y posición.
+    '''
+    recalculados = agregado_top_usuarios_genero(df_playtime_forever[df_playtime_forever['genres'].isin(generos)], n=n)
+    df_top = pd.concat([df_top[~df_top['genres'].isin(generos)], recalculados], ignore_index=True)
+    return df_top.sort_values(['genres', 'posicion'], kind='stable').reset_index(drop=True)
+
+def actualizar_reviews(df_reviews, reviews, df_games, df_sentimiento_anio, ruta_cache=sentimiento.ARCHIVO_CACHE):
+    '''
+    Calcula el sentimiento de las reviews nuevas, las inserta en df_reviews en su lugar por fecha y suma sus
+    conteos al agregado por año.
+
+    Las reviews nuevas quedan después de las existentes con la misma fecha, que es el orden que da ordenar por fecha
+    (de forma estable) la tabla completa con las reviews nuevas al final. Se insertan con búsquedas binarias sobre
+    las fechas, sin volver a ordenar la tabla.
+
+    Args:
+        df_reviews (pandas.DataFrame): Reviews actuales, ordenadas por fecha.
+        reviews (pandas.DataFrame): Reviews nuevas limpias, con la columna 'reviews_review'.
+        df_games (pandas.DataFrame): Catálogo de juegos, ya con los juegos del lote.
+        df_sentimiento_anio (pandas.DataFrame): Agregado de sentimiento por año actual.
+        ruta_cache (str): Base SQLite del cache de sentimiento.
+
+    Returns:
+        tuple: df_reviews y df_sentimiento_anio actualizados, y la cantidad de reviews agregadas.
+    '''
+    etiquetas, _ = sentimiento.puntuar_reviews(reviews['reviews_review'].tolist(), ruta_cache=ruta_cache)
+    nuevas = reviews.assign(sentiment_analysis=etiquetas).merge(_anios(df_games), on='reviews_item_id')
+    if nuevas.empty:
+        return df_reviews, df_sentimiento_anio, 0
+    nuevas = ordenar_reviews_por_fecha(nuevas[df_reviews.columns])
+
+    # Posición de cada review nueva: después de las existentes con fecha menor o igual. Las fechas inválidas (NaT)
+    # están al final de la tabla y no se comparan, así que las nuevas sin fecha van al final
+    fechas = df_reviews['reviews_date'].to_numpy()
+    validas = int(np.count_nonzero(~np.isnat(fechas)))
+    fechas_nuevas = nuevas['reviews_date'].to_numpy()
+    posiciones = np.where(np.isnat(fechas_nuevas), len(fechas), np.searchsorted(fechas[:validas], fechas_nuevas, side='right'))
+    orden = np.insert(np.arange(len(df_reviews)), posiciones, np.arange(len(df_reviews), len(df_reviews) + len(nuevas)))
+    df_reviews = pd.concat([df_reviews, nuevas], ignore_index=True).take(orden).reset_index(drop=True)
+
+    delta = agregado_sentimiento_anio(nuevas).set_index('release_anio')
+    df_sentimiento_anio = (df_sentimiento_anio.set_index('release_anio').add(delta, fill_value=0)
+                           .astype('int64').sort_index().reset_index())
+    return df_reviews, df_sentimiento_anio, len(nuevas)
+
+def actualizar_indice_vecinos(anterior, matriz_items, nombres, afectados, k=K_VECINOS, bloque=1024):
+    '''
+    Actualiza el índice de juegos similares recalculando solo las filas que pueden haber cambiado.
+
+    La similitud entre dos juegos no afectados no cambia (sus vectores de calificaciones son los mismos y el producto
+    suma en el mismo orden), así que para un juego no afectado alcanza con combinar sus vecinos anteriores no
+    afectados con las similitudes nuevas a los juegos afectados. Los demás juegos no afectados quedan, en el orden
+    de similitud, después de su k-ésimo vecino anterior; si los k elegidos quedan antes o en ese límite el resultado
+    es exacto, y si no (porque un vecino afectado bajó) la fila se recalcula completa, igual que las de los juegos
+    afectados. Como `_mejores_k` desempata por posición, el resultado es el mismo que construir el índice de cero.
+
+    Args:
+        anterior (IndiceVecinos): Índice antes del lote.
+        matriz_items (scipy.sparse.csr_matrix): Juegos × usuarios, con las calificaciones del lote.
+        nombres (array-like): Nombres de los juegos, en el orden de las filas.
+        afectados (numpy.ndarray): Posiciones de los juegos cuyas calificaciones cambiaron.
+        k (int): Cantidad de vecinos por juego.
+        bloque (int): Cantidad de juegos que se procesan por vez.
+
+    Returns:
+        tuple: La tabla del índice (la misma que `construir_indice_vecinos_dispersa`) y la cantidad de filas recalculadas.
+    '''
+    nombres = np.asarray(nombres).astype(str)
+    n = len(nombres)
+    k = min(k, n - 1)
+    # Posición actual de cada juego del índice anterior (los juegos nuevos se intercalan por nombre)
+    mapa = pd.Index(nombres).get_indexer(anterior.nombres.astype(str))
+    if anterior.vecinos.shape[1] != k or (mapa < 0).any():
+        return construir_indice_vecinos_dispersa(matriz_items, nombres, k=k, bloque=bloque), n
+
+    vecinos = np.zeros((n, k), dtype=np.int32)
+    scores = np.zeros((n, k), dtype=np.float32)
+    vecinos[mapa] = mapa[anterior.vecinos]
+    scores[mapa] = anterior.scores
+
+    # Los juegos nuevos también son afectados
+    es_afectado = np.ones(n, dtype=bool)
+    es_afectado[mapa] = False
+    es_afectado[afectados] = True
+    afectados = np.flatnonzero(es_afectado)
+    recalcular = [afectados]
+
+    matriz, transpuesta = normalizar_items(matriz_items)
+    resto = np.flatnonzero(~es_afectado)
+    if len(afectados) and len(resto):
+        transpuesta_afectados = matriz[afectados].T.tocsc()
+        for inicio in range(0, len(resto), bloque):
+            posiciones = resto[inicio:inicio + bloque]
+            similitudes = (matriz[posiciones] @ transpuesta_afectados).toarray()
+            vecinos_previos, scores_previos = vecinos[posiciones], scores[posiciones]
+            limite_score, limite_vecino = scores_previos[:, -1:], vecinos_previos[:, -1:]
+            # Los vecinos anteriores afectados se reemplazan por su similitud nueva
+            scores_previos = np.where(es_afectado[vecinos_previos], -np.inf, scores_previos)
+            candidatos = np.concatenate([vecinos_previos, np.broadcast_to(afectados, similitudes.shape)], axis=1)
+            valores = np.concatenate([scores_previos, similitudes], axis=1)
+            # Mismo criterio que `_mejores_k`: similitud descendente y, ante empates, menor posición
+            orden = np.lexsort((candidatos, -valores), axis=1)[:, :k]
+            elegidos = np.take_along_axis(candidatos, orden, axis=1)
+            valores = np.take_along_axis(valores, orden, axis=1)
+            exactas = ((valores > limite_score) | ((valores == limite_score) & (elegidos <= limite_vecino))).all(axis=1)
+            vecinos[posiciones[exactas]], scores[posiciones[exactas]] = elegidos[exactas], valores[exactas]
+            recalcular.append(posiciones[~exactas])
+
+    recalcular = np.concatenate(recalcular)
+    for inicio in range(0, len(recalcular), bloque):
+        posiciones = recalcular[inicio:inicio + bloque]
+        filas = (matriz[posiciones] @ transpuesta).toarray()
+        vecinos[posiciones], scores[posiciones] = _mejores_k(filas, posiciones, k)
+
+    return _tabla_vecinos(nombres, vecinos, scores), len(recalcular)
+
+def actualizar_modelo(historial, calificaciones, anterior, k=K_VECINOS, bloque=1024):
+    '''
+    Recalcula la matriz de usuarios y actualiza el índice de juegos similares con las calificaciones nuevas.
+
+    La matriz normalizada se vuelve a armar completa con `matriz_calificaciones`, que es lineal en la cantidad de
+    calificaciones; lo que depende del lote es el cálculo de similitudes, que solo se hace para los juegos
+    calificados por los usuarios del lote.
+
+    Args:
+        historial (str): CSV con todas las calificaciones, incluidas las del lote (como df_recomendacion.csv).
+        calificaciones (int): Cantidad de calificaciones del lote, que son las últimas filas del CSV.
+        anterior (IndiceVecinos): Índice de juegos antes del lote.
+        k (int): Cantidad de vecinos por juego.
+        bloque (int): Cantidad de juegos que se procesan por vez.
+
+    Returns:
+        tuple: El motor de usuarios, la tabla del índice de juegos, la cantidad de usuarios del lote y la de filas
+        del índice recalculadas.
+    '''
+    df = pd.read_csv(historial)
+    matriz, usuarios, items = matriz_calificaciones(df)
+
+    # Juegos afectados: todos los que calificaron los usuarios del lote, porque al cambiar la media y el rango de
+    # un usuario cambian todas sus calificaciones normalizadas
+    usuarios_lote = df['user_id'].iloc[len(df) - calificaciones:].unique()
+    items_afectados = df.loc[df['user_id'].isin(usuarios_lote), 'item_name'].dropna().astype(str).unique()
+    afectados = pd.Index(items).get_indexer(items_afectados)
+
+    tabla, recalculadas = actualizar_indice_vecinos(anterior, matriz.T.tocsr(), items, afectados[afectados >= 0], k=k, bloque=bloque)
+    return MotorUsuarios(matriz, usuarios, items), tabla, len(usuarios_lote), recalculadas
+
+def _guardar_parquet(df, ruta):
+    # Las tablas se guardan con los tipos compactos que lee la API y se leen expandidas, como las escriben los notebooks
+    guardar_compacto(df, ruta)
+
+def aplicar_lote(lote, directorio='data', ruta_cache=sentimiento.ARCHIVO_CACHE, k=K_VECINOS, bloque=1024):
+    '''
+    Aplica un lote de registros nuevos sobre las tablas y el modelo de un directorio.
+
+    Todas las tablas se calculan antes de escribir ninguna, y cada archivo se escribe con otro nombre y se reemplaza
+    al final, de modo que si algo falla el directorio queda como estaba. Al cambiar los archivos cambia la versión
+    de los datos y la API vacía su cache de respuestas.
+
+    Args:
+        lote (str): Directorio del lote, con alguna de las tablas de TABLAS_LOTE.
+        directorio (str): Directorio de los datos de la API.
+        ruta_cache (str): Base SQLite del cache de sentimiento.
+        k (int): Cantidad de vecinos por juego del índice.
+        bloque (int): Cantidad de juegos cuya similitud se calcula por vez.
+
+    Returns:
+        dict: Registros del lote y cantidad de elementos actualizados de cada tabla, y los segundos que tardó.
+    '''
+    inicio = time.perf_counter()
+    tablas = {nombre: leer_tabla(lote, nombre) for nombre in TABLAS_LOTE}
+    tablas = {nombre: df for nombre, df in tablas.items() if df is not None}
+    if not tablas:
+        raise ValueError(f"El lote '{lote}' no tiene ninguna de las tablas {TABLAS_LOTE}")
+
+    def ruta(archivo):
+        return os.path.join(directorio, archivo)
+
+    salidas = {}
+    metricas = {f'registros_{nombre}': len(df) for nombre, df in tablas.items()}
+    df_games = leer_expandido(ruta('df_games.parquet'))
+
+    if 'games' in tablas:
+        df_games, df_items_developer, df_developer_anio, metricas['developer_anio'] = actualizar_juegos(
+            df_games, tablas['games'], leer_expandido(ruta('df_items_developer.parquet')),
+            leer_expandido(ruta(ARCHIVO_DEVELOPER_ANIO)))
+        salidas.update({'df_games.parquet': df_games, 'df_items_developer.parquet': df_items_developer,
+                        ARCHIVO_DEVELOPER_ANIO: df_developer_anio})
+
+    if 'items' in tablas:
+        items = tablas['items']
+        df_gastos_items, metricas['usuarios_gastos'] = actualizar_gastos(leer_expandido(ruta('df_gastos_items.parquet')), items, df_games)
+        df_playtime_forever, generos = actualizar_playtime(leer_expandido(ruta('df_playtime_forever.parquet')), items, df_games)
+        df_genre_ranking = actualizar_ranking(leer_expandido(ruta('df_genre_ranking.parquet')), df_playtime_forever, generos)
+        df_top = actualizar_top_usuarios(leer_expandido(ruta(ARCHIVO_TOP_USUARIOS_GENERO)), df_playtime_forever, generos)
+        metricas['generos'] = len(generos)
+        salidas.update({'df_gastos_items.parquet': df_gastos_items, 'df_playtime_forever.parquet': df_playtime_forever,
+                        'df_genre_ranking.parquet': df_genre_ranking, ARCHIVO_TOP_USUARIOS_GENERO: df_top})
+
+    if 'reviews' in tablas:
+        df_reviews, df_sentimiento_anio, metricas['reviews'] = actualizar_reviews(
+            leer_expandido(ruta('df_reviews.parquet')), tablas['reviews'], df_games,
+            leer_expandido(ruta(ARCHIVO_SENTIMIENTO_ANIO)), ruta_cache=ruta_cache)
+        salidas.update({'df_reviews.parquet': df_reviews, ARCHIVO_SENTIMIENTO_ANIO: df_sentimiento_anio})
+
+    temporales = []
+    try:
+        if 'recomendacion' in tablas:
+            # Las calificaciones del lote se agregan al final de una copia del historial
+            historial = ruta('df_recomendacion.csv') + '.nuevo'
+            temporales.append(historial)
+            shutil.copyfile(ruta('df_recomendacion.csv'), historial)
+            calificaciones = tablas['recomendacion'][['user_id', 'item_name', 'rating']]
+            calificaciones.to_csv(historial, mode='a', header=False, index=False, encoding='utf-8')
+            motor, tabla, metricas['usuarios_modelo'], metricas['juegos_recalculados'] = actualizar_modelo(
+                historial, len(calificaciones), IndiceVecinos.desde_parquet(ruta('item_topk.parquet')), k=k, bloque=bloque)
+            motor.guardar(ruta('piv_norm_csr.nuevo'))
+            temporales.append(ruta('piv_norm_csr.nuevo'))
+            pq.write_table(tabla, ruta('item_topk.parquet.nuevo'))
+            temporales.append(ruta('item_topk.parquet.nuevo'))
+
+        for archivo, df in salidas.items():
+            _guardar_parquet(df, ruta(archivo + '.nuevo'))
+            temporales.append(ruta(archivo + '.nuevo'))
+    except BaseException:
+        for temporal in temporales:
+            shutil.rmtree(temporal) if os.path.isdir(temporal) else os.remove(temporal)
+        raise
+
+    # Se reemplazan los archivos recién cuando están todos escritos
+    for temporal in temporales:
+        destino = temporal[:-len('.nuevo')]
+        if os.path.isdir(temporal):
+            if os.path.isdir(destino):
+                os.replace(destino, destino + '.anterior')
+                os.replace(temporal, destino)
+                shutil.rmtree(destino + '.anterior')
+            else:
+                os.replace(temporal, destino)
+        else:
+            os.replace(temporal, destino)
+
+    metricas['segundos'] = round(time.perf_counter() - inicio, 3)
+    return metricas
+
+def reconstruir(df_games, df_items, df_reviews, df_recomendacion, directorio, ruta_cache=sentimiento.ARCHIVO_CACHE,
+                k=K_VECINOS, bloque=1024, modelo=True):
+    '''
+    Construye de cero todas las tablas que actualiza `aplicar_lote`, con los mismos pasos que los notebooks 01d y 04.
+    Sirve de referencia para verificar la actualización incremental y para preparar un directorio inicial.
+
+    Args:
+        df_games (pandas.DataFrame): Juegos limpios.
+        df_items (pandas.DataFrame): Items de usuarios limpios.
+        df_reviews (pandas.DataFrame): Reviews limpias, con la columna 'reviews_review'. Si ya tienen la columna
+            'sentiment_analysis' se usan esas etiquetas y no se calcula el sentimiento.
+        df_recomendacion (pandas.DataFrame): Calificaciones (user_id, item_name, rating).
+        directorio (str): Directorio donde se guardan las tablas.
+        ruta_cache (str): Base SQLite del cache de sentimiento.
+        k (int): Cantidad de vecinos por juego del índice.
+        bloque (int): Cantidad de juegos cuya similitud se calcula por vez.
+        modelo (bool): Si es False solo se guarda df_recomendacion.csv, sin construir el índice de vecinos ni la
+            matriz de usuarios.
+    '''
+    os.makedirs(directorio, exist_ok=True)
+
+    def ruta(archivo):
+        return os.path.join(directorio, archivo)
+
+    gastos = df_items[['items_count', 'user_id', 'item_id']].merge(_precios(df_games), on='item_id', how='left')
+    gastos['price'] = gastos['price'].fillna(0.0)
+    suma = gastos.groupby('user_id')['price'].sum().reset_index()
+    conteo = gastos[['items_count', 'user_id']].drop_duplicates(subset='user_id', keep='first')
+    df_gastos_items = conteo.merge(suma, on='user_id', how='right')
+
+    playtime = df_items[['playtime_forever', 'user_id', 'item_id']].merge(_generos(df_games), on='item_id')
+    agg_genero = playtime.groupby(['genres', 'user_id'])['playtime_forever'].sum().reset_index()
+    agg_genero['playtime_horas'] = agg_genero['playtime_forever'] / 60
+    agg_genero = agg_genero.drop('playtime_forever', axis=1)
+    urls = df_items[['user_url', 'user_id']].drop_duplicates(subset='user_id', keep='first')
+    df_playtime_forever = agg_genero.merge(urls, on='user_id', how='left')
+    df_genre_ranking = ranking_generos(agg_genero.groupby('genres')['playtime_horas'].sum())
+
+    df_items_developer = _items_developer(df_games)
+
+    if 'sentiment_analysis' not in df_reviews.columns:
+        etiquetas, _ = sentimiento.puntuar_reviews(df_reviews['reviews_review'].tolist(), ruta_cache=ruta_cache)
+        df_reviews = df_reviews.assign(sentiment_analysis=etiquetas)
+    df_reviews = df_reviews.merge(_anios(df_games), on='reviews_item_id')
+    df_reviews = ordenar_reviews_por_fecha(df_reviews.drop('reviews_review', axis=1, errors='ignore'))
+
+    tablas = {'df_games.parquet': df_games, 'df_gastos_items.parquet': df_gastos_items,
+              'df_playtime_forever.parquet': df_playtime_forever, 'df_genre_ranking.parquet': df_genre_ranking,
+              ARCHIVO_TOP_USUARIOS_GENERO: agregado_top_usuarios_genero(df_playtime_forever),
+              'df_items_developer.parquet': df_items_developer, ARCHIVO_DEVELOPER_ANIO: agregado_developer_anio(df_items_developer),
+              'df_reviews.parquet': df_reviews, ARCHIVO_SENTIMIENTO_ANIO: agregado_sentimiento_anio(df_reviews)}
+    for archivo, df in tablas.items():
+        _guardar_parquet(df, ruta(archivo))
+
+    df_recomendacion[['user_id', 'item_name', 'rating']].to_csv(ruta('df_recomendacion.csv'), index=False, encoding='utf-8')
+    if not modelo:
+        return
+    matriz, usuarios, items = matriz_calificaciones(pd.read_csv(ruta('df_recomendacion.csv')))
+    pq.write_table(construir_indice_vecinos_dispersa(matriz.T.tocsr(), items, k=k, bloque=bloque), ruta('item_topk.parquet'))
+    MotorUsuarios(matriz, usuarios, items).guardar(ruta('piv_norm_csr'))
+
+def comparar_directorios(directorio, referencia):
+    '''
+    Compara las tablas y el modelo de dos directorios, por ejemplo uno actualizado con `aplicar_lote` y otro
+    reconstruido con `reconstruir`.
+
+    Las tablas se comparan por valor, con el orden de filas y columnas de la referencia. Los gastos por usuario se
+    comparan con tolerancia, porque la suma incremental de precios suma en otro orden que la completa; el resto
+    (incluidas las horas por género y el índice de vecinos) tiene que ser idéntico.
+
+    Returns:
+        list: Nombres de los archivos que no coinciden. Vacía si todo coincide.
+    '''
+    diferencias = []
+    for archivo in ['df_games.parquet', 'df_gastos_items.parquet', 'df_playtime_forever.parquet', 'df_genre_ranking.parquet',
+                    ARCHIVO_TOP_USUARIOS_GENERO, 'df_items_developer.parquet', ARCHIVO_DEVELOPER_ANIO, 'df_reviews.parquet',
+                    ARCHIVO_SENTIMIENTO_ANIO]:
+        a = leer_expandido(os.path.join(directorio, archivo)).reset_index(drop=True)
+        b = leer_expandido(os.path.join(referencia, archivo)).reset_index(drop=True)
+        if archivo in ('df_items_developer.parquet', 'df_reviews.parquet'):
+            # Las filas de los juegos nuevos se agregan al final de df_items_developer, no en el lugar de su primera
+            # aparición en df_games, y el orden de las reviews de una misma fecha depende de cómo ordena merge cada
+            # versión de pandas. Ninguna consulta depende de esos órdenes
+            columnas = list(b.columns)
+            a, b = (df.sort_values(columnas, kind='stable').reset_index(drop=True) for df in (a, b))
+        try:
+            pd.testing.assert_frame_equal(a[b.columns], b, check_exact=archivo != 'df_gastos_items.parquet', check_dtype=False)
+        except (AssertionError, KeyError):
+            diferencias.append(archivo)
+
+    a, b = (IndiceVecinos.desde_parquet(os.path.join(d, 'item_topk.parquet')) for d in (directorio, referencia))
+    if not (np.array_equal(a.nombres, b.nombres) and np.array_equal(a.vecinos, b.vecinos) and np.array_equal(a.scores, b.scores)):
+        diferencias.append('item_topk.parquet')
+    a, b = (MotorUsuarios.desde_archivo(os.path.join(d, 'piv_norm_csr')) for d in (directorio, referencia))
+    if not (np.array_equal(a.usuarios, b.usuarios) and np.array_equal(a.items, b.items) and (a.matriz != b.matriz).nnz == 0):
+        diferencias.append('piv_norm_csr')
+    return diferencias
+
+def main():
+    parser = argparse.ArgumentParser(description='Aplica un lote de registros nuevos sobre las tablas y el modelo de la API.')
+    parser.add_argument('lote', help=f'Directorio del lote, con alguna de las tablas {TABLAS_LOTE} en parquet o CSV')
+    parser.add_argument('--directorio', default='data', help='Directorio de los datos de la API')
+    parser.add_argument('--cache', default=sentimiento.ARCHIVO_CACHE, help='Base SQLite del cache de sentimiento')
+    parser.add_argument('--k', type=int, default=K_VECINOS, help='Cantidad de vecinos por juego')
+    parser.add_argument('--bloque', type=int, default=1024, help='Juegos cuya similitud se calcula por vez')
+    parser.add_argument('--comparar', default=None, help='Directorio reconstruido de cero con el que comparar el resultado')
+    args = parser.parse_args()
+
+    metricas = aplicar_lote(args.lote, args.directorio, ruta_cache=args.cache, k=args.k, bloque=args.bloque)
+    print(f"Lote aplicado: {metricas}")
+
+    if args.comparar:
+        diferencias = comparar_directorios(args.directorio, args.comparar)
+        if diferencias:
+            print(f"No coinciden con la reconstrucción completa: {diferencias}")
+            raise SystemExit(1)
+        print('Las tablas y el modelo coinciden con la reconstrucción completa')
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,275 @@
+## AGREGADOS PRECALCULADOS PARA LAS CONSULTAS DE LA API
+# Importaciones
+import argparse
+import os
+import time
+
+import numpy as np
+import pandas as pd
+
+from tipos import guardar_compacto, leer_expandido
+
+# Archivos donde se guardan los agregados, junto a los demás parquet
+ARCHIVO_DEVELOPER_ANIO = 'df_developer_anio.parquet'
+ARCHIVO_SENTIMIENTO_ANIO = 'df_sentimiento_anio.parquet'
+ARCHIVO_TOP_USUARIOS_GENERO = 'df_top_usuarios_genero.parquet'
+
+# Cantidad de usuarios con más horas que se guardan por género
+TOP_USUARIOS_GENERO = 1000
+
+# Categorías del análisis de sentimiento
+CATEGORIAS_SENTIMIENTO = {0: 'Negative', 1: 'Neutral', 2: 'Positive'}
+
+# Funciones
+def agregado_developer_anio(df_items_developer):
+    '''
+    Calcula, para cada desarrollador y año de lanzamiento, la cantidad de items y el porcentaje de items gratuitos.
+
+    Args:
+        df_items_developer (pandas.DataFrame): Items con su precio, año de lanzamiento y desarrollador.
+
+    Returns:
+        pandas.DataFrame: Un DataFrame con las columnas 'developer', 'release_anio', 'cantidad', 'porcentaje_gratis' y
+        'gratis' (cantidad de items gratuitos, para poder actualizar el porcentaje sin recorrer los items), ordenado
+        por desarrollador y año.
+    '''
+    grupos = df_items_developer.groupby(['developer', 'release_anio'])
+    cantidad = grupos['item_id'].count()
+    gratis = df_items_developer[df_items_developer['price'] == 0.0].groupby(['developer', 'release_anio'])['item_id'].count()
+    gratis = gratis.reindex(cantidad.index, fill_value=0)
+
+    return pd.DataFrame({'cantidad': cantidad, 'porcentaje_gratis': porcentaje_gratis(gratis, cantidad),
+                         'gratis': gratis.astype('int64')}).reset_index()
+
+def porcentaje_gratis(gratis, cantidad):
+    '''
+    Mismo cálculo que la consulta original: porcentaje de items gratuitos truncado a entero.
+    '''
+    return (gratis / cantidad * 100).fillna(0).astype(int)
+
+def agregado_sentimiento_anio(df_reviews):
+    '''
+    Calcula, para cada año de lanzamiento, la cantidad de reviews en cada categoría de sentimiento.
+
+    Args:
+        df_reviews (pandas.DataFrame): Reviews con las columnas 'release_anio' y 'sentiment_analysis'.
+
+    Returns:
+        pandas.DataFrame: Un DataFrame con la columna 'release_anio' y una columna por categoría ('Negative', 'Neutral', 'Positive').
+    '''
+    conteo = pd.crosstab(df_reviews['release_anio'], df_reviews['sentiment_analysis'])
+    conteo = conteo.reindex(columns=list(CATEGORIAS_SENTIMIENTO), fill_value=0).rename(columns=CATEGORIAS_SENTIMIENTO)
+    conteo.columns.name = None
+    return conteo.astype('int64').reset_index()
+
+def _mayores(valores, n):
+    '''
+    Devuelve las posiciones de los n mayores valores, de mayor a menor y, entre valores iguales, en el orden en que
+    aparecen (como Series.nlargest). Se elige el n-ésimo mayor con una partición, sin ordenar todos los valores.
+    '''
+    if len(valores) > n:
+        limite = np.partition(valores, len(valores) - n)[len(valores) - n]
+        mayores = np.flatnonzero(valores > limite)
+        elegidos = np.concatenate([mayores, np.flatnonzero(valores == limite)[:n - len(mayores)]])
+    else:
+        elegidos = np.arange(len(valores))
+    return elegidos[np.lexsort((elegidos, -valores[elegidos]))]
+
+def agregado_top_usuarios_genero(df_playtime_forever, n=TOP_USUARIOS_GENERO):
+    '''
+    Calcula, para cada género, los n usuarios con más horas de juego, en el orden en que los devolvía la consulta
+    /userforgenre (agrupando por 'user_url' y 'user_id' y tomando nlargest).
+
+    Args:
+        df_playtime_forever (pandas.DataFrame): Horas jugadas por usuario y género, con 'user_url'.
+        n (int): Cantidad de usuarios por género.
+
+    Returns:
+        pandas.DataFrame: Un DataFrame con las columnas 'genres', 'posicion' (desde 1), 'user_id', 'user_url' y
+        'playtime_horas', ordenado por género y posición.
+    '''
+    horas = df_playtime_forever.groupby(['genres', 'user_url', 'user_id'], observed=True)['playtime_horas'].sum()
+    generos = horas.index.get_level_values('genres')
+    valores = horas.to_numpy()
+    filas = []
+    # Las filas de cada género son contiguas porque el índice está ordenado
+    limites = np.flatnonzero(np.r_[True, generos[1:] != generos[:-1], True]) if len(horas) else np.array([0])
+    for inicio, fin in zip(limites[:-1], limites[1:]):
+        filas.append(inicio + _mayores(valores[inicio:fin], n))
+    filas = np.concatenate(filas) if filas else np.array([], dtype=np.int64)
+    top = horas.iloc[filas].reset_index()
+    top.insert(1, 'posicion', top.groupby('genres', observed=True).cumcount() + 1)
+    return top[['genres', 'posicion', 'user_id', 'user_url', 'playtime_horas']]
+
+def guardar_agregados(directorio='data'):
+    '''
+    Calcula los agregados a partir de los parquet del directorio y los guarda junto a ellos.
+
+    Args:
+        directorio (str): Directorio que contiene df_items_developer.parquet y df_reviews.parquet.
+    '''
+    df_items_developer = pd.read_parquet(os.path.join(directorio, 'df_items_developer.parquet'))
+    df_reviews = pd.read_parquet(os.path.join(directorio, 'df_reviews.parquet'), columns=['release_anio', 'sentiment_analysis'])
+
+    for df, archivo in [(agregado_developer_anio(df_items_developer), ARCHIVO_DEVELOPER_ANIO),
+                        (agregado_sentimiento_anio(df_reviews), ARCHIVO_SENTIMIENTO_ANIO)]:
+        ruta = os.path.join(directorio, archivo)
+        guardar_compacto(df, ruta)
+        print(f"Agregado guardado como '{ruta}' ({len(df)} filas)")
+
+    # df_playtime_forever no está en el repositorio por su tamaño, así que el top por género solo se calcula si existe
+    ruta_playtime = os.path.join(directorio, 'df_playtime_forever.parquet')
+    if os.path.exists(ruta_playtime):
+        ruta = os.path.join(directorio, ARCHIVO_TOP_USUARIOS_GENERO)
+        df = agregado_top_usuarios_genero(leer_expandido(ruta_playtime, ['genres', 'user_id', 'playtime_horas', 'user_url']))
+        guardar_compacto(df, ruta)
+        print(f"Agregado guardado como '{ruta}' ({len(df)} filas)")
+    else:
+        print(f"No se calculó '{ARCHIVO_TOP_USUARIOS_GENERO}' porque falta '{ruta_playtime}'")
+
+def ordenar_reviews_por_fecha(df_reviews):
+    '''
+    Convierte 'reviews_date' a fecha y ordena las reviews por fecha, para poder consultarlas por rango con búsquedas binarias.
+
+    Las fechas con formato inválido quedan como NaT al final de la tabla.
+
+    Args:
+        df_reviews (pandas.DataFrame): Reviews con la columna 'reviews_date' en formato YYYY-MM-DD.
+
+    Returns:
+        pandas.DataFrame: Las reviews ordenadas por fecha, con 'reviews_date' de tipo fecha.
+    '''
+    df_reviews = df_reviews.copy()
+    if not pd.api.types.is_datetime64_any_dtype(df_reviews['reviews_date']):
+        df_reviews['reviews_date'] = pd.to_datetime(df_reviews['reviews_date'], format='%Y-%m-%d', errors='coerce')
+    return df_reviews.sort_values('reviews_date', kind='stable', na_position='last').reset_index(drop=True)
+
+def guardar_reviews_ordenadas(directorio='data'):
+    '''
+    Reescribe df_reviews.parquet ordenado por fecha, con 'reviews_date' de tipo fecha y con los tipos compactos de tipos.py.
+
+    Args:
+        directorio (str): Directorio que contiene df_reviews.parquet.
+    '''
+    ruta = os.path.join(directorio, 'df_reviews.parquet')
+    df_reviews = ordenar_reviews_por_fecha(pd.read_parquet(ruta))
+    guardar_compacto(df_reviews, ruta)
+    print(f"Reviews ordenadas por fecha guardadas como '{ruta}'")
+
+def cargar_agregados(directorio='data'):
+    '''
+    Lee los agregados guardados y los convierte en diccionarios listos para responder las consultas.
+
+    Args:
+        directorio (str): Directorio donde se guardaron los agregados.
+
+    Returns:
+        tuple: Dos diccionarios:
+            - desarrollador -> {'cantidad_por_año': dict, 'porcentaje_gratis_por_año': dict}
+            - año -> {'Negative': int, 'Neutral': int, 'Positive': int}
+    '''
+    df_developer = pd.read_parquet(os.path.join(directorio, ARCHIVO_DEVELOPER_ANIO))
+    df_sentimiento = pd.read_parquet(os.path.join(directorio, ARCHIVO_SENTIMIENTO_ANIO))
+
+    por_desarrollador = {}
+    for desarrollador, anio, cantidad, porcentaje in zip(df_developer['developer'].tolist(), df_developer['release_anio'].tolist(),
+                                                         df_developer['cantidad'].tolist(), df_developer['porcentaje_gratis'].tolist()):
+        datos = por_desarrollador.setdefault(desarrollador, {'cantidad_por_año': {}, 'porcentaje_gratis_por_año': {}})
+        datos['cantidad_por_año'][anio] = cantidad
+        datos['porcentaje_gratis_por_año'][anio] = porcentaje
+
+    categorias = list(CATEGORIAS_SENTIMIENTO.values())
+    por_anio = {fila[0]: dict(zip(categorias, fila[1:]))
+                for fila in df_sentimiento[['release_anio'] + categorias].itertuples(index=False, name=None)}
+
+    return por_desarrollador, por_anio
+
+def _developer_referencia(df_items_developer, desarrollador):
+    '''
+    Cálculo original de la consulta /developer, filtrando y agrupando en cada llamada. Se usa para verificar los agregados.
+    '''
+    data_filtrada = df_items_developer[df_items_developer['developer'] == desarrollador]
+    cantidad_por_año = data_filtrada.groupby('release_anio')['item_id'].count()
+    cantidad_gratis_por_año = data_filtrada[data_filtrada['price'] == 0.0].groupby('release_anio')['item_id'].count()
+    porcentaje_gratis_por_año = (cantidad_gratis_por_año / cantidad_por_año * 100).fillna(0).astype(int)
+    return {
+        'cantidad_por_año': cantidad_por_año.to_dict(),
+        'porcentaje_gratis_por_año': porcentaje_gratis_por_año.to_dict()
+    }
+
+def _sentimiento_referencia(df_reviews, anio):
+    '''
+    Cálculo original de la consulta /sentiment_analysis, recorriendo las reviews del año. Se usa para verificar los agregados.
+    '''
+    sentiment_counts = {'Negative': 0, 'Neutral': 0, 'Positive': 0}
+    for sentiment in df_reviews.loc[df_reviews['release_anio'] == anio, 'sentiment_analysis']:
+        sentiment_counts[CATEGORIAS_SENTIMIENTO[sentiment]] += 1
+    return sentiment_counts
+
+def _userforgenre_referencia(df_playtime_forever, genero):
+    '''
+    Cálculo original de la consulta /userforgenre, filtrando y agrupando en cada llamada. Se usa para verificar el
+    top de usuarios por género.
+    '''
+    data_por_genero = df_playtime_forever[df_playtime_forever['genres'] == genero]
+    top_users = data_por_genero.groupby(['user_url', 'user_id'])['playtime_horas'].sum().nlargest(5).reset_index()
+    return [(row['user_id'], row['user_url']) for _, row in top_users.iterrows()]
+
+def verificar_agregados(directorio='data'):
+    '''
+    Verifica que los agregados guardados den el mismo resultado que el cálculo original para cada desarrollador, cada
+    año y, si está el top de usuarios por género, cada género.
+
+    Args:
+        directorio (str): Directorio con los parquet y los agregados.
+
+    Returns:
+        list: Lista de las claves ('developer', 'anio' o 'genres', valor) cuyo resultado no coincide. Vacía si todo coincide.
+    '''
+    df_items_developer = pd.read_parquet(os.path.join(directorio, 'df_items_developer.parquet'))
+    df_reviews = pd.read_parquet(os.path.join(directorio, 'df_reviews.parquet'), columns=['release_anio', 'sentiment_analysis'])
+    por_desarrollador, por_anio = cargar_agregados(directorio)
+
+    diferencias = []
+    vacio = {'cantidad_por_año': {}, 'porcentaje_gratis_por_año': {}}
+    # Se aplica el cálculo original sobre las filas de cada desarrollador para no recorrer la tabla completa cada vez
+    for desarrollador, filas in df_items_developer.groupby('developer'):
+        if por_desarrollador.get(desarrollador, vacio) != _developer_referencia(filas, desarrollador):
+            diferencias.append(('developer', desarrollador))
+
+    vacio = {'Negative': 0, 'Neutral': 0, 'Positive': 0}
+    for anio in df_reviews['release_anio'].dropna().unique():
+        if por_anio.get(anio, vacio) != _sentimiento_referencia(df_reviews, anio):
+            diferencias.append(('anio', anio))
+
+    ruta_top = os.path.join(directorio, ARCHIVO_TOP_USUARIOS_GENERO)
+    if os.path.exists(ruta_top):
+        df_playtime_forever = leer_expandido(os.path.join(directorio, 'df_playtime_forever.parquet'))
+        df_top = leer_expandido(ruta_top)
+        for genero in df_playtime_forever['genres'].dropna().unique():
+            top = df_top[(df_top['genres'] == genero) & (df_top['posicion'] <= 5)]
+            if list(zip(top['user_id'], top['user_url'])) != _userforgenre_referencia(df_playtime_forever, genero):
+                diferencias.append(('genres', genero))
+
+    return diferencias
+
+def main():
+    parser = argparse.ArgumentParser(description='Prepara las reviews ordenadas por fecha y los agregados por desarrollador, por año y por género que usa la API.')
+    parser.add_argument('--directorio', default='data', help='Directorio de los parquet')
+    parser.add_argument('--verificar', action='store_true', help='Compara los agregados con el cálculo original')
+    args = parser.parse_args()
+
+    inicio = time.perf_counter()
+    guardar_reviews_ordenadas(args.directorio)
+    guardar_agregados(args.directorio)
+    print(f"Agregados calculados en {time.perf_counter() - inicio:.2f} s")
+
+    if args.verificar:
+        diferencias = verificar_agregados(args.directorio)
+        if diferencias:
+            print(f"Hay {len(diferencias)} diferencias con el cálculo original, por ejemplo: {diferencias[:5]}")
+            raise SystemExit(1)
+        print('Los agregados coinciden con el cálculo original para todos los desarrolladores, años y géneros')
+
+if __name__ == '__main__':
+    main()
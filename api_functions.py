@@ -1,19 +1,16 @@
 ## FUNCIONES A UTILIZAR EN app.py
 
 # Importaciones
-import pandas as pd
-import operator
+import configuracion
+from instantaneas import GestorInstantaneas
+from metricas import fase
 
-# Datos a usar
-
-df_reviews = pd.read_parquet('data/df_reviews.parquet')
-df_gastos_items = pd.read_parquet('data/df_gastos_items.parquet')
-df_genre_ranking = pd.read_parquet('data/df_genre_ranking.parquet')
-df_playtime_forever = pd.read_parquet('data/df_playtime_forever.parquet')
-df_items_developer = pd.read_parquet('data/df_items_developer.parquet')
-piv_norm = pd.read_parquet('data/piv_norm.parquet')
-item_sim_df = pd.read_parquet('data/item_sim_df.parquet')
-user_sim_df = pd.read_parquet('data/user_sim_df.parquet')
+# Datos a usar: cada conjunto se carga recién la primera vez que una consulta lo necesita. Cada consulta toma la
+# instantánea activa al empezar, así que al publicarse otra versión de los datos las que están en curso terminan
+# con la anterior
+gestor = GestorInstantaneas(configuracion.DIRECTORIO_DATOS, raiz=configuracion.DIRECTORIO_VERSIONES or None,
+                            revisar_cada=configuracion.INSTANTANEA_REVISAR_CADA, motor=configuracion.MOTOR_CONSULTAS,
+                            revisar_archivos_cada=configuracion.CACHE_REVISAR_CADA)
 
 def presentacion():
     '''
@@ -54,12 +51,13 @@ def presentacion():
     </html>
     '''
 
-def userdata(user_id):
+def userdata(user_id, datos=None):
     '''
     Esta función devuelve información sobre un usuario según su 'user_id'.
          
     Args:
         user_id (str): Identificador único del usuario.
+        datos (Datos, optional): Instantánea de los datos a usar. Por defecto, la activa.
     
     Returns:
         dict: Un diccionario que contiene información sobre el usuario.
@@ -67,17 +65,15 @@ def userdata(user_id):
             - 'porcentaje_recomendacion' (float): Porcentaje de recomendaciones realizadas por el usuario.
             - 'total_items' (int): Cantidad de items que tiene el usuario.
     '''
-    # Filtra por el usuario de interés
-    usuario = df_reviews[df_reviews['user_id'] == user_id]
-    # Calcula la cantidad de dinero gastado para el usuario de interés
-    cantidad_dinero = df_gastos_items[df_gastos_items['user_id']== user_id]['price'].iloc[0]
-    # Busca el count_item para el usuario de interés    
-    count_items = df_gastos_items[df_gastos_items['user_id']== user_id]['items_count'].iloc[0]
-    
-    # Calcula el total de recomendaciones realizadas por el usuario de interés
-    total_recomendaciones = usuario['reviews_recommend'].sum()
-    # Calcula el total de reviews realizada por todos los usuarios
-    total_reviews = len(df_reviews['user_id'].unique())
+    datos = datos or gestor.datos()
+    with fase('userdata', 'buscar'):
+        # Busca la cantidad de dinero gastado y el count_item para el usuario de interés
+        cantidad_dinero, count_items = datos.gastos.gastos(user_id)
+
+        # Busca el total de recomendaciones realizadas por el usuario de interés
+        total_recomendaciones = datos.recomendaciones.recomendaciones(user_id)
+        # Total de usuarios que realizaron reviews
+        total_reviews = datos.recomendaciones.total_usuarios_reviews
     # Calcula el porcentaje de recomendaciones realizadas por el usuario de interés
     porcentaje_recomendaciones = (total_recomendaciones / total_reviews) * 100
     
@@ -87,27 +83,24 @@ def userdata(user_id):
         'total_items': int(count_items)
     }
 
-def countreviews(fecha_inicio, fecha_fin):
+def countreviews(fecha_inicio, fecha_fin, datos=None):
     '''
     Esta función devuelve estadísticas sobre las reviews realizadas por los usuarios entre dos fechas.
          
     Args:
         fecha_inicio (str): Fecha de inicio para filtrar la información en formato YYYY-MM-DD.
         fecha_fin (str): Fecha de fin para filtrar la información en formato YYYY-MM-DD.
+        datos (Datos, optional): Instantánea de los datos a usar. Por defecto, la activa.
     
     Returns:
         dict: Un diccionario que contiene estadísticas de las reviews entre las fechas especificadas.
             - 'total_usuarios_reviews' (int): Cantidad de usuarios que realizaron reviews entre las fechas.
             - 'porcentaje_recomendaciones' (float): Porcentaje de recomendaciones positivas (True) entre las reviews realizadas.
     '''
-    # Filtra el dataframe entre las fechas de interés
-    user_data_entre_fechas = df_reviews[(df_reviews['reviews_date'] >= fecha_inicio) & (df_reviews['reviews_date'] <= fecha_fin)]
-    # Calcula la cantidad de usuarios que dieron reviews entre las fechas de interés
-    total_usuarios = user_data_entre_fechas['user_id'].nunique()
-    # Calcula el total de recomendaciones entre las fechas de interes (True + False)
-    total_recomendacion = len(user_data_entre_fechas)
-    # Calcula la cantidad de recomendaciones positivas que que hicieron entre las fechas de interés
-    total_recomendaciones_True = user_data_entre_fechas['reviews_recommend'].sum()
+    datos = datos or gestor.datos()
+    with fase('countreviews', 'filtrar'):
+        # Busca en el índice por fecha los usuarios distintos, el total de reviews y las recomendaciones positivas entre las fechas de interés
+        total_usuarios, total_recomendacion, total_recomendaciones_True = datos.fechas.rango(fecha_inicio, fecha_fin)
     # Calcula el porcentaje de recomendación realizadas entre el total de usuarios
     porcentaje_recomendaciones = (total_recomendaciones_True / total_recomendacion) * 100
     
@@ -127,181 +120,291 @@ def genre(genero):
         dict: Un diccionario que contiene la posición del género en el ranking.
             - 'rank' (int): Posición del género en el ranking basado en las horas jugadas.
     '''
-    # Busca el ranking para el género de interés
-    rank = df_genre_ranking[df_genre_ranking['genres'] == genero]['ranking'].iloc[0]
+    datos = gestor.datos()
+    with fase('genre', 'buscar'):
+        # Busca el ranking para el género de interés
+        rank = datos.generos.ranking(genero)
     return {
         'rank': int(rank)
     }
 
-def userforgenre(genero):
+def userforgenre(genero, n=5):
     '''
-    Esta función devuelve el top 5 de usuarios con más horas de juego en un género específico, junto con su URL de perfil y ID de usuario.
+    Esta función devuelve el top 5 (o n) de usuarios con más horas de juego en un género específico, junto con su URL de perfil y ID de usuario.
          
     Args:
         genero (str): Género del videojuego.
+        n (int): Cantidad de usuarios del top (como máximo los que se precalcularon por género).
     
     Returns:
         dict: Un diccionario que contiene el top 5 de usuarios con más horas de juego en el género dado, junto con su URL de perfil y ID de usuario.
             - 'user_id' (str): ID del usuario.
             - 'user_url' (str): URL del perfil del usuario.
     '''
-    # Filtra el dataframe por el género de interés
-    data_por_genero = df_playtime_forever[df_playtime_forever['genres'] == genero]
-    # Agrupa el dataframe filtrado por usuario y suma la cantidad de horas
-    top_users = data_por_genero.groupby(['user_url', 'user_id'])['playtime_horas'].sum().nlargest(5).reset_index()
-    
-    # Se hace un diccionario vacío para guardar los datos que se necesitan
-    top_users_dict = {}
-    for index, row in top_users.iterrows():
-        # User info recorre cada fila del top 5 y lo guarda en el diccionario
-        user_info = {
-            'user_id': row['user_id'],
-            'user_url': row['user_url']
-        }
-        top_users_dict[index + 1] = user_info
+    datos = gestor.datos()
+    with fase('userforgenre', 'filtrar'):
+        # Obtiene los primeros usuarios del top precalculado del género
+        top_users = datos.top_generos.pagina(genero, desde=1, cantidad=n)
+
+    with fase('userforgenre', 'serializar'):
+        top_users_dict = {}
+        for posicion, user_id, user_url, _ in top_users:
+            top_users_dict[posicion] = {
+                'user_id': user_id,
+                'user_url': user_url
+            }
     
     return top_users_dict
 
-def developer(desarrollador):
+def ranking_genero(genero, pagina=1, tamano=10):
+    '''
+    Devuelve una página del ranking de usuarios con más horas de juego en un género.
+
+    Args:
+        genero (str): Género del videojuego.
+        pagina (int): Número de página, desde 1.
+        tamano (int): Cantidad de usuarios por página.
+
+    Returns:
+        dict: Un diccionario con la página, la cantidad de usuarios del ranking y los usuarios de la página por posición:
+            - 'user_id' (str): ID del usuario.
+            - 'user_url' (str): URL del perfil del usuario.
+            - 'playtime_horas' (float): Horas jugadas en el género.
+    '''
+    datos = gestor.datos()
+    with fase('ranking_genero', 'filtrar'):
+        usuarios = datos.top_generos.pagina(genero, desde=(pagina - 1) * tamano + 1, cantidad=tamano)
+    with fase('ranking_genero', 'serializar'):
+        return {
+            'genero': genero,
+            'pagina': pagina,
+            'total': datos.top_generos.cantidad(genero),
+            'usuarios': {posicion: {'user_id': user_id, 'user_url': user_url, 'playtime_horas': horas}
+                         for posicion, user_id, user_url, horas in usuarios}
+        }
+
+def posicion_genero(genero, user_id):
+    '''
+    Devuelve la posición de un usuario en el ranking de horas de juego de un género.
+
+    Los usuarios del top precalculado se buscan en él; para los demás se suman las horas de todos los usuarios del género.
+
+    Args:
+        genero (str): Género del videojuego.
+        user_id (str): ID del usuario.
+
+    Returns:
+        dict: Un diccionario con la posición (desde 1) y las horas del usuario en el género, o un mensaje si el usuario
+        no jugó juegos del género.
+    '''
+    datos = gestor.datos()
+    with fase('posicion_genero', 'top'):
+        resultado = datos.top_generos.posicion(genero, user_id)
+    if resultado is None and genero in datos.top_generos:
+        with fase('posicion_genero', 'agrupar'):
+            resultado = datos.playtime.posicion(genero, user_id)
+    if resultado is None:
+        return 'No data available on user {} in genre {}'.format(user_id, genero)
+    posicion, horas = resultado
+    return {'genero': genero, 'user_id': user_id, 'posicion': posicion, 'playtime_horas': horas}
+
+def developer(desarrollador, datos=None):
     '''
     Esta función devuelve información sobre una empresa desarrolladora de videojuegos.
          
     Args:
         desarrollador (str): Nombre del desarrollador de videojuegos.
+        datos (Datos, optional): Instantánea de los datos a usar. Por defecto, la activa.
     
     Returns:
         dict: Un diccionario que contiene información sobre la empresa desarrolladora.
             - 'cantidad_por_año' (dict): Cantidad de items desarrollados por año.
             - 'porcentaje_gratis_por_año' (dict): Porcentaje de contenido gratuito por año según la empresa desarrolladora.
     '''
-    # Filtra el dataframe por desarrollador de interés
-    data_filtrada = df_items_developer[df_items_developer['developer'] == desarrollador]
-    # Calcula la cantidad de items por año
-    cantidad_por_año = data_filtrada.groupby('release_anio')['item_id'].count()
-    # Calcula la cantidad de elementos gratis por año
-    cantidad_gratis_por_año = data_filtrada[data_filtrada['price'] == 0.0].groupby('release_anio')['item_id'].count()
-    # Calcula el porcentaje de elementos gratis por año
-    porcentaje_gratis_por_año = (cantidad_gratis_por_año / cantidad_por_año * 100).fillna(0).astype(int)
-
-    result_dict = {
-        'cantidad_por_año': cantidad_por_año.to_dict(),
-        'porcentaje_gratis_por_año': porcentaje_gratis_por_año.to_dict()
-    }
+    datos = datos or gestor.datos()
+    with fase('developer', 'buscar'):
+        # Busca los agregados del desarrollador de interés (vacíos si no existe)
+        agregado = datos.developer_anio.get(desarrollador, {'cantidad_por_año': {}, 'porcentaje_gratis_por_año': {}})
+
+    with fase('developer', 'serializar'):
+        result_dict = {
+            'cantidad_por_año': dict(agregado['cantidad_por_año']),
+            'porcentaje_gratis_por_año': dict(agregado['porcentaje_gratis_por_año'])
+        }
     
     return result_dict
 
-def sentiment_analysis(anio):
+def sentiment_analysis(anio, datos=None):
     '''
     Realiza un análisis de sentimiento en base al año ingresado.
     
     Args:
         anio (str): El año para filtrar las reseñas.
+        datos (Datos, optional): Instantánea de los datos a usar. Por defecto, la activa.
     
     Returns:
         dict: Un diccionario con el recuento de categorías de sentimiento.
     '''
-    # Filtra las reseñas del año específico
-    anio_reviews = df_reviews[df_reviews['release_anio'] == anio]
-    
-    # Inicializa un diccionario para contar las categorías de sentimiento
-    sentiment_counts = {'Negative': 0, 'Neutral': 0, 'Positive': 0}
+    datos = datos or gestor.datos()
+    with fase('sentiment_analysis', 'buscar'):
+        # Busca el recuento de categorías de sentimiento del año (ceros si no hay reseñas de ese año)
+        sentiment_counts = datos.sentimiento_anio.get(anio, {'Negative': 0, 'Neutral': 0, 'Positive': 0})
     
-    # Itera a través de las reseñas del año seleccionado
-    for _, row in anio_reviews.iterrows():
-        sentiment = row['sentiment_analysis']
-        sentiment_category = ''
-        
-        # Maneja valores no numéricos en la columna 'release_anio'
-        try:
-            # Asigna la categoría de sentimiento correspondiente
-            if sentiment == 0:
-                sentiment_category = 'Negative'
-            elif sentiment == 1:
-                sentiment_category = 'Neutral'
-            elif sentiment == 2:
-                sentiment_category = 'Positive'
-            
-            # Incrementa el contador correspondiente en el diccionario
-            sentiment_counts[sentiment_category] += 1
-        except ValueError:
-            # Maneja el valor no numérico (como 'Sin Dato Disponible')
-            pass
-    
-    return sentiment_counts
+    return dict(sentiment_counts)
 
-def recomendacion_juego(game):
+def recomendacion_juego(game, datos=None):
     '''
     Muestra una lista de juegos similares a un juego dado.
 
+    Si el nombre no es exactamente el de un juego del índice, se usa el juego cuyo título coincide sin distinguir
+    mayúsculas, tildes ni signos de puntuación o, si no hay, el más parecido con pocos errores de tipeo.
+
     Args:
         game (str): El nombre del juego para el cual se desean encontrar juegos similares.
+        datos (Datos, optional): Instantánea de los datos a usar. Por defecto, la activa.
 
     Returns:
-        None: Un diccionario con 5 nombres de juegos recomendados.
+        dict: Un diccionario con 5 nombres de juegos recomendados, o un mensaje si ningún juego se parece al nombre.
 
     '''
-    # Obtener la lista de juegos similares ordenados
-    similar_games = item_sim_df.sort_values(by=game, ascending=False).iloc[1:6]
+    datos = datos or gestor.datos()
+    with fase('recomendacion_juego', 'resolver'):
+        # Si el nombre no está en el índice, se busca el título al que se refiere
+        if game not in datos.juegos:
+            game = datos.titulos.resolver(game) or game
+            if game not in datos.juegos:
+                return 'No data available on game {}'.format(game)
+    with fase('recomendacion_juego', 'buscar'):
+        # Obtiene los 5 juegos más similares desde el índice precalculado
+        similar_games = datos.juegos.similares(game, n=5)
 
-    count = 1
-    contador = 1
-    recomendaciones = {}
-    
-    for item in similar_games:
-        if contador <= 5:
-            item = str(item)
-            recomendaciones[count] = item
-            count += 1
-            contador += 1 
-        else:
-            break
+    with fase('recomendacion_juego', 'serializar'):
+        recomendaciones = {}
+        for count, item in enumerate(similar_games, start=1):
+            recomendaciones[count] = str(item)
     return recomendaciones
 
-def recomendacion_usuario(user):
+def buscar_juegos(texto, n=10):
+    '''
+    Busca juegos por su título para autocompletar: primero los que empiezan con el texto, después los que tienen una
+    palabra que empieza con él y por último los que se le parecen con errores de tipeo.
+
+    Args:
+        texto (str): Texto buscado (no distingue mayúsculas, tildes ni signos de puntuación).
+        n (int): Cantidad máxima de juegos a devolver.
+
+    Returns:
+        dict: Un diccionario con los nombres de los juegos encontrados, tal como los acepta recomendacion_juego.
+
+    '''
+    datos = gestor.datos()
+    with fase('buscar_juegos', 'buscar'):
+        titulos = datos.titulos.buscar(texto, n=n)
+    return dict(enumerate(titulos, start=1))
+
+def _precalculadas(datos, user, n_similares, n_resultados):
+    '''
+    Devuelve las recomendaciones precalculadas de un usuario (ver recomendacion.precalcular_recomendaciones), o None
+    si no las hay y hay que calcularlas en vivo.
+    '''
+    precalculadas = datos.recomendaciones_usuarios
+    return None if precalculadas is None else precalculadas.get(user, n_similares, n_resultados)
+
+def recomendacion_usuario(user, n_similares=10, n_resultados=5):
     '''
     Genera una lista de los juegos más recomendados para un usuario, basándose en las calificaciones de usuarios similares.
 
     Args:
         user (str): El nombre o identificador del usuario para el cual se desean generar recomendaciones.
+        n_similares (int): Cantidad de usuarios similares que se tienen en cuenta.
+        n_resultados (int): Cantidad de juegos a recomendar.
 
     Returns:
-        list: Una lista de los juegos más recomendados para el usuario basado en la calificación de usuarios similares.
+        dict: Un diccionario con los juegos más recomendados para el usuario basado en la calificación de usuarios similares.
 
     '''
-    # Verifica si el usuario está presente en las columnas de piv_norm (si no está, devuelve un mensaje)
-    if user not in piv_norm.columns:
+    datos = gestor.datos()
+    # Verifica si el usuario está presente en piv_norm (si no está, devuelve un mensaje)
+    if user not in datos.usuarios:
         return('No data available on user {}'.format(user))
+
+    with fase('recomendacion_usuario', 'precalculadas'):
+        # Busca las recomendaciones precalculadas del usuario, si las hay
+        juegos = _precalculadas(datos, user, n_similares, n_resultados)
+    if juegos is None:
+        with fase('recomendacion_usuario', 'similares'):
+            # Obtiene los usuarios más similares
+            similares = datos.usuarios.similares(user, n=n_similares)
+        with fase('recomendacion_usuario', 'votar'):
+            # Obtiene los juegos que más de ellos calificaron con su puntaje máximo
+            juegos = datos.usuarios.mas_votados(similares, n=n_resultados)
+
+    with fase('recomendacion_usuario', 'serializar'):
+        recomendaciones = {}
+        for contador, juego in enumerate(juegos, start=1):
+            recomendaciones[contador] = juego
     
-    # Obtiene los usuarios más similares al usuario dado
-    sim_users = user_sim_df.sort_values(by=user, ascending=False).index[1:11]
-    
-    best = [] # Lista para almacenar los juegos mejor calificados por usuarios similares
-    most_common = {} # Diccionario para contar cuántas veces se recomienda cada juego
-    
-    # Para cada usuario similar, encuentra el juego mejor calificado y lo agrega a la lista 'best'
-    for i in sim_users:
-        i = str(i)
-        max_score = piv_norm.loc[:, i].max()
-        best.append(piv_norm[piv_norm.loc[:, i]==max_score].index.tolist())
-    
-    # Cuenta cuántas veces se recomienda cada juego
-    for i in range(len(best)):
-        for j in best[i]:
-            if j in most_common:
-                most_common[j] += 1
-            else:
-                most_common[j] = 1
-    
-    # Ordena los juegos por la frecuencia de recomendación en orden descendente
-    sorted_list = sorted(most_common.items(), key=operator.itemgetter(1), reverse=True)
-    recomendaciones = {} 
-    contador = 1 
-    # Devuelve los 5 juegos más recomendados
-    for juego, _ in sorted_list:
-        if contador <= 5:
-            recomendaciones[contador] = juego 
-            contador += 1 
-        else:
-            break
-    
-    return recomendaciones
\ No newline at end of file
+    return recomendaciones
+
+def userdata_lote(user_ids):
+    '''
+    Devuelve la información de userdata para una lista de usuarios.
+
+    Args:
+        user_ids (list): Identificadores de los usuarios.
+
+    Yields:
+        tuple: (user_id, resultado), en el orden de `user_ids`. El resultado es el diccionario de userdata,
+        o un mensaje si el usuario no tiene datos.
+    '''
+    # Todo el lote se responde con la misma instantánea de los datos
+    datos = gestor.datos()
+    for user_id in user_ids:
+        try:
+            yield user_id, userdata(user_id, datos)
+        except KeyError:
+            yield user_id, 'No data available on user {}'.format(user_id)
+
+def recomendacion_juego_lote(games):
+    '''
+    Devuelve los juegos similares a cada juego de una lista.
+
+    Args:
+        games (list): Nombres de los juegos.
+
+    Yields:
+        tuple: (game, resultado), en el orden de `games`, con el mismo resultado que recomendacion_juego.
+    '''
+    datos = gestor.datos()
+    for game in games:
+        yield game, recomendacion_juego(game, datos)
+
+def recomendacion_usuario_lote(users, n_similares=10, n_resultados=5, bloque=256):
+    '''
+    Genera las recomendaciones de recomendacion_usuario para una lista de usuarios.
+
+    Los usuarios con recomendaciones precalculadas se responden desde la tabla. Para el resto, las similitudes se
+    calculan por bloques de usuarios con un producto de matrices dispersa por densa, en lugar de un producto
+    matriz-vector por usuario.
+
+    Args:
+        users (list): Identificadores de los usuarios.
+        n_similares (int): Cantidad de usuarios similares que se tienen en cuenta.
+        n_resultados (int): Cantidad de juegos a recomendar.
+        bloque (int): Cantidad de usuarios que se calculan por vez.
+
+    Yields:
+        tuple: (user, resultado), en el orden de `users`, con el mismo resultado que recomendacion_usuario.
+    '''
+    datos = gestor.datos()
+    # Solo se calculan en vivo los usuarios que no tienen recomendaciones precalculadas
+    pendientes = [user for user in users if user in datos.usuarios and _precalculadas(datos, user, n_similares, n_resultados) is None]
+    juegos_pendientes = datos.usuarios.recomendar_lote(pendientes, n_similares=n_similares, n_resultados=n_resultados, bloque=bloque)
+    for user in users:
+        if user not in datos.usuarios:
+            yield user, 'No data available on user {}'.format(user)
+            continue
+        juegos = _precalculadas(datos, user, n_similares, n_resultados)
+        if juegos is None:
+            juegos = next(juegos_pendientes)
+        yield user, dict(enumerate(juegos, start=1))
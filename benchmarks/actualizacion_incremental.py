@@ -0,0 +1,85 @@
+## VERIFICACIÓN Y MEDICIÓN DE LA ACTUALIZACIÓN INCREMENTAL
+# Genera datos sintéticos con semilla fija, aplica lotes de distinto tamaño con actualizacion.aplicar_lote y compara
+# el resultado y el tiempo con reconstruir todas las tablas de cero.
+# Uso: python benchmarks/actualizacion_incremental.py --usuarios 20000 --lotes 10 100 1000
+# Importaciones
+import argparse
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import actualizacion
+from datos_sinteticos import generar_juegos, generar_usuarios
+
+# Funciones
+def medir(funcion, *args, **kwargs):
+    inicio = time.perf_counter()
+    resultado = funcion(*args, **kwargs)
+    return resultado, time.perf_counter() - inicio
+
+def main():
+    parser = argparse.ArgumentParser(description='Verifica y mide la actualización incremental contra la reconstrucción completa.')
+    parser.add_argument('--usuarios', type=int, default=20000, help='Usuarios del historial')
+    parser.add_argument('--juegos', type=int, default=3000, help='Juegos del historial')
+    parser.add_argument('--filas', type=int, default=200000, help='Items del historial')
+    parser.add_argument('--lotes', type=int, nargs='+', default=[10, 100, 1000], help='Items de cada lote')
+    parser.add_argument('--semilla', type=int, default=42)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(args.semilla)
+    ids = np.arange(args.juegos)
+    usuarios = np.array([f'usuario{i}' for i in range(args.usuarios)])
+    df_games = generar_juegos(rng, ids)
+    df_items, df_reviews, df_recomendacion = generar_usuarios(rng, usuarios, ids, args.filas)
+
+    temporal = tempfile.mkdtemp()
+    try:
+        cache = os.path.join(temporal, 'sentimiento.sqlite')
+        base = os.path.join(temporal, 'base')
+        _, segundos = medir(actualizacion.reconstruir, df_games, df_items, df_reviews, df_recomendacion, base, ruta_cache=cache)
+        print(json.dumps({'reconstruccion_historial': {'items': len(df_items), 'segundos': round(segundos, 3)}}))
+
+        for n, tamano in enumerate(args.lotes):
+            # Lote con juegos nuevos y una mezcla de usuarios existentes y nuevos
+            nuevos_ids = args.juegos + n * 1000 + np.arange(max(1, tamano // 50))
+            games = generar_juegos(rng, nuevos_ids)
+            nuevos_usuarios = np.array([f'lote{n}_usuario{i}' for i in range(max(1, tamano // 10))])
+            items, reviews, recomendacion = generar_usuarios(rng, np.concatenate([usuarios, nuevos_usuarios]),
+                                                             np.concatenate([ids, nuevos_ids]), tamano)
+
+            lote = os.path.join(temporal, f'lote{n}')
+            os.makedirs(lote)
+            for nombre, df in [('games', games), ('items', items), ('reviews', reviews), ('recomendacion', recomendacion)]:
+                df.to_parquet(os.path.join(lote, f'{nombre}.parquet'), index=False)
+
+            actualizado = os.path.join(temporal, f'actualizado{n}')
+            shutil.copytree(base, actualizado)
+            metricas, incremental = medir(actualizacion.aplicar_lote, lote, actualizado, ruta_cache=cache)
+
+            df_games, df_items = pd.concat([df_games, games], ignore_index=True), pd.concat([df_items, items], ignore_index=True)
+            df_reviews = pd.concat([df_reviews, reviews], ignore_index=True)
+            df_recomendacion = pd.concat([df_recomendacion, recomendacion], ignore_index=True)
+            ids, usuarios = np.concatenate([ids, nuevos_ids]), np.concatenate([usuarios, nuevos_usuarios])
+            referencia = os.path.join(temporal, f'referencia{n}')
+            _, completa = medir(actualizacion.reconstruir, df_games, df_items, df_reviews, df_recomendacion, referencia, ruta_cache=cache)
+
+            diferencias = actualizacion.comparar_directorios(actualizado, referencia)
+            print(json.dumps({'lote_items': tamano, 'incremental_s': round(incremental, 3), 'reconstruccion_s': round(completa, 3),
+                              'diferencias': diferencias, 'metricas': metricas}, ensure_ascii=False))
+            if diferencias:
+                raise SystemExit(1)
+            # El lote siguiente parte del directorio actualizado
+            shutil.rmtree(base)
+            base = actualizado
+    finally:
+        shutil.rmtree(temporal)
+
+if __name__ == '__main__':
+    main()
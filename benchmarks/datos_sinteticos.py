@@ -0,0 +1,153 @@
+## GENERADOR DE DATOS SINTÉTICOS
+# Genera con una semilla fija un directorio con todos los archivos que usa la API (los mismos esquemas que producen
+# los notebooks), a la escala que se pida, para medir el rendimiento sin depender del tamaño de los datos de data/.
+# Uso: python benchmarks/datos_sinteticos.py /tmp/sinteticos --reviews 1000000 --juegos 20000
+# Importaciones
+import argparse
+import json
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import actualizacion
+
+GENEROS = ['Action', 'Adventure', 'Casual', 'Indie', 'RPG', 'Racing', 'Simulation', 'Sports', 'Strategy', 'Free to Play',
+           'Early Access', 'Massively Multiplayer', 'Animation &amp; Modeling', 'Design &amp; Illustration', 'Education']
+FRASES = ['great game', 'awful and boring', 'it is ok', 'best game ever, loved it', 'terrible controls', 'fun with friends',
+          'not bad', 'worst purchase', 'amazing story and beautiful music', 'meh', None]
+UTILIDAD = ['No ratings yet', '1 of 1 people (100%) found this review helpful', '2 of 5 people (40%) found this review helpful']
+# Proporción de etiquetas negativas, neutrales y positivas cuando no se generan textos
+PROPORCION_SENTIMIENTO = [0.15, 0.3, 0.55]
+
+# Funciones
+def generar_ids_usuarios(rng, cantidad):
+    '''
+    Genera identificadores de usuario con sus URLs de perfil: la mayoría con nombre (/id/) y el resto con el número de
+    cuenta de Steam (/profiles/), como en los datos reales.
+
+    Returns:
+        tuple: Dos arreglos con los identificadores y las URLs.
+    '''
+    numericos = rng.random(cantidad) < 0.3
+    usuarios = np.array([f'7656119{8000000000 + i}' if numerico else f'usuario{i}' for i, numerico in enumerate(numericos)],
+                        dtype=object)
+    # Algunos nombres personalizados también son solo dígitos, así que la URL no se deduce de la forma del identificador
+    personalizados = ~numericos & (rng.random(cantidad) < 0.02)
+    usuarios[personalizados] = [str(10**8 + i) for i in np.flatnonzero(personalizados)]
+    urls = np.where(numericos, 'http://steamcommunity.com/profiles/', 'http://steamcommunity.com/id/').astype(object) + usuarios
+    return usuarios, urls
+
+def generar_juegos(rng, ids):
+    '''
+    Genera juegos con uno a tres géneros cada uno (una fila por género, como df_games).
+    '''
+    generos = rng.integers(1, 4, size=len(ids))
+    filas = np.repeat(ids, generos)
+    nombres = np.repeat([f'Juego {i}' for i in ids], generos)
+    return pd.DataFrame({
+        'genres': rng.choice(GENEROS, size=len(filas)),
+        'price': np.repeat(rng.choice([0.0, 0.99, 4.99, 9.99, 19.99, 59.99], size=len(ids)), generos),
+        'early_access': np.repeat(rng.random(len(ids)) < 0.1, generos),
+        'id': filas,
+        'release_anio': np.repeat(rng.integers(2000, 2019, size=len(ids)).astype(str), generos),
+        'publisher': np.repeat([f'Publisher {i % 50}' for i in ids], generos),
+        'app_name': nombres,
+        'title': nombres,
+        'developer': np.repeat([f'Developer {i % 300}' for i in rng.integers(0, 10**6, size=len(ids))], generos),
+    })
+
+def generar_usuarios(rng, usuarios, ids_juegos, filas, resenas=None, urls=None, textos=True):
+    '''
+    Genera registros de items, reviews y calificaciones repartidos entre los usuarios dados.
+
+    Args:
+        rng (numpy.random.Generator): Generador de números aleatorios.
+        usuarios (numpy.ndarray): Identificadores de los usuarios.
+        ids_juegos (numpy.ndarray): Identificadores de los juegos del catálogo.
+        filas (int): Cantidad de items.
+        resenas (int, optional): Cantidad de reviews (y de calificaciones). Por defecto, la quinta parte de los items.
+        urls (numpy.ndarray, optional): URL de perfil de cada usuario. Por defecto, /id/ seguido del identificador.
+        textos (bool): Si es True las reviews tienen texto en 'reviews_review'; si es False tienen directamente la
+            etiqueta en 'sentiment_analysis', para no pagar el análisis de sentimiento en escalas grandes.
+
+    Returns:
+        tuple: DataFrames de items, reviews y calificaciones.
+    '''
+    usuarios = np.asarray(usuarios, dtype=object)
+    urls = 'http://steamcommunity.com/id/' + usuarios if urls is None else np.asarray(urls, dtype=object)
+    posicion = rng.integers(0, len(usuarios), size=filas)
+    # Algunos items no están en el catálogo, como en los datos reales
+    item = np.where(rng.random(filas) < 0.05, 10**7 + rng.integers(0, 100, size=filas), rng.choice(ids_juegos, size=filas))
+    items = pd.DataFrame({'user_id': usuarios[posicion], 'user_url': urls[posicion],
+                          'items_count': rng.integers(1, 500, size=filas), 'item_id': item,
+                          'playtime_forever': rng.integers(0, 10000, size=filas)})
+
+    resenas = max(1, filas // 5) if resenas is None else resenas
+    posicion = rng.integers(0, len(usuarios), size=resenas)
+    item = rng.choice(ids_juegos, size=resenas)
+    fechas = pd.Timestamp('2010-01-01') + pd.to_timedelta(rng.integers(0, 2500, size=resenas), unit='D')
+    reviews = pd.DataFrame({'user_id': usuarios[posicion], 'user_url': urls[posicion], 'reviews_item_id': item,
+                            'reviews_helpful': rng.choice(UTILIDAD, size=resenas),
+                            'reviews_recommend': rng.random(resenas) < 0.8, 'reviews_date': fechas.strftime('%Y-%m-%d')})
+    if textos:
+        reviews['reviews_review'] = rng.choice(np.array(FRASES, dtype=object), size=resenas)
+    else:
+        reviews['sentiment_analysis'] = rng.choice(3, size=resenas, p=PROPORCION_SENTIMIENTO)
+    recomendacion = pd.DataFrame({'user_id': reviews['user_id'], 'item_name': 'Juego ' + pd.Series(item).astype(str),
+                                  'rating': rng.integers(1, 6, size=resenas)})
+    return items, reviews, recomendacion
+
+def generar_directorio(directorio, reviews=10000, juegos=1000, usuarios=None, items=None, semilla=42, modelo=True,
+                       bloque=1024):
+    '''
+    Genera un directorio de datos completo, con las tablas y el modelo que usa la API, construido con
+    actualizacion.reconstruir a partir de juegos, items y reviews sintéticos.
+
+    Args:
+        directorio (str): Directorio de salida.
+        reviews (int): Cantidad de reviews y de calificaciones.
+        juegos (int): Cantidad de juegos del catálogo.
+        usuarios (int, optional): Cantidad de usuarios. Por defecto, una cuarta parte de las reviews.
+        items (int, optional): Cantidad de items de usuarios. Por defecto, el doble de las reviews.
+        semilla (int): Semilla del generador; la misma semilla y escala producen los mismos archivos.
+        modelo (bool): Si es False no se construyen el índice de vecinos ni la matriz de usuarios (solo
+            df_recomendacion.csv), por ejemplo para medir aparte la construcción del modelo.
+        bloque (int): Cantidad de juegos cuya similitud se calcula por vez al construir el modelo.
+
+    Returns:
+        dict: La escala generada y los segundos que tardó.
+    '''
+    inicio = time.perf_counter()
+    usuarios = max(100, reviews // 4) if usuarios is None else usuarios
+    items = 2 * reviews if items is None else items
+    rng = np.random.default_rng(semilla)
+    ids = np.arange(10, 10 * juegos + 10, 10)
+    ids_usuarios, urls = generar_ids_usuarios(rng, usuarios)
+    df_games = generar_juegos(rng, ids)
+    df_items, df_reviews, df_recomendacion = generar_usuarios(rng, ids_usuarios, ids, items, resenas=reviews, urls=urls,
+                                                              textos=False)
+    actualizacion.reconstruir(df_games, df_items, df_reviews, df_recomendacion, directorio, bloque=bloque, modelo=modelo)
+    return {'reviews': reviews, 'juegos': juegos, 'usuarios': usuarios, 'items': items, 'semilla': semilla,
+            'segundos': round(time.perf_counter() - inicio, 3)}
+
+def main():
+    parser = argparse.ArgumentParser(description='Genera un directorio de datos sintéticos con los esquemas que usa la API.')
+    parser.add_argument('directorio', help='Directorio de salida')
+    parser.add_argument('--reviews', type=int, default=10000, help='Cantidad de reviews y calificaciones')
+    parser.add_argument('--juegos', type=int, default=1000, help='Cantidad de juegos del catálogo')
+    parser.add_argument('--usuarios', type=int, default=None, help='Cantidad de usuarios (por defecto, reviews / 4)')
+    parser.add_argument('--items', type=int, default=None, help='Cantidad de items de usuarios (por defecto, 2 x reviews)')
+    parser.add_argument('--semilla', type=int, default=42)
+    parser.add_argument('--sin-modelo', action='store_true', help='No construye el índice de vecinos ni la matriz de usuarios')
+    args = parser.parse_args()
+
+    escala = generar_directorio(args.directorio, reviews=args.reviews, juegos=args.juegos, usuarios=args.usuarios,
+                                items=args.items, semilla=args.semilla, modelo=not args.sin_modelo)
+    print(json.dumps(escala))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,184 @@
+## COMPARACIÓN DE LOS MOTORES DE CONSULTAS
+# Verifica que los motores 'indices' y 'arrow' (ver datos.MOTORES) respondan exactamente lo mismo en /userdata,
+# /countreviews, /developer y /sentiment_analysis, y mide lado a lado, en un proceso nuevo por motor, la carga, la
+# latencia y la memoria de cada uno.
+# Uso: python benchmarks/motores.py --datos data --consultas 500
+#      python benchmarks/motores.py --escala 1000000:20000 --consultas 500
+# Importaciones
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+
+# Funciones de api_functions que cambian de motor
+CONSULTAS = ['userdata', 'countreviews', 'developer', 'sentiment_analysis']
+# Casos límite que se comparan además de los argumentos elegidos al azar
+CASOS_LIMITE = {
+    'userdata': [('usuario_que_no_existe',), ('',)],
+    'countreviews': [('2012-12-24', '2011-11-05'), ('1990-01-01', '1990-12-31'), ('1990-01-01', '2100-01-01'),
+                     ('2011-13-45', '2012-01-01'), ('ayer', 'hoy')],
+    'developer': [('Desarrollador que no existe',), ('',)],
+    'sentiment_analysis': [('1800',), ('',)],
+}
+
+# Funciones
+def argumentos(directorio, rng, n):
+    '''
+    Elige al azar, de los archivos del directorio, `n` argumentos válidos para cada consulta de CONSULTAS.
+
+    Returns:
+        dict: Nombre de la función -> lista de tuplas de argumentos.
+    '''
+    import pandas as pd
+    import pyarrow.parquet as pq
+
+    def elegir(archivo, nombre):
+        valores = pq.read_table(os.path.join(directorio, archivo), columns=[nombre]).column(nombre).unique().to_pylist()
+        return [(valores[i],) for i in rng.integers(0, len(valores), size=n)]
+
+    fechas = pd.Timestamp('2009-01-01') + pd.to_timedelta(np.sort(rng.integers(0, 3300, size=(n, 2)), axis=1).ravel(), unit='D')
+    fechas = fechas.strftime('%Y-%m-%d').to_numpy().reshape(n, 2)
+    return {
+        # Usuarios con gastos y también usuarios que solo tienen reviews
+        'userdata': elegir('df_gastos_items.parquet', 'user_id')[:n // 2 + 1] + elegir('df_reviews.parquet', 'user_id')[:n // 2],
+        'countreviews': [tuple(par) for par in fechas],
+        'developer': elegir('df_developer_anio.parquet', 'developer'),
+        'sentiment_analysis': elegir('df_sentimiento_anio.parquet', 'release_anio'),
+    }
+
+def responder(funcion, args, datos):
+    '''
+    Devuelve la respuesta de una función de la API, o el tipo de la excepción que lanza, para compararlas.
+    '''
+    try:
+        return repr(funcion(*args, datos=datos))
+    except Exception as e:
+        return type(e).__name__
+
+def equivalencia(directorio, n, semilla):
+    '''
+    Responde las mismas consultas con los dos motores y devuelve las diferencias.
+
+    Returns:
+        tuple: Cantidad de consultas comparadas y lista de diferencias (función, argumentos, respuesta de cada motor).
+    '''
+    import warnings
+
+    import api_functions as af
+    from datos import Datos
+
+    indices, arrow = Datos(directorio, motor='indices'), Datos(directorio, motor='arrow')
+    casos = argumentos(directorio, np.random.default_rng(semilla), n)
+    comparadas = 0
+    diferencias = []
+    # Los rangos sin reviews dividen por cero en los dos motores
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore', RuntimeWarning)
+        for nombre in CONSULTAS:
+            funcion = getattr(af, nombre)
+            for args in casos[nombre] + CASOS_LIMITE[nombre]:
+                esperada, obtenida = responder(funcion, args, indices), responder(funcion, args, arrow)
+                comparadas += 1
+                if esperada != obtenida:
+                    diferencias.append((nombre, args, esperada, obtenida))
+    return comparadas, diferencias
+
+def medir_motor(directorio, motor, n, semilla):
+    '''
+    Mide con un motor la carga (la primera llamada), la latencia y la memoria de cada función de CONSULTAS. Se
+    ejecuta en un proceso nuevo por motor, para que la memoria de uno no se mezcle con la del otro.
+    '''
+    import warnings
+
+    import api_functions as af
+    from datos import Datos, memoria_proceso
+    from suite import pico_memoria, resumen
+
+    warnings.simplefilter('ignore', RuntimeWarning)
+    casos = argumentos(directorio, np.random.default_rng(semilla), n)
+    datos = Datos(directorio, motor=motor)
+    resultado = {'motor': motor, 'memoria_inicial_mb': memoria_proceso(), 'consultas': {}}
+    for nombre in CONSULTAS:
+        funcion = getattr(af, nombre)
+        inicio = time.perf_counter()
+        responder(funcion, casos[nombre][0], datos)
+        primera = time.perf_counter() - inicio
+        latencias = []
+        for args in casos[nombre]:
+            inicio = time.perf_counter()
+            responder(funcion, args, datos)
+            latencias.append(time.perf_counter() - inicio)
+        resultado['consultas'][nombre] = {'primera_ms': round(primera * 1000, 4), **resumen(latencias)}
+    resultado['estructuras_mb'] = {nombre: round(getattr(datos, nombre).nbytes() / 1e6, 2)
+                                   for nombre in ('gastos', 'recomendaciones', 'fechas')}
+    resultado['memoria_final_mb'] = memoria_proceso()
+    resultado['pico_memoria_mb'] = pico_memoria()
+    return resultado
+
+def en_proceso_nuevo(*args):
+    '''
+    Ejecuta este script con --hijo y los argumentos dados, y devuelve el JSON que imprime.
+    '''
+    salida = subprocess.run([sys.executable, os.path.abspath(__file__), '--hijo', *map(str, args)], cwd=RAIZ,
+                            capture_output=True, text=True)
+    if salida.returncode:
+        raise RuntimeError(f'Falló la medición {args}:\n{salida.stderr}')
+    return json.loads(salida.stdout.splitlines()[-1])
+
+def main():
+    parser = argparse.ArgumentParser(description='Compara las respuestas, la latencia y la memoria de los motores de consultas.')
+    parser.add_argument('--datos', default=None, help='Directorio de datos a usar (por defecto, uno sintético de --escala)')
+    parser.add_argument('--escala', default='100000:10000', help='Escala reviews:juegos de los datos sintéticos')
+    parser.add_argument('--directorio-sinteticos', default=os.path.join(tempfile.gettempdir(), 'pi1_datos_sinteticos'),
+                        help='Directorio donde se generan (y se reutilizan) los datos sintéticos')
+    parser.add_argument('--consultas', type=int, default=500, help='Consultas que se comparan y se miden por función')
+    parser.add_argument('--semilla', type=int, default=42)
+    parser.add_argument('--sin-medir', action='store_true', help='Solo verifica que las respuestas sean iguales')
+    parser.add_argument('--hijo', nargs=4, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.hijo:
+        directorio, motor, n, semilla = args.hijo
+        print(json.dumps(medir_motor(directorio, motor, int(n), int(semilla))))
+        return
+
+    directorio = args.datos
+    if directorio is None:
+        from suite import escala, preparar_datos
+        reviews, juegos = escala(args.escala)
+        directorio, _ = preparar_datos(args.directorio_sinteticos, reviews, juegos, args.semilla)
+
+    comparadas, diferencias = equivalencia(directorio, args.consultas, args.semilla)
+    print(f'Equivalencia: {comparadas} consultas comparadas, {len(diferencias)} diferencias')
+    for nombre, argumentos_consulta, esperada, obtenida in diferencias[:20]:
+        print(f'  {nombre}{argumentos_consulta}: indices={esperada} arrow={obtenida}')
+
+    if not args.sin_medir:
+        mediciones = {motor: en_proceso_nuevo(directorio, motor, args.consultas, args.semilla) for motor in ('indices', 'arrow')}
+        print(f"{'':22}{'indices':>34}{'arrow':>34}")
+        print(f"{'':22}" + f"{'primera_ms':>12}{'p50_ms':>11}{'p99_ms':>11}" * 2)
+        for nombre in CONSULTAS:
+            fila = ''.join(f"{m['consultas'][nombre]['primera_ms']:12.3f}{m['consultas'][nombre]['p50_ms']:11.4f}"
+                           f"{m['consultas'][nombre]['p99_ms']:11.4f}" for m in mediciones.values())
+            print(f'{nombre:22}{fila}')
+        for clave in ('rss', 'rss_anon', 'rss_file'):
+            fila = ''.join(f"{m['memoria_final_mb'].get(clave, float('nan')) - m['memoria_inicial_mb'].get(clave, float('nan')):34.2f}"
+                           for m in mediciones.values())
+            print(f'{clave + " agregada (MB)":22}{fila}')
+        fila = ''.join(f"{sum(m['estructuras_mb'].values()):34.2f}" for m in mediciones.values())
+        print(f"{'estructuras (MB)':22}{fila}")
+        print(json.dumps(mediciones))
+
+    if diferencias:
+        raise SystemExit(1)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,150 @@
+## PRUEBA DE CARGA LOCAL DE LA API
+# Lanza consultas concurrentes contra la API y reporta el throughput y los percentiles de latencia.
+# Uso: python benchmarks/prueba_carga.py --iniciar --concurrencia 32 --duracion 20
+# Importaciones
+import argparse
+import http.client
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import threading
+import time
+from urllib.parse import urlencode, urlsplit
+
+# Consultas de ejemplo. Unas pocas se repiten mucho más que el resto, como en el tráfico real
+CONSULTAS = [
+    ('/userdata', {'user_id': 'EchoXSilence'}),
+    ('/countreviews', {'fecha_inicio': '2011-11-05', 'fecha_fin': '2012-12-24'}),
+    ('/genre', {'genero': 'Simulation'}),
+    ('/userforgenre', {'genero': 'Action'}),
+    ('/userforgenre', {'genero': 'Simulation'}),
+    ('/developer', {'desarrollador': 'Valve'}),
+    ('/sentiment_analysis', {'anio': '2009'}),
+    ('/recomendacion_juego', {'game': 'Killing Floor'}),
+    ('/recomendacion_usuario', {'user': '76561197970982479'}),
+]
+PESOS = [4, 3, 2, 8, 4, 3, 2, 6, 3]
+
+# Funciones
+def puerto_libre():
+    '''
+    Devuelve un puerto TCP libre de la máquina local.
+    '''
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+def iniciar_servidor(directorio, puerto, workers):
+    '''
+    Inicia uvicorn con main:app en un proceso aparte y espera a que responda.
+    '''
+    proceso = subprocess.Popen([sys.executable, '-m', 'uvicorn', 'main:app', '--port', str(puerto), '--workers', str(workers),
+                                '--log-level', 'warning'], cwd=directorio)
+    for _ in range(300):
+        try:
+            conexion = http.client.HTTPConnection('127.0.0.1', puerto, timeout=1)
+            conexion.request('GET', '/')
+            conexion.getresponse().read()
+            return proceso
+        except OSError:
+            time.sleep(0.1)
+    proceso.terminate()
+    raise RuntimeError('El servidor no respondió')
+
+def cliente(host, puerto, fin, semilla, resultados):
+    '''
+    Envía consultas una detrás de otra hasta el instante `fin`, guardando (latencia, estado) de cada una.
+    '''
+    rng = random.Random(semilla)
+    conexion = http.client.HTTPConnection(host, puerto, timeout=60)
+    while time.perf_counter() < fin:
+        ruta, parametros = rng.choices(CONSULTAS, weights=PESOS)[0]
+        inicio = time.perf_counter()
+        try:
+            conexion.request('GET', f'{ruta}?{urlencode(parametros)}')
+            respuesta = conexion.getresponse()
+            respuesta.read()
+            estado = respuesta.status
+        except (OSError, http.client.HTTPException):
+            estado = 'error'
+            conexion.close()
+            conexion = http.client.HTTPConnection(host, puerto, timeout=60)
+        resultados.append((time.perf_counter() - inicio, estado))
+    conexion.close()
+
+def percentil(valores, p):
+    '''
+    Devuelve el percentil p (0 a 100) de una lista de valores.
+    '''
+    ordenados = sorted(valores)
+    return ordenados[min(len(ordenados) - 1, int(round(p / 100 * (len(ordenados) - 1))))]
+
+def prueba_carga(url, concurrencia, duracion):
+    '''
+    Ejecuta la prueba de carga contra una API en ejecución.
+
+    Args:
+        url (str): URL base de la API, por ejemplo http://127.0.0.1:8000.
+        concurrencia (int): Cantidad de clientes simultáneos.
+        duracion (float): Duración de la prueba en segundos.
+
+    Returns:
+        dict: Consultas por segundo, percentiles de latencia en milisegundos de las respuestas 200 y cantidad por estado.
+    '''
+    partes = urlsplit(url)
+    resultados = []
+    fin = time.perf_counter() + duracion
+    hilos = [threading.Thread(target=cliente, args=(partes.hostname, partes.port, fin, i, resultados)) for i in range(concurrencia)]
+    for hilo in hilos:
+        hilo.start()
+    for hilo in hilos:
+        hilo.join()
+
+    estados = {}
+    for _, estado in resultados:
+        estados[str(estado)] = estados.get(str(estado), 0) + 1
+    latencias = [latencia * 1000 for latencia, estado in resultados if estado == 200] or [float('nan')]
+    return {
+        'concurrencia': concurrencia,
+        'consultas_por_segundo': round(estados.get('200', 0) / duracion, 1),
+        'p50_ms': round(percentil(latencias, 50), 2),
+        'p99_ms': round(percentil(latencias, 99), 2),
+        'max_ms': round(max(latencias), 2),
+        'estados': estados,
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description='Prueba de carga local de la API.')
+    parser.add_argument('--url', default=None, help='URL de una API en ejecución (si no se indica, usar --iniciar)')
+    parser.add_argument('--iniciar', action='store_true', help='Inicia uvicorn con main:app en un puerto libre')
+    parser.add_argument('--directorio', default=os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                        help='Directorio desde donde se inicia la API')
+    parser.add_argument('--workers', type=int, default=1, help='Workers de uvicorn al usar --iniciar')
+    parser.add_argument('--concurrencia', type=int, nargs='+', default=[1, 8, 32], help='Clientes simultáneos')
+    parser.add_argument('--duracion', type=float, default=10, help='Segundos por cada nivel de concurrencia')
+    args = parser.parse_args()
+
+    proceso = None
+    url = args.url
+    if args.iniciar:
+        puerto = puerto_libre()
+        proceso = iniciar_servidor(args.directorio, puerto, args.workers)
+        url = f'http://127.0.0.1:{puerto}'
+    if url is None:
+        parser.error('Hay que indicar --url o --iniciar')
+
+    try:
+        # Una consulta de cada tipo para que la carga perezosa de los datos no cuente en la medición
+        prueba_carga(url, len(CONSULTAS), 1)
+        for concurrencia in args.concurrencia:
+            print(json.dumps(prueba_carga(url, concurrencia, args.duracion), ensure_ascii=False))
+    finally:
+        if proceso is not None:
+            proceso.terminate()
+            proceso.wait()
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,128 @@
+## MEDICIÓN DE LA SERIALIZACIÓN DE LAS RESPUESTAS
+# Para respuestas reales de cada función de la API (y de las consultas por lote), compara el tiempo y los bytes del
+# camino de FastAPI (jsonable_encoder + json de la biblioteca estándar) con los de respuestas.py: orjson, Arrow IPC
+# y la compresión con gzip y brotli. Verifica además que el JSON de orjson diga lo mismo que el de antes.
+# Uso: python benchmarks/serializacion.py --datos data --consultas 200 --lote 1000
+# Importaciones
+import argparse
+import json
+import math
+import os
+import sys
+import time
+import warnings
+
+import numpy as np
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+
+# Funciones
+def json_fastapi(contenido):
+    '''
+    Serializa una respuesta como lo hace FastAPI cuando la ruta devuelve un objeto: jsonable_encoder y después
+    JSONResponse (json.dumps sin espacios ni escapes ASCII). Devuelve None si no se puede serializar: JSONResponse
+    no acepta NaN, así que antes esas respuestas terminaban en un error 500.
+    '''
+    from fastapi.encoders import jsonable_encoder
+    from fastapi.responses import JSONResponse
+    try:
+        return JSONResponse(jsonable_encoder(contenido)).body
+    except ValueError:
+        return None
+
+def sin_nan(valor):
+    '''
+    Reemplaza los NaN por None en una respuesta ya deserializada, porque orjson los escribe como null.
+    '''
+    if isinstance(valor, float) and math.isnan(valor):
+        return None
+    if isinstance(valor, dict):
+        return {clave: sin_nan(v) for clave, v in valor.items()}
+    if isinstance(valor, list):
+        return [sin_nan(v) for v in valor]
+    return valor
+
+def tiempo_us(funcion, contenidos, repeticiones=3):
+    '''
+    Devuelve la mediana, en microsegundos, del tiempo de aplicar `funcion` a cada contenido (la mejor de varias pasadas).
+    '''
+    mejor = None
+    for _ in range(repeticiones):
+        tiempos = []
+        for contenido in contenidos:
+            inicio = time.perf_counter()
+            funcion(contenido)
+            tiempos.append(time.perf_counter() - inicio)
+        mediana = float(np.median(tiempos)) * 1e6
+        mejor = mediana if mejor is None else min(mejor, mediana)
+    return mejor
+
+def medir(contenidos):
+    '''
+    Mide la serialización de las respuestas de una función con cada formato y compresión.
+
+    Returns:
+        dict: Mediana de tiempo (µs) y de bytes de cada camino, cantidad de respuestas que antes no se podían
+        serializar y si los JSON de antes y de ahora son iguales en las demás.
+    '''
+    import orjson
+
+    from respuestas import codificar, comprimir
+
+    antes = [json_fastapi(contenido) for contenido in contenidos]
+    ahora = [codificar(contenido, 'json') for contenido in contenidos]
+    arrow = [codificar(contenido, 'arrow') for contenido in contenidos]
+    iguales = all(sin_nan(json.loads(a)) == orjson.loads(b) for a, b in zip(antes, ahora) if a is not None)
+    errores = sum(cuerpo is None for cuerpo in antes)
+    antes = [cuerpo for cuerpo in antes if cuerpo is not None] or [b'']
+    return {
+        'antes_us': round(tiempo_us(json_fastapi, contenidos), 2),
+        'orjson_us': round(tiempo_us(lambda contenido: codificar(contenido, 'json'), contenidos), 2),
+        'arrow_us': round(tiempo_us(lambda contenido: codificar(contenido, 'arrow'), contenidos), 2),
+        'gzip_us': round(tiempo_us(lambda cuerpo: comprimir(cuerpo, 'gzip'), ahora), 2),
+        'br_us': round(tiempo_us(lambda cuerpo: comprimir(cuerpo, 'br'), ahora), 2),
+        'bytes_antes': int(np.median([len(cuerpo) for cuerpo in antes])),
+        'bytes_orjson': int(np.median([len(cuerpo) for cuerpo in ahora])),
+        'bytes_gzip': int(np.median([len(comprimir(cuerpo, 'gzip')) for cuerpo in ahora])),
+        'bytes_br': int(np.median([len(comprimir(cuerpo, 'br')) for cuerpo in ahora])),
+        'bytes_arrow': int(np.median([len(cuerpo) for cuerpo in arrow])),
+        'errores_antes': errores,
+        'iguales': iguales,
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description='Compara el tiempo y los bytes de la serialización de las respuestas de la API.')
+    parser.add_argument('--datos', default='data', help='Directorio de datos')
+    parser.add_argument('--consultas', type=int, default=200, help='Respuestas que se serializan por función')
+    parser.add_argument('--lote', type=int, default=1000, help='Elementos de cada consulta por lote')
+    parser.add_argument('--semilla', type=int, default=42)
+    args = parser.parse_args()
+
+    os.environ['API_DIRECTORIO_DATOS'] = args.datos
+    os.environ['API_DIRECTORIO_VERSIONES'] = ''
+    from suite import CONSULTAS, argumentos_consultas
+    import api_functions as af
+
+    warnings.simplefilter('ignore', RuntimeWarning)
+    argumentos = argumentos_consultas(args.datos, np.random.default_rng(args.semilla), args.consultas)
+    respuestas = {nombre: [getattr(af, nombre)(*argumentos_consulta) for argumentos_consulta in argumentos[nombre]]
+                  for nombre in CONSULTAS}
+    # Las consultas por lote se serializan como la lista de objetos {"id", "resultado"} que arma main.consultar_lote
+    for nombre, elemento in (('userdata_lote', 'userdata'), ('recomendacion_juego_lote', 'recomendacion_juego')):
+        claves = [argumentos_consulta[0] for argumentos_consulta in argumentos[elemento]][:args.lote]
+        respuestas[nombre] = [[{'id': id_, 'resultado': resultado} for id_, resultado in getattr(af, nombre)(claves)]]
+
+    columnas = ['antes_us', 'orjson_us', 'arrow_us', 'gzip_us', 'br_us', 'bytes_antes', 'bytes_orjson', 'bytes_gzip', 'bytes_br',
+                'bytes_arrow', 'errores_antes', 'iguales']
+    print(f"{'':26}" + ''.join(f'{columna:>14}' for columna in columnas))
+    resultados = {}
+    for nombre, contenidos in respuestas.items():
+        resultados[nombre] = medir(contenidos)
+        print(f'{nombre:26}' + ''.join(f'{str(resultados[nombre][columna]):>14}' for columna in columnas))
+    print(json.dumps(resultados))
+    if not all(medidas['iguales'] for medidas in resultados.values()):
+        raise SystemExit(1)
+
+if __name__ == '__main__':
+    main()
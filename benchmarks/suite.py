@@ -0,0 +1,323 @@
+## SUITE DE RENDIMIENTO DE LA API
+# Para cada escala genera (o reutiliza) un directorio de datos sintéticos, mide en procesos nuevos la construcción del
+# modelo y cada función de api_functions, y guarda los resultados en un JSON para comparar ramas y ver cómo escalan
+# la latencia y la memoria con el tamaño de los datos.
+# Uso: python benchmarks/suite.py --escalas 10000:1000 1000000:20000 --salida resultados/rama.json
+#      python benchmarks/suite.py --comparar resultados/main.json resultados/rama.json
+# Importaciones
+import argparse
+import json
+import os
+import platform
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+
+import numpy as np
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+
+# Escalas por defecto, como reviews:juegos
+ESCALAS = ['10000:1000', '100000:10000']
+# Funciones de api_functions que responden una consulta
+CONSULTAS = ['userdata', 'countreviews', 'genre', 'userforgenre', 'developer', 'sentiment_analysis', 'recomendacion_juego',
+             'recomendacion_usuario', 'buscar_juegos']
+# Funciones que responden un lote de consultas
+LOTES = ['userdata_lote', 'recomendacion_juego_lote', 'recomendacion_usuario_lote']
+# Archivo que deja el generador en cada directorio, con la escala generada
+ARCHIVO_ESCALA = 'escala.json'
+
+# Funciones
+def escala(texto):
+    '''
+    Convierte una escala 'reviews:juegos' (por ejemplo '1000000:20000') en una tupla de enteros.
+    '''
+    try:
+        reviews, juegos = (int(valor) for valor in texto.split(':'))
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"'{texto}' no tiene el formato reviews:juegos")
+    return reviews, juegos
+
+def entorno():
+    '''
+    Devuelve la rama y el commit del repositorio, las versiones de las librerías y los datos de la máquina, para
+    saber qué se midió y dónde.
+    '''
+    def git(*args):
+        try:
+            return subprocess.run(['git', *args], cwd=RAIZ, capture_output=True, text=True, check=True).stdout.strip()
+        except (OSError, subprocess.CalledProcessError):
+            return None
+
+    import pandas as pd
+    import pyarrow as pa
+    import scipy
+    return {
+        'fecha': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        'rama': git('rev-parse', '--abbrev-ref', 'HEAD'),
+        'commit': git('rev-parse', '--short', 'HEAD'),
+        'cambios_sin_commit': bool(git('status', '--porcelain', '--untracked-files=no')),
+        'python': platform.python_version(),
+        'librerias': {'numpy': np.__version__, 'pandas': pd.__version__, 'pyarrow': pa.__version__, 'scipy': scipy.__version__},
+        'maquina': {'sistema': platform.platform(), 'procesador': platform.machine(), 'cpus': os.cpu_count()},
+    }
+
+def resumen(segundos):
+    '''
+    Resume una lista de latencias en segundos: cantidad, media y percentiles en milisegundos.
+    '''
+    ms = np.asarray(segundos) * 1000
+    return {'consultas': len(ms), 'media_ms': round(float(ms.mean()), 4),
+            **{f'p{p}_ms': round(float(np.percentile(ms, p)), 4) for p in (50, 90, 99)}, 'max_ms': round(float(ms.max()), 4)}
+
+def pico_memoria():
+    '''
+    Devuelve la memoria residente máxima que alcanzó el proceso, en MB.
+    '''
+    return round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 2)
+
+def argumentos_consultas(directorio, rng, n):
+    '''
+    Elige al azar, de los archivos del directorio, `n` argumentos válidos para cada consulta.
+
+    Returns:
+        dict: Nombre de la función -> lista de tuplas de argumentos.
+    '''
+    import pandas as pd
+    import pyarrow.parquet as pq
+
+    def columna(archivo, nombre):
+        return pq.read_table(os.path.join(directorio, archivo), columns=[nombre]).column(nombre).unique().to_pylist()
+
+    def elegir(valores):
+        return [(valores[i],) for i in rng.integers(0, len(valores), size=n)]
+
+    def texto_tipeado(titulo):
+        # El comienzo de un título, como lo que lleva escrito un usuario, con un carácter omitido la mitad de las veces
+        texto = titulo[:rng.integers(min(3, len(titulo)), len(titulo) + 1)]
+        if len(texto) > 2 and rng.random() < 0.5:
+            posicion = rng.integers(0, len(texto))
+            texto = texto[:posicion] + texto[posicion + 1:]
+        return texto
+
+    generos = columna('df_genre_ranking.parquet', 'genres')
+    fechas = pd.Timestamp('2009-01-01') + pd.to_timedelta(np.sort(rng.integers(0, 3300, size=(n, 2)), axis=1).ravel(), unit='D')
+    fechas = fechas.strftime('%Y-%m-%d').to_numpy().reshape(n, 2)
+    return {
+        'userdata': elegir(columna('df_gastos_items.parquet', 'user_id')),
+        'countreviews': [tuple(par) for par in fechas],
+        'genre': elegir(generos),
+        'userforgenre': elegir(generos),
+        'developer': elegir(columna('df_developer_anio.parquet', 'developer')),
+        'sentiment_analysis': elegir(columna('df_sentimiento_anio.parquet', 'release_anio')),
+        'recomendacion_juego': elegir(columna('item_topk.parquet', 'item_name')),
+        'recomendacion_usuario': elegir(np.load(os.path.join(directorio, 'piv_norm_csr', 'usuarios.npy')).tolist()),
+        'buscar_juegos': [(texto_tipeado(titulo),) for (titulo,) in elegir(columna('item_topk.parquet', 'item_name'))],
+    }
+
+def medir_consultas(directorio, n, lote, semilla):
+    '''
+    Mide cada función de api_functions sobre un directorio. Se ejecuta en un proceso nuevo por escala, para que la
+    memoria y la carga perezosa de cada estructura no dependan de lo medido antes.
+
+    La primera llamada a cada función se mide aparte porque incluye la carga de las estructuras que usa. La memoria
+    residente se toma después de cada función, así que es acumulada: la diferencia con la anterior es lo que agregó.
+    '''
+    # La API lee el directorio de datos de la configuración al importarse
+    os.environ['API_DIRECTORIO_DATOS'] = directorio
+    os.environ['API_DIRECTORIO_VERSIONES'] = ''
+    from datos import memoria_proceso
+
+    rng = np.random.default_rng(semilla)
+    argumentos = argumentos_consultas(directorio, rng, n)
+    inicio = time.perf_counter()
+    import api_functions as af
+    resultado = {'importacion_s': round(time.perf_counter() - inicio, 4), 'memoria_inicial_mb': memoria_proceso().get('rss'),
+                 'consultas': {}, 'lotes': {}}
+
+    for nombre in CONSULTAS:
+        funcion = getattr(af, nombre)
+        inicio = time.perf_counter()
+        funcion(*argumentos[nombre][0])
+        primera = time.perf_counter() - inicio
+        latencias = []
+        for args in argumentos[nombre]:
+            inicio = time.perf_counter()
+            funcion(*args)
+            latencias.append(time.perf_counter() - inicio)
+        resultado['consultas'][nombre] = {'primera_ms': round(primera * 1000, 4), **resumen(latencias),
+                                          'memoria_mb': memoria_proceso().get('rss')}
+
+    elementos = {'userdata_lote': 'userdata', 'recomendacion_juego_lote': 'recomendacion_juego',
+                 'recomendacion_usuario_lote': 'recomendacion_usuario'}
+    for nombre in LOTES:
+        claves = [args[0] for args in argumentos[elementos[nombre]]][:lote]
+        inicio = time.perf_counter()
+        for _ in getattr(af, nombre)(claves):
+            pass
+        segundos = time.perf_counter() - inicio
+        resultado['lotes'][nombre] = {'elementos': len(claves), 'segundos': round(segundos, 4),
+                                      'por_elemento_ms': round(segundos * 1000 / len(claves), 4),
+                                      'memoria_mb': memoria_proceso().get('rss')}
+
+    estructuras = ('gastos', 'recomendaciones', 'fechas', 'generos', 'playtime', 'top_generos', 'juegos', 'titulos')
+    resultado['estructuras_mb'] = {nombre: round(getattr(af.gestor.datos(), nombre).nbytes() / 1e6, 2) for nombre in estructuras}
+    resultado['pico_memoria_mb'] = pico_memoria()
+    return resultado
+
+def medir_modelo(directorio, k, bloque):
+    '''
+    Construye el índice de vecinos y la matriz de usuarios desde df_recomendacion.csv, como `recomendacion.py modelo`,
+    midiendo cada paso, y los guarda en el directorio para las consultas.
+    '''
+    import pandas as pd
+    import pyarrow.parquet as pq
+    from recomendacion import MotorUsuarios, construir_indice_vecinos_dispersa, matriz_calificaciones
+
+    inicio = time.perf_counter()
+    df = pd.read_csv(os.path.join(directorio, 'df_recomendacion.csv'))
+    lectura = time.perf_counter() - inicio
+    inicio = time.perf_counter()
+    matriz, usuarios, items = matriz_calificaciones(df)
+    segundos_matriz = time.perf_counter() - inicio
+    inicio = time.perf_counter()
+    tabla = construir_indice_vecinos_dispersa(matriz.T.tocsr(), items, k=k, bloque=bloque)
+    segundos_indice = time.perf_counter() - inicio
+    pq.write_table(tabla, os.path.join(directorio, 'item_topk.parquet'))
+    MotorUsuarios(matriz, usuarios, items).guardar(os.path.join(directorio, 'piv_norm_csr'))
+    return {'calificaciones': int(matriz.nnz), 'usuarios': len(usuarios), 'juegos': len(items), 'k': k, 'bloque': bloque,
+            'lectura_s': round(lectura, 4), 'matriz_s': round(segundos_matriz, 4), 'indice_vecinos_s': round(segundos_indice, 4),
+            'total_s': round(lectura + segundos_matriz + segundos_indice, 4), 'pico_memoria_mb': pico_memoria()}
+
+def en_proceso_nuevo(*args):
+    '''
+    Ejecuta este script con --hijo y los argumentos dados, y devuelve el JSON que imprime.
+    '''
+    salida = subprocess.run([sys.executable, os.path.abspath(__file__), '--hijo', *map(str, args)], cwd=RAIZ,
+                            capture_output=True, text=True)
+    if salida.returncode:
+        raise RuntimeError(f'Falló la medición {args}:\n{salida.stderr}')
+    return json.loads(salida.stdout.splitlines()[-1])
+
+def preparar_datos(raiz, reviews, juegos, semilla):
+    '''
+    Devuelve el directorio de datos sintéticos de una escala, generándolo si todavía no existe.
+
+    Returns:
+        tuple: El directorio y la escala generada (con los segundos que tardó la generación, si se generó ahora).
+    '''
+    from datos_sinteticos import generar_directorio
+
+    directorio = os.path.join(raiz, f'reviews{reviews}_juegos{juegos}_semilla{semilla}')
+    archivo = os.path.join(directorio, ARCHIVO_ESCALA)
+    if os.path.exists(archivo):
+        with open(archivo, encoding='utf-8') as f:
+            return directorio, {**json.load(f), 'reutilizado': True}
+    # El modelo se construye aparte, en medir_modelo
+    generada = generar_directorio(directorio, reviews=reviews, juegos=juegos, semilla=semilla, modelo=False)
+    with open(archivo, 'w', encoding='utf-8') as f:
+        json.dump(generada, f)
+    return directorio, generada
+
+def comparar(base, nueva, umbral):
+    '''
+    Compara dos resultados de la suite, escala por escala, e imprime la relación nueva / base de cada métrica.
+
+    Returns:
+        list: Las métricas en las que la nueva supera a la base por más de `umbral` veces.
+    '''
+    def metricas(escala):
+        valores = {f"modelo.{clave}": valor for clave, valor in escala['modelo'].items() if clave.endswith(('_s', '_mb'))}
+        for grupo in ('consultas', 'lotes'):
+            for nombre, medidas in escala['mediciones'][grupo].items():
+                for clave in ('primera_ms', 'p50_ms', 'p99_ms', 'por_elemento_ms'):
+                    if clave in medidas:
+                        valores[f'{nombre}.{clave}'] = medidas[clave]
+        valores['pico_memoria_mb'] = escala['mediciones']['pico_memoria_mb']
+        return valores
+
+    regresiones = []
+    escalas_base = {(e['escala']['reviews'], e['escala']['juegos']): e for e in base['escalas']}
+    print(f"Base: {base['entorno']['rama']}@{base['entorno']['commit']}  Nueva: {nueva['entorno']['rama']}@{nueva['entorno']['commit']}")
+    for escala_nueva in nueva['escalas']:
+        clave = (escala_nueva['escala']['reviews'], escala_nueva['escala']['juegos'])
+        if clave not in escalas_base:
+            print(f'Escala {clave[0]} reviews / {clave[1]} juegos: no está en la base')
+            continue
+        print(f'Escala {clave[0]} reviews / {clave[1]} juegos')
+        valores_base = metricas(escalas_base[clave])
+        for metrica, valor in metricas(escala_nueva).items():
+            anterior = valores_base.get(metrica)
+            if not anterior or valor is None:
+                continue
+            relacion = valor / anterior
+            marca = '  <- regresión' if relacion > umbral else ''
+            print(f'  {metrica:45} {anterior:12.4f} {valor:12.4f} {relacion:7.2f}x{marca}')
+            if marca:
+                regresiones.append(f'{clave}: {metrica}')
+    return regresiones
+
+def main():
+    parser = argparse.ArgumentParser(description='Mide la latencia y la memoria de la API y del modelo con datos sintéticos de distintas escalas.')
+    parser.add_argument('--escalas', type=escala, nargs='+', default=[escala(e) for e in ESCALAS],
+                        help='Escalas a medir, como reviews:juegos (por ejemplo 10000:1000 10000000:100000)')
+    parser.add_argument('--datos', default=os.path.join(tempfile.gettempdir(), 'pi1_datos_sinteticos'),
+                        help='Directorio donde se generan (y se reutilizan) los datos de cada escala')
+    parser.add_argument('--semilla', type=int, default=42)
+    parser.add_argument('--consultas', type=int, default=200, help='Consultas que se miden por función')
+    parser.add_argument('--lote', type=int, default=1000, help='Elementos de cada consulta por lote')
+    parser.add_argument('--k', type=int, default=None, help='Vecinos por juego del modelo (por defecto, el de recomendacion.py)')
+    parser.add_argument('--bloque', type=int, default=1024, help='Juegos cuya similitud se calcula por vez al construir el modelo')
+    parser.add_argument('--salida', default=None, help='Archivo JSON donde se guardan los resultados')
+    parser.add_argument('--comparar', nargs=2, metavar=('BASE', 'NUEVA'), help='Compara dos archivos de resultados')
+    parser.add_argument('--umbral', type=float, default=1.2, help='Relación nueva / base a partir de la que se marca una regresión')
+    parser.add_argument('--hijo', nargs='+', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.hijo:
+        modo, directorio, *resto = args.hijo
+        if modo == 'modelo':
+            resultado = medir_modelo(directorio, int(resto[0]), int(resto[1]))
+        else:
+            resultado = medir_consultas(directorio, int(resto[0]), int(resto[1]), int(resto[2]))
+        print(json.dumps(resultado))
+        return
+
+    if args.comparar:
+        with open(args.comparar[0], encoding='utf-8') as f:
+            base = json.load(f)
+        with open(args.comparar[1], encoding='utf-8') as f:
+            nueva = json.load(f)
+        regresiones = comparar(base, nueva, args.umbral)
+        print(f'{len(regresiones)} regresiones de más de {args.umbral}x')
+        if regresiones:
+            raise SystemExit(1)
+        return
+
+    from recomendacion import K_VECINOS
+    k = args.k or K_VECINOS
+    resultados = {'entorno': entorno(), 'parametros': {'semilla': args.semilla, 'consultas': args.consultas, 'lote': args.lote,
+                                                     'k': k, 'bloque': args.bloque}, 'escalas': []}
+    for reviews, juegos in args.escalas:
+        directorio, generada = preparar_datos(args.datos, reviews, juegos, args.semilla)
+        modelo = en_proceso_nuevo('modelo', directorio, k, args.bloque)
+        mediciones = en_proceso_nuevo('consultas', directorio, args.consultas, args.lote, args.semilla)
+        resultados['escalas'].append({'escala': generada, 'modelo': modelo, 'mediciones': mediciones})
+        print(json.dumps({'escala': f'{reviews}:{juegos}', 'modelo_s': modelo['total_s'],
+                          'p50_ms': {nombre: medidas['p50_ms'] for nombre, medidas in mediciones['consultas'].items()},
+                          'pico_memoria_mb': mediciones['pico_memoria_mb']}))
+
+    if args.salida:
+        directorio_salida = os.path.dirname(args.salida)
+        if directorio_salida:
+            os.makedirs(directorio_salida, exist_ok=True)
+        with open(args.salida, 'w', encoding='utf-8') as f:
+            json.dump(resultados, f, indent=2, ensure_ascii=False)
+        print(f"Se guardaron los resultados en '{args.salida}'")
+
+if __name__ == '__main__':
+    main()
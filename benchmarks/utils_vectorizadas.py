@@ -0,0 +1,97 @@
+## EQUIVALENCIA Y RENDIMIENTO DE LAS FUNCIONES VECTORIZADAS DE utils
+# Compara convertir_fecha_serie, obtener_anio_release_serie y reemplaza_a_flotante_serie con la aplicación fila por
+# fila de las funciones originales, sobre casos borde y columnas sintéticas del tamaño de las tablas reales.
+# Uso: python benchmarks/utils_vectorizadas.py --filas 100000
+# Importaciones
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import utils
+
+# Casos borde de cada función (solo textos y nulos, que es lo que contienen las columnas de los notebooks)
+CASOS_FECHA = ['Posted April 21, 2011.', 'Posted November 5, 2013.', 'Posted May 1, 2015.', 'Posted Sept 5, 2012.',
+               'Posted Jan 3, 2014.', 'Posted February 30, 2011.', 'Posted April 21.', 'Posted 21 April, 2011.',
+               'Posted Foo 12, 2011.', 'April 21, 2011', 'Posted april 21, 2011.', 'Posted APRIL 21, 2011.',
+               'Posted April 21,\t2011.', 'Posted 12 5, 2011.', 'Posted April 00, 2011.', '', 'Posted Abril 21, 2011.',
+               'x 2011, 2011', 'Posted April  21, 2011.', 'Posted Dec 31, 1999.']
+CASOS_ANIO = ['2018-01-04', '2018-1-4', '18-01-04', 'Jan 2018', '2018-01-04 ', '2018-01-04\n', '', None, np.nan,
+              'Dato no disponible', '2018-13-45', '١٢٣٤-٠١-٠٢']
+CASOS_PRECIO = [4.99, 0.0, 'Free To Play', 'Free', '19.99', ' 3.5 ', '1e3', 'inf', 'nan', '1_000', None, np.nan,
+                'Starting at $449.00', '', 12, True]
+
+# Funciones
+def columnas_sinteticas(filas, semilla=42):
+    '''
+    Genera columnas con la mezcla de valores de las tablas reales: fechas de reviews, fechas de lanzamiento y precios.
+    '''
+    rng = np.random.default_rng(semilla)
+    meses = np.array(['January', 'February', 'March', 'April', 'May', 'June', 'July', 'August', 'September',
+                      'October', 'November', 'December'])
+    fechas = pd.Series([f'Posted {m} {d}, {a}.' for m, d, a in zip(rng.choice(meses, filas), rng.integers(1, 29, filas),
+                                                                    rng.integers(2010, 2016, filas))], dtype=object)
+    # Alrededor de un 10% de las reviews no tienen año en la fecha de posteo
+    sin_anio = rng.random(filas) < 0.1
+    fechas[sin_anio] = [f'Posted {m} {d}.' for m, d in zip(rng.choice(meses, sin_anio.sum()), rng.integers(1, 29, sin_anio.sum()))]
+
+    lanzamientos = pd.Series([f'{a}-{m:02d}-{d:02d}' for a, m, d in zip(rng.integers(1990, 2018, filas),
+                                                                       rng.integers(1, 13, filas), rng.integers(1, 29, filas))], dtype=object)
+    lanzamientos[rng.random(filas) < 0.05] = 'Soon..'
+    lanzamientos[rng.random(filas) < 0.05] = None
+
+    precios = pd.Series(rng.choice([0.99, 4.99, 9.99, 19.99, 59.99], filas), dtype=object)
+    precios[rng.random(filas) < 0.08] = 'Free To Play'
+    precios[rng.random(filas) < 0.04] = None
+    return fechas, lanzamientos, precios
+
+def iguales(a, b):
+    '''
+    Compara dos Series valor por valor (NaN se considera igual a NaN).
+    '''
+    return a.index.equals(b.index) and all(x == y or (x != x and y != y) for x, y in zip(a.tolist(), b.tolist()))
+
+def comparar(nombre, escalar, vectorizada, serie, repeticiones=3):
+    '''
+    Verifica que la versión vectorizada dé lo mismo que aplicar la escalar fila por fila y mide ambas.
+    '''
+    inicio = time.perf_counter()
+    referencia = serie.apply(escalar)
+    tiempo_escalar = time.perf_counter() - inicio
+    tiempos = []
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        resultado = vectorizada(serie)
+        tiempos.append(time.perf_counter() - inicio)
+    tiempo_vectorizada = min(tiempos)
+    ok = iguales(referencia, resultado)
+    print(f'{nombre:<28} filas={len(serie):>8} apply={tiempo_escalar:8.3f} s  vectorizada={tiempo_vectorizada:8.3f} s  '
+          f'x{tiempo_escalar / tiempo_vectorizada:6.1f}  iguales={ok}')
+    return ok
+
+def main():
+    parser = argparse.ArgumentParser(description='Equivalencia y rendimiento de las funciones vectorizadas de utils.')
+    parser.add_argument('--filas', type=int, default=100000, help='Filas de las columnas sintéticas')
+    args = parser.parse_args()
+
+    ok = True
+    print('Casos borde:')
+    ok &= comparar('convertir_fecha', utils.convertir_fecha, utils.convertir_fecha_serie, pd.Series(CASOS_FECHA, dtype=object), 1)
+    ok &= comparar('obtener_anio_release', utils.obtener_anio_release, utils.obtener_anio_release_serie, pd.Series(CASOS_ANIO, dtype=object), 1)
+    ok &= comparar('reemplaza_a_flotante', utils.reemplaza_a_flotante, utils.reemplaza_a_flotante_serie, pd.Series(CASOS_PRECIO, dtype=object), 1)
+
+    print('Columnas sintéticas:')
+    fechas, lanzamientos, precios = columnas_sinteticas(args.filas)
+    ok &= comparar('convertir_fecha', utils.convertir_fecha, utils.convertir_fecha_serie, fechas)
+    ok &= comparar('obtener_anio_release', utils.obtener_anio_release, utils.obtener_anio_release_serie, lanzamientos)
+    ok &= comparar('reemplaza_a_flotante', utils.reemplaza_a_flotante, utils.reemplaza_a_flotante_serie, precios)
+
+    if not ok:
+        raise SystemExit(1)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,153 @@
+## CACHE DE RESPUESTAS DE LA API
+# Importaciones
+import hashlib
+import os
+import time
+from collections import OrderedDict
+
+# Funciones
+def version_datos(directorio='data', archivos=None):
+    '''
+    Calcula una huella de los archivos de datos a partir del nombre, el tamaño y la fecha de modificación de cada uno.
+
+    No lee el contenido de los archivos, así que es barata de calcular. Cambia cuando se agrega, se borra o se
+    reescribe alguno de los archivos.
+
+    Args:
+        directorio (str): Directorio de los datos.
+        archivos (list, optional): Rutas relativas al directorio de los archivos a considerar (por ejemplo,
+            datos.ARCHIVOS_DATOS, los que carga la API). Si es None se consideran todos los archivos del directorio,
+            incluidos los de los subdirectorios como piv_norm_csr.
+
+    Returns:
+        str: Huella hexadecimal de 16 caracteres.
+    '''
+    if archivos is None:
+        archivos = []
+        for raiz, carpetas, nombres in os.walk(directorio, followlinks=True):
+            carpetas.sort()
+            archivos.extend(os.path.relpath(os.path.join(raiz, nombre), directorio) for nombre in sorted(nombres))
+    huella = hashlib.sha1()
+    for archivo in archivos:
+        try:
+            estado = os.stat(os.path.join(directorio, archivo))
+        except OSError:
+            continue
+        huella.update(f'{archivo}|{estado.st_size}|{estado.st_mtime_ns}\n'.encode())
+    return huella.hexdigest()[:16]
+
+# Clases
+class CacheRespuestas:
+    '''
+    Cache LRU de las respuestas de la API, con tiempo de vida opcional y métricas de aciertos.
+
+    Las claves son (nombre de la consulta, argumentos). Todas las entradas pertenecen a una versión de los datos:
+    cada `revisar_cada` segundos se recalcula `version_datos` y, si cambió, se vacía el cache. Si se indica
+    `version`, la versión es la que devuelve esa función (por ejemplo, la de la instantánea activa, que cambia recién
+    cuando se terminan de recargar sus datos), de modo que el cache nunca guarda respuestas de los datos anteriores
+    con la versión nueva.
+
+    Se usa solo desde el event loop de FastAPI, por lo que no necesita locks.
+
+    Args:
+        directorio (str o callable): Directorio de los datos cuya versión se vigila, o una función que lo devuelve
+            (por ejemplo, el de la instantánea activa). Si el directorio cambia, el cache se vacía enseguida.
+        max_entradas (int): Cantidad máxima de respuestas guardadas. Al superarla se descarta la usada hace más tiempo.
+        ttl (float): Segundos que vive cada respuesta. 0 para que no venzan.
+        revisar_cada (float): Cada cuántos segundos se revisa si cambiaron los datos.
+        version (callable, optional): Función que devuelve la versión de los datos. Si se indica, no se usa `directorio`.
+    '''
+    def __init__(self, directorio='data', max_entradas=1024, ttl=0, revisar_cada=5, version=None):
+        self.directorio = directorio
+        self.fuente_version = version
+        self.max_entradas = max_entradas
+        self.ttl = ttl
+        self.revisar_cada = revisar_cada
+        self.entradas = OrderedDict()
+        self._directorio = None if version is not None else self._ruta()
+        self._version = version() if version is not None else version_datos(self._directorio)
+        self._revisada = time.monotonic()
+        self.aciertos = 0
+        self.fallos = 0
+        self.descartadas = 0
+        self.vencidas = 0
+        self.invalidaciones = 0
+
+    def _ruta(self):
+        return self.directorio() if callable(self.directorio) else self.directorio
+
+    def version(self):
+        '''
+        Devuelve la versión actual de los datos, vaciando el cache si cambió desde la última revisión.
+        '''
+        if self.fuente_version is not None:
+            version = self.fuente_version()
+        else:
+            ahora = time.monotonic()
+            directorio = self._ruta()
+            if ahora - self._revisada < self.revisar_cada and directorio == self._directorio:
+                return self._version
+            self._revisada = ahora
+            self._directorio = directorio
+            version = version_datos(directorio)
+        if version != self._version:
+            self._version = version
+            self.entradas.clear()
+            self.invalidaciones += 1
+        return self._version
+
+    def etag(self, clave):
+        '''
+        Devuelve el ETag de una consulta: la respuesta solo depende de la consulta y de la versión de los datos,
+        así que se puede calcular sin calcular la respuesta.
+        '''
+        return '"' + hashlib.sha1(f'{self.version()}|{clave!r}'.encode()).hexdigest()[:20] + '"'
+
+    def obtener(self, clave):
+        '''
+        Devuelve la respuesta guardada para una clave, o None si no está o venció.
+        '''
+        entrada = self.entradas.get(clave)
+        if entrada is not None:
+            respuesta, guardada = entrada
+            if self.ttl and time.monotonic() - guardada > self.ttl:
+                del self.entradas[clave]
+                self.vencidas += 1
+            else:
+                self.entradas.move_to_end(clave)
+                self.aciertos += 1
+                return respuesta
+        self.fallos += 1
+        return None
+
+    def guardar(self, clave, respuesta, version=None):
+        '''
+        Guarda una respuesta, descartando las usadas hace más tiempo si se supera `max_entradas`.
+
+        Si se indica la versión de los datos con la que se empezó a calcular y ya no es la actual, no se guarda,
+        para no mezclar respuestas de los datos anteriores con las de los nuevos.
+        '''
+        if version is not None and version != self.version():
+            return
+        self.entradas[clave] = (respuesta, time.monotonic())
+        self.entradas.move_to_end(clave)
+        while len(self.entradas) > self.max_entradas:
+            self.entradas.popitem(last=False)
+            self.descartadas += 1
+
+    def estado(self):
+        '''
+        Devuelve las métricas del cache.
+        '''
+        consultas = self.aciertos + self.fallos
+        return {
+            'version_datos': self._version,
+            'entradas': len(self.entradas),
+            'max_entradas': self.max_entradas,
+            'aciertos': self.aciertos,
+            'fallos': self.fallos,
+            'tasa_aciertos': round(self.aciertos / consultas, 4) if consultas else 0.0,
+            'descartadas': self.descartadas,
+            'vencidas': self.vencidas,
+            'invalidaciones': self.invalidaciones,
+        }
@@ -0,0 +1,52 @@
+## CONFIGURACIÓN DE LA API
+# Todos los valores se pueden modificar con variables de entorno
+# Importaciones
+import os
+
+# Cantidad máxima de consultas que se calculan al mismo tiempo en el pool de hilos
+MAX_WORKERS = int(os.environ.get('API_MAX_WORKERS', 4))
+# Cantidad máxima de consultas distintas en curso (calculándose o esperando un hilo libre).
+# Las que superan este límite se rechazan con un 503 en lugar de encolarse sin límite
+MAX_PENDIENTES = int(os.environ.get('API_MAX_PENDIENTES', 64))
+# Segundos que se sugieren al cliente en el encabezado Retry-After de un 503
+REINTENTAR_EN = int(os.environ.get('API_REINTENTAR_EN', 1))
+
+# Cantidad máxima de respuestas guardadas en el cache (se descartan las usadas hace más tiempo)
+CACHE_MAX_ENTRADAS = int(os.environ.get('API_CACHE_MAX_ENTRADAS', 1024))
+# Segundos que vive cada respuesta en el cache. 0 para que solo se descarten al cambiar los datos
+CACHE_TTL = float(os.environ.get('API_CACHE_TTL', 0))
+# Cada cuántos segundos se revisa si cambiaron los archivos que carga la API (datos.ARCHIVOS_DATOS), para recargarlos
+# y vaciar el cache
+CACHE_REVISAR_CADA = float(os.environ.get('API_CACHE_REVISAR_CADA', 5))
+# Segundos que clientes y CDNs pueden usar una respuesta sin revalidarla (Cache-Control: max-age)
+CACHE_MAX_EDAD = int(os.environ.get('API_CACHE_MAX_EDAD', 60))
+
+# Tamaño en bytes a partir del que se comprimen las respuestas (con brotli o gzip, según el Accept-Encoding del cliente)
+COMPRIMIR_DESDE = int(os.environ.get('API_COMPRIMIR_DESDE', 1024))
+
+# Cantidad máxima de elementos de una consulta por lote. Cada lote ocupa un hilo del pool mientras se calcula (unos
+# 25 s para 5000 usuarios de /recomendacion_usuario_lote con la base completa), así que se mantiene acotado
+MAX_LOTE = int(os.environ.get('API_MAX_LOTE', 5000))
+
+# Directorio de datos que se sirve si no hay ninguna versión publicada
+DIRECTORIO_DATOS = os.environ.get('API_DIRECTORIO_DATOS', 'data')
+# Raíz de las versiones de los datos: cada versión es un subdirectorio y el archivo ACTUAL indica la que se sirve.
+# Vacío para servir siempre DIRECTORIO_DATOS
+DIRECTORIO_VERSIONES = os.environ.get('API_DIRECTORIO_VERSIONES', 'versiones')
+# Motor de /userdata, /countreviews, /developer y /sentiment_analysis: 'indices' (índices en memoria, más rápidos)
+# o 'arrow' (tablas de Arrow consultadas con pyarrow.compute, sin índices: menos memoria por worker)
+MOTOR_CONSULTAS = os.environ.get('API_MOTOR_CONSULTAS', 'indices')
+# Cada cuántos segundos cada worker revisa si se publicó otra versión
+INSTANTANEA_REVISAR_CADA = float(os.environ.get('API_INSTANTANEA_REVISAR_CADA', 5))
+# Token que se exige en el encabezado X-Token-Admin para cambiar de versión con POST /instantanea. Vacío para
+# deshabilitar esa ruta (las versiones se publican con `python instantaneas.py publicar`)
+TOKEN_ADMIN = os.environ.get('API_TOKEN_ADMIN', '')
+
+# Si es 0 no se registran las métricas de latencia por ruta y por fase que se publican en /metrics
+METRICAS = os.environ.get('API_METRICAS', '1') != '0'
+# Fracción de las consultas que se perfilan con cProfile (0 para no perfilar ninguna)
+PERFIL_MUESTREO = float(os.environ.get('API_PERFIL_MUESTREO', 0))
+# Segundos a partir de los que se guarda el perfil de una consulta perfilada
+PERFIL_UMBRAL = float(os.environ.get('API_PERFIL_UMBRAL', 0.5))
+# Directorio donde se guardan los perfiles de las consultas lentas
+PERFIL_DIRECTORIO = os.environ.get('API_PERFIL_DIRECTORIO', 'perfiles')
@@ -0,0 +1,204 @@
+## CONSULTAS SOBRE TABLAS DE ARROW
+# Motor alternativo para /userdata, /countreviews, /developer y /sentiment_analysis: las tablas se leen como Tables de
+# Arrow (mapeadas en memoria, sin pasar por pandas) y cada consulta filtra, suma y cuenta con pyarrow.compute, sobre
+# cortes sin copia de la tabla. No construye índices al cargar, así que ocupa menos memoria que los de indices.py a
+# cambio de recorrer las filas de la consulta en cada llamada. Se elige con API_MOTOR_CONSULTAS=arrow.
+# Importaciones
+import numpy as np
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
+
+from agregados import CATEGORIAS_SENTIMIENTO
+
+# Funciones
+def leer_tabla(ruta, columnas, diccionario=()):
+    '''
+    Lee columnas de un archivo parquet como una Table de Arrow mapeada en memoria, con un único bloque por columna.
+
+    Args:
+        ruta (str): Ruta del archivo parquet.
+        columnas (list): Columnas a leer.
+        diccionario (tuple): Columnas de texto que se leen codificadas con diccionario (uno solo para toda la tabla).
+
+    Returns:
+        pyarrow.Table: La tabla leída.
+    '''
+    tabla = pq.read_table(ruta, columns=columnas, memory_map=True, read_dictionary=list(diccionario))
+    if diccionario:
+        tabla = tabla.unify_dictionaries()
+    return tabla.combine_chunks()
+
+def _arreglo(tabla, columna):
+    '''
+    Devuelve una columna de una tabla de un solo bloque como un arreglo de Arrow.
+    '''
+    return tabla.column(columna).chunk(0)
+
+# Clases
+class GastosArrow:
+    '''
+    Gasto y cantidad de items de cada usuario para la consulta /userdata, buscados con pyarrow.compute.index.
+    Tiene la misma interfaz que indices.IndiceGastos.
+
+    Args:
+        tabla (pyarrow.Table): Tabla con las columnas 'user_id', 'price' e 'items_count'.
+    '''
+    def __init__(self, tabla):
+        self.tabla = tabla
+        self.user_id = _arreglo(tabla, 'user_id')
+
+    def nbytes(self):
+        return self.tabla.nbytes
+
+    def gastos(self, user_id):
+        '''
+        Devuelve el dinero gastado y la cantidad de items de un usuario (los de su primera fila).
+
+        Raises:
+            KeyError: Si el usuario no está en la tabla.
+        '''
+        posicion = pc.index(self.user_id, user_id).as_py()
+        if posicion < 0:
+            raise KeyError(user_id)
+        fila = self.tabla.slice(posicion, 1)
+        return fila.column('price')[0].as_py(), fila.column('items_count')[0].as_py()
+
+class ReviewsArrow:
+    '''
+    Reviews ordenadas por fecha para las consultas /userdata y /countreviews. Tiene la misma interfaz que
+    indices.IndiceRecomendaciones e indices.IndiceFechas.
+
+    Los usuarios se guardan codificados con diccionario, así que filtrar por usuario compara enteros. Un rango de
+    fechas se ubica con dos búsquedas binarias y se resuelve sobre un corte sin copia de la tabla.
+
+    Args:
+        tabla (pyarrow.Table): Reviews con las columnas 'user_id' (codificada con diccionario), 'reviews_recommend'
+            y 'reviews_date'.
+    '''
+    def __init__(self, tabla):
+        # Las recomendaciones por usuario se cuentan sobre todas las reviews, también las de fecha inválida
+        self.usuarios = _arreglo(tabla, 'user_id')
+        self.recomienda = _arreglo(tabla, 'reviews_recommend')
+        self.total_usuarios_reviews = pc.count_distinct(self.usuarios.indices).as_py()
+
+        fechas = tabla.column('reviews_date')
+        if not pa.types.is_temporal(fechas.type):
+            fechas = pc.strptime(fechas, format='%Y-%m-%d', unit='s', error_is_null=True)
+        fechas = pc.cast(fechas, pa.date32())
+        tabla = tabla.drop(['reviews_date']).append_column('reviews_date', fechas).combine_chunks()
+
+        # Se descartan las fechas inválidas. Si ya están al final de la tabla (como las deja
+        # agregados.guardar_reviews_ordenadas) alcanza con un corte, sin copiar
+        validas = _arreglo(tabla, 'reviews_date').is_valid()
+        cantidad = len(validas) - _arreglo(tabla, 'reviews_date').null_count
+        if pc.all(validas.slice(0, cantidad)).as_py() is False:
+            tabla = tabla.filter(validas).combine_chunks()
+        else:
+            tabla = tabla.slice(0, cantidad)
+        dias = _arreglo(tabla, 'reviews_date').view(pa.int32()).to_numpy()
+        # Si no vienen ordenadas por fecha se ordenan una vez, al cargar
+        if len(dias) and not (dias[1:] >= dias[:-1]).all():
+            tabla = tabla.take(pc.sort_indices(tabla, sort_keys=[('reviews_date', 'ascending')])).combine_chunks()
+            dias = _arreglo(tabla, 'reviews_date').view(pa.int32()).to_numpy()
+        self.por_fecha = tabla
+        # Días desde 1970-01-01 de cada review, sin copia de la columna de Arrow
+        self.dias = dias
+
+    def nbytes(self):
+        '''
+        Devuelve la memoria de los buffers de Arrow que usa, en bytes (los cortes comparten los de la tabla leída).
+        '''
+        buffers = {}
+        for arreglo in (self.usuarios, self.recomienda, *(_arreglo(self.por_fecha, nombre) for nombre in self.por_fecha.column_names)):
+            for buffer in arreglo.buffers() + (arreglo.dictionary.buffers() if hasattr(arreglo, 'dictionary') else []):
+                if buffer is not None:
+                    buffers[buffer.address] = buffer.size
+        return sum(buffers.values())
+
+    def recomendaciones(self, user_id):
+        '''
+        Devuelve la cantidad de reviews recomendadas por un usuario (0 si no tiene reviews).
+        '''
+        codigo = pc.index(self.usuarios.dictionary, user_id).as_py()
+        if codigo < 0:
+            return 0
+        return pc.sum(pc.filter(self.recomienda, pc.equal(self.usuarios.indices, codigo))).as_py() or 0
+
+    def rango(self, fecha_inicio, fecha_fin):
+        '''
+        Calcula las estadísticas de las reviews entre dos fechas (ambas incluidas).
+
+        Args:
+            fecha_inicio (str): Fecha de inicio en formato YYYY-MM-DD.
+            fecha_fin (str): Fecha de fin en formato YYYY-MM-DD.
+
+        Returns:
+            tuple: Cantidad de usuarios distintos, cantidad de reviews y cantidad de recomendaciones positivas en el rango
+            (estas dos últimas como enteros de NumPy, igual que indices.IndiceFechas).
+
+        Raises:
+            ValueError: Si alguna de las fechas no tiene el formato YYYY-MM-DD.
+        '''
+        inicio = np.datetime64(fecha_inicio, 'D').astype(np.int64)
+        fin = np.datetime64(fecha_fin, 'D').astype(np.int64)
+
+        izquierda = np.searchsorted(self.dias, inicio, side='left')
+        derecha = np.searchsorted(self.dias, fin, side='right')
+        total = np.int64(max(derecha - izquierda, 0))
+        if not total:
+            return 0, total, np.int64(0)
+        corte = self.por_fecha.slice(izquierda, total)
+        usuarios = pc.count_distinct(_arreglo(corte, 'user_id').indices).as_py()
+        positivas = np.int64(pc.sum(_arreglo(corte, 'reviews_recommend')).as_py() or 0)
+        return usuarios, total, positivas
+
+class DeveloperArrow:
+    '''
+    Agregados por desarrollador y año para la consulta /developer, filtrados con pyarrow.compute. Tiene la misma
+    interfaz (`get`) que el diccionario de agregados.cargar_agregados.
+
+    Args:
+        tabla (pyarrow.Table): Tabla df_developer_anio.
+    '''
+    def __init__(self, tabla):
+        self.tabla = tabla
+
+    def nbytes(self):
+        return self.tabla.nbytes
+
+    def get(self, desarrollador, defecto=None):
+        '''
+        Devuelve {'cantidad_por_año': dict, 'porcentaje_gratis_por_año': dict} de un desarrollador, o `defecto` si no existe.
+        '''
+        filas = self.tabla.filter(pc.equal(self.tabla.column('developer'), desarrollador))
+        if not filas.num_rows:
+            return defecto
+        anios = filas.column('release_anio').to_pylist()
+        return {'cantidad_por_año': dict(zip(anios, filas.column('cantidad').to_pylist())),
+                'porcentaje_gratis_por_año': dict(zip(anios, filas.column('porcentaje_gratis').to_pylist()))}
+
+class SentimientoArrow:
+    '''
+    Cantidad de reviews de cada categoría de sentimiento por año de lanzamiento para la consulta /sentiment_analysis.
+    Tiene la misma interfaz (`get`) que el diccionario de agregados.cargar_agregados.
+
+    Args:
+        tabla (pyarrow.Table): Tabla df_sentimiento_anio.
+    '''
+    def __init__(self, tabla):
+        self.tabla = tabla
+        self.anios = _arreglo(tabla, 'release_anio')
+
+    def nbytes(self):
+        return self.tabla.nbytes
+
+    def get(self, anio, defecto=None):
+        '''
+        Devuelve {'Negative': int, 'Neutral': int, 'Positive': int} de un año, o `defecto` si no hay reviews de ese año.
+        '''
+        posicion = pc.index(self.anios, anio).as_py()
+        if posicion < 0:
+            return defecto
+        fila = self.tabla.slice(posicion, 1)
+        return {categoria: fila.column(categoria)[0].as_py() for categoria in CATEGORIAS_SENTIMIENTO.values()}
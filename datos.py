@@ -0,0 +1,331 @@
+## ACCESO PEREZOSO A LOS DATOS QUE USA LA API
+# Importaciones
+import argparse
+import logging
+import os
+import subprocess
+import sys
+import time
+from functools import cached_property
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from agregados import (ARCHIVO_DEVELOPER_ANIO, ARCHIVO_SENTIMIENTO_ANIO, ARCHIVO_TOP_USUARIOS_GENERO,
+                       agregado_top_usuarios_genero, cargar_agregados)
+from consultas_arrow import DeveloperArrow, GastosArrow, ReviewsArrow, SentimientoArrow, leer_tabla
+from indices import (IndiceFechas, IndiceGastos, IndiceGeneros, IndicePlaytime, IndiceRecomendaciones, IndiceTitulos,
+                     IndiceTopGeneros)
+from recomendacion import (ARCHIVO_RECOMENDACIONES_USUARIOS, IndiceVecinos, MotorUsuarios, RecomendacionesPrecalculadas,
+                           ARCHIVO_HUELLA_MODELO, leer_huella_modelo)
+from tipos import CATEGORICAS, leer_expandido
+
+# Se usa el logger de uvicorn para que los mensajes aparezcan en la consola del servidor
+logger = logging.getLogger('uvicorn.error')
+
+# Archivos parquet que usa la API y las columnas que lee de cada uno
+COLUMNAS = {
+    'df_gastos_items.parquet': ['user_id', 'price', 'items_count'],
+    'df_reviews.parquet': ['user_id', 'reviews_recommend', 'reviews_date'],
+    'df_genre_ranking.parquet': ['genres', 'ranking'],
+    'df_playtime_forever.parquet': ['genres', 'user_id', 'playtime_horas'],
+    ARCHIVO_DEVELOPER_ANIO: ['developer', 'release_anio', 'cantidad', 'porcentaje_gratis'],
+    ARCHIVO_SENTIMIENTO_ANIO: ['release_anio', 'Negative', 'Neutral', 'Positive'],
+    ARCHIVO_TOP_USUARIOS_GENERO: ['genres', 'posicion', 'user_id', 'playtime_horas'],
+    'item_topk.parquet': ['item_name', 'vecinos', 'scores'],
+}
+# Archivos que tienen que tener al menos una de estas columnas: la URL de perfil o la columna compacta que la reemplaza
+COLUMNAS_ALTERNATIVAS = {'df_playtime_forever.parquet': ['url_perfil', 'user_url'],
+                         ARCHIVO_TOP_USUARIOS_GENERO: ['url_perfil', 'user_url']}
+# Arreglos de la matriz de usuarios (directorio piv_norm_csr)
+ARREGLOS_USUARIOS = ['data', 'indices', 'indptr', 'shape', 'usuarios', 'items']
+# Archivos que carga la API, relativos al directorio de datos: su huella (cache.version_datos) es la versión de los
+# datos, así que los demás archivos del directorio (notebooks, caches de otros procesos) no la cambian
+ARCHIVOS_DATOS = (list(COLUMNAS) + [ARCHIVO_RECOMENDACIONES_USUARIOS] +
+                  [os.path.join('piv_norm_csr', f'{nombre}.npy') for nombre in ARREGLOS_USUARIOS] +
+                  [os.path.join('piv_norm_csr', ARCHIVO_HUELLA_MODELO)])
+# Motores de las consultas /userdata, /countreviews, /developer y /sentiment_analysis: 'indices' (índices de
+# indices.py y diccionarios de agregados.py) o 'arrow' (tablas de Arrow consultadas con pyarrow.compute)
+MOTORES = ('indices', 'arrow')
+
+# Clases
+class DatosNoDisponibles(Exception):
+    '''
+    Se lanza cuando falta en el directorio de datos un archivo que necesita una consulta y que no está en el
+    repositorio (por ejemplo, df_playtime_forever.parquet por su tamaño), para que la API responda 503 en lugar de 500.
+    '''
+
+# Funciones
+def leer_parquet(ruta, columnas=None):
+    '''
+    Lee un archivo parquet mapeándolo en memoria, y solo las columnas indicadas.
+
+    Las columnas de texto de tipos.CATEGORICAS se leen como categóricas, sin crear un objeto str por fila.
+
+    Args:
+        ruta (str): Ruta del archivo parquet.
+        columnas (list, optional): Columnas a leer. Si es None se leen todas.
+
+    Returns:
+        pandas.DataFrame: El contenido del archivo.
+    '''
+    return pq.read_table(ruta, columns=columnas, memory_map=True, read_dictionary=CATEGORICAS).to_pandas()
+
+def columnas_disponibles(ruta, columnas):
+    '''
+    Devuelve las columnas de la lista que tiene un archivo parquet, leyendo solo su esquema.
+    '''
+    nombres = pq.read_schema(ruta).names
+    return [columna for columna in columnas if columna in nombres]
+
+def memoria_proceso():
+    '''
+    Devuelve la memoria residente del proceso actual en MB, leída de /proc/self/status.
+
+    Returns:
+        dict: 'rss' (total), 'rss_anon' (memoria propia del proceso) y 'rss_file' (páginas de archivos mapeados,
+        que se comparten con otros procesos a través del page cache). Vacío si /proc no está disponible.
+    '''
+    campos = {'VmRSS': 'rss', 'RssAnon': 'rss_anon', 'RssFile': 'rss_file'}
+    memoria = {}
+    try:
+        with open('/proc/self/status') as f:
+            for linea in f:
+                clave, _, valor = linea.partition(':')
+                if clave in campos:
+                    memoria[campos[clave]] = round(int(valor.split()[0]) / 1024, 2)
+    except OSError:
+        pass
+    return memoria
+
+class Datos:
+    '''
+    Da acceso a los datos y estructuras de consulta de un directorio, cargando cada uno recién la primera vez que se usa.
+
+    Cada propiedad lee solo el archivo y las columnas que necesita y construye su índice una única vez, de modo que
+    importar la API no lee ningún archivo y cada worker de uvicorn solo carga lo que sus consultas usan.
+
+    Args:
+        directorio (str): Directorio que contiene los parquet y los índices del modelo.
+        motor (str): Motor de las consultas /userdata, /countreviews, /developer y /sentiment_analysis, uno de MOTORES.
+
+    Raises:
+        ValueError: Si el motor no es uno de MOTORES.
+    '''
+    def __init__(self, directorio='data', motor='indices'):
+        if motor not in MOTORES:
+            raise ValueError(f"Motor de consultas desconocido '{motor}', tiene que ser uno de {MOTORES}")
+        self.directorio = directorio
+        self.motor = motor
+
+    # Estructuras que se cargan de forma perezosa
+    ESTRUCTURAS = ('gastos', 'recomendaciones', 'fechas', 'generos', 'playtime', 'top_generos', 'agregados', 'juegos', 'titulos',
+                   'usuarios', 'recomendaciones_usuarios')
+
+    def _ruta(self, archivo):
+        return os.path.join(self.directorio, archivo)
+
+    def cargadas(self):
+        '''
+        Devuelve los nombres de las estructuras que ya se cargaron.
+        '''
+        return [nombre for nombre in self.ESTRUCTURAS if nombre in self.__dict__]
+
+    def validar(self):
+        '''
+        Verifica que el directorio tenga todos los archivos que usa la API, con las columnas que se leen de cada uno.
+        Solo lee los metadatos de los parquet, así que no carga los datos.
+
+        Returns:
+            list: Descripción de cada problema encontrado. Vacía si el directorio es válido.
+        '''
+        problemas = []
+        for archivo, columnas in COLUMNAS.items():
+            try:
+                esquema = pq.read_schema(self._ruta(archivo))
+            except (OSError, pa.ArrowInvalid) as e:
+                problemas.append(f"No se puede leer '{archivo}': {e}")
+                continue
+            faltantes = [columna for columna in columnas if columna not in esquema.names]
+            if faltantes:
+                problemas.append(f"A '{archivo}' le faltan las columnas {faltantes}")
+            alternativas = COLUMNAS_ALTERNATIVAS.get(archivo, [])
+            if alternativas and not any(columna in esquema.names for columna in alternativas):
+                problemas.append(f"A '{archivo}' le falta alguna de las columnas {alternativas}")
+        for nombre in ARREGLOS_USUARIOS:
+            if not os.path.exists(self._ruta(os.path.join('piv_norm_csr', f'{nombre}.npy'))):
+                problemas.append(f"Falta 'piv_norm_csr/{nombre}.npy'")
+        return problemas
+
+    def _construir(self, nombre, funcion):
+        '''
+        Construye una estructura de datos registrando en el log el tiempo y la memoria que ocupa.
+        '''
+        inicio = time.perf_counter()
+        resultado = funcion()
+        tamano = resultado.nbytes() / 1e6 if hasattr(resultado, 'nbytes') else float('nan')
+        logger.info("Se cargó '%s' desde '%s' en %.3f s (%.2f MB)", nombre, self.directorio, time.perf_counter() - inicio, tamano)
+        return resultado
+
+    @cached_property
+    def gastos(self):
+        columnas = ['user_id', 'price', 'items_count']
+        if self.motor == 'arrow':
+            return self._construir('gastos', lambda: GastosArrow(leer_tabla(self._ruta('df_gastos_items.parquet'), columnas)))
+        return self._construir('gastos', lambda: IndiceGastos(leer_parquet(self._ruta('df_gastos_items.parquet'), columnas)))
+
+    @cached_property
+    def reviews_arrow(self):
+        # Con el motor 'arrow', /userdata y /countreviews comparten la misma tabla de reviews
+        return self._construir('reviews_arrow', lambda: ReviewsArrow(leer_tabla(
+            self._ruta('df_reviews.parquet'), ['user_id', 'reviews_recommend', 'reviews_date'], diccionario=('user_id',))))
+
+    @cached_property
+    def recomendaciones(self):
+        if self.motor == 'arrow':
+            return self.reviews_arrow
+        return self._construir('recomendaciones', lambda: IndiceRecomendaciones(
+            leer_parquet(self._ruta('df_reviews.parquet'), ['user_id', 'reviews_recommend'])))
+
+    @cached_property
+    def fechas(self):
+        if self.motor == 'arrow':
+            return self.reviews_arrow
+        return self._construir('fechas', lambda: IndiceFechas(
+            leer_parquet(self._ruta('df_reviews.parquet'), ['user_id', 'reviews_recommend', 'reviews_date'])))
+
+    @cached_property
+    def generos(self):
+        return self._construir('generos', lambda: IndiceGeneros(
+            leer_parquet(self._ruta('df_genre_ranking.parquet'), ['genres', 'ranking'])))
+
+    def _requerir(self, archivo, indicacion):
+        '''
+        Devuelve la ruta de un archivo del directorio.
+
+        Raises:
+            DatosNoDisponibles: Si el archivo no existe, con la indicación de cómo generarlo.
+        '''
+        ruta = self._ruta(archivo)
+        if not os.path.exists(ruta):
+            raise DatosNoDisponibles(f"Falta '{archivo}' en '{self.directorio}': {indicacion}")
+        return ruta
+
+    @cached_property
+    def playtime(self):
+        # Los archivos compactos tienen 'url_perfil' y los de los notebooks 'user_url'
+        ruta = self._requerir('df_playtime_forever.parquet', 'genérelo con los notebooks de ETL')
+        columnas = ['genres', 'user_id'] + columnas_disponibles(ruta, ['url_perfil', 'user_url'])[:1] + ['playtime_horas']
+        return self._construir('playtime', lambda: IndicePlaytime(leer_parquet(ruta, columnas)))
+
+    @cached_property
+    def top_generos(self):
+        ruta = self._ruta(ARCHIVO_TOP_USUARIOS_GENERO)
+        if os.path.exists(ruta):
+            return self._construir('top_generos', lambda: IndiceTopGeneros(leer_parquet(ruta)))
+        # Sin el agregado se calcula el top en memoria a partir de df_playtime_forever, si está
+        ruta_playtime = self._requerir('df_playtime_forever.parquet',
+                                       f"hace falta para calcular '{ARCHIVO_TOP_USUARIOS_GENERO}', que tampoco está; "
+                                       f"genérelo con los notebooks de ETL y ejecute `python agregados.py --directorio {self.directorio}`")
+        logger.warning("Falta '%s': se calcula desde '%s' (ejecute `python agregados.py --directorio %s` para guardarlo)",
+                       ruta, ruta_playtime, self.directorio)
+        return self._construir('top_generos', lambda: IndiceTopGeneros(agregado_top_usuarios_genero(
+            leer_expandido(ruta_playtime, ['genres', 'user_id', 'playtime_horas', 'user_url']))))
+
+    @cached_property
+    def agregados(self):
+        inicio = time.perf_counter()
+        if self.motor == 'arrow':
+            resultado = (DeveloperArrow(leer_tabla(self._ruta(ARCHIVO_DEVELOPER_ANIO), COLUMNAS[ARCHIVO_DEVELOPER_ANIO])),
+                         SentimientoArrow(leer_tabla(self._ruta(ARCHIVO_SENTIMIENTO_ANIO), COLUMNAS[ARCHIVO_SENTIMIENTO_ANIO])))
+        else:
+            resultado = cargar_agregados(self.directorio)
+        logger.info("Se cargó 'agregados' desde '%s' en %.3f s", self.directorio, time.perf_counter() - inicio)
+        return resultado
+
+    @property
+    def developer_anio(self):
+        return self.agregados[0]
+
+    @property
+    def sentimiento_anio(self):
+        return self.agregados[1]
+
+    @cached_property
+    def juegos(self):
+        return self._construir('juegos', lambda: IndiceVecinos.desde_parquet(self._ruta('item_topk.parquet')))
+
+    @cached_property
+    def titulos(self):
+        # Se buscan los mismos nombres que acepta el índice de vecinos
+        return self._construir('titulos', lambda: IndiceTitulos(self.juegos.nombres))
+
+    def _requerir_modelo(self):
+        '''
+        Devuelve el directorio de la matriz de usuarios (piv_norm_csr).
+
+        Raises:
+            DatosNoDisponibles: Si falta alguno de sus arreglos.
+        '''
+        for nombre in ARREGLOS_USUARIOS:
+            self._requerir(os.path.join('piv_norm_csr', f'{nombre}.npy'),
+                           f'genere la matriz de usuarios con `python recomendacion.py usuarios --salida {self._ruta("piv_norm_csr")}`')
+        return self._ruta('piv_norm_csr')
+
+    @cached_property
+    def usuarios(self):
+        ruta = self._requerir_modelo()
+        return self._construir('usuarios', lambda: MotorUsuarios.desde_archivo(ruta))
+
+    @cached_property
+    def huella_modelo(self):
+        # Huella guardada junto a la matriz de usuarios al generarla: se lee una sola vez, sin recorrer los arreglos
+        return leer_huella_modelo(self._requerir_modelo())
+
+    @cached_property
+    def recomendaciones_usuarios(self):
+        # Recomendaciones generadas con `python recomendacion.py precalcular`. None si no hay, o si se calcularon con
+        # otra matriz de usuarios (por ejemplo, antes de una actualización): en ese caso se recomienda en vivo
+        ruta = self._ruta(ARCHIVO_RECOMENDACIONES_USUARIOS)
+        if not os.path.exists(ruta):
+            return None
+        precalculadas = self._construir('recomendaciones_usuarios', lambda: RecomendacionesPrecalculadas.desde_parquet(ruta))
+        if precalculadas.modelo != self.huella_modelo:
+            logger.warning("'%s' se calculó con otra matriz de usuarios: las recomendaciones se calculan en vivo", ruta)
+            return None
+        return precalculadas
+
+def reporte_arranque(modulo='api_functions'):
+    '''
+    Mide, en un proceso nuevo, el tiempo de importar la API y la memoria del proceso antes y después de usar cada consulta.
+
+    Args:
+        modulo (str): Módulo a importar (el que define las funciones de la API).
+
+    Returns:
+        str: Reporte con el tiempo de importación y la memoria en MB después de cada paso.
+    '''
+    codigo = f'''
+import time
+from datos import memoria_proceso
+inicio = time.perf_counter()
+import {modulo} as af
+print(f"importación: {{time.perf_counter() - inicio:.3f}} s, memoria: {{memoria_proceso()}}")
+consultas = [('userdata', ('EchoXSilence',)), ('countreviews', ('2011-11-05', '2012-12-24')), ('genre', ('Simulation',)),
+             ('userforgenre', ('Simulation',)), ('developer', ('Valve',)), ('sentiment_analysis', ('2009',)),
+             ('recomendacion_juego', ('Killing Floor',)), ('recomendacion_usuario', ('76561197970982479',))]
+for nombre, args in consultas:
+    inicio = time.perf_counter()
+    try:
+        getattr(af, nombre)(*args)
+        estado = 'ok'
+    except Exception as e:
+        estado = type(e).__name__
+    print(f"{{nombre}} ({{estado}}): {{time.perf_counter() - inicio:.3f}} s, memoria: {{memoria_proceso()}}")
+'''
+    return subprocess.run([sys.executable, '-c', codigo], capture_output=True, text=True, check=True).stdout
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Reporta el tiempo de importación y la memoria de un worker de la API.')
+    parser.add_argument('--modulo', default='api_functions', help='Módulo de la API a importar')
+    print(reporte_arranque(parser.parse_args().modulo))
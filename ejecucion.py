@@ -0,0 +1,110 @@
+## EJECUCIÓN DE LAS CONSULTAS FUERA DEL EVENT LOOP
+# Importaciones
+import asyncio
+import itertools
+import weakref
+from concurrent.futures import ThreadPoolExecutor
+
+# Clases
+class SobreCarga(Exception):
+    '''
+    Se lanza cuando hay más consultas en curso que las permitidas y la consulta nueva se rechaza.
+    '''
+
+class Ejecutor:
+    '''
+    Ejecuta las funciones de la API en un pool de hilos acotado, sin bloquear el event loop de FastAPI.
+
+    Las consultas idénticas (misma función y mismos argumentos) que llegan mientras otra igual se está calculando
+    no se vuelven a calcular: esperan el resultado de la primera (single-flight). Cuando la cantidad de consultas
+    distintas en curso (incluidas las consultas por lote) llega a `max_pendientes`, las nuevas se rechazan con
+    `SobreCarga`.
+
+    Args:
+        max_workers (int): Cantidad de hilos que calculan consultas al mismo tiempo.
+        max_pendientes (int): Cantidad máxima de consultas distintas en curso, calculándose o esperando un hilo.
+    '''
+    def __init__(self, max_workers, max_pendientes):
+        self.pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='consultas')
+        self.max_pendientes = max_pendientes
+        self.en_curso = {}
+        self.lotes = itertools.count()
+        self.coalescidas = 0
+        self.rechazadas = 0
+
+    async def ejecutar(self, funcion, *args, version=None):
+        '''
+        Calcula `funcion(*args)` en el pool de hilos, compartiendo el resultado con las consultas idénticas en curso.
+
+        Args:
+            version (str, optional): Versión de los datos. Las consultas de versiones distintas no se comparten.
+
+        Raises:
+            SobreCarga: Si ya hay `max_pendientes` consultas distintas en curso.
+        '''
+        clave = (version, funcion.__name__, args)
+        futuro = self.en_curso.get(clave)
+        if futuro is not None:
+            self.coalescidas += 1
+        else:
+            self._reservar()
+            futuro = asyncio.get_running_loop().run_in_executor(self.pool, funcion, *args)
+            self.en_curso[clave] = futuro
+            # Se libera la clave al terminar el cálculo, aunque los clientes que esperaban se hayan desconectado
+            futuro.add_done_callback(lambda _: self.en_curso.pop(clave, None))
+        # shield evita que la cancelación de un cliente cancele el cálculo que comparten los demás
+        return await asyncio.shield(futuro)
+
+    def _reservar(self):
+        '''
+        Verifica que haya lugar para una consulta más en curso.
+
+        Raises:
+            SobreCarga: Si ya hay `max_pendientes` consultas distintas en curso.
+        '''
+        if len(self.en_curso) >= self.max_pendientes:
+            self.rechazadas += 1
+            raise SobreCarga(f'Hay {len(self.en_curso)} consultas en curso')
+
+    def iterar(self, iterable, tamano=256):
+        '''
+        Recorre un iterable en el pool de hilos, de a `tamano` elementos por vez, sin bloquear el event loop.
+
+        Sirve para las consultas por lote: cada trozo se calcula en el mismo pool acotado que las demás consultas
+        y se entrega apenas está listo, sin esperar a que termine el lote completo. El lote se registra como una
+        consulta en curso al llamar a este método, antes de enviar la respuesta, así que cuenta para
+        `max_pendientes` y se puede rechazar con 503. Se libera al terminar de recorrerlo o al descartarlo.
+
+        Returns:
+            Iterador asíncrono de los trozos (listas de hasta `tamano` elementos del iterable).
+
+        Raises:
+            SobreCarga: Si ya hay `max_pendientes` consultas distintas en curso.
+        '''
+        self._reservar()
+        # Las claves de los lotes no coinciden con las de ejecutar, que son (version, función, argumentos)
+        clave = ('lote', next(self.lotes))
+        self.en_curso[clave] = None
+        trozos = self._recorrer(iterable, tamano, clave)
+        # Si el iterador se descarta sin recorrerlo (por ejemplo, porque el cliente se desconectó antes de empezar
+        # la respuesta) su bloque finally no se ejecuta: el lote se libera cuando se recolecta
+        weakref.finalize(trozos, self.en_curso.pop, clave, None)
+        return trozos
+
+    async def _recorrer(self, iterable, tamano, clave):
+        loop = asyncio.get_running_loop()
+        iterador = iter(iterable)
+        try:
+            while True:
+                trozo = await loop.run_in_executor(self.pool, lambda: list(itertools.islice(iterador, tamano)))
+                if not trozo:
+                    return
+                yield trozo
+        finally:
+            self.en_curso.pop(clave, None)
+
+    def estado(self):
+        '''
+        Devuelve la cantidad de consultas en curso, coalescidas y rechazadas desde el inicio.
+        '''
+        return {'en_curso': len(self.en_curso), 'coalescidas': self.coalescidas, 'rechazadas': self.rechazadas}
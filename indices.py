@@ -0,0 +1,587 @@
+## ÍNDICES DE BÚSQUEDA PARA LAS CONSULTAS DE LA API
+# Importaciones
+import bisect
+import sys
+import unicodedata
+
+import numpy as np
+import pandas as pd
+
+from tipos import PREFIJO_ID, PREFIJO_PERFIL
+
+# Funciones
+def _tamano_dict(diccionario):
+    '''
+    Estima la memoria ocupada por un diccionario, sus claves y sus valores, en bytes.
+    '''
+    total = sys.getsizeof(diccionario)
+    for clave, valor in diccionario.items():
+        total += sys.getsizeof(clave)
+        total += valor.nbytes if isinstance(valor, np.ndarray) else sys.getsizeof(valor)
+    return total
+
+def _primera_posicion(serie):
+    '''
+    Devuelve un diccionario que asocia cada valor de una serie con la posición de su primera aparición.
+    '''
+    posiciones = {}
+    for posicion, valor in enumerate(serie.tolist()):
+        posiciones.setdefault(valor, posicion)
+    return posiciones
+
+def normalizar_titulo(titulo):
+    '''
+    Normaliza un título para buscarlo: sin tildes, en minúsculas (casefold), sin apóstrofos y con los símbolos y
+    signos de puntuación reemplazados por espacios. Por ejemplo "Assassin’s Creed® III" -> "assassins creed iii".
+    '''
+    caracteres = []
+    for caracter in unicodedata.normalize('NFKD', titulo.replace('™', ' ').replace('®', ' ')):
+        if unicodedata.combining(caracter) or caracter in "'’":
+            continue
+        categoria = unicodedata.category(caracter)
+        caracteres.append(' ' if categoria[0] in 'PSZC' else caracter)
+    return ' '.join(''.join(caracteres).casefold().split())
+
+def _trigramas(texto):
+    '''
+    Devuelve los trigramas de un texto normalizado, con dos espacios al principio y uno al final para que también
+    los textos cortos y el comienzo del texto tengan trigramas.
+    '''
+    texto = f'  {texto} '
+    return {texto[i:i + 3] for i in range(len(texto) - 2)}
+
+def distancias_edicion(patron, texto):
+    '''
+    Calcula la distancia de Levenshtein entre `patron` y `texto` y entre `patron` y el prefijo de `texto` más
+    parecido, con el algoritmo de vectores de bits de Myers (una operación entre enteros por carácter de `texto`).
+
+    Returns:
+        tuple: (distancia al texto completo, menor distancia a un prefijo del texto).
+    '''
+    if not patron:
+        return len(texto), 0
+    coincidencias = {}
+    for i, caracter in enumerate(patron):
+        coincidencias[caracter] = coincidencias.get(caracter, 0) | (1 << i)
+    mascara = (1 << len(patron)) - 1
+    ultimo = 1 << (len(patron) - 1)
+    positivos, negativos = mascara, 0
+    distancia = minima = len(patron)
+    for caracter in texto:
+        igual = coincidencias.get(caracter, 0)
+        vertical = igual | negativos
+        horizontal = (((igual & positivos) + positivos) ^ positivos) | igual
+        suben = negativos | ~(horizontal | positivos)
+        bajan = positivos & horizontal
+        if suben & ultimo:
+            distancia += 1
+        elif bajan & ultimo:
+            distancia -= 1
+            minima = min(minima, distancia)
+        suben = (suben << 1) | 1
+        bajan = bajan << 1
+        positivos = (bajan | ~(vertical | suben)) & mascara
+        negativos = suben & vertical & mascara
+    return distancia, minima
+
+class IndiceGastos:
+    '''
+    Índice hash de df_gastos_items por 'user_id' para la consulta /userdata.
+
+    Args:
+        df_gastos_items (pandas.DataFrame): Gasto y cantidad de items por usuario.
+    '''
+    def __init__(self, df_gastos_items):
+        # user_id -> fila de df_gastos_items (la primera, como hacía .iloc[0])
+        self.posiciones = _primera_posicion(df_gastos_items['user_id'])
+        self.price = df_gastos_items['price'].to_numpy()
+        self.items_count = df_gastos_items['items_count'].to_numpy()
+
+    def nbytes(self):
+        '''
+        Devuelve una estimación de la memoria ocupada por el índice, en bytes.
+        '''
+        return _tamano_dict(self.posiciones) + self.price.nbytes + self.items_count.nbytes
+
+    def gastos(self, user_id):
+        '''
+        Devuelve el dinero gastado y la cantidad de items de un usuario.
+
+        Raises:
+            KeyError: Si el usuario no está en df_gastos_items.
+        '''
+        posicion = self.posiciones[user_id]
+        return self.price[posicion], self.items_count[posicion]
+
+class IndiceRecomendaciones:
+    '''
+    Cantidad de reviews recomendadas por cada usuario y total de usuarios con reviews, para la consulta /userdata.
+
+    Args:
+        df_reviews (pandas.DataFrame): Reviews con las columnas 'user_id' y 'reviews_recommend'.
+    '''
+    def __init__(self, df_reviews):
+        self.recomendaciones_usuario = df_reviews.groupby('user_id', observed=True)['reviews_recommend'].sum().to_dict()
+        self.total_usuarios_reviews = df_reviews['user_id'].nunique()
+
+    def nbytes(self):
+        '''
+        Devuelve una estimación de la memoria ocupada por el índice, en bytes.
+        '''
+        return _tamano_dict(self.recomendaciones_usuario)
+
+    def recomendaciones(self, user_id):
+        '''
+        Devuelve la cantidad de reviews recomendadas por un usuario (0 si no tiene reviews).
+        '''
+        return self.recomendaciones_usuario.get(user_id, 0)
+
+class IndiceGeneros:
+    '''
+    Índice hash del ranking de géneros para la consulta /genre.
+
+    Args:
+        df_genre_ranking (pandas.DataFrame): Ranking de géneros por horas jugadas.
+    '''
+    def __init__(self, df_genre_ranking):
+        posiciones = _primera_posicion(df_genre_ranking['genres'])
+        rankings = df_genre_ranking['ranking'].to_numpy()
+        self.ranking_genero = {genero: rankings[posicion] for genero, posicion in posiciones.items()}
+
+    def nbytes(self):
+        '''
+        Devuelve una estimación de la memoria ocupada por el índice, en bytes.
+        '''
+        return _tamano_dict(self.ranking_genero)
+
+    def ranking(self, genero):
+        '''
+        Devuelve la posición de un género en el ranking.
+
+        Raises:
+            KeyError: Si el género no está en el ranking.
+        '''
+        return self.ranking_genero[genero]
+
+class IndicePlaytime:
+    '''
+    Horas jugadas por usuario de df_playtime_forever, ordenadas por género con la porción de filas de cada género,
+    para la consulta /userforgenre.
+
+    Cada fila guarda solo un código de usuario (int32) y las horas. Los códigos siguen el orden de (user_url,
+    user_id), que es el orden en que agrupaba la consulta original, así que agrupar por código da los mismos grupos
+    en el mismo orden. El user_id y la URL de cada código se guardan una sola vez; la URL se deriva del user_id
+    cuando es /profiles/<user_id> o /id/<user_id>. Dentro de cada género se conserva el orden original de las filas.
+
+    Args:
+        df_playtime_forever (pandas.DataFrame): Horas jugadas por usuario y género, con 'user_url' o con la columna
+            compacta 'url_perfil' (ver tipos.py).
+    '''
+    def __init__(self, df_playtime_forever):
+        codigos_id, ids = pd.factorize(df_playtime_forever['user_id'])
+        ids = np.asarray(ids, dtype=object)
+        if 'url_perfil' in df_playtime_forever.columns:
+            segunda, n = df_playtime_forever['url_perfil'].to_numpy().astype(np.int64), 2
+        else:
+            segunda, urls_distintas = pd.factorize(df_playtime_forever['user_url'])
+            n = max(len(urls_distintas), 1)
+        # Las filas sin usuario o sin URL no formaban ningún grupo en la consulta original
+        validas = (codigos_id >= 0) & (segunda >= 0)
+        df_playtime_forever = df_playtime_forever[validas]
+
+        # Pares distintos (usuario, URL)
+        pares, codigos = np.unique(codigos_id[validas].astype(np.int64) * n + segunda[validas], return_inverse=True)
+        user_ids = ids[pares // n]
+        if 'url_perfil' in df_playtime_forever.columns:
+            perfiles = (pares % n).astype(bool)
+            urls = np.where(perfiles, PREFIJO_PERFIL, PREFIJO_ID).astype(object) + user_ids
+        else:
+            urls = np.asarray(urls_distintas, dtype=object)[pares % n]
+            perfiles = urls == PREFIJO_PERFIL + user_ids
+            # Si todas las URLs se derivan del usuario, se guarda solo si es /profiles/ o /id/
+            if not (perfiles | (urls == PREFIJO_ID + user_ids)).all():
+                perfiles = None
+
+        # Código de cada par: su posición en el orden de (user_url, user_id)
+        rango = np.empty(len(pares), dtype=np.int32)
+        rango[pd.DataFrame({'url': urls, 'id': user_ids}).sort_values(['url', 'id']).index.to_numpy()] = np.arange(len(pares))
+        self.user_ids = np.empty_like(user_ids)
+        self.user_ids[rango] = user_ids
+        if perfiles is not None:
+            self.perfiles, self.urls = np.empty(len(pares), dtype=bool), None
+            self.perfiles[rango] = perfiles
+        else:
+            self.perfiles, self.urls = None, np.empty_like(urls)
+            self.urls[rango] = urls
+
+        codigos_genero, generos = pd.factorize(df_playtime_forever['genres'])
+        # Las filas sin género (código -1) quedan al final, como con sort_values
+        orden = np.argsort(np.where(codigos_genero < 0, len(generos), codigos_genero), kind='stable')
+        self.playtime_ordenado = pd.DataFrame({'usuario': rango[codigos.ravel()[orden]],
+                                               'playtime_horas': df_playtime_forever['playtime_horas'].to_numpy()[orden]})
+        # Porción de filas de cada género
+        conteos = np.bincount(codigos_genero[codigos_genero >= 0], minlength=len(generos))
+        fines = np.cumsum(conteos)
+        self.playtime_genero = {genero: (int(fin - conteo), int(fin)) for genero, conteo, fin in zip(generos, conteos, fines)}
+
+    def nbytes(self):
+        '''
+        Devuelve una estimación de la memoria ocupada por el índice, las filas ordenadas y los usuarios, en bytes.
+        '''
+        usuarios = sum(sys.getsizeof(user_id) for user_id in self.user_ids) + self.user_ids.nbytes
+        urls = self.perfiles.nbytes if self.perfiles is not None else sum(sys.getsizeof(url) for url in self.urls) + self.urls.nbytes
+        return _tamano_dict(self.playtime_genero) + int(self.playtime_ordenado.memory_usage(deep=True).sum()) + usuarios + urls
+
+    def playtime(self, genero):
+        '''
+        Devuelve las filas de un género (vacío si el género no existe), con las columnas 'usuario' (código del
+        usuario) y 'playtime_horas'.
+        '''
+        inicio, fin = self.playtime_genero.get(genero, (0, 0))
+        return self.playtime_ordenado.iloc[inicio:fin]
+
+    def usuario(self, codigo):
+        '''
+        Devuelve el user_id y la URL de perfil del usuario con ese código.
+        '''
+        user_id = self.user_ids[codigo]
+        if self.perfiles is None:
+            return user_id, self.urls[codigo]
+        return user_id, (PREFIJO_PERFIL if self.perfiles[codigo] else PREFIJO_ID) + user_id
+
+    def posicion(self, genero, user_id):
+        '''
+        Devuelve la posición de un usuario entre los que más horas jugaron un género, con el mismo orden que
+        /userforgenre (a igual cantidad de horas, primero el de menor código). Recorre todas las filas del género, así
+        que se usa solo para los usuarios que no están en el top precalculado.
+
+        Returns:
+            tuple: (posición desde 1, horas), o None si el usuario no tiene horas en el género.
+        '''
+        horas = self.playtime(genero).groupby('usuario')['playtime_horas'].sum()
+        codigos = np.flatnonzero(self.user_ids == user_id)
+        codigos = codigos[np.isin(codigos, horas.index.to_numpy())]
+        if not len(codigos):
+            return None
+        # Si el usuario aparece con más de una URL, cuenta la mejor de sus posiciones
+        codigo = min(codigos, key=lambda codigo: (-horas[codigo], codigo))
+        valores, codigos_genero = horas.to_numpy(), horas.index.to_numpy()
+        antes = (valores > horas[codigo]) | ((valores == horas[codigo]) & (codigos_genero < codigo))
+        return int(antes.sum()) + 1, float(horas[codigo])
+
+class IndiceTopGeneros:
+    '''
+    Usuarios con más horas de juego de cada género, precalculados en orden (ver agregados.agregado_top_usuarios_genero),
+    para /userforgenre y el ranking paginado por género. Cada consulta es una porción de los arreglos.
+
+    Args:
+        df_top (pandas.DataFrame): Top de usuarios por género, ordenado por género y posición, con 'user_url' o con la
+            columna compacta 'url_perfil' (ver tipos.py).
+    '''
+    def __init__(self, df_top):
+        generos = df_top['genres'].to_numpy()
+        self.user_ids = df_top['user_id'].astype(object).to_numpy()
+        if 'url_perfil' in df_top.columns:
+            self.urls = np.where(df_top['url_perfil'].to_numpy(), PREFIJO_PERFIL, PREFIJO_ID).astype(object) + self.user_ids
+        else:
+            self.urls = df_top['user_url'].astype(object).to_numpy()
+        self.horas = df_top['playtime_horas'].to_numpy()
+        # Porción de filas de cada género
+        limites = np.flatnonzero(np.r_[True, generos[1:] != generos[:-1], True]) if len(generos) else np.array([0])
+        self.top_genero = {generos[inicio]: (int(inicio), int(fin)) for inicio, fin in zip(limites[:-1], limites[1:])}
+
+    def __contains__(self, genero):
+        return genero in self.top_genero
+
+    def cantidad(self, genero):
+        '''
+        Devuelve la cantidad de usuarios guardados de un género.
+        '''
+        inicio, fin = self.top_genero.get(genero, (0, 0))
+        return fin - inicio
+
+    def pagina(self, genero, desde=1, cantidad=5):
+        '''
+        Devuelve los usuarios de un género desde una posición.
+
+        Args:
+            genero (str): Género del videojuego.
+            desde (int): Primera posición, desde 1.
+            cantidad (int): Cantidad máxima de usuarios.
+
+        Returns:
+            list: Tuplas (posición, user_id, user_url, horas), de la mayor a la menor cantidad de horas.
+        '''
+        inicio, fin = self.top_genero.get(genero, (0, 0))
+        primera = inicio + max(desde, 1) - 1
+        filas = range(primera, min(primera + max(cantidad, 0), fin))
+        return [(fila - inicio + 1, self.user_ids[fila], self.urls[fila], float(self.horas[fila])) for fila in filas]
+
+    def posicion(self, genero, user_id):
+        '''
+        Devuelve la posición de un usuario en el top de un género.
+
+        Returns:
+            tuple: (posición desde 1, horas), o None si el usuario no está en el top guardado.
+        '''
+        inicio, fin = self.top_genero.get(genero, (0, 0))
+        filas = np.flatnonzero(self.user_ids[inicio:fin] == user_id)
+        if not len(filas):
+            return None
+        return int(filas[0]) + 1, float(self.horas[inicio + filas[0]])
+
+    def nbytes(self):
+        '''
+        Devuelve una estimación de la memoria ocupada por el índice, en bytes.
+        '''
+        textos = sum(sys.getsizeof(texto) for texto in self.user_ids) + sum(sys.getsizeof(texto) for texto in self.urls)
+        return textos + self.user_ids.nbytes + self.urls.nbytes + self.horas.nbytes + _tamano_dict(self.top_genero)
+
+class IndiceFechas:
+    '''
+    Índice de las reviews ordenadas por fecha para responder consultas por rango de fechas sin recorrer la tabla.
+
+    La cantidad de reviews y de recomendaciones positivas de un rango salen de sumas acumuladas y dos búsquedas
+    binarias. Para la cantidad de usuarios distintos se guarda, por cada par (usuario, día), el día de la review
+    anterior del mismo usuario: un usuario cuenta en el rango [a, b] una sola vez, en su primer día dentro del rango,
+    que es el único con día anterior menor que a. Ese conteo se resuelve con una tabla de conteos acumulados cada
+    `paso` días y búsquedas binarias para los días restantes, de modo que el costo de una consulta no depende de la
+    cantidad de reviews.
+
+    Args:
+        df_reviews (pandas.DataFrame): Reviews con las columnas 'reviews_date', 'reviews_recommend' y 'user_id'.
+        paso (int): Cada cuántos días se guarda una fila de la tabla de conteos acumulados.
+    '''
+    def __init__(self, df_reviews, paso=64):
+        fechas = df_reviews['reviews_date']
+        if not pd.api.types.is_datetime64_any_dtype(fechas):
+            fechas = pd.to_datetime(fechas, format='%Y-%m-%d', errors='coerce')
+        validas = fechas.notna().to_numpy()
+        fechas = fechas.to_numpy()[validas].astype('datetime64[D]')
+        recomienda = df_reviews['reviews_recommend'].to_numpy()[validas]
+        usuarios = pd.factorize(df_reviews['user_id'])[0][validas]
+
+        # Reviews ordenadas por fecha (si ya vienen ordenadas, no se reordenan)
+        if len(fechas) and not (fechas[1:] >= fechas[:-1]).all():
+            orden = np.argsort(fechas, kind='stable')
+            fechas, recomienda, usuarios = fechas[orden], recomienda[orden], usuarios[orden]
+        self.fechas = fechas
+        self.recomendaciones_acumuladas = np.concatenate(([0], np.cumsum(recomienda, dtype=np.int64)))
+
+        # Días distintos y, por cada par (usuario, día), el día anterior del mismo usuario (-1 si es el primero)
+        self.dias, dia = np.unique(fechas, return_inverse=True)
+        n_dias = len(self.dias)
+        pares = np.unique(usuarios.astype(np.int64) * max(n_dias, 1) + dia)
+        usuario_par, dia_par = np.divmod(pares, max(n_dias, 1))
+        dia_anterior = np.full(len(pares), -1, dtype=np.int64)
+        mismo_usuario = usuario_par[1:] == usuario_par[:-1]
+        dia_anterior[1:][mismo_usuario] = dia_par[:-1][mismo_usuario]
+
+        # Pares con día menor a cada día (los pares con día < a tienen también día anterior < a)
+        self.pares_antes_de = np.concatenate(([0], np.cumsum(np.bincount(dia_par, minlength=n_dias))))
+
+        # Tabla: fila j = cantidad de pares con día anterior < j*paso y día <= b, para cada b.
+        # Cada par cae en la franja 0 si no tiene día anterior o en la franja día_anterior // paso + 1
+        self.paso = paso
+        n_filas = n_dias // paso + 1
+        franja = np.where(dia_anterior < 0, 0, dia_anterior // paso + 1)
+        conteos = np.bincount(franja * n_dias + dia_par, minlength=(n_filas + 1) * n_dias).reshape(n_filas + 1, n_dias)
+        self.tabla = conteos.cumsum(axis=1).cumsum(axis=0)[:n_filas].astype(np.int32)
+
+        # Pares ordenados por (día anterior, día) para contar los días que quedan entre la fila de la tabla y a
+        self.claves = np.sort((dia_anterior + 1) * (n_dias + 1) + dia_par)
+
+    def nbytes(self):
+        '''
+        Devuelve la memoria ocupada por los arreglos del índice, en bytes.
+        '''
+        return (self.fechas.nbytes + self.recomendaciones_acumuladas.nbytes + self.dias.nbytes
+                + self.pares_antes_de.nbytes + self.tabla.nbytes + self.claves.nbytes)
+
+    def _usuarios_distintos(self, a, b):
+        '''
+        Cuenta los usuarios con al menos una review entre los días a y b (posiciones en `dias`, ambos incluidos).
+        '''
+        if b < a:
+            return 0
+        n_dias = len(self.dias)
+        fila = a // self.paso
+        # Pares con día anterior < fila*paso y día <= b
+        conteo = int(self.tabla[fila, b])
+        # Pares con día anterior entre fila*paso y a-1 y día <= b
+        anteriores = np.arange(fila * self.paso, a) + 1
+        if len(anteriores):
+            hasta = np.searchsorted(self.claves, anteriores * (n_dias + 1) + b, side='right')
+            desde = np.searchsorted(self.claves, anteriores * (n_dias + 1), side='left')
+            conteo += int((hasta - desde).sum())
+        # Se descuentan los pares con día < a
+        return conteo - int(self.pares_antes_de[a])
+
+    def rango(self, fecha_inicio, fecha_fin):
+        '''
+        Calcula las estadísticas de las reviews entre dos fechas (ambas incluidas).
+
+        Args:
+            fecha_inicio (str): Fecha de inicio en formato YYYY-MM-DD.
+            fecha_fin (str): Fecha de fin en formato YYYY-MM-DD.
+
+        Returns:
+            tuple: Cantidad de usuarios distintos, cantidad de reviews y cantidad de recomendaciones positivas en el rango
+            (estas dos últimas como enteros de NumPy).
+
+        Raises:
+            ValueError: Si alguna de las fechas no tiene el formato YYYY-MM-DD.
+        '''
+        inicio = np.datetime64(fecha_inicio, 'D')
+        fin = np.datetime64(fecha_fin, 'D')
+
+        izquierda = np.searchsorted(self.fechas, inicio, side='left')
+        derecha = np.searchsorted(self.fechas, fin, side='right')
+        total = np.int64(max(derecha - izquierda, 0))
+        positivas = self.recomendaciones_acumuladas[derecha] - self.recomendaciones_acumuladas[izquierda] if total else np.int64(0)
+
+        a = np.searchsorted(self.dias, inicio, side='left')
+        b = np.searchsorted(self.dias, fin, side='right') - 1
+        return self._usuarios_distintos(a, b), total, positivas
+
+class IndiceTitulos:
+    '''
+    Índice de los títulos de los juegos para buscarlos por prefijo o con errores de tipeo, para /search_games y para
+    resolver nombres aproximados en /recomendacion_juego.
+
+    Los títulos se comparan normalizados (ver `normalizar_titulo`). Las búsquedas por prefijo son búsquedas binarias
+    en dos listas ordenadas: la de los títulos y la de los sufijos que empiezan en cada palabra (así "floor" encuentra
+    "Killing Floor"). Para los errores de tipeo, un índice invertido de trigramas elige los títulos que comparten más
+    trigramas con el texto buscado y solo esos se ordenan por distancia de edición.
+
+    Args:
+        titulos (iterable): Títulos de los juegos, tal como se consultan en el índice de vecinos.
+        candidatos (int): Cantidad de títulos, los que comparten más trigramas, cuya distancia de edición se calcula.
+    '''
+    def __init__(self, titulos, candidatos=32):
+        self.titulos = np.asarray(list(titulos), dtype=object)
+        self.candidatos = candidatos
+        self.normalizados = [normalizar_titulo(titulo) for titulo in self.titulos]
+        self.longitudes = np.array([len(normalizado) for normalizado in self.normalizados], dtype=np.int32)
+        # Títulos normalizados ordenados, y sufijos que empiezan en cada palabra (desde la segunda), ordenados
+        self.orden_titulos = sorted(range(len(self.titulos)), key=lambda i: (self.normalizados[i], self.titulos[i]))
+        self.titulos_ordenados = [self.normalizados[i] for i in self.orden_titulos]
+        sufijos = sorted((normalizado[i + 1:], posicion) for posicion, normalizado in enumerate(self.normalizados)
+                         for i, caracter in enumerate(normalizado) if caracter == ' ')
+        self.sufijos = [sufijo for sufijo, _ in sufijos]
+        self.posiciones_sufijos = np.array([posicion for _, posicion in sufijos], dtype=np.int32)
+        # Trigrama -> posiciones de los títulos que lo contienen
+        posiciones = {}
+        for posicion, normalizado in enumerate(self.normalizados):
+            for trigrama in _trigramas(normalizado):
+                posiciones.setdefault(trigrama, []).append(posicion)
+        self.trigramas = {trigrama: np.array(lista, dtype=np.int32) for trigrama, lista in posiciones.items()}
+
+    @staticmethod
+    def _rango(ordenados, prefijo):
+        '''
+        Devuelve el rango de posiciones de una lista ordenada cuyos elementos empiezan con `prefijo`.
+        '''
+        return bisect.bisect_left(ordenados, prefijo), bisect.bisect_left(ordenados, prefijo + '\U0010ffff')
+
+    @staticmethod
+    def umbral(normalizado):
+        '''
+        Máxima distancia de edición que se tolera para un texto buscado: una por cada cuatro caracteres, entre una y tres.
+        '''
+        return min(3, max(1, len(normalizado) // 4))
+
+    def _aproximados(self, normalizado, prefijo, limite):
+        '''
+        Devuelve las posiciones de hasta `limite` títulos a distancia de edición tolerable del texto normalizado, de
+        la más cercana a la más lejana. Si `prefijo` es True se mide la distancia al comienzo de cada título (para
+        autocompletar), y si es False al título completo.
+        '''
+        trigramas = _trigramas(normalizado)
+        listas = [self.trigramas[trigrama] for trigrama in trigramas if trigrama in self.trigramas]
+        if not listas:
+            return []
+        compartidos = np.bincount(np.concatenate(listas), minlength=len(self.titulos))
+        # Cada error de tipeo cambia a lo sumo tres trigramas (y cortar el título en un prefijo, uno más), así que un
+        # título a distancia d comparte al menos len(trigramas) - 3 * d - 1 trigramas con el texto
+        umbral = self.umbral(normalizado)
+        validos = compartidos >= max(1, len(trigramas) - 3 * umbral - 1)
+        # Y su longitud difiere a lo sumo en d de la del texto (o, para un prefijo, es a lo sumo d menor)
+        diferencia = self.longitudes - len(normalizado)
+        validos &= (diferencia >= -umbral) if prefijo else (np.abs(diferencia) <= umbral)
+        candidatos = np.flatnonzero(validos)
+        # Se recorren, entre los que comparten más trigramas, de los que comparten más a los que comparten menos
+        if len(candidatos) > self.candidatos:
+            candidatos = candidatos[np.argpartition(-compartidos[candidatos], self.candidatos - 1)[:self.candidatos]]
+        candidatos = candidatos[np.argsort(-compartidos[candidatos], kind='stable')]
+        encontrados = []
+        for posicion, compartido in zip(candidatos.tolist(), compartidos[candidatos].tolist()):
+            # Si ningún título que queda puede estar más cerca que los `limite` ya encontrados, no se sigue
+            if len(encontrados) >= limite and -(-(len(trigramas) - compartido - 1) // 3) > sorted(encontrados)[limite - 1][0]:
+                break
+            titulo = self.normalizados[posicion]
+            # Para un prefijo alcanza con mirar los primeros caracteres: los prefijos más largos están más lejos
+            completa, al_prefijo = distancias_edicion(normalizado, titulo[:len(normalizado) + umbral] if prefijo else titulo)
+            distancia = al_prefijo if prefijo else completa
+            if distancia <= umbral:
+                encontrados.append((distancia, len(titulo), titulo, self.titulos[posicion], posicion))
+        return [encontrado[-1] for encontrado in sorted(encontrados)[:limite]]
+
+    def buscar(self, texto, n=10):
+        '''
+        Devuelve los títulos que mejor completan un texto: primero los que empiezan con él (en orden alfabético),
+        después los que tienen una palabra que empieza con él y por último los parecidos con errores de tipeo, de la
+        menor a la mayor distancia de edición.
+
+        Args:
+            texto (str): Texto buscado, por ejemplo lo que el usuario lleva escrito.
+            n (int): Cantidad máxima de títulos a devolver.
+
+        Returns:
+            list: Títulos de los juegos, sin repetidos.
+        '''
+        normalizado = normalizar_titulo(texto)
+        if not normalizado or n <= 0:
+            return []
+        elegidas = {}
+        inicio, fin = self._rango(self.titulos_ordenados, normalizado)
+        for posicion in self.orden_titulos[inicio:min(fin, inicio + n)]:
+            elegidas.setdefault(posicion, None)
+        if len(elegidas) < n:
+            inicio, fin = self._rango(self.sufijos, normalizado)
+            for posicion in self.posiciones_sufijos[inicio:fin].tolist():
+                elegidas.setdefault(posicion, None)
+                if len(elegidas) == n:
+                    break
+        if len(elegidas) < n:
+            for posicion in self._aproximados(normalizado, prefijo=True, limite=n):
+                elegidas.setdefault(posicion, None)
+                if len(elegidas) == n:
+                    break
+        return self.titulos[list(elegidas)].tolist()
+
+    def resolver(self, texto):
+        '''
+        Devuelve el título del catálogo al que se refiere un texto: el mismo título normalizado o, si no hay, el más
+        parecido con a lo sumo `umbral` errores de tipeo.
+
+        Returns:
+            str: El título, o None si ninguno se parece lo suficiente.
+        '''
+        normalizado = normalizar_titulo(texto)
+        if not normalizado:
+            return None
+        inicio, fin = self._rango(self.titulos_ordenados, normalizado)
+        if inicio < fin and self.titulos_ordenados[inicio] == normalizado:
+            return self.titulos[self.orden_titulos[inicio]]
+        aproximados = self._aproximados(normalizado, prefijo=False, limite=1)
+        return self.titulos[aproximados[0]] if aproximados else None
+
+    def nbytes(self):
+        '''
+        Devuelve una estimación de la memoria ocupada por los títulos normalizados, los sufijos y los trigramas, en bytes.
+        '''
+        textos = sum(sys.getsizeof(texto) for texto in self.normalizados) + sum(sys.getsizeof(sufijo) for sufijo in self.sufijos)
+        listas = 8 * (len(self.normalizados) + len(self.orden_titulos) + len(self.titulos_ordenados) + len(self.sufijos))
+        arreglos = self.titulos.nbytes + self.longitudes.nbytes + self.posiciones_sufijos.nbytes
+        return textos + listas + arreglos + _tamano_dict(self.trigramas)
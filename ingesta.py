@@ -0,0 +1,295 @@
+## INGESTA EN STREAMING DE LOS ARCHIVOS JSON CRUDOS DE STEAM
+# Lee cada archivo por trozos, los procesa en paralelo y escribe directamente un dataset parquet particionado.
+# Uso: python ingesta.py reviews data/australian_user_reviews.json --salida data/crudo --comparar
+# Importaciones
+import argparse
+import ast
+import json
+import multiprocessing
+import os
+import resource
+import shutil
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+# Tamaño aproximado de cada trozo de archivo que procesa un worker, en bytes
+TAMANO_TROZO = 16 * 2**20
+
+# Esquema de salida de cada archivo. Es el mismo para todos los trozos, aunque un trozo no tenga algún campo
+ESQUEMAS = {
+    # output_steam_games.json: un juego por línea. 'price' mezcla números y textos ('Free To Play'), así que se
+    # guarda como texto y se convierte después con utils.reemplaza_a_flotante
+    'games': pa.schema([
+        ('publisher', pa.string()), ('genres', pa.list_(pa.string())), ('app_name', pa.string()),
+        ('title', pa.string()), ('url', pa.string()), ('release_date', pa.string()), ('tags', pa.list_(pa.string())),
+        ('reviews_url', pa.string()), ('specs', pa.list_(pa.string())), ('price', pa.string()),
+        ('early_access', pa.bool_()), ('id', pa.string()), ('developer', pa.string()),
+    ]),
+    # australian_users_items.json: una fila por item de cada usuario, como pd.json_normalize(record_path=['items'])
+    'items': pa.schema([
+        ('item_id', pa.string()), ('item_name', pa.string()), ('playtime_forever', pa.int64()),
+        ('playtime_2weeks', pa.int64()), ('steam_id', pa.string()), ('items_count', pa.int64()),
+        ('user_id', pa.string()), ('user_url', pa.string()),
+    ]),
+    # australian_user_reviews.json: una fila por review de cada usuario, con las claves de la review con prefijo 'reviews_'
+    'reviews': pa.schema([
+        ('user_id', pa.string()), ('user_url', pa.string()), ('reviews_funny', pa.string()),
+        ('reviews_posted', pa.string()), ('reviews_last_edited', pa.string()), ('reviews_item_id', pa.string()),
+        ('reviews_helpful', pa.string()), ('reviews_recommend', pa.bool_()), ('reviews_review', pa.string()),
+    ]),
+}
+
+# Funciones
+def parsear_linea(linea):
+    '''
+    Convierte una línea del archivo en un diccionario.
+
+    output_steam_games.json es JSON válido, pero los archivos de usuarios están escritos como diccionarios de Python
+    (comillas simples, True/False). Se intenta primero json.loads, que es mucho más rápido, y si falla se usa
+    ast.literal_eval como en los notebooks.
+
+    Returns:
+        dict or None: El registro, o None si la línea está vacía.
+    '''
+    linea = linea.strip()
+    if not linea:
+        return None
+    try:
+        return json.loads(linea)
+    except ValueError:
+        return ast.literal_eval(linea.decode('utf-8') if isinstance(linea, bytes) else linea)
+
+def _texto(valor):
+    return None if valor is None else str(valor)
+
+def _lista_textos(valor):
+    return None if valor is None else [str(v) for v in valor]
+
+def aplanar(dataset, registros, usuarios_vistos=None):
+    '''
+    Convierte los registros de un trozo en columnas, aplanando las listas anidadas de 'items' y 'reviews'.
+
+    Args:
+        dataset (str): 'games', 'items' o 'reviews'.
+        registros (list): Diccionarios leídos del archivo.
+        usuarios_vistos (set, optional): Solo para 'reviews'. Usuarios ya procesados: sus registros repetidos se
+            descartan (como drop_duplicates(subset='user_id', keep='first') del notebook) y se agregan los nuevos.
+
+    Returns:
+        dict: Nombre de columna -> lista de valores, con las columnas de ESQUEMAS[dataset].
+    '''
+    columnas = {nombre: [] for nombre in ESQUEMAS[dataset].names}
+    if dataset == 'games':
+        for registro in registros:
+            # Como df_games.dropna(how='all'), se descartan los registros sin ningún dato
+            if all(valor is None for valor in registro.values()):
+                continue
+            for nombre in columnas:
+                valor = registro.get(nombre)
+                if nombre in ('genres', 'tags', 'specs'):
+                    valor = _lista_textos(valor)
+                elif nombre != 'early_access':
+                    valor = _texto(valor)
+                columnas[nombre].append(valor)
+
+    elif dataset == 'items':
+        for registro in registros:
+            usuario = (_texto(registro.get('steam_id')), registro.get('items_count'),
+                       _texto(registro.get('user_id')), registro.get('user_url'))
+            for item in registro.get('items') or []:
+                columnas['item_id'].append(_texto(item.get('item_id')))
+                columnas['item_name'].append(item.get('item_name'))
+                columnas['playtime_forever'].append(item.get('playtime_forever'))
+                columnas['playtime_2weeks'].append(item.get('playtime_2weeks'))
+                for nombre, valor in zip(('steam_id', 'items_count', 'user_id', 'user_url'), usuario):
+                    columnas[nombre].append(valor)
+
+    elif dataset == 'reviews':
+        usuarios_vistos = set() if usuarios_vistos is None else usuarios_vistos
+        for registro in registros:
+            user_id = _texto(registro.get('user_id'))
+            if user_id in usuarios_vistos:
+                continue
+            usuarios_vistos.add(user_id)
+            for review in registro.get('reviews') or []:
+                columnas['user_id'].append(user_id)
+                columnas['user_url'].append(registro.get('user_url'))
+                for nombre in ('funny', 'posted', 'last_edited', 'item_id', 'helpful', 'review'):
+                    columnas[f'reviews_{nombre}'].append(_texto(review.get(nombre)))
+                columnas['reviews_recommend'].append(review.get('recommend'))
+    else:
+        raise ValueError(f'Dataset desconocido: {dataset}')
+    return columnas
+
+def rangos_trozos(ruta, tamano=TAMANO_TROZO):
+    '''
+    Divide un archivo en rangos de bytes de aproximadamente `tamano`, cada uno terminado en un fin de línea.
+
+    Solo lee una línea por rango para encontrar el corte, así que no carga el archivo en memoria.
+
+    Yields:
+        tuple: (inicio, fin) en bytes de cada trozo.
+    '''
+    total = os.path.getsize(ruta)
+    with open(ruta, 'rb') as f:
+        inicio = 0
+        while inicio < total:
+            f.seek(min(inicio + tamano, total))
+            f.readline()
+            fin = min(f.tell(), total)
+            yield inicio, fin
+            inicio = fin
+
+def procesar_trozo(dataset, ruta, inicio, fin):
+    '''
+    Lee, parsea y aplana un trozo del archivo. Se ejecuta en los procesos del pool.
+
+    Returns:
+        tuple: (pyarrow.Table con las columnas del trozo, cantidad de registros leídos, usuarios del trozo). Los
+        usuarios solo se devuelven para 'reviews' (incluidos los que no tienen reviews) y son None en los demás casos.
+    '''
+    with open(ruta, 'rb') as f:
+        f.seek(inicio)
+        lineas = f.read(fin - inicio).splitlines()
+    registros = [registro for registro in map(parsear_linea, lineas) if registro is not None]
+    usuarios = set() if dataset == 'reviews' else None
+    tabla = pa.Table.from_pydict(aplanar(dataset, registros, usuarios), schema=ESQUEMAS[dataset])
+    return tabla, len(registros), usuarios
+
+def pico_memoria():
+    '''
+    Devuelve el pico de memoria residente, en MB, del proceso actual y el del mayor de sus procesos hijos terminados.
+    '''
+    propio = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    hijos = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss / 1024
+    return round(propio, 1), round(hijos, 1)
+
+def ingerir(dataset, ruta, salida, workers=None, tamano=TAMANO_TROZO):
+    '''
+    Ingiere un archivo crudo y lo escribe como un dataset parquet con una parte por trozo.
+
+    Los trozos se procesan en un pool de procesos y se escriben en el orden del archivo. Como mucho hay dos trozos
+    por worker en curso, por lo que la memoria máxima depende de `tamano` y de `workers`, y no del tamaño del archivo.
+
+    Args:
+        dataset (str): 'games', 'items' o 'reviews'.
+        ruta (str): Archivo crudo, con un registro por línea.
+        salida (str): Directorio del dataset parquet (se reemplaza si ya existe). Se lee con pq.read_table(salida).
+        workers (int, optional): Procesos del pool. Por defecto, la cantidad de CPUs.
+        tamano (int): Tamaño aproximado de cada trozo en bytes.
+
+    Returns:
+        dict: Registros leídos, filas escritas, partes, segundos, filas por segundo y pico de memoria en MB.
+    '''
+    inicio = time.perf_counter()
+    if os.path.isdir(salida):
+        shutil.rmtree(salida)
+    os.makedirs(salida)
+
+    workers = workers or os.cpu_count()
+    en_vuelo = 2 * workers
+    usuarios_vistos = set()
+    registros = filas = partes = 0
+
+    def escribir(futuro):
+        nonlocal registros, filas, partes
+        tabla, leidos, usuarios = futuro.result()
+        registros += leidos
+        if dataset == 'reviews':
+            # Cada worker descarta los usuarios repetidos de su trozo; acá se descartan los que ya aparecieron en
+            # trozos anteriores, aunque allí no tuvieran reviews
+            if usuarios_vistos:
+                mascara = [usuario not in usuarios_vistos for usuario in tabla.column('user_id').to_pylist()]
+                tabla = tabla.filter(pa.array(mascara, pa.bool_()))
+            usuarios_vistos.update(usuarios)
+        if tabla.num_rows:
+            pq.write_table(tabla, os.path.join(salida, f'parte-{partes:05d}.parquet'))
+            partes += 1
+            filas += tabla.num_rows
+
+    # 'spawn' evita heredar la memoria del proceso principal en los workers
+    with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn')) as pool:
+        pendientes = []
+        for desde, hasta in rangos_trozos(ruta, tamano):
+            pendientes.append(pool.submit(procesar_trozo, dataset, ruta, desde, hasta))
+            if len(pendientes) >= en_vuelo:
+                escribir(pendientes.pop(0))
+        for futuro in pendientes:
+            escribir(futuro)
+
+    segundos = time.perf_counter() - inicio
+    propio, hijos = pico_memoria()
+    return {'registros': registros, 'filas': filas, 'partes': partes, 'segundos': round(segundos, 2),
+            'filas_por_segundo': round(filas / segundos, 1) if segundos else 0.0,
+            'pico_mb_principal': propio, 'pico_mb_worker': hijos}
+
+def ingerir_como_notebook(dataset, ruta):
+    '''
+    Lectura de los notebooks 01a/01b/01c: readlines, parseo línea por línea y armado del DataFrame aplanado en memoria.
+    Se usa como referencia para comparar resultados, velocidad y memoria.
+
+    Returns:
+        pandas.DataFrame: Las mismas filas y columnas que escribe `ingerir`.
+    '''
+    import pandas as pd
+
+    filas = []
+    with open(ruta) as f:
+        for line in f.readlines():
+            filas.append(json.loads(line) if dataset == 'games' else ast.literal_eval(line))
+
+    if dataset == 'games':
+        df = pd.DataFrame(filas).dropna(how='all').reset_index(drop=True)
+    elif dataset == 'items':
+        df = pd.json_normalize(filas, record_path=['items'], meta=['steam_id', 'items_count', 'user_id', 'user_url'])
+    else:
+        df = pd.DataFrame(filas).drop_duplicates(subset='user_id', keep='first').reset_index(drop=True)
+        df2 = pd.concat([df[['user_id', 'user_url']], pd.json_normalize(df['reviews'])], axis=1)
+        df2 = pd.melt(df2, id_vars=['user_id', 'user_url'], value_vars=[c for c in df2.columns if isinstance(c, int)],
+                      value_name='reviews').dropna()
+        df = pd.concat([df2[['user_id', 'user_url']].reset_index(drop=True),
+                        df2['reviews'].apply(pd.Series, dtype='object').add_prefix('reviews_').reset_index(drop=True)], axis=1)
+    return df
+
+def _medir_notebook(dataset, ruta, cola):
+    inicio = time.perf_counter()
+    df = ingerir_como_notebook(dataset, ruta)
+    segundos = time.perf_counter() - inicio
+    cola.put({'filas': len(df), 'segundos': round(segundos, 2),
+              'filas_por_segundo': round(len(df) / segundos, 1) if segundos else 0.0,
+              'pico_mb': pico_memoria()[0]})
+
+def comparar_con_notebook(dataset, ruta):
+    '''
+    Ejecuta la lectura de los notebooks en un proceso nuevo y devuelve su tiempo, filas por segundo y pico de memoria.
+    '''
+    contexto = multiprocessing.get_context('spawn')
+    cola = contexto.Queue()
+    proceso = contexto.Process(target=_medir_notebook, args=(dataset, ruta, cola))
+    proceso.start()
+    resultado = cola.get()
+    proceso.join()
+    return resultado
+
+def main():
+    parser = argparse.ArgumentParser(description='Ingesta en streaming de los archivos JSON crudos de Steam a parquet.')
+    parser.add_argument('dataset', choices=sorted(ESQUEMAS), help='Tipo de archivo')
+    parser.add_argument('ruta', help='Archivo JSON crudo, un registro por línea')
+    parser.add_argument('--salida', default=None, help='Directorio del dataset parquet (por defecto data/crudo/<dataset>)')
+    parser.add_argument('--workers', type=int, default=None, help='Procesos del pool (por defecto, la cantidad de CPUs)')
+    parser.add_argument('--tamano-mb', type=float, default=TAMANO_TROZO / 2**20, help='Tamaño de cada trozo en MB')
+    parser.add_argument('--comparar', action='store_true', help='Mide también la lectura de los notebooks')
+    args = parser.parse_args()
+
+    salida = args.salida or os.path.join('data', 'crudo', args.dataset)
+    resultado = ingerir(args.dataset, args.ruta, salida, workers=args.workers, tamano=int(args.tamano_mb * 2**20))
+    print(f"Ingesta en streaming: {json.dumps(resultado)}")
+    print(f"Dataset guardado en '{salida}'")
+    if args.comparar:
+        print(f"Lectura de los notebooks: {json.dumps(comparar_con_notebook(args.dataset, args.ruta))}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,280 @@
+## INSTANTÁNEAS DE LOS DATOS CON RECARGA SIN REINICIAR LA API
+# Cada versión de los datos es un directorio dentro de la raíz de versiones (por ejemplo versiones/2024-01-15/) y el
+# archivo versiones/ACTUAL indica cuál se sirve. Cada worker de uvicorn revisa ese archivo y, cuando cambia, carga la
+# versión nueva en un hilo aparte, la valida y la activa para las consultas nuevas, sin reiniciar.
+# Uso: python instantaneas.py publicar 2024-01-15 --raiz versiones
+# Importaciones
+import argparse
+import gc
+import logging
+import os
+import threading
+import time
+from datetime import datetime, timezone
+
+from cache import version_datos
+from datos import ARCHIVOS_DATOS, Datos, memoria_proceso
+
+# Se usa el logger de uvicorn para que los mensajes aparezcan en la consola del servidor
+logger = logging.getLogger('uvicorn.error')
+
+# Archivo de la raíz de versiones con el nombre de la versión que se sirve
+ARCHIVO_ACTUAL = 'ACTUAL'
+
+# Funciones
+def leer_actual(raiz):
+    '''
+    Devuelve el nombre de la versión publicada en la raíz de versiones, o None si no hay ninguna.
+    '''
+    try:
+        with open(os.path.join(raiz, ARCHIVO_ACTUAL), encoding='utf-8') as f:
+            return f.read().strip() or None
+    except FileNotFoundError:
+        return None
+
+def directorio_version(raiz, version):
+    '''
+    Devuelve el directorio de una versión, verificando que sea un directorio de la raíz de versiones.
+
+    Raises:
+        ValueError: Si el nombre no es el de un directorio de la raíz (por ejemplo, si contiene separadores de ruta).
+    '''
+    if not version or version != os.path.basename(version) or version in ('.', '..'):
+        raise ValueError(f"'{version}' no es un nombre de versión válido")
+    directorio = os.path.join(raiz, version)
+    if not os.path.isdir(directorio):
+        raise ValueError(f"No existe la versión '{version}' en '{raiz}'")
+    return directorio
+
+def publicar(raiz, version):
+    '''
+    Publica una versión como la que se sirve, reescribiendo el archivo ACTUAL de forma atómica. Los workers la
+    cargan la próxima vez que revisan la raíz.
+
+    Args:
+        raiz (str): Raíz de versiones.
+        version (str): Nombre del directorio de la versión.
+    '''
+    directorio_version(raiz, version)
+    temporal = os.path.join(raiz, f'.{ARCHIVO_ACTUAL}.{os.getpid()}')
+    with open(temporal, 'w', encoding='utf-8') as f:
+        f.write(version + '\n')
+    os.replace(temporal, os.path.join(raiz, ARCHIVO_ACTUAL))
+
+# Clases
+class Instantanea:
+    '''
+    Un directorio de datos con sus estructuras de consulta, la versión de sus archivos y el momento en que se activó.
+
+    Args:
+        nombre (str): Nombre de la versión (el del directorio).
+        directorio (str): Directorio de los datos.
+        segundos_carga (float): Segundos que tardó en cargarse y validarse.
+        motor (str): Motor de consultas de los datos (ver datos.MOTORES).
+    '''
+    def __init__(self, nombre, directorio, segundos_carga=0.0, motor='indices'):
+        self.nombre = nombre
+        self.directorio = directorio
+        self.datos = Datos(directorio, motor=motor)
+        self.version = version_datos(directorio, ARCHIVOS_DATOS)
+        self.segundos_carga = segundos_carga
+        self.activada = None
+
+    def estado(self):
+        return {
+            'nombre': self.nombre,
+            'directorio': self.directorio,
+            'version_datos': self.version,
+            'activada': self.activada,
+            'segundos_carga': round(self.segundos_carga, 3),
+            'motor': self.datos.motor,
+            'estructuras_cargadas': self.datos.cargadas(),
+        }
+
+class GestorInstantaneas:
+    '''
+    Mantiene la instantánea de datos activa y la reemplaza cuando se publica una versión nueva.
+
+    Las consultas toman la instantánea activa al empezar (`datos()`) y la usan hasta terminar, así que las que están
+    en curso durante un cambio terminan con los datos anteriores. La versión nueva se carga en un hilo aparte: se
+    validan sus archivos, se cargan las mismas estructuras que ya tenía cargadas la activa (para que las consultas
+    no paguen la carga después del cambio) y recién entonces se reemplaza la referencia. Los datos anteriores se
+    liberan apenas termina la última consulta que los usa, así que la memoria solo se duplica durante la carga.
+
+    Si se reescribe en su lugar alguno de los archivos que carga la API (datos.ARCHIVOS_DATOS) sin publicar otra
+    versión, la instantánea activa se recarga del mismo modo, así que las estructuras ya cargadas nunca quedan
+    desactualizadas respecto de la versión de los datos que usa el cache de respuestas.
+
+    Args:
+        directorio (str): Directorio de datos que se sirve si no hay ninguna versión publicada.
+        raiz (str, optional): Raíz de versiones. Si es None no se revisan versiones.
+        revisar_cada (float): Cada cuántos segundos se revisa el archivo ACTUAL de la raíz.
+        motor (str): Motor de consultas de todas las instantáneas (ver datos.MOTORES).
+        revisar_archivos_cada (float): Cada cuántos segundos se revisa si cambiaron los archivos de la instantánea activa.
+    '''
+    def __init__(self, directorio='data', raiz=None, revisar_cada=5, motor='indices', revisar_archivos_cada=5):
+        self.raiz = raiz
+        self.revisar_cada = revisar_cada
+        self.revisar_archivos_cada = revisar_archivos_cada
+        self.motor = motor
+        self._lock = threading.Lock()
+        self._revisada = time.monotonic()
+        self._archivos_revisados = time.monotonic()
+        self._huella_rechazada = None
+        self.cargando = None
+        self.ultimo_error = None
+        self.activaciones = 0
+        self._rechazada = None
+
+        # Al iniciar se usa la versión publicada, sin precargar nada para que importar la API siga siendo barato
+        nombre = leer_actual(self.raiz) if self.raiz else None
+        if nombre is not None:
+            try:
+                directorio = directorio_version(self.raiz, nombre)
+            except ValueError as e:
+                logger.warning('No se puede usar la versión publicada: %s', e)
+                nombre = None
+        self.activa = Instantanea(nombre or os.path.basename(os.path.normpath(directorio)), directorio, motor=motor)
+        self.activa.activada = datetime.now(timezone.utc).isoformat(timespec='seconds')
+
+    def datos(self):
+        '''
+        Devuelve los datos de la instantánea activa. Cada consulta lo llama una vez al empezar y usa esos datos hasta
+        terminar.
+        '''
+        self.revisar()
+        return self.activa.datos
+
+    def directorio(self):
+        '''
+        Devuelve el directorio de la instantánea activa. Como el cache de respuestas lo consulta en cada petición,
+        también revisa si se publicó otra versión, aunque la respuesta salga del cache.
+        '''
+        self.revisar()
+        return self.activa.directorio
+
+    def version(self):
+        '''
+        Devuelve la versión de los datos de la instantánea activa: su nombre y la huella de sus archivos (dos
+        versiones copiadas conservando las fechas tienen la misma huella). Cambia recién cuando los datos nuevos
+        terminaron de cargarse, así que sirve como versión del cache de respuestas.
+        '''
+        self.revisar()
+        return f'{self.activa.nombre}:{self.activa.version}'
+
+    def revisar(self):
+        '''
+        Si pasaron `revisar_cada` segundos, lee el archivo ACTUAL y, si publica otra versión, la carga en un hilo aparte.
+        Si pasaron `revisar_archivos_cada` segundos y cambiaron los archivos de la instantánea activa, la recarga.
+        '''
+        ahora = time.monotonic()
+        if self.raiz is not None and ahora - self._revisada >= self.revisar_cada:
+            self._revisada = ahora
+            nombre = leer_actual(self.raiz)
+            # Una versión que no pasó la validación no se vuelve a intentar hasta que se publique otra
+            if nombre is not None and nombre not in (self.activa.nombre, self._rechazada):
+                self._iniciar_carga(nombre)
+                return
+        if ahora - self._archivos_revisados >= self.revisar_archivos_cada:
+            self._archivos_revisados = ahora
+            activa = self.activa
+            huella = version_datos(activa.directorio, ARCHIVOS_DATOS)
+            # Unos archivos que no se pudieron cargar no se vuelven a intentar hasta que cambien otra vez
+            if huella not in (activa.version, self._huella_rechazada):
+                self._iniciar_carga(activa.nombre, activa.directorio, huella)
+
+    def _iniciar_carga(self, nombre, directorio=None, huella=None):
+        '''
+        Empieza a cargar una instantánea en un hilo aparte, salvo que ya se esté cargando otra.
+        '''
+        with self._lock:
+            if self.cargando is not None:
+                return
+            self.cargando = nombre
+        threading.Thread(target=self._cargar, args=(nombre, directorio, huella), name=f'instantanea-{nombre}',
+                         daemon=True).start()
+
+    def recargar(self, nombre):
+        '''
+        Publica una versión y empieza a cargarla enseguida en este worker. Los demás workers la cargan la próxima vez
+        que revisan la raíz.
+
+        Raises:
+            ValueError: Si no hay raíz de versiones o la versión no existe.
+        '''
+        if self.raiz is None:
+            raise ValueError('La API no tiene configurado un directorio de versiones')
+        publicar(self.raiz, nombre)
+        self._rechazada = None
+        self._revisada = float('-inf')
+        self.revisar()
+
+    def _cargar(self, nombre, directorio=None, huella=None):
+        '''
+        Carga, valida y activa una versión. Se ejecuta en un hilo aparte; si algo falla, sigue activa la anterior.
+
+        Con `directorio` y `huella` se recarga la instantánea activa porque cambiaron sus archivos: en ese caso no se
+        exige que estén todos los archivos de la API (el directorio por defecto no los tiene), solo que se puedan
+        cargar las estructuras que ya estaban cargadas.
+        '''
+        inicio = time.perf_counter()
+        try:
+            nueva = Instantanea(nombre, directorio or directorio_version(self.raiz, nombre), motor=self.motor)
+            problemas = nueva.datos.validar() if huella is None else []
+            if problemas:
+                raise ValueError('; '.join(problemas))
+            for estructura in self.activa.datos.cargadas():
+                getattr(nueva.datos, estructura)
+            nueva.segundos_carga = time.perf_counter() - inicio
+            nueva.activada = datetime.now(timezone.utc).isoformat(timespec='seconds')
+            # Reemplazar la referencia es atómico: las consultas que empiecen desde ahora usan la versión nueva
+            anterior, self.activa = self.activa, nueva
+            self.activaciones += 1
+            self.ultimo_error = None
+            logger.info("Se activó la versión '%s' en %.3f s (antes '%s'), memoria: %s", nombre, nueva.segundos_carga,
+                        anterior.nombre, memoria_proceso())
+            del anterior
+            gc.collect()
+        except Exception as e:
+            if huella is None:
+                self._rechazada = nombre
+            else:
+                self._huella_rechazada = huella
+            self.ultimo_error = {'version': nombre, 'error': f'{type(e).__name__}: {e}',
+                                 'fecha': datetime.now(timezone.utc).isoformat(timespec='seconds')}
+            logger.error("No se activó la versión '%s': %s", nombre, e)
+        finally:
+            with self._lock:
+                self.cargando = None
+
+    def estado(self):
+        '''
+        Devuelve la instantánea activa, la versión que se está cargando y el último error de carga.
+        '''
+        return {
+            'activa': self.activa.estado(),
+            'publicada': leer_actual(self.raiz) if self.raiz else None,
+            'cargando': self.cargando,
+            'activaciones': self.activaciones,
+            'ultimo_error': self.ultimo_error,
+        }
+
+def main():
+    parser = argparse.ArgumentParser(description='Publica y valida versiones de los datos de la API.')
+    parser.add_argument('comando', choices=['publicar', 'validar'], help='publicar: la API pasa a servir la versión; validar: solo la verifica')
+    parser.add_argument('version', help='Nombre del directorio de la versión dentro de la raíz')
+    parser.add_argument('--raiz', default='versiones', help='Raíz de versiones')
+    args = parser.parse_args()
+
+    problemas = Datos(directorio_version(args.raiz, args.version)).validar()
+    if problemas:
+        print(f"La versión '{args.version}' no es válida: {problemas}")
+        raise SystemExit(1)
+    if args.comando == 'publicar':
+        publicar(args.raiz, args.version)
+        print(f"Se publicó la versión '{args.version}': los workers la cargan en los próximos segundos")
+    else:
+        print(f"La versión '{args.version}' es válida")
+
+if __name__ == '__main__':
+    main()
@@ -1,19 +1,152 @@
 # Importaciones
-from fastapi import FastAPI, Query
-from fastapi.responses import HTMLResponse
+import asyncio
+import hmac
+import logging
+from datetime import date
+from typing import List, Literal
+
+from fastapi import FastAPI, Header, HTTPException, Query, Request, Response
+from fastapi.responses import HTMLResponse, JSONResponse, PlainTextResponse, StreamingResponse
+from pydantic import BaseModel
 import api_functions as af
+import configuracion
+from cache import CacheRespuestas
+from datos import DatosNoDisponibles, memoria_proceso
+from ejecucion import Ejecutor, SobreCarga
+from metricas import MiddlewareMetricas, perfilador, registro
+from respuestas import comprimir_flujo, etag_representacion, negociar, responder, serializar_json
 
-import importlib
-importlib.reload(af)
+# Se usa el logger de uvicorn para que los mensajes aparezcan en la consola del servidor
+logger = logging.getLogger('uvicorn.error')
 
 # Se instancia la aplicación
 app = FastAPI()
 
+# Latencia de cada petición por ruta, publicada en /metrics
+app.add_middleware(MiddlewareMetricas, registro=registro)
+
+# Las consultas se calculan en un pool de hilos acotado, coalesciendo las consultas idénticas en curso
+ejecutor = Ejecutor(max_workers=configuracion.MAX_WORKERS, max_pendientes=configuracion.MAX_PENDIENTES)
+
+# Respuestas ya calculadas, válidas mientras no cambie la versión de la instantánea de datos activa (que cambia al
+# publicar otra versión o al recargar los archivos que carga la API)
+cache = CacheRespuestas(max_entradas=configuracion.CACHE_MAX_ENTRADAS, ttl=configuracion.CACHE_TTL, version=af.gestor.version)
+
+async def consultar(request, funcion, *args):
+    '''
+    Responde una consulta desde el cache o calculándola en el ejecutor, con los encabezados ETag y Cache-Control.
+
+    La respuesta se serializa en el formato que pide el encabezado Accept (JSON o Arrow IPC) y se comprime según
+    Accept-Encoding (ver respuestas.py). Si el cliente envía el ETag vigente en If-None-Match se responde 304 sin
+    calcular la consulta.
+
+    Args:
+        request (Request): Petición HTTP.
+        funcion (callable): Función de api_functions que calcula la consulta.
+        *args: Argumentos de la consulta, en el orden de la función.
+    '''
+    clave = (funcion.__name__, args)
+    version = cache.version()
+    formato, codificacion = negociar(request)
+    etag = cache.etag(clave)
+    encabezados = {'Cache-Control': f'public, max-age={configuracion.CACHE_MAX_EDAD}'}
+    # Las respuestas chicas se envían sin comprimir aunque el cliente acepte compresión, así que su ETag puede ser el
+    # de la representación comprimida o el de la sin comprimir
+    vigentes = [etag_representacion(etag, formato, None)]
+    if codificacion:
+        vigentes.append(etag_representacion(etag, formato, codificacion))
+    si_no_coincide = request.headers.get('if-none-match')
+    if si_no_coincide in vigentes or si_no_coincide == '*':
+        etag_vigente = si_no_coincide if si_no_coincide in vigentes else vigentes[0]
+        return Response(status_code=304, headers={**encabezados, 'ETag': etag_vigente, 'Vary': 'Accept, Accept-Encoding'})
+
+    resultado = cache.obtener(clave)
+    if resultado is None:
+        # Si está activo el perfilador, una muestra de las consultas se calcula con cProfile
+        resultado = await ejecutor.ejecutar(perfilador.envolver(funcion), *args, version=version)
+        cache.guardar(clave, resultado, version=version)
+    return responder(resultado, funcion.__name__, formato, codificacion, encabezados, etag=etag)
+
+class Lote(BaseModel):
+    '''
+    Cuerpo de las consultas por lote: la lista de identificadores de usuarios o de nombres de juegos.
+    '''
+    ids: List[str]
+
+async def consultar_lote(request, funcion, ids, formato):
+    '''
+    Responde una consulta por lote calculándola de a trozos en el ejecutor.
+
+    Con formato 'ndjson' cada resultado se envía como una línea JSON {"id", "resultado"} apenas se calcula su trozo,
+    sin armar la respuesta completa en memoria; si un trozo falla después de empezar la respuesta, se envía una
+    última línea {"error"} en lugar de cortarla sin aviso. Con formato 'json' se devuelve la lista de esos objetos, o una tabla
+    Arrow IPC con las columnas 'id' y 'resultado' si el encabezado Accept la pide. En los dos casos la respuesta se
+    comprime según Accept-Encoding, y los resultados se serializan en el pool de hilos, fuera del event loop.
+
+    Args:
+        request (Request): Petición HTTP.
+        funcion (callable): Función por lote de api_functions, que devuelve pares (id, resultado).
+        ids (list): Identificadores a consultar.
+        formato (str): 'json' o 'ndjson'.
+    '''
+    if len(ids) > configuracion.MAX_LOTE:
+        raise HTTPException(status_code=413, detail=f'El lote admite como máximo {configuracion.MAX_LOTE} elementos.')
+    formato_cuerpo, codificacion = negociar(request)
+
+    # El lugar del lote en el ejecutor se reserva antes de empezar la respuesta, para poder responder 503
+    if formato == 'ndjson':
+        # Cada resultado se serializa en el pool, junto con el cálculo de su trozo
+        trozos = ejecutor.iterar(serializar_json({'id': id_, 'resultado': resultado}) + b'\n' for id_, resultado in funcion(ids))
+        # El primer trozo se calcula antes de enviar el estado y los encabezados, así que los errores al empezar el
+        # lote (por ejemplo, si faltan los datos) se responden con 503 o 500 como en las demás consultas
+        try:
+            primero = await trozos.__anext__()
+        except StopAsyncIteration:
+            primero = []
+
+        async def lineas():
+            yield b''.join(primero)
+            try:
+                async for trozo in trozos:
+                    yield b''.join(trozo)
+            except Exception as e:
+                # Con la respuesta ya empezada no se puede cambiar el estado: el error se informa en una última línea
+                logger.exception('Error en la consulta por lote %s', funcion.__name__)
+                error = str(e) if isinstance(e, DatosNoDisponibles) else 'Error interno al calcular el lote.'
+                yield serializar_json({'error': error}) + b'\n'
+        if codificacion is None:
+            return StreamingResponse(lineas(), media_type='application/x-ndjson', headers={'Vary': 'Accept-Encoding'})
+        return StreamingResponse(comprimir_flujo(lineas(), codificacion), media_type='application/x-ndjson',
+                                 headers={'Content-Encoding': codificacion, 'Vary': 'Accept-Encoding'})
+
+    resultados = []
+    async for trozo in ejecutor.iterar(funcion(ids)):
+        resultados.extend({'id': id_, 'resultado': resultado} for id_, resultado in trozo)
+    # Serializar y comprimir la lista completa (hasta MAX_LOTE resultados) se hace en el pool, sin bloquear el event loop
+    return await asyncio.get_running_loop().run_in_executor(ejecutor.pool, responder, resultados, funcion.__name__,
+                                                            formato_cuerpo, codificacion)
+
+@app.exception_handler(SobreCarga)
+async def sobrecarga(request: Request, exc: SobreCarga):
+    '''
+    Responde 503 cuando la API tiene más consultas en curso que las permitidas, en lugar de encolarlas sin límite.
+    '''
+    return JSONResponse(status_code=503,
+                        content={'detail': 'La API está sobrecargada, intente nuevamente en unos segundos.'},
+                        headers={'Retry-After': str(configuracion.REINTENTAR_EN)})
+
+@app.exception_handler(DatosNoDisponibles)
+async def datos_no_disponibles(request: Request, exc: DatosNoDisponibles):
+    '''
+    Responde 503 cuando la consulta necesita un archivo que no está en el directorio de datos, indicando cómo generarlo.
+    '''
+    return JSONResponse(status_code=503, content={'detail': str(exc)})
+
 # Funciones
 @app.get(path="/", 
          response_class=HTMLResponse,
          tags=["Home"])
-def home():
+async def home():
     '''
     Página de inicio que muestra una presentación.
 
@@ -31,11 +164,11 @@ def home():
                         </font>
                         """,
          tags=["Consultas Generales"])
-def userdata(user_id: str = Query(..., 
+async def userdata(request: Request, user_id: str = Query(..., 
                                 description="Identificador único del usuario", 
                                 example="EchoXSilence")):
         
-    return af.userdata(user_id)
+    return await consultar(request, af.userdata, user_id)
     
     
 @app.get(path = '/countreviews',
@@ -47,13 +180,14 @@ def userdata(user_id: str = Query(...,
                         </font>
                         """,
          tags=["Consultas Generales"])
-def countreviews(fecha_inicio: str = Query(..., 
+async def countreviews(request: Request, fecha_inicio: date = Query(..., 
                                 description="Fechas de inicio para filtar la información", 
                                 example='2011-11-05'), 
-                 fecha_fin: str = Query(..., 
+                 fecha_fin: date = Query(..., 
                                 description="Fechas de Fin para filtar la información", 
                                 example='2012-12-24')):
-    return af.countreviews(fecha_inicio, fecha_fin)
+    # Las fechas que no existen o no tienen el formato YYYY-MM-DD se responden con 422 al validar los parámetros
+    return await consultar(request, af.countreviews, fecha_inicio.isoformat(), fecha_fin.isoformat())
 
 
 @app.get(path = '/genre',
@@ -64,10 +198,10 @@ def countreviews(fecha_inicio: str = Query(...,
                         </font>
                         """,
          tags=["Consultas Generales"])
-def genre(genero: str = Query(..., 
+async def genre(request: Request, genero: str = Query(..., 
                             description="Género del videojuego", 
                             example='Simulation')):
-    return af.genre(genero)
+    return await consultar(request, af.genre, genero)
 
 
 @app.get(path = '/userforgenre',
@@ -78,10 +212,35 @@ def genre(genero: str = Query(...,
                         </font>
                         """,
          tags=["Consultas Generales"])
-def userforgenre(genero: str = Query(..., 
+async def userforgenre(request: Request, genero: str = Query(..., 
                             description="Género del videojuego", 
-                            example='Simulation')):
-    return af.userforgenre(genero)
+                            example='Simulation'),
+                       n: int = Query(5, ge=1, le=100, description="Cantidad de usuarios del top")):
+    return await consultar(request, af.userforgenre, genero, n)
+
+@app.get(path = '/ranking_genero',
+          description = """ <font color="blue">
+                        Ranking paginado de los usuarios con más horas de juego en un género, con sus horas.<br>
+                        Incluye los primeros 1000 usuarios de cada género; 'total' indica cuántos hay.
+                        </font>
+                        """,
+         tags=["Consultas Generales"])
+async def ranking_genero(request: Request, genero: str = Query(..., description="Género del videojuego",
+                                                                                    example='Simulation'),
+                         pagina: int = Query(1, ge=1, description="Número de página"),
+                         tamano: int = Query(10, ge=1, le=100, description="Usuarios por página")):
+    return await consultar(request, af.ranking_genero, genero, pagina, tamano)
+
+@app.get(path = '/posicion_genero',
+          description = """ <font color="blue">
+                        Posición de un usuario en el ranking de horas de juego de un género, y sus horas en el género.
+                        </font>
+                        """,
+         tags=["Consultas Generales"])
+async def posicion_genero(request: Request, genero: str = Query(..., description="Género del videojuego",
+                                                                                     example='Simulation'),
+                          user_id: str = Query(..., description="Identificador del usuario", example='76561197970982479')):
+    return await consultar(request, af.posicion_genero, genero, user_id)
 
 @app.get(path = '/developer',
           description = """ <font color="blue">
@@ -91,10 +250,10 @@ def userforgenre(genero: str = Query(...,
                         </font>
                         """,
          tags=["Consultas Generales"])
-def developer(desarrollador: str = Query(..., 
+async def developer(request: Request, desarrollador: str = Query(..., 
                             description="Desarrollador del videojuego", 
                             example='Valve')):
-    return af.developer(desarrollador)
+    return await consultar(request, af.developer, desarrollador)
 
 
 @app.get('/sentiment_analysis',
@@ -106,10 +265,10 @@ def developer(desarrollador: str = Query(...,
                     </font>
                     """,
          tags=["Consultas Generales"])
-def sentiment_analysis(anio: str = Query(..., 
+async def sentiment_analysis(request: Request, anio: str = Query(..., 
                                          description="Año para filtrar los sentimientos de las reseñas", 
                                          example="2009")):
-    return af.sentiment_analysis(anio)
+    return await consultar(request, af.sentiment_analysis, anio)
 
 
 @app.get('/recomendacion_juego',
@@ -121,10 +280,25 @@ def sentiment_analysis(anio: str = Query(...,
                     </font>
                     """,
          tags=["Recomendación"])
-def recomendacion_juego(game: str = Query(..., 
+async def recomendacion_juego(request: Request, game: str = Query(..., 
                                          description="Juego a partir del cuál se hace la recomendación de otros juego", 
                                          example="Killing Floor")):
-    return af.recomendacion_juego(game)
+    return await consultar(request, af.recomendacion_juego, game)
+
+
+@app.get('/search_games',
+         description=""" <font color="blue">
+                    Busca juegos por su título para autocompletar: primero los que empiezan con el texto, después los que
+                    tienen una palabra que empieza con él y por último los parecidos con errores de tipeo.<br>
+                    Los nombres devueltos son los que acepta /recomendacion_juego.
+                    </font>
+                    """,
+         tags=["Recomendación"])
+async def search_games(request: Request, q: str = Query(...,
+                                         description="Texto a buscar en los títulos (no distingue mayúsculas ni tildes)",
+                                         example="killing"),
+                       n: int = Query(10, ge=1, le=50, description="Cantidad máxima de juegos")):
+    return await consultar(request, af.buscar_juegos, q, n)
 
 
 @app.get('/recomendacion_usuario',
@@ -136,7 +310,109 @@ def recomendacion_juego(game: str = Query(...,
                     </font>
                     """,
          tags=["Recomendación"])
-def recomendacion_usuario(user: str = Query(..., 
+async def recomendacion_usuario(request: Request, user: str = Query(..., 
                                          description="Usuario a partir del cuál se hace la recomendación de los juego", 
                                          example="76561197970982479")):
-    return af.recomendacion_usuario(user) 
\ No newline at end of file
+    return await consultar(request, af.recomendacion_usuario, user) 
+
+@app.post('/userdata_lote',
+          description=""" <font color="blue">
+                    Consulta userdata para una lista de usuarios en una sola petición.<br>
+                    Con formato=ndjson la respuesta se envía en streaming, un resultado por línea.
+                    </font>
+                    """,
+          tags=["Consultas por lote"])
+async def userdata_lote(request: Request, lote: Lote, formato: Literal['json', 'ndjson'] = Query('json', description="Formato de la respuesta")):
+    return await consultar_lote(request, af.userdata_lote, lote.ids, formato)
+
+
+@app.post('/recomendacion_juego_lote',
+          description=""" <font color="blue">
+                    Consulta recomendacion_juego para una lista de juegos en una sola petición.<br>
+                    Con formato=ndjson la respuesta se envía en streaming, un resultado por línea.
+                    </font>
+                    """,
+          tags=["Consultas por lote"])
+async def recomendacion_juego_lote(request: Request, lote: Lote, formato: Literal['json', 'ndjson'] = Query('json', description="Formato de la respuesta")):
+    return await consultar_lote(request, af.recomendacion_juego_lote, lote.ids, formato)
+
+
+@app.post('/recomendacion_usuario_lote',
+          description=""" <font color="blue">
+                    Consulta recomendacion_usuario para una lista de usuarios en una sola petición.<br>
+                    Las similitudes se calculan por bloques de usuarios con un producto de matrices.<br>
+                    Con formato=ndjson la respuesta se envía en streaming, un resultado por línea.
+                    </font>
+                    """,
+          tags=["Consultas por lote"])
+async def recomendacion_usuario_lote(request: Request, lote: Lote, formato: Literal['json', 'ndjson'] = Query('json', description="Formato de la respuesta")):
+    return await consultar_lote(request, af.recomendacion_usuario_lote, lote.ids, formato)
+
+
+@app.get('/estado',
+         description=""" <font color="blue">
+                    Métricas del cache de respuestas y de las consultas en curso.
+                    </font>
+                    """,
+         tags=["Administración"])
+async def estado():
+    return {'cache': cache.estado(), 'ejecutor': ejecutor.estado(), 'instantanea': af.gestor.estado(),
+            'perfilador': perfilador.estado()}
+
+
+@app.get('/metrics',
+         response_class=PlainTextResponse,
+         description=""" <font color="blue">
+                    Métricas de este worker en formato de texto de Prometheus: histogramas de latencia por ruta y por fase
+                    de cada consulta, métricas del cache y de las consultas en curso.
+                    </font>
+                    """,
+         tags=["Administración"])
+async def metrics():
+    estado_cache, estado_ejecutor = cache.estado(), ejecutor.estado()
+    adicionales = [
+        ('api_cache_aciertos_total', 'counter', 'Consultas respondidas desde el cache.', estado_cache['aciertos']),
+        ('api_cache_fallos_total', 'counter', 'Consultas que no estaban en el cache.', estado_cache['fallos']),
+        ('api_cache_entradas', 'gauge', 'Respuestas guardadas en el cache.', estado_cache['entradas']),
+        ('api_cache_invalidaciones_total', 'counter', 'Veces que se vació el cache por un cambio de los datos.', estado_cache['invalidaciones']),
+        ('api_consultas_en_curso', 'gauge', 'Consultas distintas calculándose o esperando un hilo.', estado_ejecutor['en_curso']),
+        ('api_consultas_coalescidas_total', 'counter', 'Consultas que esperaron el resultado de otra idéntica.', estado_ejecutor['coalescidas']),
+        ('api_consultas_rechazadas_total', 'counter', 'Consultas rechazadas con 503 por sobrecarga.', estado_ejecutor['rechazadas']),
+        ('api_instantanea_activaciones_total', 'counter', 'Versiones de los datos activadas sin reiniciar.', af.gestor.activaciones),
+        ('api_perfiles_guardados_total', 'counter', 'Perfiles de consultas lentas guardados.', perfilador.guardados),
+        ('api_memoria_residente_mb', 'gauge', 'Memoria residente del worker en MB.', memoria_proceso().get('rss')),
+    ]
+    return PlainTextResponse(registro.texto(adicionales), media_type='text/plain; version=0.0.4')
+
+
+@app.get('/instantanea',
+         description=""" <font color="blue">
+                    Versión de los datos que se está sirviendo, cuándo se activó y cuánto tardó en cargarse.
+                    </font>
+                    """,
+         tags=["Administración"])
+async def instantanea():
+    return af.gestor.estado()
+
+
+@app.post('/instantanea',
+          status_code=202,
+          description=""" <font color="blue">
+                    Publica una versión de los datos (un directorio de la raíz de versiones). Se carga y valida en segundo plano
+                    y se activa para las consultas nuevas sin reiniciar la API; las consultas en curso terminan con la versión anterior.<br>
+                    El resultado se consulta en GET /instantanea.
+                    </font>
+                    """,
+          tags=["Administración"])
+async def publicar_instantanea(version: str = Query(..., description="Nombre de la versión a publicar"),
+                               x_token_admin: str = Header('', description="Token de administración (API_TOKEN_ADMIN)")):
+    # Sin token configurado la ruta queda deshabilitada: cambiar de versión afecta a todas las consultas
+    if not configuracion.TOKEN_ADMIN:
+        raise HTTPException(status_code=403, detail='La publicación de versiones por HTTP está deshabilitada: configure API_TOKEN_ADMIN.')
+    if not hmac.compare_digest(x_token_admin.encode(), configuracion.TOKEN_ADMIN.encode()):
+        raise HTTPException(status_code=403, detail='Token de administración inválido.')
+    try:
+        af.gestor.recargar(version)
+    except ValueError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    return af.gestor.estado()
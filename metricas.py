@@ -0,0 +1,272 @@
+## MÉTRICAS DE LATENCIA Y PERFILADO DE LAS CONSULTAS
+# Registra histogramas de latencia por ruta (con un middleware ASGI) y por fase de cada consulta (con `fase`), los
+# publica en el formato de texto de Prometheus y, si se activa, guarda el perfil de una muestra de las consultas lentas.
+# Importaciones
+import bisect
+import cProfile
+import functools
+import os
+import random
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+
+import configuracion
+
+# Límites superiores de los buckets de los histogramas, en segundos
+BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+# Límites de los buckets del histograma de bytes enviados por respuesta
+BUCKETS_BYTES = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304, 16777216)
+
+# Funciones
+def _escapar(valor):
+    '''
+    Escapa el valor de una etiqueta para el formato de texto de Prometheus.
+    '''
+    return str(valor).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+def _etiquetas(pares):
+    '''
+    Devuelve las etiquetas de una serie en el formato de Prometheus, por ejemplo {ruta="/genre",estado="200"}.
+    '''
+    return '{' + ','.join(f'{clave}="{_escapar(valor)}"' for clave, valor in pares) + '}' if pares else ''
+
+# Clases
+class Histograma:
+    '''
+    Histograma acumulado con buckets fijos, como los de Prometheus.
+
+    Args:
+        buckets (tuple): Límites superiores de los buckets, en orden creciente.
+    '''
+    def __init__(self, buckets=BUCKETS):
+        self.buckets = buckets
+        # Un conteo por bucket y uno más para los valores mayores al último límite (+Inf)
+        self.conteos = [0] * (len(buckets) + 1)
+        self.suma = 0.0
+        self.cantidad = 0
+
+    def observar(self, valor):
+        self.conteos[bisect.bisect_left(self.buckets, valor)] += 1
+        self.suma += valor
+        self.cantidad += 1
+
+    def lineas(self, nombre, pares):
+        '''
+        Devuelve las líneas _bucket, _sum y _count del histograma en el formato de texto de Prometheus.
+        '''
+        lineas = []
+        acumulado = 0
+        for limite, conteo in zip(self.buckets + ('+Inf',), self.conteos):
+            acumulado += conteo
+            lineas.append(f'{nombre}_bucket{_etiquetas(pares + (("le", limite),))} {acumulado}')
+        lineas.append(f'{nombre}_sum{_etiquetas(pares)} {self.suma}')
+        lineas.append(f'{nombre}_count{_etiquetas(pares)} {self.cantidad}')
+        return lineas
+
+class Registro:
+    '''
+    Histogramas de latencia de la API, por nombre de métrica y etiquetas. Es seguro usarlo desde varios hilos.
+
+    Args:
+        activo (bool): Si es False, `observar` y `fase` no registran nada.
+        buckets (tuple): Límites de los buckets de los histogramas, en segundos.
+    '''
+    AYUDAS = {
+        'api_consulta_segundos': 'Latencia de las peticiones HTTP por ruta, método y código de estado.',
+        'api_fase_segundos': 'Duración de cada fase de las funciones de la API.',
+        'api_respuesta_bytes': 'Bytes del cuerpo de las respuestas HTTP (ya comprimido) por ruta y compresión.',
+    }
+    # Buckets de las métricas que no son latencias
+    BUCKETS_METRICA = {'api_respuesta_bytes': BUCKETS_BYTES}
+
+    def __init__(self, activo=True, buckets=BUCKETS):
+        self.activo = activo
+        self.buckets = buckets
+        self.histogramas = {}
+        self._lock = threading.Lock()
+
+    def observar(self, nombre, segundos, **etiquetas):
+        '''
+        Agrega una observación, en segundos, al histograma de la métrica con esas etiquetas.
+        '''
+        if not self.activo:
+            return
+        clave = (nombre, tuple(etiquetas.items()))
+        with self._lock:
+            histograma = self.histogramas.get(clave)
+            if histograma is None:
+                histograma = self.histogramas[clave] = Histograma(self.BUCKETS_METRICA.get(nombre, self.buckets))
+            histograma.observar(segundos)
+
+    @contextmanager
+    def fase(self, funcion, fase):
+        '''
+        Mide la duración de un bloque de código como una fase de una función de la API.
+
+        Args:
+            funcion (str): Nombre de la función de la API.
+            fase (str): Nombre de la fase, por ejemplo 'filtrar', 'agrupar', 'ordenar' o 'serializar'.
+        '''
+        if not self.activo:
+            yield
+            return
+        inicio = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observar('api_fase_segundos', time.perf_counter() - inicio, funcion=funcion, fase=fase)
+
+    def texto(self, adicionales=()):
+        '''
+        Devuelve todas las métricas en el formato de texto de Prometheus.
+
+        Args:
+            adicionales (iterable): Métricas simples como tuplas (nombre, tipo, ayuda, valor), por ejemplo los
+                contadores del cache. Se omiten las que tienen valor None.
+
+        Returns:
+            str: El texto que se publica en /metrics.
+        '''
+        with self._lock:
+            series = sorted(((nombre, pares, histograma.lineas(nombre, pares))
+                             for (nombre, pares), histograma in self.histogramas.items()), key=lambda serie: serie[:2])
+        lineas = []
+        anterior = None
+        for nombre, _, lineas_serie in series:
+            if nombre != anterior:
+                lineas += [f'# HELP {nombre} {self.AYUDAS.get(nombre, nombre)}', f'# TYPE {nombre} histogram']
+                anterior = nombre
+            lineas += lineas_serie
+        for nombre, tipo, ayuda, valor in adicionales:
+            if valor is not None:
+                lineas += [f'# HELP {nombre} {ayuda}', f'# TYPE {nombre} {tipo}', f'{nombre} {valor}']
+        return '\n'.join(lineas) + '\n'
+
+class Perfilador:
+    '''
+    Perfila con cProfile una muestra de las consultas y guarda el perfil de las que tardan más que un umbral, para
+    ver en qué se va el tiempo de una consulta lenta (por ejemplo con `python -m pstats archivo.prof`).
+
+    Args:
+        muestreo (float): Fracción de las consultas que se perfilan, entre 0 (ninguna) y 1 (todas).
+        umbral (float): Segundos a partir de los que se guarda el perfil de una consulta perfilada.
+        directorio (str): Directorio donde se guardan los perfiles.
+        max_archivos (int): Cantidad máxima de perfiles que se guardan, para no llenar el disco.
+    '''
+    def __init__(self, muestreo=0.0, umbral=0.5, directorio='perfiles', max_archivos=100):
+        self.muestreo = muestreo
+        self.umbral = umbral
+        self.directorio = directorio
+        self.max_archivos = max_archivos
+        self.perfiladas = 0
+        self.guardados = 0
+
+    def envolver(self, funcion):
+        '''
+        Devuelve una versión de `funcion` (con el mismo nombre) que perfila una muestra de sus llamadas. Si el
+        muestreo es 0 devuelve la misma función, sin ningún costo agregado.
+        '''
+        if self.muestreo <= 0:
+            return funcion
+
+        @functools.wraps(funcion)
+        def perfilada(*args):
+            if random.random() >= self.muestreo:
+                return funcion(*args)
+            perfil = cProfile.Profile()
+            try:
+                perfil.enable()
+            except ValueError:
+                # Desde Python 3.12 solo puede haber un perfil activo a la vez en todo el proceso
+                return funcion(*args)
+            inicio = time.perf_counter()
+            try:
+                return funcion(*args)
+            finally:
+                perfil.disable()
+                self.perfiladas += 1
+                segundos = time.perf_counter() - inicio
+                if segundos >= self.umbral and self.guardados < self.max_archivos:
+                    self._guardar(perfil, funcion.__name__, segundos)
+        return perfilada
+
+    def _guardar(self, perfil, nombre, segundos):
+        os.makedirs(self.directorio, exist_ok=True)
+        fecha = datetime.now().strftime('%Y%m%d-%H%M%S-%f')
+        perfil.dump_stats(os.path.join(self.directorio, f'{fecha}_{nombre}_{segundos * 1000:.0f}ms_{os.getpid()}.prof'))
+        self.guardados += 1
+
+    def estado(self):
+        return {'muestreo': self.muestreo, 'umbral': self.umbral, 'perfiladas': self.perfiladas, 'guardados': self.guardados}
+
+class MiddlewareMetricas:
+    '''
+    Middleware ASGI que registra la latencia de cada petición HTTP en el histograma api_consulta_segundos, con la
+    ruta (la plantilla, no la URL con sus parámetros), el método y el código de estado.
+
+    La latencia se mide hasta que se envía el último trozo del cuerpo, así que incluye el streaming de las consultas
+    por lote. Los bytes enviados del cuerpo se registran en el histograma api_respuesta_bytes, por ruta y compresión.
+    Las peticiones que no corresponden a ninguna ruta se registran con la ruta 'sin_ruta'.
+
+    Args:
+        app: Aplicación ASGI siguiente.
+        registro (Registro): Registro donde se guardan las latencias.
+    '''
+    def __init__(self, app, registro):
+        self.app = app
+        self.registro = registro
+        self._rutas = {}
+
+    def _ruta(self, scope):
+        '''
+        Devuelve la plantilla de la ruta que atendió la petición, a partir del endpoint que eligió el router.
+        '''
+        endpoint = scope.get('endpoint')
+        if endpoint is None:
+            return 'sin_ruta'
+        if endpoint not in self._rutas:
+            self._rutas[endpoint] = next((ruta.path for ruta in scope['app'].routes
+                                          if getattr(ruta, 'endpoint', None) is endpoint), 'sin_ruta')
+        return self._rutas[endpoint]
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http' or not self.registro.activo:
+            await self.app(scope, receive, send)
+            return
+
+        inicio = time.perf_counter()
+        estado = {'codigo': 500, 'registrada': False, 'bytes': 0, 'compresion': 'identity'}
+
+        def registrar():
+            if not estado['registrada']:
+                estado['registrada'] = True
+                ruta = self._ruta(scope)
+                self.registro.observar('api_consulta_segundos', time.perf_counter() - inicio, ruta=ruta,
+                                       metodo=scope['method'], estado=str(estado['codigo']))
+                self.registro.observar('api_respuesta_bytes', estado['bytes'], ruta=ruta, compresion=estado['compresion'])
+
+        async def enviar(mensaje):
+            if mensaje['type'] == 'http.response.start':
+                estado['codigo'] = mensaje['status']
+                for clave, valor in mensaje.get('headers', ()):
+                    if clave.lower() == b'content-encoding':
+                        estado['compresion'] = valor.decode('latin-1')
+            elif mensaje['type'] == 'http.response.body':
+                estado['bytes'] += len(mensaje.get('body', b''))
+            await send(mensaje)
+            if mensaje['type'] == 'http.response.body' and not mensaje.get('more_body', False):
+                registrar()
+
+        try:
+            await self.app(scope, receive, enviar)
+        finally:
+            # Si la petición terminó con una excepción o el cliente se desconectó antes del final del cuerpo
+            registrar()
+
+# Registro de las métricas de este worker y perfilador de las consultas, configurados con variables de entorno
+registro = Registro(activo=configuracion.METRICAS)
+fase = registro.fase
+perfilador = Perfilador(muestreo=configuracion.PERFIL_MUESTREO, umbral=configuracion.PERFIL_UMBRAL,
+                        directorio=configuracion.PERFIL_DIRECTORIO)
@@ -0,0 +1,556 @@
+## PERFIL DE CALIDAD DE LOS DATOS EN STREAMING
+# Resume los tipos, los nulos, la cantidad de valores distintos y las claves duplicadas de un archivo parquet (o de un
+# dataset como los que escribe ingesta.py) o de un archivo JSON con un registro por línea, en una sola pasada por
+# trozos y con memoria acotada. Devuelve la misma tabla de resumen que utils.verificar_tipo_datos, con más columnas.
+# Uso: python perfilado.py data/crudo/reviews --claves user_id
+#      python perfilado.py data/australian_user_reviews.json --claves user_id --comparar
+# Importaciones
+import argparse
+import io
+import json
+import multiprocessing
+import os
+import time
+from collections import Counter
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.dataset as ds
+import pyarrow.json as pj
+
+from ingesta import TAMANO_TROZO, parsear_linea, pico_memoria, rangos_trozos
+
+# Filas de cada lote que se lee de un parquet
+FILAS_LOTE = 65536
+# Precisión de HyperLogLog: 2**14 registros de un byte (16 KB por columna), con un error típico de 1.04 / 2**7 = 0.8%
+PRECISION_HLL = 14
+# Hash de los valores nulos de una columna clave: como en pandas.DataFrame.duplicated, dos nulos son la misma clave
+HASH_NULO = np.uint64(0x9E3779B97F4A7C15)
+# Hashes de una columna clave que se acumulan antes de combinarlos con los ya contados
+MINIMO_PENDIENTES = 1 << 20
+
+# Funciones
+def _mezclar(valores):
+    '''
+    Mezcla los bits de enteros de 64 bits (la misma función que usa pandas para hashear enteros).
+    '''
+    return pd.util.hash_array(np.asarray(valores, dtype=np.uint64), categorize=False)
+
+def _hashes(arreglo):
+    '''
+    Calcula un hash de 64 bits de cada posición de un arreglo de Arrow, sin recorrer los valores en Python (el valor
+    que queda en las posiciones nulas no importa). Las listas y los structs se hashean a partir de sus elementos,
+    así que dos listas iguales tienen el mismo hash aunque estén en lotes distintos.
+
+    Returns:
+        numpy.ndarray: Un hash (uint64) por posición.
+    '''
+    tipo = arreglo.type
+    if pa.types.is_dictionary(tipo):
+        return _hashes(arreglo.dictionary)[arreglo.indices.fill_null(0).to_numpy(zero_copy_only=False)]
+    if pa.types.is_list(tipo) or pa.types.is_large_list(tipo):
+        # Cada elemento se mezcla con su posición en la lista y se suman los de cada lista con una suma acumulada
+        desplazamientos = arreglo.offsets.to_numpy().astype(np.int64)
+        largos = np.diff(desplazamientos)
+        inicio, fin = desplazamientos[0], desplazamientos[-1]
+        posiciones = np.arange(fin - inicio) - np.repeat(desplazamientos[:-1] - inicio, largos)
+        elementos = _mezclar(_hashes(arreglo.values.slice(inicio, fin - inicio)) ^ posiciones.astype(np.uint64))
+        acumulada = np.concatenate([np.zeros(1, np.uint64), np.cumsum(elementos, dtype=np.uint64)])
+        return _mezclar(acumulada[desplazamientos[1:] - inicio] - acumulada[desplazamientos[:-1] - inicio] ^ largos.astype(np.uint64))
+    if pa.types.is_struct(tipo):
+        hashes = np.full(len(arreglo), tipo.num_fields, dtype=np.uint64)
+        for i, campo in enumerate(arreglo.flatten()):
+            hashes = _mezclar(hashes ^ (_hashes(campo) + np.uint64(i)))
+        return hashes
+    if pa.types.is_null(tipo):
+        return np.zeros(len(arreglo), dtype=np.uint64)
+    # Los enteros, los booleanos y las fechas se hashean como int64 y los float como float64, con o sin nulos en el
+    # lote, para que el mismo valor tenga siempre el mismo hash
+    if pa.types.is_boolean(tipo) or pa.types.is_integer(tipo):
+        return pd.util.hash_array(pc.fill_null(arreglo.cast(pa.int64()), 0).to_numpy(), categorize=False)
+    if pa.types.is_temporal(tipo):
+        return pd.util.hash_array(pc.fill_null(arreglo.cast(pa.int64()), 0).to_numpy(), categorize=False)
+    if pa.types.is_floating(tipo):
+        return pd.util.hash_array(pc.fill_null(arreglo.cast(pa.float64()), 0.0).to_numpy(), categorize=False)
+    return pd.util.hash_array(arreglo.to_numpy(zero_copy_only=False))
+
+def _longitud_bits(valores):
+    '''
+    Devuelve la cantidad de bits significativos de cada entero de 64 bits sin signo (0 para el 0).
+    '''
+    # frexp es exacto hasta 2**53, así que se calcula por separado para cada mitad de 32 bits
+    alto = np.frexp((valores >> np.uint64(32)).astype(np.float64))[1]
+    bajo = np.frexp((valores & np.uint64(0xFFFFFFFF)).astype(np.float64))[1]
+    return np.where(alto > 0, alto + 32, bajo)
+
+def _sigma(x):
+    '''
+    Función sigma del estimador de Ertl: x + suma de x**(2**k) * 2**(k - 1) para k >= 1.
+    '''
+    if x == 1:
+        return np.inf
+    y, z = 1.0, x
+    while True:
+        x *= x
+        anterior = z
+        z += x * y
+        y += y
+        if z == anterior:
+            return z
+
+def _tau(x):
+    '''
+    Función tau del estimador de Ertl: (1 - x - suma de (1 - x**(2**-k))**2 * 2**-k para k >= 1) / 3.
+    '''
+    if x == 0 or x == 1:
+        return 0.0
+    y, z = 1.0, 1 - x
+    while True:
+        x = np.sqrt(x)
+        anterior = z
+        y *= 0.5
+        z -= (1 - x) ** 2 * y
+        if z == anterior:
+            return z / 3
+
+def nombre_tipo(tipo):
+    '''
+    Devuelve el nombre del tipo de Python que tienen en pandas los valores de un tipo de Arrow (por ejemplo 'str' para
+    string, 'list' para listas y 'dict' para structs), que es como los muestra utils.verificar_tipo_datos.
+    '''
+    if pa.types.is_dictionary(tipo):
+        return nombre_tipo(tipo.value_type)
+    if pa.types.is_string(tipo) or pa.types.is_large_string(tipo):
+        return 'str'
+    if pa.types.is_boolean(tipo):
+        return 'bool'
+    if pa.types.is_integer(tipo):
+        return 'int'
+    if pa.types.is_floating(tipo):
+        return 'float'
+    if pa.types.is_list(tipo) or pa.types.is_large_list(tipo) or pa.types.is_fixed_size_list(tipo):
+        return 'list'
+    if pa.types.is_struct(tipo) or pa.types.is_map(tipo):
+        return 'dict'
+    if pa.types.is_timestamp(tipo):
+        return 'Timestamp'
+    if pa.types.is_date(tipo):
+        return 'date'
+    if pa.types.is_binary(tipo) or pa.types.is_large_binary(tipo):
+        return 'bytes'
+    return str(tipo)
+
+def hashear(valores):
+    '''
+    Hashea los valores de una columna en un lote y cuenta sus tipos. Los NaN se cuentan como nulos, como en pandas.
+
+    En una columna de JSON que mezcla tipos, los valores de cada tipo se hashean por separado, para que tengan el
+    mismo hash que en los lotes donde la columna no está mezclada.
+
+    Args:
+        valores: Arreglo de Arrow o lista de valores de Python de tipos mezclados.
+
+    Returns:
+        tuple: (máscara de los valores no nulos, hash de cada valor, Counter con la cantidad de valores de cada tipo).
+    '''
+    if not isinstance(valores, list):
+        validos = valores.is_valid().to_numpy(zero_copy_only=False)
+        if pa.types.is_floating(valores.type):
+            validos = validos & ~pc.fill_null(pc.is_nan(valores), False).to_numpy(zero_copy_only=False)
+        cantidad = int(validos.sum())
+        return validos, _hashes(valores), Counter({nombre_tipo(valores.type): cantidad} if cantidad else {})
+
+    tipos = np.array([type(valor).__name__ for valor in valores], dtype=object)
+    validos = (tipos != 'NoneType') & np.array([valor == valor for valor in valores], dtype=bool)
+    hashes = np.zeros(len(valores), dtype=np.uint64)
+    cantidades = Counter()
+    for tipo in np.unique(tipos[validos]):
+        posiciones = np.flatnonzero((tipos == tipo) & validos)
+        cantidades[tipo] = len(posiciones)
+        grupo = [valores[i] for i in posiciones]
+        try:
+            hashes[posiciones] = _hashes(pa.array(grupo))
+        except (pa.ArrowInvalid, pa.ArrowTypeError):
+            hashes[posiciones] = pd.util.hash_array(np.array([repr(valor) for valor in grupo], dtype=object))
+    return validos, hashes, cantidades
+
+def formato_archivo(ruta):
+    '''
+    Deduce el formato de un archivo: 'parquet' para los .parquet y los directorios (datasets con varias partes) y
+    'json' para el resto.
+    '''
+    return 'parquet' if os.path.isdir(ruta) or ruta.endswith('.parquet') else 'json'
+
+def leer_lotes(ruta, formato=None, tamano=TAMANO_TROZO, filas_lote=FILAS_LOTE, columnas=None):
+    '''
+    Lee un archivo por lotes, sin cargarlo completo en memoria.
+
+    Los parquet (un archivo o un directorio con varias partes) se leen por lotes de `filas_lote` filas. Los JSON se
+    leen por trozos de `tamano` bytes terminados en un fin de línea: cada trozo se parsea con el lector de JSON de
+    Arrow y, si no se puede (porque una columna mezcla tipos o porque el archivo está escrito como diccionarios de
+    Python, como los de usuarios de Steam), línea por línea con ingesta.parsear_linea.
+
+    Args:
+        ruta (str): Archivo o directorio.
+        formato (str, optional): 'parquet' o 'json'. Por defecto se deduce de la ruta.
+        tamano (int): Tamaño aproximado de cada trozo de un JSON, en bytes.
+        filas_lote (int): Filas de cada lote de un parquet.
+        columnas (list, optional): Columnas a leer (por defecto, todas).
+
+    Yields:
+        tuple: (cantidad de filas, diccionario columna -> valores). Los valores son un arreglo de Arrow o, en una
+        columna de JSON que mezcla tipos, una lista de valores de Python.
+    '''
+    formato = formato or formato_archivo(ruta)
+    if formato == 'parquet':
+        for lote in ds.dataset(ruta, format='parquet').to_batches(columns=columnas, batch_size=filas_lote,
+                                                                 batch_readahead=1, fragment_readahead=1):
+            yield lote.num_rows, dict(zip(lote.schema.names, lote.columns))
+        return
+
+    with open(ruta, 'rb') as f:
+        for inicio, fin in rangos_trozos(ruta, tamano):
+            f.seek(inicio)
+            trozo = f.read(fin - inicio)
+            try:
+                tabla = pj.read_json(io.BytesIO(trozo))
+            except (pa.ArrowInvalid, pa.ArrowTypeError, pa.ArrowNotImplementedError):
+                yield _parsear_trozo(trozo, columnas)
+                continue
+            nombres = [nombre for nombre in tabla.column_names if columnas is None or nombre in columnas]
+            yield tabla.num_rows, {nombre: tabla.column(nombre).combine_chunks() for nombre in nombres}
+
+def _parsear_trozo(trozo, columnas=None):
+    '''
+    Parsea un trozo de JSON línea por línea y arma sus columnas. Las que mezclan tipos quedan como listas de Python.
+
+    Returns:
+        tuple: (cantidad de filas, diccionario columna -> arreglo de Arrow o lista).
+    '''
+    registros = [registro for registro in map(parsear_linea, trozo.splitlines()) if registro is not None]
+    nombres = dict.fromkeys(nombre for registro in registros for nombre in registro)
+    valores = {}
+    for nombre in nombres:
+        if columnas is not None and nombre not in columnas:
+            continue
+        columna = [registro.get(nombre) for registro in registros]
+        try:
+            valores[nombre] = pa.array(columna, from_pandas=True)
+        except (pa.ArrowInvalid, pa.ArrowTypeError):
+            valores[nombre] = columna
+    return len(registros), valores
+
+# Clases
+class HyperLogLog:
+    '''
+    Estimador de la cantidad de valores distintos de una columna con memoria fija: 2**precision registros de un byte,
+    con un error relativo típico de 1.04 / sqrt(2**precision). Dos estimadores de la misma precisión se pueden unir.
+
+    Args:
+        precision (int): Bits del hash que eligen el registro.
+    '''
+    def __init__(self, precision=PRECISION_HLL):
+        self.precision = precision
+        self.registros = np.zeros(2 ** precision, dtype=np.uint8)
+
+    def agregar(self, hashes):
+        '''
+        Agrega los hashes de 64 bits de un lote de valores.
+        '''
+        if not len(hashes):
+            return
+        restantes = 64 - self.precision
+        posiciones = (hashes >> np.uint64(restantes)).astype(np.intp)
+        # Posición del primer bit en 1 de los bits restantes (restantes + 1 si son todos 0)
+        rangos = (restantes + 1 - _longitud_bits(hashes & np.uint64((1 << restantes) - 1))).astype(np.uint8)
+        np.maximum.at(self.registros, posiciones, rangos)
+
+    def unir(self, otro):
+        np.maximum(self.registros, otro.registros, out=self.registros)
+
+    def estimar(self):
+        '''
+        Devuelve la cantidad estimada de valores distintos, con el estimador mejorado de Ertl (2017). A diferencia del
+        original, que pasa al conteo lineal de los registros vacíos cuando hay pocos valores, no tiene sesgo en ese
+        cambio de rango (alrededor de 2.5 * 2**precision valores).
+        '''
+        m = len(self.registros)
+        restantes = 64 - self.precision
+        conteos = np.bincount(self.registros, minlength=restantes + 2).astype(np.float64)
+        denominador = m * _sigma(conteos[0] / m) + m * _tau(1 - conteos[restantes + 1] / m) * 2.0 ** -restantes
+        denominador += (conteos[1:restantes + 1] * np.ldexp(1.0, -np.arange(1, restantes + 1))).sum()
+        return int(round(m * m / (2 * np.log(2)) / denominador))
+
+class ContadorClaves:
+    '''
+    Cuenta cuántas veces aparece cada valor de una columna clave, guardando el hash de 64 bits de cada valor distinto
+    y su cantidad (16 bytes por clave, sin importar el ancho de las filas). Los hashes de cada lote se acumulan y se
+    combinan con los ya contados cuando son tantos como ellos, así que cada hash se ordena pocas veces.
+    '''
+    def __init__(self):
+        self.hashes = np.empty(0, dtype=np.uint64)
+        self.conteos = np.empty(0, dtype=np.int64)
+        self.pendientes = []
+        self.cantidad_pendientes = 0
+
+    def agregar(self, hashes):
+        self.pendientes.append(hashes)
+        self.cantidad_pendientes += len(hashes)
+        if self.cantidad_pendientes >= max(len(self.hashes), MINIMO_PENDIENTES):
+            self._combinar()
+
+    def _combinar(self):
+        if not self.pendientes:
+            return
+        hashes, inversos = np.unique(np.concatenate([self.hashes, *self.pendientes]), return_inverse=True)
+        conteos = np.bincount(inversos[len(self.hashes):], minlength=len(hashes))
+        conteos[inversos[:len(self.hashes)]] += self.conteos
+        self.hashes, self.conteos = hashes, conteos
+        self.pendientes, self.cantidad_pendientes = [], 0
+
+    def repetidos(self):
+        '''
+        Devuelve los hashes de las claves que aparecen más de una vez.
+        '''
+        self._combinar()
+        return self.hashes[self.conteos > 1]
+
+    def duplicados(self):
+        '''
+        Devuelve la cantidad de filas cuya clave ya apareció antes, como pandas.DataFrame.duplicated(subset=columna).sum().
+        '''
+        self._combinar()
+        return int((self.conteos - 1).sum())
+
+class PerfilColumna:
+    '''
+    Acumula el perfil de una columna lote por lote: la cantidad de valores de cada tipo, los no nulos, los valores
+    distintos (con HyperLogLog) y, si es una columna clave, las repeticiones de cada valor.
+
+    Args:
+        clave (bool): Si se cuentan las claves duplicadas.
+        precision (int): Precisión de HyperLogLog.
+    '''
+    def __init__(self, clave=False, precision=PRECISION_HLL):
+        self.tipos = Counter()
+        self.no_nulos = 0
+        self.distintos = HyperLogLog(precision)
+        self.claves = ContadorClaves() if clave else None
+
+    def agregar(self, valores):
+        '''
+        Agrega los valores de una columna en un lote (un arreglo de Arrow o una lista de valores de tipos mezclados).
+        '''
+        validos, hashes, tipos = hashear(valores)
+        self.tipos.update(tipos)
+        self.no_nulos += int(validos.sum())
+        self.distintos.agregar(hashes[validos])
+        if self.claves is not None:
+            self.claves.agregar(np.where(validos, hashes, HASH_NULO))
+
+    def agregar_nulos(self, filas):
+        '''
+        Agrega las filas de un lote en el que la columna no aparece, que son nulas.
+        '''
+        if self.claves is not None and filas:
+            self.claves.agregar(np.full(filas, HASH_NULO, dtype=np.uint64))
+
+# Funciones
+def perfilar(ruta, claves=(), formato=None, tamano=TAMANO_TROZO, filas_lote=FILAS_LOTE, precision=PRECISION_HLL):
+    '''
+    Perfila un archivo en una sola pasada por lotes. Versión en streaming de utils.verificar_tipo_datos, que además
+    estima los valores distintos de cada columna y cuenta las filas duplicadas de las columnas clave (lo que se
+    revisa con utils.verifica_duplicados_por_columna).
+
+    La memoria no depende de la cantidad de filas: un lote por vez, 2**precision bytes por columna para los valores
+    distintos y 16 bytes por valor distinto de cada columna clave.
+
+    Args:
+        ruta (str): Archivo parquet, directorio con un dataset parquet o archivo JSON con un registro por línea.
+        claves (list): Columnas en las que se buscan valores duplicados.
+        formato (str, optional): 'parquet' o 'json'. Por defecto se deduce de la ruta.
+        tamano (int): Tamaño aproximado de cada trozo de un JSON, en bytes.
+        filas_lote (int): Filas de cada lote de un parquet.
+        precision (int): Precisión de HyperLogLog.
+
+    Returns:
+        pandas.DataFrame: Una fila por columna con:
+        - 'nombre_campo': Nombre de la columna.
+        - 'tipo_datos': Cantidad de valores no nulos de cada tipo de Python, de mayor a menor.
+        - 'no_nulos_%': Porcentaje de valores no nulos.
+        - 'nulos_%': Porcentaje de valores nulos.
+        - 'nulos': Cantidad de valores nulos (también los de las filas donde la columna no aparece).
+        - 'distintos_aprox': Cantidad estimada de valores no nulos distintos.
+        - 'duplicados': Filas cuyo valor ya apareció antes, solo en las columnas de `claves` (<NA> en las demás).
+        La cantidad de filas y los segundos que tomó quedan en .attrs.
+    '''
+    inicio = time.perf_counter()
+    perfiles = {}
+    filas = 0
+    for filas_lote_leido, columnas in leer_lotes(ruta, formato, tamano, filas_lote):
+        for nombre, valores in columnas.items():
+            if nombre not in perfiles:
+                perfiles[nombre] = PerfilColumna(clave=nombre in claves, precision=precision)
+                # Las filas de los lotes anteriores, en los que la columna no estaba, son nulas en esta columna
+                perfiles[nombre].agregar_nulos(filas)
+            perfiles[nombre].agregar(valores)
+        for nombre, perfil in perfiles.items():
+            if nombre not in columnas:
+                perfil.agregar_nulos(filas_lote_leido)
+        filas += filas_lote_leido
+    faltantes = [clave for clave in claves if clave not in perfiles]
+    if faltantes:
+        raise KeyError(f'Columnas clave que no están en el archivo: {faltantes}')
+
+    mi_dict = {"nombre_campo": [], "tipo_datos": [], "no_nulos_%": [], "nulos_%": [], "nulos": [], "distintos_aprox": [],
+               "duplicados": []}
+    for nombre, perfil in perfiles.items():
+        porcentaje_no_nulos = (perfil.no_nulos / filas) * 100 if filas else 0.0
+        mi_dict["nombre_campo"].append(nombre)
+        mi_dict["tipo_datos"].append(dict(perfil.tipos.most_common()))
+        mi_dict["no_nulos_%"].append(round(porcentaje_no_nulos, 2))
+        mi_dict["nulos_%"].append(round(100 - porcentaje_no_nulos, 2))
+        mi_dict["nulos"].append(filas - perfil.no_nulos)
+        mi_dict["distintos_aprox"].append(perfil.distintos.estimar())
+        mi_dict["duplicados"].append(perfil.claves.duplicados() if perfil.claves is not None else None)
+
+    df_info = pd.DataFrame(mi_dict).astype({"duplicados": "Int64"})
+    df_info.attrs.update({'filas': filas, 'segundos': round(time.perf_counter() - inicio, 2)})
+    return df_info
+
+def filas_duplicadas(ruta, columna, formato=None, tamano=TAMANO_TROZO, filas_lote=FILAS_LOTE):
+    '''
+    Versión en streaming de utils.verifica_duplicados_por_columna. Una primera pasada cuenta los hashes de la columna
+    y una segunda guarda solo las filas cuya clave se repite, así que en memoria quedan las claves y esas filas.
+
+    Returns:
+        pandas.DataFrame or str: Las filas duplicadas ordenadas por `columna`, o el mensaje "No hay duplicados".
+    '''
+    contador = ContadorClaves()
+    for filas, columnas in leer_lotes(ruta, formato, tamano, filas_lote, columnas=[columna]):
+        contador.agregar(_hashes_clave(columnas, columna, filas))
+    repetidos = contador.repetidos()
+    if not len(repetidos):
+        return "No hay duplicados"
+
+    partes = []
+    for filas, columnas in leer_lotes(ruta, formato, tamano, filas_lote):
+        mascara = np.isin(_hashes_clave(columnas, columna, filas), repetidos)
+        if mascara.any():
+            # Las filas se arman con valores de Python, como los DataFrame de los notebooks
+            partes.append(pd.DataFrame({
+                nombre: [valor for valor, repetida in zip(valores, mascara) if repetida] if isinstance(valores, list)
+                else valores.filter(pa.array(mascara)).to_pylist()
+                for nombre, valores in columnas.items()}))
+    duplicated_rows = pd.concat(partes, ignore_index=True)
+    return duplicated_rows.sort_values(by=columna, kind='stable')
+
+def _hashes_clave(columnas, columna, filas):
+    '''
+    Devuelve el hash de la columna clave en cada fila de un lote, con HASH_NULO en los nulos y en los lotes donde
+    la columna no aparece.
+    '''
+    if columna not in columnas:
+        return np.full(filas, HASH_NULO, dtype=np.uint64)
+    validos, hashes, _ = hashear(columnas[columna])
+    return np.where(validos, hashes, HASH_NULO)
+
+def _leer_como_dataframe(ruta, formato=None):
+    '''
+    Lee el archivo completo en un DataFrame, como en los notebooks (los JSON línea por línea). Se usa como referencia.
+    Las columnas quedan como object, para que los enteros con nulos no se conviertan en float y los tipos que se
+    comparan sean los del archivo.
+    '''
+    formato = formato or formato_archivo(ruta)
+    if formato == 'parquet':
+        tabla = ds.dataset(ruta, format='parquet').to_table()
+        return pd.DataFrame({nombre: pd.Series(tabla.column(nombre).to_pylist(), dtype=object) for nombre in tabla.column_names})
+    with open(ruta, 'rb') as f:
+        return pd.DataFrame([registro for registro in map(parsear_linea, f.read().splitlines()) if registro is not None], dtype=object)
+
+def _medir_utils(ruta, formato, claves, cola):
+    import utils
+
+    inicio = time.perf_counter()
+    df = _leer_como_dataframe(ruta, formato)
+    lectura = time.perf_counter() - inicio
+    df_info = utils.verificar_tipo_datos(df)
+    duplicados = {clave: df.duplicated(subset=clave).sum() for clave in claves}
+    for clave in claves:
+        utils.verifica_duplicados_por_columna(df, clave)
+    segundos = time.perf_counter() - inicio
+
+    def clave_distinta(valor):
+        return json.dumps(valor, sort_keys=True, default=str) if isinstance(valor, (list, dict, np.ndarray)) else valor
+
+    def es_nulo(valor):
+        return valor is None or (isinstance(valor, float) and valor != valor)
+
+    validos = {columna: df[columna][[not es_nulo(valor) for valor in df[columna]]] for columna in df.columns}
+    cola.put({
+        'filas': len(df), 'segundos': round(segundos, 2), 'segundos_lectura': round(lectura, 2), 'pico_mb': pico_memoria()[0],
+        'nulos': dict(zip(df_info['nombre_campo'], map(int, df_info['nulos']))),
+        'tipos': {columna: sorted({type(valor).__name__ for valor in valores}) for columna, valores in validos.items()},
+        'distintos': {columna: int(valores.map(clave_distinta).nunique()) for columna, valores in validos.items()},
+        'duplicados': {clave: int(cantidad) for clave, cantidad in duplicados.items()},
+    })
+
+def comparar_con_utils(ruta, perfil, formato=None, claves=()):
+    '''
+    Ejecuta, en un proceso nuevo, la lectura completa del archivo con utils.verificar_tipo_datos y
+    utils.verifica_duplicados_por_columna, y compara sus resultados con los del perfil.
+
+    Returns:
+        dict: Tiempo y pico de memoria del camino anterior, diferencias en los nulos, los tipos y los duplicados, y
+        el mayor error relativo de la estimación de valores distintos.
+    '''
+    contexto = multiprocessing.get_context('spawn')
+    cola = contexto.Queue()
+    proceso = contexto.Process(target=_medir_utils, args=(ruta, formato, list(claves), cola))
+    proceso.start()
+    referencia = cola.get()
+    proceso.join()
+
+    diferencias = []
+    errores = []
+    for fila in perfil.itertuples(index=False):
+        nombre = fila.nombre_campo
+        if fila.nulos != referencia['nulos'].get(nombre):
+            diferencias.append((nombre, 'nulos', fila.nulos, referencia['nulos'].get(nombre)))
+        if sorted(fila.tipo_datos) != referencia['tipos'].get(nombre):
+            diferencias.append((nombre, 'tipos', sorted(fila.tipo_datos), referencia['tipos'].get(nombre)))
+        if nombre in referencia['duplicados'] and fila.duplicados != referencia['duplicados'][nombre]:
+            diferencias.append((nombre, 'duplicados', fila.duplicados, referencia['duplicados'][nombre]))
+        exactos = referencia['distintos'].get(nombre, 0)
+        errores.append(abs(fila.distintos_aprox - exactos) / exactos if exactos else float(fila.distintos_aprox != 0))
+    return {'filas': referencia['filas'], 'segundos': referencia['segundos'], 'segundos_lectura': referencia['segundos_lectura'],
+            'pico_mb': referencia['pico_mb'], 'diferencias': diferencias, 'error_distintos_max': round(max(errores, default=0.0), 4)}
+
+def main():
+    parser = argparse.ArgumentParser(description='Perfil de calidad de un archivo parquet o JSON, en streaming.')
+    parser.add_argument('ruta', help='Archivo parquet, directorio con un dataset parquet o archivo JSON con un registro por línea')
+    parser.add_argument('--formato', choices=['parquet', 'json'], default=None, help='Por defecto se deduce de la ruta')
+    parser.add_argument('--claves', nargs='*', default=[], help='Columnas en las que se buscan valores duplicados')
+    parser.add_argument('--tamano-mb', type=float, default=TAMANO_TROZO / 2**20, help='Tamaño de cada trozo de un JSON en MB')
+    parser.add_argument('--filas-lote', type=int, default=FILAS_LOTE, help='Filas de cada lote de un parquet')
+    parser.add_argument('--duplicados', default=None, metavar='COLUMNA', help='Muestra las filas duplicadas de una columna')
+    parser.add_argument('--comparar', action='store_true', help='Compara con utils.verificar_tipo_datos sobre el archivo completo')
+    args = parser.parse_args()
+
+    tamano = int(args.tamano_mb * 2**20)
+    perfil = perfilar(args.ruta, args.claves, args.formato, tamano, args.filas_lote)
+    with pd.option_context('display.max_columns', None, 'display.width', 200, 'display.max_colwidth', 60):
+        print(perfil.to_string(index=False))
+    print(f"Perfil en streaming: {json.dumps({**perfil.attrs, 'pico_mb': pico_memoria()[0]})}")
+    if args.duplicados:
+        print(filas_duplicadas(args.ruta, args.duplicados, args.formato, tamano, args.filas_lote))
+    if args.comparar:
+        comparacion = comparar_con_utils(args.ruta, perfil, args.formato, args.claves)
+        print(f"utils.verificar_tipo_datos con el archivo completo: {json.dumps(comparacion, default=str)}")
+        if comparacion['diferencias']:
+            raise SystemExit(1)
+
+if __name__ == '__main__':
+    main()
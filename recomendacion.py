@@ -0,0 +1,874 @@
+## CONSTRUCCIÓN Y CONSULTA DE LOS ÍNDICES DEL MODELO DE RECOMENDACIÓN
+# Importaciones
+import argparse
+import hashlib
+import json
+import multiprocessing
+import os
+import shutil
+import sys
+import tempfile
+import time
+import tracemalloc
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+from scipy import sparse
+
+# Cantidad de vecinos que se guardan por juego en el índice
+K_VECINOS = 20
+# Cantidad de usuarios similares que se usan para recomendar
+N_USUARIOS_SIMILARES = 10
+# Cantidad de juegos que se recomiendan
+N_RECOMENDACIONES = 5
+# Archivo con las recomendaciones precalculadas de cada usuario
+ARCHIVO_RECOMENDACIONES_USUARIOS = 'recomendaciones_usuarios.parquet'
+# Cantidad de usuarios que calcula un worker por vez al precalcular las recomendaciones
+TAMANO_TROZO_USUARIOS = 2048
+# Memoria máxima (en bytes) de la matriz densa de similitudes de un bloque de usuarios en `similares_lote`
+MEMORIA_BLOQUE_SIMILITUDES = 64 * 2**20
+# Arreglos de la matriz de usuarios que identifican al modelo
+ARREGLOS_MODELO = ('shape', 'usuarios', 'items', 'indptr', 'indices', 'data')
+# Archivo, junto a los arreglos, con la huella del modelo calculada al guardarlo
+ARCHIVO_HUELLA_MODELO = 'huella.txt'
+
+# Motor de usuarios de cada proceso del pool de precalcular_recomendaciones
+_motor_worker = None
+
+# Funciones
+def construir_indice_vecinos(item_sim_df, k=K_VECINOS, bloque=1024):
+    '''
+    Construye un índice con los k juegos más similares a cada juego a partir de la matriz de similitud ítem-ítem.
+
+    Para cada fila de la matriz se seleccionan los k mayores valores con `partition` (sin ordenar toda la fila)
+    y luego se ordenan solo esos k. El propio juego se excluye de sus vecinos. Las filas se procesan por bloques
+    para no duplicar en memoria la matriz completa.
+
+    Args:
+        item_sim_df (pandas.DataFrame): Matriz cuadrada de similitud entre juegos, con los nombres de los juegos como índice y columnas.
+        k (int): Cantidad de vecinos a guardar por juego.
+        bloque (int): Cantidad de filas que se procesan por vez.
+
+    Returns:
+        pyarrow.Table: Tabla con las columnas 'item_name', 'vecinos' (posiciones de los vecinos) y 'scores' (similitud de cada vecino).
+    '''
+    sim = item_sim_df.to_numpy(dtype=np.float32)
+    n = sim.shape[0]
+    k = min(k, n - 1)
+
+    vecinos = np.empty((n, k), dtype=np.int32)
+    scores = np.empty((n, k), dtype=np.float32)
+
+    for inicio in range(0, n, bloque):
+        fin = min(inicio + bloque, n)
+        vecinos[inicio:fin], scores[inicio:fin] = _mejores_k(sim[inicio:fin].copy(), np.arange(inicio, fin), k)
+
+    return _tabla_vecinos(item_sim_df.index.astype(str), vecinos, scores)
+
+def _mejores_k(filas, posiciones, k):
+    '''
+    Selecciona los k mayores valores de cada fila de un bloque de la matriz de similitud (modifica `filas`).
+
+    Ante empates en el k-ésimo valor se eligen los juegos de menor posición, de modo que el resultado no depende
+    de cómo se calculó cada fila y un índice actualizado incrementalmente coincide con uno construido de cero.
+
+    Args:
+        filas (numpy.ndarray): Filas del bloque.
+        posiciones (numpy.ndarray): Posición de cada fila del bloque, para excluir a cada juego de sus vecinos.
+        k (int): Cantidad de vecinos por fila.
+
+    Returns:
+        tuple: Posiciones y similitudes de los k vecinos de cada fila, ordenados de mayor a menor similitud.
+    '''
+    # Se excluye el propio juego de sus vecinos
+    filas[np.arange(len(filas)), posiciones] = -np.inf
+    # k-ésimo mayor valor de cada fila, sin ordenar toda la fila
+    umbral = -np.partition(-filas, k - 1, axis=1)[:, k - 1:k]
+    mayores = filas > umbral
+    empatados = filas == umbral
+    # Se completan los k con los empatados en el umbral de menor posición
+    cupo = k - np.count_nonzero(mayores, axis=1, keepdims=True)
+    elegidos = mayores | (empatados & (np.cumsum(empatados, axis=1) <= cupo))
+    candidatos = np.nonzero(elegidos)[1].reshape(len(filas), k)
+    valores = np.take_along_axis(filas, candidatos, axis=1)
+    # Ordena los k candidatos por similitud descendente y, ante empates, por posición
+    orden = np.lexsort((candidatos, -valores), axis=1)
+    return np.take_along_axis(candidatos, orden, axis=1), np.take_along_axis(valores, orden, axis=1)
+
+def _tabla_vecinos(nombres, vecinos, scores):
+    '''
+    Arma la tabla del índice de vecinos a partir de los nombres de los juegos y los arreglos de vecinos y similitudes.
+    '''
+    k = vecinos.shape[1]
+    return pa.table({
+        'item_name': pa.array(nombres),
+        'vecinos': pa.FixedSizeListArray.from_arrays(pa.array(vecinos.astype(np.int32).ravel()), k),
+        'scores': pa.FixedSizeListArray.from_arrays(pa.array(scores.astype(np.float32).ravel()), k),
+    })
+
+def matriz_calificaciones(df, usuario='user_id', item='item_name', rating='rating'):
+    '''
+    Construye la matriz normalizada de calificaciones de usuarios por juegos directamente como matriz dispersa CSR.
+
+    Da el mismo resultado que el notebook 04 (pivot_table, normalización de cada usuario con (x - media) / (máximo - mínimo)
+    sobre sus juegos calificados, nulos en cero y sin los usuarios que quedan solo con ceros), pero sin armar la
+    matriz densa: las filas y columnas son los códigos categóricos de usuarios y juegos y la normalización se hace
+    sobre los valores guardados. La memoria y el tiempo crecen con la cantidad de calificaciones.
+
+    Args:
+        df (pandas.DataFrame): Calificaciones en formato (usuario, juego, rating).
+        usuario (str): Columna de los usuarios.
+        item (str): Columna de los juegos.
+        rating (str): Columna de las calificaciones.
+
+    Returns:
+        tuple: La matriz CSR (usuarios × juegos, float64), los usuarios (filas) y los juegos (columnas), ordenados como
+        los ordena pivot_table.
+    '''
+    df = df.dropna(subset=[usuario, item, rating])
+    usuarios = pd.Categorical(df[usuario])
+    items = pd.Categorical(df[item])
+    forma = (len(usuarios.categories), len(items.categories))
+    posiciones = (usuarios.codes, items.codes)
+
+    # Como pivot_table, las calificaciones repetidas de un mismo par (usuario, juego) se promedian
+    suma = sparse.csr_matrix((df[rating].to_numpy(dtype=np.float64), posiciones), shape=forma)
+    cantidad = sparse.csr_matrix((np.ones(len(df)), posiciones), shape=forma)
+    suma.sum_duplicates()
+    cantidad.sum_duplicates()
+    matriz = sparse.csr_matrix((suma.data / cantidad.data, suma.indices, suma.indptr), shape=forma)
+
+    # Media, máximo y mínimo de cada usuario sobre sus juegos calificados
+    por_fila = np.diff(matriz.indptr)
+    media = np.add.reduceat(matriz.data, matriz.indptr[:-1]) / por_fila
+    rango = np.maximum.reduceat(matriz.data, matriz.indptr[:-1]) - np.minimum.reduceat(matriz.data, matriz.indptr[:-1])
+    with np.errstate(divide='ignore', invalid='ignore'):
+        matriz.data = (matriz.data - np.repeat(media, por_fila)) / np.repeat(rango, por_fila)
+    # Los usuarios con todas sus calificaciones iguales dan 0/0, que el notebook rellena con cero
+    matriz.data[~np.isfinite(matriz.data)] = 0.0
+    matriz.eliminate_zeros()
+
+    # Se quitan los usuarios que quedaron solo con ceros
+    con_datos = np.diff(matriz.indptr) > 0
+    return matriz[con_datos], np.asarray(usuarios.categories.astype(str))[con_datos], np.asarray(items.categories.astype(str))
+
+def normalizar_items(matriz_items):
+    '''
+    Normaliza las filas de la matriz de juegos × usuarios (norma L2, en float32), para que el producto de dos filas
+    sea su similitud del coseno.
+
+    Args:
+        matriz_items (scipy.sparse.csr_matrix): Juegos × usuarios.
+
+    Returns:
+        tuple: La matriz normalizada (CSR) y su transpuesta (CSC), lista para multiplicar bloques de filas.
+    '''
+    matriz = sparse.csr_matrix(matriz_items, dtype=np.float32)
+    normas = np.sqrt(np.asarray(matriz.multiply(matriz).sum(axis=1)).ravel())
+    normas[normas == 0] = 1.0
+    matriz = sparse.csr_matrix(sparse.diags((1 / normas).astype(np.float32)) @ matriz)
+    return matriz, matriz.T.tocsc()
+
+def construir_indice_vecinos_dispersa(matriz_items, nombres, k=K_VECINOS, bloque=1024):
+    '''
+    Construye el índice de los k juegos más similares a cada juego directamente desde la matriz dispersa de calificaciones.
+
+    Calcula la similitud del coseno por bloques de juegos en float32 y de cada bloque guarda solo los k vecinos, de
+    modo que nunca se arma la matriz juego-juego completa: la memoria es la de la matriz dispersa más un bloque de
+    `bloque` × cantidad de juegos.
+
+    Args:
+        matriz_items (scipy.sparse.csr_matrix): Juegos × usuarios.
+        nombres (array-like): Nombres de los juegos, en el orden de las filas.
+        k (int): Cantidad de vecinos a guardar por juego.
+        bloque (int): Cantidad de juegos que se procesan por vez.
+
+    Returns:
+        pyarrow.Table: La misma tabla que `construir_indice_vecinos`.
+    '''
+    matriz, transpuesta = normalizar_items(matriz_items)
+    n = matriz.shape[0]
+    k = min(k, n - 1)
+    vecinos = np.empty((n, k), dtype=np.int32)
+    scores = np.empty((n, k), dtype=np.float32)
+    for inicio in range(0, n, bloque):
+        fin = min(inicio + bloque, n)
+        filas = (matriz[inicio:fin] @ transpuesta).toarray()
+        vecinos[inicio:fin], scores[inicio:fin] = _mejores_k(filas, np.arange(inicio, fin), k)
+
+    return _tabla_vecinos(np.asarray(nombres).astype(str), vecinos, scores)
+
+class IndiceVecinos:
+    '''
+    Índice de los juegos más similares a cada juego, respaldado por arreglos de NumPy.
+
+    La consulta de un juego es una búsqueda en un diccionario y una lectura de una fila de los arreglos,
+    por lo que su costo no depende de la cantidad de juegos del catálogo.
+    '''
+    def __init__(self, tabla):
+        k = tabla.schema.field('vecinos').type.list_size
+        self.nombres = np.asarray(tabla.column('item_name').to_pylist(), dtype=object)
+        self.vecinos = tabla.column('vecinos').combine_chunks().flatten().to_numpy().reshape(-1, k)
+        self.scores = tabla.column('scores').combine_chunks().flatten().to_numpy().reshape(-1, k)
+        self.posiciones = {nombre: i for i, nombre in enumerate(self.nombres)}
+
+    @classmethod
+    def desde_parquet(cls, archivo):
+        '''
+        Carga el índice desde un archivo parquet generado por `construir_indice_vecinos`.
+        '''
+        return cls(pq.read_table(archivo, memory_map=True))
+
+    def __contains__(self, game):
+        return game in self.posiciones
+
+    def similares(self, game, n=5):
+        '''
+        Devuelve los nombres de los n juegos más similares a un juego dado.
+
+        Args:
+            game (str): El nombre del juego.
+            n (int): Cantidad de juegos a devolver (como máximo el k con el que se construyó el índice).
+
+        Returns:
+            list: Lista con los nombres de los juegos más similares, de mayor a menor similitud.
+        '''
+        fila = self.posiciones[game]
+        return self.nombres[self.vecinos[fila, :n]].tolist()
+
+    def nbytes(self):
+        '''
+        Devuelve la memoria ocupada por los arreglos del índice, en bytes.
+        '''
+        return self.vecinos.nbytes + self.scores.nbytes + sum(len(nombre) for nombre in self.nombres)
+
+def comparar_latencias(item_sim_df, indice, n_consultas=200, semilla=42):
+    '''
+    Compara la latencia de recomendar juegos ordenando la matriz completa contra la consulta al índice.
+
+    Args:
+        item_sim_df (pandas.DataFrame): Matriz de similitud entre juegos.
+        indice (IndiceVecinos): Índice de vecinos construido a partir de la misma matriz.
+        n_consultas (int): Cantidad de juegos elegidos al azar para medir.
+        semilla (int): Semilla para elegir los juegos.
+
+    Returns:
+        dict: Percentiles 50 y 99 en milisegundos de cada método.
+    '''
+    rng = np.random.default_rng(semilla)
+    juegos = rng.choice(item_sim_df.columns, size=n_consultas)
+
+    tiempos_sort, tiempos_indice = [], []
+    for game in juegos:
+        inicio = time.perf_counter()
+        item_sim_df.sort_values(by=game, ascending=False).index[1:6]
+        tiempos_sort.append(time.perf_counter() - inicio)
+
+        inicio = time.perf_counter()
+        indice.similares(game)
+        tiempos_indice.append(time.perf_counter() - inicio)
+
+    resultado = {}
+    for metodo, tiempos in [('sort', tiempos_sort), ('indice', tiempos_indice)]:
+        ms = np.array(tiempos) * 1000
+        resultado[metodo] = {'p50_ms': round(float(np.percentile(ms, 50)), 4),
+                             'p99_ms': round(float(np.percentile(ms, 99)), 4)}
+    return resultado
+
+class MotorUsuarios:
+    '''
+    Calcula bajo demanda los usuarios más similares a un usuario dado, sin materializar la matriz usuario-usuario.
+
+    Guarda `piv_norm` como una matriz dispersa CSR de usuarios por juegos con las filas normalizadas (norma L2),
+    de modo que la similitud del coseno de un usuario con todos los demás es un único producto matriz-vector.
+    La memoria crece con la cantidad de calificaciones y no con el cuadrado de la cantidad de usuarios.
+    '''
+    def __init__(self, matriz, usuarios, items, normalizar=True):
+        self.matriz = sparse.csr_matrix(matriz, dtype=np.float64)
+        if normalizar:
+            self.matriz.eliminate_zeros()
+            # Normaliza cada fila por su norma L2 (las filas vacías quedan en cero)
+            normas = np.sqrt(self.matriz.multiply(self.matriz).sum(axis=1)).A1
+            normas[normas == 0] = 1.0
+            self.matriz = sparse.csr_matrix(sparse.diags(1 / normas) @ self.matriz)
+        self.usuarios = np.asarray(usuarios, dtype=object)
+        self.items = np.asarray(items, dtype=object)
+        self.posiciones = {usuario: i for i, usuario in enumerate(self.usuarios)}
+
+    @classmethod
+    def desde_piv_norm(cls, piv_norm):
+        '''
+        Crea el motor a partir del dataframe `piv_norm` (juegos como índice y usuarios como columnas).
+        '''
+        matriz = sparse.csr_matrix(piv_norm.to_numpy(dtype=np.float64).T)
+        return cls(matriz, piv_norm.columns.astype(str), piv_norm.index.astype(str))
+
+    @classmethod
+    def desde_archivo(cls, directorio):
+        '''
+        Carga el motor desde un directorio generado con `guardar`.
+
+        Los arreglos de la matriz se abren como mapas de memoria de solo lectura, por lo que no se copian al heap
+        del proceso y los workers de uvicorn que leen el mismo archivo comparten sus páginas a través del page cache.
+        '''
+        def cargar(nombre):
+            return np.load(os.path.join(directorio, f'{nombre}.npy'), mmap_mode='r', allow_pickle=False)
+
+        matriz = sparse.csr_matrix((cargar('data'), cargar('indices'), cargar('indptr')),
+                                   shape=tuple(np.load(os.path.join(directorio, 'shape.npy'))), copy=False)
+        return cls(matriz, cargar('usuarios'), cargar('items'), normalizar=False)
+
+    def guardar(self, directorio):
+        '''
+        Guarda la matriz dispersa y los nombres de usuarios y juegos como archivos .npy sin comprimir en un directorio,
+        junto con la huella del modelo (ver leer_huella_modelo), para no tener que calcularla al servir la API.
+        '''
+        os.makedirs(directorio, exist_ok=True)
+        arreglos = {'data': self.matriz.data, 'indices': self.matriz.indices, 'indptr': self.matriz.indptr,
+                    'shape': np.array(self.matriz.shape), 'usuarios': self.usuarios.astype(str), 'items': self.items.astype(str)}
+        for nombre, arreglo in arreglos.items():
+            np.save(os.path.join(directorio, f'{nombre}.npy'), arreglo, allow_pickle=False)
+        with open(os.path.join(directorio, ARCHIVO_HUELLA_MODELO), 'w', encoding='utf-8') as f:
+            f.write(huella_modelo(directorio))
+
+    def __contains__(self, user):
+        return user in self.posiciones
+
+    def similares(self, user, n=N_USUARIOS_SIMILARES):
+        '''
+        Devuelve las posiciones de los n usuarios más similares a un usuario dado.
+
+        Args:
+            user (str): Identificador del usuario.
+            n (int): Cantidad de usuarios similares a devolver.
+
+        Returns:
+            numpy.ndarray: Posiciones de los usuarios similares, de mayor a menor similitud.
+        '''
+        fila = self.posiciones[user]
+        # Similitud del coseno del usuario con todos los demás: un producto matriz-vector disperso
+        sims = self.matriz @ self.matriz[fila].toarray().ravel()
+        return self._mas_similares(sims, fila, n)
+
+    def similares_lote(self, users, n=N_USUARIOS_SIMILARES, bloque=256):
+        '''
+        Devuelve, para cada usuario de una lista, las posiciones de sus n usuarios más similares.
+
+        Las similitudes de un bloque de usuarios con todos los demás se calculan con un único producto de la matriz
+        dispersa por la matriz densa de los usuarios del bloque, que suma en el mismo orden que `similares`, por lo
+        que el resultado es idéntico al de consultar los usuarios de a uno (por eso se calcula en float64). El
+        bloque se achica según la cantidad de usuarios para que su matriz densa de similitudes (cantidad de usuarios
+        × `bloque` valores) no supere `MEMORIA_BLOQUE_SIMILITUDES`, y se reduce a los n más similares de cada usuario
+        antes de devolverlos, de modo que no queda en memoria entre un resultado y el siguiente.
+
+        Args:
+            users (list): Identificadores de los usuarios (todos deben estar en el motor).
+            n (int): Cantidad de usuarios similares a devolver por usuario.
+            bloque (int): Cantidad máxima de usuarios cuyas similitudes se calculan por vez.
+
+        Yields:
+            numpy.ndarray: Posiciones de los usuarios similares de cada usuario, en el orden de `users`.
+        '''
+        filas = np.array([self.posiciones[user] for user in users], dtype=np.int64)
+        bloque = max(1, min(bloque, MEMORIA_BLOQUE_SIMILITUDES // (8 * max(1, self.matriz.shape[0]))))
+        for inicio in range(0, len(filas), bloque):
+            filas_bloque = filas[inicio:inicio + bloque]
+            sims = self.matriz @ self.matriz[filas_bloque].toarray().T
+            resultados = [self._mas_similares(sims[:, j].copy(), fila, n) for j, fila in enumerate(filas_bloque)]
+            del sims
+            yield from resultados
+
+    @staticmethod
+    def _mas_similares(sims, fila, n):
+        '''
+        Selecciona las posiciones de las n mayores similitudes, excluyendo al propio usuario (modifica `sims`).
+        '''
+        sims[fila] = -np.inf
+        n = min(n, len(sims) - 1)
+        candidatos = np.argpartition(-sims, n - 1)[:n]
+        # Ordena los candidatos por similitud descendente y, ante empates, por posición
+        return candidatos[np.lexsort((candidatos, -sims[candidatos]))]
+
+    def mas_votados(self, vecinos, n=N_RECOMENDACIONES):
+        '''
+        Devuelve los juegos mejor calificados por más usuarios de un grupo de usuarios.
+
+        Cada usuario vota por el o los juegos que tienen su calificación máxima (todos los empatados, contando
+        como cero los juegos que no calificó). Se calcula en una sola operación sobre la submatriz de los usuarios:
+        el máximo por fila, la máscara de empates y el conteo de votos con `bincount`. Ante igual cantidad de votos
+        se mantiene el orden en que aparece cada juego recorriendo los usuarios en orden y los juegos por posición.
+
+        Args:
+            vecinos (numpy.ndarray): Posiciones de los usuarios que votan, en orden de similitud.
+            n (int): Cantidad de juegos a devolver.
+
+        Returns:
+            list: Nombres de los juegos más votados, de mayor a menor cantidad de votos.
+        '''
+        submatriz = self.matriz[vecinos].toarray()
+        # Máscara de los juegos con la calificación máxima de cada usuario
+        empates = submatriz == submatriz.max(axis=1, keepdims=True)
+        # np.nonzero recorre la máscara por filas, es decir, en el orden de aparición de los votos
+        columnas = np.nonzero(empates)[1]
+        votos = np.bincount(columnas, minlength=submatriz.shape[1])
+        candidatos, primera_aparicion = np.unique(columnas, return_index=True)
+        # Clave única por juego: más votos primero y, ante empates, la primera aparición
+        clave = -votos[candidatos].astype(np.int64) * (len(columnas) + 1) + primera_aparicion
+        n = min(n, len(candidatos))
+        if n == 0:
+            return []
+        seleccion = np.argpartition(clave, n - 1)[:n]
+        seleccion = seleccion[np.argsort(clave[seleccion])]
+        return self.items[candidatos[seleccion]].tolist()
+
+    def recomendar(self, user, n_similares=N_USUARIOS_SIMILARES, n_resultados=N_RECOMENDACIONES):
+        '''
+        Recomienda juegos a un usuario a partir de los juegos mejor calificados por los usuarios más similares.
+
+        Args:
+            user (str): Identificador del usuario.
+            n_similares (int): Cantidad de usuarios similares que votan.
+            n_resultados (int): Cantidad de juegos a recomendar.
+
+        Returns:
+            list: Nombres de los juegos recomendados.
+        '''
+        return self.mas_votados(self.similares(user, n=n_similares), n=n_resultados)
+
+    def recomendar_lote(self, users, n_similares=N_USUARIOS_SIMILARES, n_resultados=N_RECOMENDACIONES, bloque=256):
+        '''
+        Recomienda juegos a cada usuario de una lista, calculando las similitudes por bloques con `similares_lote`.
+
+        Args:
+            users (list): Identificadores de los usuarios (todos deben estar en el motor).
+            n_similares (int): Cantidad de usuarios similares que votan.
+            n_resultados (int): Cantidad de juegos a recomendar.
+            bloque (int): Cantidad de usuarios cuyas similitudes se calculan por vez.
+
+        Yields:
+            list: Nombres de los juegos recomendados a cada usuario, en el orden de `users`.
+        '''
+        vecinos = []
+        for similares in self.similares_lote(users, n=n_similares, bloque=bloque):
+            vecinos.append(similares)
+            if len(vecinos) == bloque:
+                yield from self.mas_votados_lote(np.array(vecinos), n=n_resultados)
+                vecinos = []
+        if vecinos:
+            yield from self.mas_votados_lote(np.array(vecinos), n=n_resultados)
+
+    def mas_votados_lote(self, vecinos, n=N_RECOMENDACIONES, bloque=32):
+        '''
+        Calcula `mas_votados` para varios grupos de usuarios a la vez, con el mismo resultado.
+
+        Las submatrices de los grupos se apilan en un arreglo de grupos × usuarios × juegos, y los votos y la primera
+        aparición de cada juego salen de operaciones sobre ese arreglo. La primera aparición se codifica como
+        (usuario del grupo, posición del juego), que ordena los juegos igual que el recorrido de `mas_votados`.
+
+        Args:
+            vecinos (numpy.ndarray): Arreglo de grupos × usuarios con las posiciones de los usuarios que votan.
+            n (int): Cantidad de juegos a devolver por grupo.
+            bloque (int): Cantidad de grupos que se procesan por vez (cada uno ocupa usuarios × juegos valores).
+
+        Yields:
+            list: Nombres de los juegos más votados de cada grupo, de mayor a menor cantidad de votos.
+        '''
+        n_grupos, n_votantes = vecinos.shape
+        n_items = self.matriz.shape[1]
+        for inicio in range(0, n_grupos, bloque):
+            grupos = vecinos[inicio:inicio + bloque]
+            submatrices = self.matriz[grupos.ravel()].toarray().reshape(len(grupos), n_votantes, n_items)
+            empates = submatrices == submatrices.max(axis=2, keepdims=True)
+            votos = np.count_nonzero(empates, axis=1)
+            # Primer usuario del grupo que votó por cada juego (recorriendo los usuarios de atrás hacia adelante),
+            # combinado con la posición del juego
+            primer_votante = np.zeros((len(grupos), n_items), dtype=np.int64)
+            for votante in range(n_votantes - 1, -1, -1):
+                primer_votante[empates[:, votante]] = votante
+            primera_aparicion = primer_votante * n_items + np.arange(n_items)
+            clave = -votos.astype(np.int64) * (n_votantes * n_items + 1) + primera_aparicion
+            clave[votos == 0] = np.iinfo(np.int64).max
+            n_grupo = min(n, n_items)
+            seleccion = np.argpartition(clave, n_grupo - 1, axis=1)[:, :n_grupo] if n_grupo else np.empty((len(grupos), 0), dtype=np.int64)
+            seleccion = np.take_along_axis(seleccion, np.argsort(np.take_along_axis(clave, seleccion, axis=1), axis=1), axis=1)
+            for fila, columnas in zip(votos, seleccion):
+                yield self.items[columnas[fila[columnas] > 0]].tolist()
+
+    def nbytes(self):
+        '''
+        Devuelve la memoria ocupada por la matriz dispersa, en bytes.
+        '''
+        return self.matriz.data.nbytes + self.matriz.indices.nbytes + self.matriz.indptr.nbytes
+
+def huella_modelo(directorio):
+    '''
+    Devuelve el hash SHA-1 de los arreglos de la matriz de usuarios guardada en un directorio (ver
+    MotorUsuarios.guardar). Cambia cada vez que se reconstruye la matriz con otros datos, así que sirve para saber
+    si unas recomendaciones precalculadas corresponden al modelo que se sirve.
+    '''
+    huella = hashlib.sha1()
+    for nombre in ARREGLOS_MODELO:
+        with open(os.path.join(directorio, f'{nombre}.npy'), 'rb') as f:
+            for bloque in iter(lambda: f.read(1 << 20), b''):
+                huella.update(bloque)
+    return huella.hexdigest()
+
+def leer_huella_modelo(directorio):
+    '''
+    Devuelve la huella del modelo guardada por MotorUsuarios.guardar junto a los arreglos, sin leerlos. Si la matriz
+    se guardó antes de que se guardara la huella, la calcula con huella_modelo.
+    '''
+    try:
+        with open(os.path.join(directorio, ARCHIVO_HUELLA_MODELO), encoding='utf-8') as f:
+            return f.read().strip()
+    except FileNotFoundError:
+        return huella_modelo(directorio)
+
+def _iniciar_worker(directorio):
+    '''
+    Abre el motor de usuarios en un proceso del pool. Los arreglos se mapean en memoria, así que los procesos
+    comparten sus páginas.
+    '''
+    global _motor_worker
+    _motor_worker = MotorUsuarios.desde_archivo(directorio)
+
+def _recomendar_trozo(inicio, fin, n_similares, n_resultados, bloque):
+    '''
+    Calcula las recomendaciones de los usuarios de las posiciones [inicio, fin). Se ejecuta en los procesos del pool.
+    '''
+    usuarios = _motor_worker.usuarios[inicio:fin].tolist()
+    return inicio, list(_motor_worker.recomendar_lote(usuarios, n_similares=n_similares, n_resultados=n_resultados,
+                                                      bloque=bloque))
+
+def precalcular_recomendaciones(directorio, salida, workers=None, tamano=TAMANO_TROZO_USUARIOS, n_similares=N_USUARIOS_SIMILARES,
+                                n_resultados=N_RECOMENDACIONES, bloque=256, usuarios=None):
+    '''
+    Calcula las recomendaciones de todos los usuarios de la matriz y las guarda en un parquet con una fila por
+    usuario ('user_id' y la lista 'recomendaciones'), para que la API no tenga que calcularlas en cada consulta.
+
+    Los usuarios se reparten en trozos entre los procesos del pool, y cada trozo se guarda en el directorio
+    `salida`.partes apenas termina. Si el proceso se interrumpe, al volver a ejecutarlo con el mismo modelo y los
+    mismos parámetros solo se calculan los trozos que faltan. Al terminar se unen los trozos en `salida`, con la
+    huella del modelo y los parámetros en los metadatos del esquema.
+
+    Args:
+        directorio (str): Directorio de la matriz de usuarios (piv_norm_csr).
+        salida (str): Archivo parquet de salida.
+        workers (int, optional): Procesos del pool. Por defecto, la cantidad de CPUs.
+        tamano (int): Cantidad de usuarios por trozo.
+        n_similares (int): Cantidad de usuarios similares que votan.
+        n_resultados (int): Cantidad de juegos a recomendar.
+        bloque (int): Cantidad de usuarios cuyas similitudes se calculan por vez dentro de un trozo.
+        usuarios (int, optional): Calcula solo los primeros `usuarios` usuarios, por ejemplo para medir el escalado.
+
+    Returns:
+        dict: Métricas: usuarios, trozos, trozos reanudados del checkpoint, usuarios calculados, workers, segundos y
+        usuarios calculados por segundo.
+    '''
+    inicio = time.perf_counter()
+    motor = MotorUsuarios.desde_archivo(directorio)
+    total = len(motor.usuarios) if usuarios is None else min(usuarios, len(motor.usuarios))
+    parametros = {'modelo': leer_huella_modelo(directorio), 'usuarios': total, 'tamano': tamano, 'n_similares': n_similares,
+                  'n_resultados': n_resultados}
+
+    # Los trozos guardados solo se reutilizan si se calcularon con el mismo modelo y los mismos parámetros
+    partes = salida + '.partes'
+    manifiesto = os.path.join(partes, 'manifiesto.json')
+    try:
+        with open(manifiesto, encoding='utf-8') as f:
+            reanudar = json.load(f) == parametros
+    except (OSError, ValueError):
+        reanudar = False
+    if not reanudar:
+        shutil.rmtree(partes, ignore_errors=True)
+        os.makedirs(partes)
+        with open(manifiesto, 'w', encoding='utf-8') as f:
+            json.dump(parametros, f)
+
+    def ruta_parte(posicion):
+        return os.path.join(partes, f'{posicion:010d}.parquet')
+
+    def guardar_parte(posicion, recomendaciones):
+        tabla = pa.table({'user_id': pa.array(motor.usuarios[posicion:posicion + len(recomendaciones)].tolist(), pa.string()),
+                          'recomendaciones': pa.array(recomendaciones, pa.list_(pa.string()))})
+        # Se escribe con otro nombre y se renombra, para que un trozo a medio escribir no cuente como terminado
+        pq.write_table(tabla, ruta_parte(posicion) + '.tmp')
+        os.replace(ruta_parte(posicion) + '.tmp', ruta_parte(posicion))
+
+    trozos = [(posicion, min(posicion + tamano, total)) for posicion in range(0, total, tamano)]
+    pendientes = [(desde, hasta) for desde, hasta in trozos if not os.path.exists(ruta_parte(desde))]
+    workers = workers or os.cpu_count()
+    inicio_calculo = time.perf_counter()
+    if workers > 1 and len(pendientes) > 1:
+        contexto = multiprocessing.get_context('spawn')
+        with ProcessPoolExecutor(max_workers=workers, mp_context=contexto, initializer=_iniciar_worker,
+                                 initargs=(directorio,)) as pool:
+            futuros = [pool.submit(_recomendar_trozo, desde, hasta, n_similares, n_resultados, bloque) for desde, hasta in pendientes]
+            for futuro in as_completed(futuros):
+                guardar_parte(*futuro.result())
+    else:
+        # Con un solo worker el pool solo agregaría el costo de abrir el motor en otro proceso
+        for desde, hasta in pendientes:
+            guardar_parte(desde, list(motor.recomendar_lote(motor.usuarios[desde:hasta].tolist(), n_similares=n_similares,
+                                                            n_resultados=n_resultados, bloque=bloque)))
+    segundos_calculo = time.perf_counter() - inicio_calculo
+
+    tabla = pa.concat_tables([pq.read_table(ruta_parte(desde)) for desde, _ in trozos]) if trozos else pa.table(
+        {'user_id': pa.array([], pa.string()), 'recomendaciones': pa.array([], pa.list_(pa.string()))})
+    tabla = tabla.replace_schema_metadata({clave: str(valor) for clave, valor in parametros.items() if clave != 'tamano'})
+    pq.write_table(tabla, salida + '.tmp')
+    os.replace(salida + '.tmp', salida)
+    shutil.rmtree(partes)
+
+    calculados = sum(hasta - desde for desde, hasta in pendientes)
+    return {
+        'usuarios': total,
+        'trozos': len(trozos),
+        'trozos_reanudados': len(trozos) - len(pendientes),
+        'calculados': calculados,
+        'workers': workers,
+        'segundos': round(time.perf_counter() - inicio, 2),
+        'usuarios_por_segundo': round(calculados / segundos_calculo, 1) if calculados else 0.0,
+    }
+
+class RecomendacionesPrecalculadas:
+    '''
+    Recomendaciones por usuario generadas con `precalcular_recomendaciones`, para responder /recomendacion_usuario
+    con una búsqueda en un diccionario en lugar de calcular los usuarios similares y sus votos.
+
+    Args:
+        tabla (pyarrow.Table): Tabla con las columnas 'user_id' y 'recomendaciones', y los metadatos 'modelo',
+            'n_similares' y 'n_resultados'.
+    '''
+    def __init__(self, tabla):
+        metadatos = {clave.decode(): valor.decode() for clave, valor in (tabla.schema.metadata or {}).items()}
+        self.modelo = metadatos.get('modelo')
+        self.n_similares = int(metadatos.get('n_similares', -1))
+        self.n_resultados = int(metadatos.get('n_resultados', -1))
+        self.posiciones = {usuario: i for i, usuario in enumerate(tabla.column('user_id').to_pylist())}
+        self.recomendaciones = tabla.column('recomendaciones').combine_chunks()
+
+    @classmethod
+    def desde_parquet(cls, archivo):
+        return cls(pq.read_table(archivo, memory_map=True))
+
+    def __len__(self):
+        return len(self.posiciones)
+
+    def get(self, user, n_similares=N_USUARIOS_SIMILARES, n_resultados=N_RECOMENDACIONES):
+        '''
+        Devuelve la lista de juegos recomendados a un usuario, o None si no está en la tabla o si la tabla se calculó
+        con otros parámetros.
+        '''
+        posicion = self.posiciones.get(user)
+        if posicion is None or (n_similares, n_resultados) != (self.n_similares, self.n_resultados):
+            return None
+        return self.recomendaciones[posicion].as_py()
+
+    def nbytes(self):
+        '''
+        Devuelve una estimación de la memoria ocupada por la tabla y su diccionario de usuarios, en bytes.
+        '''
+        return self.recomendaciones.nbytes + sys.getsizeof(self.posiciones) + sum(len(usuario) for usuario in self.posiciones)
+
+def comparar_usuarios(piv_norm, user_sim_df, motor, n_consultas=200, semilla=42):
+    '''
+    Compara la memoria y la latencia de buscar usuarios similares con la matriz densa contra el motor disperso.
+
+    Args:
+        piv_norm (pandas.DataFrame): Matriz normalizada de juegos por usuarios.
+        user_sim_df (pandas.DataFrame): Matriz densa de similitud usuario-usuario.
+        motor (MotorUsuarios): Motor construido a partir del mismo `piv_norm`.
+        n_consultas (int): Cantidad de usuarios elegidos al azar para medir.
+        semilla (int): Semilla para elegir los usuarios.
+
+    Returns:
+        dict: Memoria en MB y percentiles 50 y 99 en milisegundos de cada método.
+    '''
+    rng = np.random.default_rng(semilla)
+    usuarios = rng.choice(user_sim_df.columns, size=n_consultas)
+
+    tiempos_denso, tiempos_motor = [], []
+    for user in usuarios:
+        inicio = time.perf_counter()
+        user_sim_df.sort_values(by=user, ascending=False).index[1:N_USUARIOS_SIMILARES + 1]
+        tiempos_denso.append(time.perf_counter() - inicio)
+
+        inicio = time.perf_counter()
+        motor.similares(user)
+        tiempos_motor.append(time.perf_counter() - inicio)
+
+    memoria = {'denso': (user_sim_df.memory_usage(deep=True).sum() + piv_norm.memory_usage(deep=True).sum()) / 1e6,
+               'motor': motor.nbytes() / 1e6}
+    resultado = {}
+    for metodo, tiempos in [('denso', tiempos_denso), ('motor', tiempos_motor)]:
+        ms = np.array(tiempos) * 1000
+        resultado[metodo] = {'memoria_mb': round(float(memoria[metodo]), 2),
+                             'p50_ms': round(float(np.percentile(ms, 50)), 4),
+                             'p99_ms': round(float(np.percentile(ms, 99)), 4)}
+    return resultado
+
+def construir_juegos(args):
+    item_sim_df = pd.read_parquet(args.entrada)
+
+    inicio = time.perf_counter()
+    tabla = construir_indice_vecinos(item_sim_df, k=args.k)
+    pq.write_table(tabla, args.salida)
+    print(f"Índice de {tabla.num_rows} juegos y k={args.k} construido en {time.perf_counter() - inicio:.2f} s")
+
+    indice = IndiceVecinos(tabla)
+    print(f"Tamaño de la matriz: {item_sim_df.memory_usage(deep=True).sum() / 1e6:.2f} MB en memoria, "
+          f"{os.path.getsize(args.entrada) / 1e6:.2f} MB en disco")
+    print(f"Tamaño del índice: {indice.nbytes() / 1e6:.2f} MB en memoria, "
+          f"{os.path.getsize(args.salida) / 1e6:.2f} MB en disco")
+
+    for metodo, percentiles in comparar_latencias(item_sim_df, indice, n_consultas=args.consultas).items():
+        print(f"Latencia {metodo}: p50 {percentiles['p50_ms']} ms, p99 {percentiles['p99_ms']} ms")
+
+def construir_usuarios(args):
+    piv_norm = pd.read_parquet(args.entrada)
+
+    inicio = time.perf_counter()
+    motor = MotorUsuarios.desde_piv_norm(piv_norm)
+    motor.guardar(args.salida)
+    print(f"Matriz dispersa de {len(motor.usuarios)} usuarios y {len(motor.items)} juegos "
+          f"({motor.matriz.nnz} calificaciones) construida en {time.perf_counter() - inicio:.2f} s")
+
+    if args.comparar:
+        user_sim_df = pd.read_parquet(args.comparar)
+        for metodo, medidas in comparar_usuarios(piv_norm, user_sim_df, motor, n_consultas=args.consultas).items():
+            print(f"{metodo}: {medidas['memoria_mb']} MB, p50 {medidas['p50_ms']} ms, p99 {medidas['p99_ms']} ms")
+
+def modelo_notebook(df):
+    '''
+    Construcción densa del notebook 04: pivot_table, normalización fila por fila con apply y cosine_similarity en float64.
+    Se usa como referencia para comparar resultados, tiempo y memoria.
+
+    Returns:
+        tuple: piv_norm (juegos × usuarios) y la matriz densa de similitud entre juegos.
+    '''
+    from sklearn.metrics.pairwise import cosine_similarity
+
+    piv = df.pivot_table(index=['user_id'], columns=['item_name'], values='rating')
+    piv_norm = piv.apply(lambda x: (x - np.mean(x)) / (np.max(x) - np.min(x)), axis=1)
+    piv_norm.fillna(0, inplace=True)
+    piv_norm = piv_norm.T
+    piv_norm = piv_norm.loc[:, (piv_norm != 0).any(axis=0)]
+    return piv_norm, cosine_similarity(sparse.csr_matrix(piv_norm.values))
+
+def _medir(funcion, *args):
+    '''
+    Ejecuta una función y devuelve su resultado, los segundos que tardó y el pico de memoria que reservó en MB.
+    '''
+    tracemalloc.start()
+    inicio = time.perf_counter()
+    resultado = funcion(*args)
+    segundos = time.perf_counter() - inicio
+    pico = tracemalloc.get_traced_memory()[1] / 1e6
+    tracemalloc.stop()
+    return resultado, segundos, pico
+
+def construir_modelo(args):
+    df = pd.read_csv(args.entrada)
+
+    def construir():
+        matriz, usuarios, items = matriz_calificaciones(df)
+        tabla = construir_indice_vecinos_dispersa(matriz.T.tocsr(), items, k=args.k, bloque=args.bloque)
+        return matriz, usuarios, items, tabla
+
+    (matriz, usuarios, items, tabla), segundos, pico = _medir(construir)
+    pq.write_table(tabla, args.salida_juegos)
+    MotorUsuarios(matriz, usuarios, items).guardar(args.salida_usuarios)
+    print(f"Modelo de {len(usuarios)} usuarios, {len(items)} juegos y {matriz.nnz} calificaciones construido en "
+          f"{segundos:.2f} s, con un pico de {pico:.1f} MB")
+    print(f"Índice de juegos guardado en '{args.salida_juegos}' y matriz de usuarios en '{args.salida_usuarios}'")
+
+    if args.comparar:
+        (piv_norm, item_sim), segundos, pico = _medir(modelo_notebook, df)
+        print(f"Notebook (pivot_table denso y cosine_similarity): {segundos:.2f} s, con un pico de {pico:.1f} MB")
+        iguales = (list(piv_norm.index.astype(str)) == list(items) and list(piv_norm.columns.astype(str)) == list(usuarios)
+                   and np.allclose(piv_norm.to_numpy().T, matriz.toarray()))
+        print(f"Matriz normalizada igual a piv_norm del notebook: {iguales}")
+        # Coincidencia de los k vecinos con el ordenamiento de la matriz densa del notebook
+        indice = IndiceVecinos(tabla)
+        referencia = construir_indice_vecinos(pd.DataFrame(item_sim, index=piv_norm.index, columns=piv_norm.index), k=args.k)
+        referencia = IndiceVecinos(referencia)
+        coincidencia = np.mean([len(set(a) & set(b)) / len(a) for a, b in zip(indice.vecinos, referencia.vecinos)])
+        print(f"Vecinos en común con la similitud densa en float64: {coincidencia:.2%}")
+
+def precalcular(args):
+    entrada = args.entrada
+    if args.escalado:
+        # Mide los usuarios por segundo con cada cantidad de workers sobre los mismos usuarios, sin tocar la salida
+        base = None
+        for workers in args.escalado:
+            with tempfile.TemporaryDirectory() as temporal:
+                metricas = precalcular_recomendaciones(entrada, os.path.join(temporal, 'recomendaciones.parquet'), workers=workers,
+                                                       tamano=args.trozo, usuarios=args.muestra)
+            base = base or metricas['usuarios_por_segundo']
+            aceleracion = metricas['usuarios_por_segundo'] / base if base else 0.0
+            print(f"{workers} workers: {metricas['usuarios_por_segundo']} usuarios/s, aceleración {aceleracion:.2f}x, "
+                  f"eficiencia {aceleracion / workers:.0%}")
+        return
+
+    metricas = precalcular_recomendaciones(entrada, args.salida, workers=args.workers, tamano=args.trozo)
+    print(f"Recomendaciones precalculadas: {metricas}")
+    print(f"Se guardó el archivo {args.salida}")
+
+    if args.verificar:
+        # Compara usuarios al azar con el cálculo en vivo de la API
+        motor = MotorUsuarios.desde_archivo(entrada)
+        precalculadas = RecomendacionesPrecalculadas.desde_parquet(args.salida)
+        rng = np.random.default_rng(42)
+        muestra = motor.usuarios[rng.choice(len(motor.usuarios), size=min(args.verificar, len(motor.usuarios)), replace=False)].tolist()
+        distintas = sum(precalculadas.get(user) != motor.recomendar(user) for user in muestra)
+        print(f"Verificación: {distintas} diferencias en {len(muestra)} usuarios")
+        if distintas:
+            raise SystemExit(1)
+
+def main():
+    parser = argparse.ArgumentParser(description='Construye los índices que usa la API para recomendar juegos.')
+    subparsers = parser.add_subparsers(dest='comando', required=True)
+
+    juegos = subparsers.add_parser('juegos', help='Índice de juegos similares a partir de item_sim_df')
+    juegos.add_argument('--entrada', default='data/item_sim_df.parquet', help='Matriz de similitud ítem-ítem')
+    juegos.add_argument('--salida', default='data/item_topk.parquet', help='Archivo parquet del índice')
+    juegos.add_argument('--k', type=int, default=K_VECINOS, help='Cantidad de vecinos por juego')
+    juegos.add_argument('--consultas', type=int, default=200, help='Consultas para medir la latencia')
+    juegos.set_defaults(funcion=construir_juegos)
+
+    usuarios = subparsers.add_parser('usuarios', help='Matriz dispersa de usuarios a partir de piv_norm')
+    usuarios.add_argument('--entrada', default='data/piv_norm.parquet', help='Matriz normalizada de juegos por usuarios')
+    usuarios.add_argument('--salida', default='data/piv_norm_csr', help='Directorio de la matriz dispersa')
+    usuarios.add_argument('--comparar', default=None, help='user_sim_df.parquet para comparar memoria y latencia')
+    usuarios.add_argument('--consultas', type=int, default=200, help='Consultas para medir la latencia')
+    usuarios.set_defaults(funcion=construir_usuarios)
+
+    modelo = subparsers.add_parser('modelo', help='Matriz de usuarios e índice de juegos a partir de las calificaciones')
+    modelo.add_argument('--entrada', default='data/df_recomendacion.csv', help='Calificaciones (user_id, item_name, rating)')
+    modelo.add_argument('--salida-juegos', default='data/item_topk.parquet', help='Archivo parquet del índice de juegos')
+    modelo.add_argument('--salida-usuarios', default='data/piv_norm_csr', help='Directorio de la matriz dispersa')
+    modelo.add_argument('--k', type=int, default=K_VECINOS, help='Cantidad de vecinos por juego')
+    modelo.add_argument('--bloque', type=int, default=1024, help='Juegos cuya similitud se calcula por vez')
+    modelo.add_argument('--comparar', action='store_true', help='Compara con la construcción densa del notebook')
+    modelo.set_defaults(funcion=construir_modelo)
+
+    precalculo = subparsers.add_parser('precalcular', help='Recomendaciones de todos los usuarios, para servirlas sin calcularlas')
+    precalculo.add_argument('--entrada', default='data/piv_norm_csr', help='Directorio de la matriz dispersa de usuarios')
+    precalculo.add_argument('--salida', default=os.path.join('data', ARCHIVO_RECOMENDACIONES_USUARIOS), help='Archivo parquet de salida')
+    precalculo.add_argument('--workers', type=int, default=None, help='Procesos del pool (por defecto, la cantidad de CPUs)')
+    precalculo.add_argument('--trozo', type=int, default=TAMANO_TROZO_USUARIOS, help='Usuarios por trozo (y por checkpoint)')
+    precalculo.add_argument('--verificar', type=int, default=0, metavar='N', help='Compara N usuarios al azar con el cálculo en vivo')
+    precalculo.add_argument('--escalado', type=int, nargs='+', metavar='WORKERS',
+                            help='Solo mide los usuarios por segundo con cada cantidad de workers (por ejemplo 1 2 4 8)')
+    precalculo.add_argument('--muestra', type=int, default=20000, help='Usuarios que se calculan al medir el escalado')
+    precalculo.set_defaults(funcion=precalcular)
+
+    args = parser.parse_args()
+    args.funcion(args)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,216 @@
+## SERIALIZACIÓN, FORMATO Y COMPRESIÓN DE LAS RESPUESTAS
+# Las respuestas se serializan con orjson, que convierte los tipos de NumPy sin pasar por jsonable_encoder. Los
+# clientes que lo piden en el encabezado Accept las reciben como Arrow IPC (stream) y, según Accept-Encoding, las que
+# superan configuracion.COMPRIMIR_DESDE bytes se comprimen con brotli o gzip.
+# Importaciones
+import gzip
+import zlib
+
+import brotli
+import orjson
+import pyarrow as pa
+from starlette.responses import Response
+
+import configuracion
+from metricas import fase
+
+# Formatos de respuesta y su tipo de contenido. Ante un empate en Accept (por ejemplo con */*) gana el primero
+FORMATOS = {'json': 'application/json', 'arrow': 'application/vnd.apache.arrow.stream'}
+# Codificaciones de compresión, en orden de preferencia ante un empate en Accept-Encoding
+CODIFICACIONES = ('br', 'gzip')
+# Niveles de compresión: rápidos, porque se comprime en cada respuesta
+CALIDAD_BROTLI = 5
+NIVEL_GZIP = 6
+# Opciones de orjson: arreglos y escalares de NumPy, y claves que no son str (como las de .to_dict())
+OPCIONES_JSON = orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS
+
+# Funciones
+def _por_defecto(valor):
+    '''
+    Convierte los valores que orjson no serializa por sí mismo, como los escalares de NumPy de tipos poco comunes.
+    '''
+    if hasattr(valor, 'item'):
+        return valor.item()
+    raise TypeError(f'No se puede serializar un {type(valor).__name__}')
+
+def serializar_json(contenido):
+    '''
+    Serializa una respuesta en JSON (UTF-8, sin espacios, como JSONResponse). Los NaN se escriben como null.
+
+    Returns:
+        bytes: El JSON serializado.
+    '''
+    return orjson.dumps(contenido, default=_por_defecto, option=OPCIONES_JSON)
+
+def _calidades(encabezado):
+    '''
+    Devuelve los valores de un encabezado Accept o Accept-Encoding con su calidad, por ejemplo
+    'gzip;q=0.5, br' -> {'gzip': 0.5, 'br': 1.0}.
+    '''
+    calidades = {}
+    for parte in encabezado.split(','):
+        valor, *parametros = (texto.strip() for texto in parte.split(';'))
+        if not valor:
+            continue
+        calidad = 1.0
+        for parametro in parametros:
+            clave, _, numero = parametro.partition('=')
+            if clave.strip() == 'q':
+                try:
+                    calidad = float(numero)
+                except ValueError:
+                    calidad = 0.0
+        calidades[valor.lower()] = calidad
+    return calidades
+
+def negociar_formato(accept):
+    '''
+    Elige el formato de la respuesta según el encabezado Accept. Si no acepta ninguno de FORMATOS se responde JSON,
+    como antes de que hubiera otros formatos.
+
+    Returns:
+        str: Una de las claves de FORMATOS.
+    '''
+    if not accept:
+        return 'json'
+    calidades = _calidades(accept)
+
+    def calidad(formato):
+        tipo = FORMATOS[formato]
+        return calidades.get(tipo, calidades.get(tipo.split('/')[0] + '/*', calidades.get('*/*', 0.0)))
+
+    elegido = max(FORMATOS, key=calidad)
+    return elegido if calidad(elegido) > 0 else 'json'
+
+def negociar_codificacion(accept_encoding):
+    '''
+    Elige la compresión de la respuesta según el encabezado Accept-Encoding.
+
+    Returns:
+        str: 'br', 'gzip' o None si el cliente no acepta ninguna.
+    '''
+    if not accept_encoding:
+        return None
+    calidades = _calidades(accept_encoding)
+
+    def calidad(codificacion):
+        return calidades.get(codificacion, calidades.get('*', 0.0))
+
+    elegida = max(CODIFICACIONES, key=calidad)
+    return elegida if calidad(elegida) > 0 else None
+
+def negociar(request):
+    '''
+    Devuelve el formato y la compresión que acepta el cliente de una petición.
+    '''
+    return negociar_formato(request.headers.get('accept')), negociar_codificacion(request.headers.get('accept-encoding'))
+
+def etag_representacion(etag, formato, codificacion):
+    '''
+    Devuelve el ETag de una representación de la respuesta: cada formato y compresión tiene el suyo, para que un
+    cache no entregue a un cliente una representación que no pidió. El de JSON sin comprimir es `etag` sin cambios.
+    `codificacion` es la que se aplicó al cuerpo (None si se envió sin comprimir), no la que acepta el cliente.
+    '''
+    sufijo = ''.join(f'-{parte}' for parte in (formato if formato != 'json' else None, codificacion) if parte)
+    return etag[:-1] + sufijo + '"' if sufijo else etag
+
+def _columna_arrow(valores):
+    '''
+    Convierte los valores de una columna en un arreglo de Arrow. Si tienen tipos que no se pueden combinar (por
+    ejemplo diccionarios y mensajes de texto en los resultados de un lote), se guarda el JSON de cada valor.
+    '''
+    try:
+        return pa.array(valores)
+    except (pa.ArrowInvalid, pa.ArrowTypeError):
+        return pa.array([None if valor is None else serializar_json(valor).decode() for valor in valores], type=pa.string())
+
+def tabla_arrow(contenido):
+    '''
+    Convierte una respuesta en una tabla de Arrow: una fila por elemento si es una lista de diccionarios, una sola
+    fila si es un diccionario (los diccionarios anidados quedan como structs) y, si no, una columna 'resultado'.
+    '''
+    if isinstance(contenido, list) and contenido and all(isinstance(fila, dict) for fila in contenido):
+        filas = contenido
+    elif isinstance(contenido, dict):
+        filas = [contenido]
+    else:
+        filas = [{'resultado': contenido}]
+    columnas = list(dict.fromkeys(clave for fila in filas for clave in fila))
+    return pa.table({str(columna): _columna_arrow([fila.get(columna) for fila in filas]) for columna in columnas})
+
+def codificar(contenido, formato):
+    '''
+    Serializa una respuesta en un formato de FORMATOS.
+
+    Returns:
+        bytes: El cuerpo de la respuesta.
+    '''
+    if formato == 'arrow':
+        tabla = tabla_arrow(contenido)
+        destino = pa.BufferOutputStream()
+        with pa.ipc.new_stream(destino, tabla.schema) as escritor:
+            escritor.write_table(tabla)
+        return destino.getvalue().to_pybytes()
+    return serializar_json(contenido)
+
+def comprimir(cuerpo, codificacion):
+    '''
+    Comprime un cuerpo con 'br' o 'gzip'. El gzip no lleva fecha, así que la misma respuesta da los mismos bytes.
+    '''
+    if codificacion == 'br':
+        return brotli.compress(cuerpo, quality=CALIDAD_BROTLI)
+    return gzip.compress(cuerpo, compresslevel=NIVEL_GZIP, mtime=0)
+
+async def comprimir_flujo(trozos, codificacion):
+    '''
+    Comprime un flujo de trozos de bytes. Cada trozo se envía comprimido apenas llega (con un flush), así que el
+    cliente recibe cada resultado sin esperar al final.
+
+    Args:
+        trozos: Iterador asíncrono de bytes.
+        codificacion (str): 'br' o 'gzip'.
+
+    Yields:
+        bytes: Los trozos comprimidos.
+    '''
+    if codificacion == 'br':
+        compresor = brotli.Compressor(quality=CALIDAD_BROTLI)
+        async for trozo in trozos:
+            yield compresor.process(trozo) + compresor.flush()
+        yield compresor.finish()
+    else:
+        compresor = zlib.compressobj(NIVEL_GZIP, wbits=31)
+        async for trozo in trozos:
+            yield compresor.compress(trozo) + compresor.flush(zlib.Z_SYNC_FLUSH)
+        yield compresor.flush()
+
+def responder(contenido, nombre, formato='json', codificacion=None, headers=None, etag=None):
+    '''
+    Arma la respuesta HTTP de una consulta: la serializa en el formato pedido y, si supera
+    configuracion.COMPRIMIR_DESDE bytes, la comprime. El tiempo de cada paso se registra como las fases 'codificar'
+    y 'comprimir' de la consulta.
+
+    Args:
+        contenido: Resultado de la función de api_functions.
+        nombre (str): Nombre de la función, para las métricas.
+        formato (str): Una de las claves de FORMATOS.
+        codificacion (str, optional): 'br', 'gzip' o None para no comprimir.
+        headers (dict, optional): Encabezados adicionales, como Cache-Control.
+        etag (str, optional): ETag de la consulta. Se envía con el sufijo del formato y, solo si el cuerpo se
+            comprimió, el de la compresión (ver etag_representacion).
+
+    Returns:
+        starlette.responses.Response: La respuesta, con Content-Type, Content-Encoding, ETag y Vary.
+    '''
+    with fase(nombre, 'codificar'):
+        cuerpo = codificar(contenido, formato)
+    encabezados = {**(headers or {}), 'Vary': 'Accept, Accept-Encoding'}
+    if etag is not None:
+        encabezados['ETag'] = etag_representacion(etag, formato, None)
+    if codificacion and len(cuerpo) >= configuracion.COMPRIMIR_DESDE:
+        with fase(nombre, 'comprimir'):
+            cuerpo = comprimir(cuerpo, codificacion)
+        encabezados['Content-Encoding'] = codificacion
+        if etag is not None:
+            encabezados['ETag'] = etag_representacion(etag, formato, codificacion)
+    return Response(cuerpo, headers=encabezados, media_type=FORMATOS[formato])
@@ -0,0 +1,187 @@
+## ANÁLISIS DE SENTIMIENTO EN PARALELO CON CACHE PERSISTENTE
+# Calcula las mismas etiquetas 0/1/2 que utils.analisis_sentimiento, repartiendo las reviews en un pool de procesos
+# y guardando cada resultado en una base SQLite por hash del texto, para no volver a calcular reviews ya vistas.
+# Uso: python sentimiento.py data/user_review_limpio.csv --salida data/user_review_sentimiento.csv
+# Importaciones
+import argparse
+import hashlib
+import multiprocessing
+import os
+import sqlite3
+import time
+from concurrent.futures import ProcessPoolExecutor
+from importlib import metadata
+
+import pandas as pd
+
+import utils
+
+# Base SQLite donde se guardan las etiquetas ya calculadas. Está fuera de data/ para que escribirla no cambie la
+# versión de los datos que sirve la API (ver cache.version_datos)
+ARCHIVO_CACHE = os.path.join('.cache', 'cache_sentimiento.sqlite')
+# Cantidad de reviews que procesa un worker por vez
+TAMANO_TROZO = 2000
+# Las etiquetas dependen de la versión de TextBlob y de los umbrales de utils.analisis_sentimiento. Si cambian, se
+# cambia esta versión y las etiquetas guardadas dejan de coincidir con los hashes nuevos
+VERSION_MODELO = f"textblob-{metadata.version('textblob')}-umbral-0.2"
+# SQLite admite una cantidad limitada de parámetros por consulta
+_MAX_PARAMETROS = 900
+
+# Funciones
+def hash_texto(texto):
+    '''
+    Devuelve el hash SHA-1 del texto de una review junto con la versión del modelo.
+    '''
+    return hashlib.sha1(f'{VERSION_MODELO}\n{texto}'.encode('utf-8')).hexdigest()
+
+def _puntuar_trozo(textos):
+    '''
+    Calcula la etiqueta de sentimiento de cada texto de un trozo. Se ejecuta en los procesos del pool.
+    '''
+    return [utils.analisis_sentimiento(texto) for texto in textos]
+
+class CacheSentimiento:
+    '''
+    Cache persistente en SQLite de las etiquetas de sentimiento, por hash del texto de la review.
+
+    Args:
+        ruta (str): Archivo de la base SQLite. Se crea si no existe.
+    '''
+    def __init__(self, ruta=ARCHIVO_CACHE):
+        directorio = os.path.dirname(ruta)
+        if directorio:
+            os.makedirs(directorio, exist_ok=True)
+        self.conexion = sqlite3.connect(ruta)
+        self.conexion.execute('CREATE TABLE IF NOT EXISTS sentimiento (hash TEXT PRIMARY KEY, etiqueta INTEGER NOT NULL)')
+
+    def buscar(self, hashes):
+        '''
+        Devuelve un diccionario hash -> etiqueta con los hashes que ya están en el cache.
+        '''
+        encontrados = {}
+        hashes = list(hashes)
+        for inicio in range(0, len(hashes), _MAX_PARAMETROS):
+            trozo = hashes[inicio:inicio + _MAX_PARAMETROS]
+            consulta = f"SELECT hash, etiqueta FROM sentimiento WHERE hash IN ({','.join('?' * len(trozo))})"
+            encontrados.update(self.conexion.execute(consulta, trozo))
+        return encontrados
+
+    def guardar(self, pares):
+        '''
+        Guarda pares (hash, etiqueta) en el cache.
+        '''
+        with self.conexion:
+            self.conexion.executemany('INSERT OR REPLACE INTO sentimiento (hash, etiqueta) VALUES (?, ?)', pares)
+
+    def cerrar(self):
+        self.conexion.close()
+
+def puntuar_reviews(textos, ruta_cache=ARCHIVO_CACHE, workers=None, tamano=TAMANO_TROZO):
+    '''
+    Calcula la etiqueta de sentimiento de cada review, igual que utils.analisis_sentimiento.
+
+    Los textos repetidos se calculan una sola vez, los que ya están en el cache no se calculan y el resto se reparte
+    en trozos entre los procesos del pool. Cada trozo se guarda en el cache apenas termina, así que si se interrumpe
+    el proceso lo ya calculado no se pierde.
+
+    Args:
+        textos (iterable): Textos de las reviews. Los valores nulos reciben la etiqueta 1 (neutral).
+        ruta_cache (str): Base SQLite del cache.
+        workers (int, optional): Procesos del pool. Por defecto, la cantidad de CPUs.
+        tamano (int): Cantidad de reviews por trozo.
+
+    Returns:
+        tuple: La lista de etiquetas (0, 1 o 2) en el orden de `textos` y un diccionario con las métricas: reviews,
+        textos distintos, aciertos del cache, tasa de aciertos, reviews calculadas, segundos y reviews calculadas por segundo.
+    '''
+    inicio = time.perf_counter()
+    textos = [None if pd.isna(texto) else texto for texto in textos]
+    hashes = [None if texto is None else hash_texto(texto) for texto in textos]
+
+    # Un texto por hash distinto
+    distintos = {}
+    for texto, clave in zip(textos, hashes):
+        if clave is not None:
+            distintos.setdefault(clave, texto)
+
+    cache = CacheSentimiento(ruta_cache)
+    try:
+        etiquetas = cache.buscar(distintos)
+        aciertos = len(etiquetas)
+        pendientes = [clave for clave in distintos if clave not in etiquetas]
+
+        inicio_calculo = time.perf_counter()
+        workers = workers or os.cpu_count()
+        trozos = [pendientes[i:i + tamano] for i in range(0, len(pendientes), tamano)]
+        textos_trozos = ([distintos[clave] for clave in trozo] for trozo in trozos)
+        if workers > 1 and len(trozos) > 1:
+            contexto = multiprocessing.get_context('spawn')
+            with ProcessPoolExecutor(max_workers=workers, mp_context=contexto) as pool:
+                for claves, resultado in zip(trozos, pool.map(_puntuar_trozo, textos_trozos)):
+                    pares = list(zip(claves, resultado))
+                    cache.guardar(pares)
+                    etiquetas.update(pares)
+        else:
+            # Con un solo worker el pool solo agregaría el costo de enviar los textos a otro proceso
+            for claves, textos_trozo in zip(trozos, textos_trozos):
+                pares = list(zip(claves, _puntuar_trozo(textos_trozo)))
+                cache.guardar(pares)
+                etiquetas.update(pares)
+        segundos_calculo = time.perf_counter() - inicio_calculo
+    finally:
+        cache.cerrar()
+
+    resultado = [1 if clave is None else etiquetas[clave] for clave in hashes]
+    metricas = {
+        'reviews': len(textos),
+        'textos_distintos': len(distintos),
+        'aciertos_cache': aciertos,
+        'tasa_aciertos': round(aciertos / len(distintos), 4) if distintos else 0.0,
+        'calculadas': len(pendientes),
+        'segundos': round(time.perf_counter() - inicio, 2),
+        'calculadas_por_segundo': round(len(pendientes) / segundos_calculo, 1) if pendientes else 0.0,
+    }
+    return resultado, metricas
+
+def puntuar_serie(serie, **kwargs):
+    '''
+    Versión de `puntuar_reviews` para una columna de pandas: reemplaza a serie.apply(utils.analisis_sentimiento).
+
+    Returns:
+        pandas.Series: Las etiquetas, con el mismo índice que `serie`.
+    '''
+    etiquetas, metricas = puntuar_reviews(serie.tolist(), **kwargs)
+    print(f"Análisis de sentimiento: {metricas}")
+    return pd.Series(etiquetas, index=serie.index, name=serie.name, dtype='int64')
+
+def main():
+    parser = argparse.ArgumentParser(description='Análisis de sentimiento en paralelo con cache persistente.')
+    parser.add_argument('entrada', help='CSV o parquet con las reviews')
+    parser.add_argument('--salida', required=True, help="Archivo CSV o parquet de salida, con la columna 'sentiment_analysis'")
+    parser.add_argument('--columna', default='reviews_review', help='Columna con el texto de las reviews')
+    parser.add_argument('--cache', default=ARCHIVO_CACHE, help='Base SQLite del cache')
+    parser.add_argument('--workers', type=int, default=None, help='Procesos del pool (por defecto, la cantidad de CPUs)')
+    parser.add_argument('--verificar', type=int, default=0, metavar='N',
+                        help='Compara N reviews al azar con utils.analisis_sentimiento')
+    args = parser.parse_args()
+
+    df = pd.read_parquet(args.entrada) if args.entrada.endswith('.parquet') else pd.read_csv(args.entrada, encoding='utf-8')
+    etiquetas, metricas = puntuar_reviews(df[args.columna].tolist(), ruta_cache=args.cache, workers=args.workers)
+    df['sentiment_analysis'] = etiquetas
+    print(f"Análisis de sentimiento: {metricas}")
+
+    if args.verificar:
+        muestra = df.dropna(subset=[args.columna]).sample(min(args.verificar, len(df)), random_state=42)
+        distintas = (muestra[args.columna].apply(utils.analisis_sentimiento) != muestra['sentiment_analysis']).sum()
+        print(f"Verificación: {distintas} diferencias en {len(muestra)} reviews")
+        if distintas:
+            raise SystemExit(1)
+
+    if args.salida.endswith('.parquet'):
+        df.to_parquet(args.salida, index=False)
+    else:
+        df.to_csv(args.salida, index=False, encoding='utf-8')
+    print(f"Se guardó el archivo {args.salida}")
+
+if __name__ == '__main__':
+    main()
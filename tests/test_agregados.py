@@ -0,0 +1,105 @@
+## PRUEBAS DE EQUIVALENCIA DE LOS AGREGADOS PRECALCULADOS CON LAS CONSULTAS ORIGINALES
+# Uso: python -m pytest -q tests
+# Importaciones
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+import pytest
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+os.environ.setdefault('API_DIRECTORIO_DATOS', os.path.join(RAIZ, 'data'))
+os.environ.setdefault('API_DIRECTORIO_VERSIONES', '')
+
+import api_functions as af
+from agregados import guardar_agregados, verificar_agregados
+from datos import Datos
+from tipos import PREFIJO_ID, PREFIJO_PERFIL
+
+# Funciones
+def developer_original(df_items_developer, desarrollador):
+    # api_functions.developer antes de los agregados
+    data_filtrada = df_items_developer[df_items_developer['developer'] == desarrollador]
+    cantidad_por_año = data_filtrada.groupby('release_anio')['item_id'].count()
+    cantidad_gratis_por_año = data_filtrada[data_filtrada['price'] == 0.0].groupby('release_anio')['item_id'].count()
+    porcentaje_gratis_por_año = (cantidad_gratis_por_año / cantidad_por_año * 100).fillna(0).astype(int)
+    return {'cantidad_por_año': cantidad_por_año.to_dict(), 'porcentaje_gratis_por_año': porcentaje_gratis_por_año.to_dict()}
+
+def sentiment_analysis_original(df_reviews, anio):
+    # api_functions.sentiment_analysis antes de los agregados
+    sentiment_counts = {'Negative': 0, 'Neutral': 0, 'Positive': 0}
+    for _, row in df_reviews[df_reviews['release_anio'] == anio].iterrows():
+        sentiment_counts[{0: 'Negative', 1: 'Neutral', 2: 'Positive'}[row['sentiment_analysis']]] += 1
+    return sentiment_counts
+
+def userforgenre_original(df_playtime_forever, genero):
+    # api_functions.userforgenre antes del top precalculado
+    data_por_genero = df_playtime_forever[df_playtime_forever['genres'] == genero]
+    top_users = data_por_genero.groupby(['user_url', 'user_id'])['playtime_horas'].sum().nlargest(5).reset_index()
+    return {index + 1: {'user_id': row['user_id'], 'user_url': row['user_url']} for index, row in top_users.iterrows()}
+
+@pytest.fixture(scope='module')
+def tablas():
+    '''
+    Tablas pequeñas con desarrolladores sin items gratuitos, años sin dato, años sin reviews de alguna categoría y
+    usuarios empatados en horas de juego.
+    '''
+    rng = np.random.default_rng(7)
+    n = 400
+    df_items_developer = pd.DataFrame({
+        'price': rng.choice([0.0, 0.99, 4.99, 19.99], n),
+        'release_anio': rng.choice(['2014', '2015', '2016', 'Dato no disponible'], n),
+        'developer': rng.choice(['Valve', 'Ubisoft', 'Indie Solo', 'Sin Gratis'], n),
+        'item_id': np.arange(n),
+    })
+    df_items_developer.loc[df_items_developer['developer'] == 'Sin Gratis', 'price'] = 9.99
+    df_reviews = pd.DataFrame({
+        'release_anio': rng.choice(['2010', '2011', '2012', 'Dato no disponible'], n),
+        'sentiment_analysis': rng.choice([0, 1, 2], n),
+    })
+    # Año con reviews de una sola categoría
+    df_reviews.loc[:9, 'release_anio'] = '2009'
+    df_reviews.loc[:9, 'sentiment_analysis'] = 2
+    usuarios = [f'usuario{i}' for i in range(30)] + [f'7656119800000{i:04d}' for i in range(10)]
+    user_id = rng.choice(usuarios, n)
+    df_playtime_forever = pd.DataFrame({
+        'genres': rng.choice(['Action', 'Indie', 'RPG'], n),
+        'user_id': user_id,
+        'user_url': [(PREFIJO_PERFIL if u.isdigit() else PREFIJO_ID) + u for u in user_id],
+        # Horas enteras y pocas, para que haya usuarios empatados en el top
+        'playtime_horas': rng.integers(0, 4, n).astype(float),
+    })
+    return df_items_developer, df_reviews, df_playtime_forever
+
+@pytest.fixture(scope='module')
+def directorio(tablas, tmp_path_factory):
+    directorio = tmp_path_factory.mktemp('agregados')
+    for df, archivo in zip(tablas, ['df_items_developer.parquet', 'df_reviews.parquet', 'df_playtime_forever.parquet']):
+        df.to_parquet(directorio / archivo)
+    guardar_agregados(str(directorio))
+    return str(directorio)
+
+def test_verificar_agregados_sin_diferencias(directorio):
+    assert verificar_agregados(directorio) == []
+
+@pytest.mark.parametrize('motor', ['indices', 'arrow'])
+def test_developer_igual_a_la_consulta_original(tablas, directorio, motor):
+    df_items_developer = tablas[0]
+    datos = Datos(directorio, motor=motor)
+    for desarrollador in list(df_items_developer['developer'].unique()) + ['Desarrollador que no existe']:
+        assert af.developer(desarrollador, datos=datos) == developer_original(df_items_developer, desarrollador)
+
+@pytest.mark.parametrize('motor', ['indices', 'arrow'])
+def test_sentiment_analysis_igual_a_la_consulta_original(tablas, directorio, motor):
+    df_reviews = tablas[1]
+    datos = Datos(directorio, motor=motor)
+    for anio in list(df_reviews['release_anio'].unique()) + ['1800']:
+        assert af.sentiment_analysis(anio, datos=datos) == sentiment_analysis_original(df_reviews, anio)
+
+def test_userforgenre_igual_a_la_consulta_original(tablas, directorio, monkeypatch):
+    df_playtime_forever = tablas[2]
+    monkeypatch.setattr(af.gestor, 'datos', lambda: Datos(directorio))
+    for genero in df_playtime_forever['genres'].unique():
+        assert af.userforgenre(genero) == userforgenre_original(df_playtime_forever, genero)
@@ -0,0 +1,83 @@
+## PRUEBAS DE LA VERSIÓN DE LOS DATOS DEL CACHE DE RESPUESTAS Y DE LA RECARGA DE LA INSTANTÁNEA ACTIVA
+# Uso: python -m pytest -q tests
+# Importaciones
+import os
+import shutil
+import sys
+import time
+
+import pandas as pd
+import pytest
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+
+from agregados import ARCHIVO_DEVELOPER_ANIO, ARCHIVO_SENTIMIENTO_ANIO
+from cache import CacheRespuestas, version_datos
+from datos import ARCHIVOS_DATOS
+from instantaneas import GestorInstantaneas
+
+# Funciones
+@pytest.fixture
+def directorio(tmp_path):
+    for archivo in (ARCHIVO_DEVELOPER_ANIO, ARCHIVO_SENTIMIENTO_ANIO):
+        shutil.copy(os.path.join(RAIZ, 'data', archivo), tmp_path / archivo)
+    return tmp_path
+
+def reescribir_sentimiento(directorio, anio, negativas):
+    '''
+    Reescribe en su lugar df_sentimiento_anio.parquet cambiando la cantidad de reviews negativas de un año.
+    '''
+    ruta = directorio / ARCHIVO_SENTIMIENTO_ANIO
+    df = pd.read_parquet(ruta)
+    df.loc[df['release_anio'] == anio, 'Negative'] = negativas
+    df.to_parquet(ruta)
+    # Se asegura que cambie la fecha de modificación aunque el sistema de archivos tenga poca resolución
+    estado = os.stat(ruta)
+    os.utime(ruta, ns=(estado.st_atime_ns, estado.st_mtime_ns + 10 ** 9))
+
+def esperar_carga(gestor, limite=10):
+    inicio = time.monotonic()
+    while gestor.cargando is not None and time.monotonic() - inicio < limite:
+        time.sleep(0.01)
+    assert gestor.cargando is None
+
+def test_version_ignora_los_archivos_que_no_carga_la_api(directorio):
+    version = version_datos(str(directorio), ARCHIVOS_DATOS)
+    (directorio / 'cache_sentimiento.sqlite').write_bytes(b'etiquetas')
+    (directorio / 'user_review_limpio.csv').write_text('review\n')
+    assert version_datos(str(directorio), ARCHIVOS_DATOS) == version
+    # Sin lista de archivos se consideran todos los del directorio
+    assert version_datos(str(directorio)) != version
+
+def test_archivo_reescrito_recarga_la_instantanea_y_vacia_el_cache(directorio):
+    gestor = GestorInstantaneas(str(directorio), revisar_archivos_cada=0)
+    cache = CacheRespuestas(version=gestor.version)
+    anio = next(iter(gestor.datos().sentimiento_anio))
+    cache.guardar(('sentiment_analysis', (anio,)), dict(gestor.datos().sentimiento_anio[anio]), version=cache.version())
+    version = cache.version()
+
+    reescribir_sentimiento(directorio, anio, 123456)
+    gestor.version()
+    esperar_carga(gestor)
+    # La versión cambia recién con los datos nuevos cargados, y con ella se vacía el cache
+    assert cache.version() != version
+    assert cache.obtener(('sentiment_analysis', (anio,))) is None
+    assert gestor.datos().sentimiento_anio[anio]['Negative'] == 123456
+    assert 'agregados' in gestor.datos().cargadas()
+
+def test_archivo_ilegible_mantiene_la_instantanea_activa(directorio):
+    gestor = GestorInstantaneas(str(directorio), revisar_archivos_cada=0)
+    anio = next(iter(gestor.datos().sentimiento_anio))
+    anterior = gestor.datos().sentimiento_anio[anio]
+    version = gestor.version()
+
+    (directorio / ARCHIVO_SENTIMIENTO_ANIO).write_bytes(b'no es un parquet')
+    gestor.version()
+    esperar_carga(gestor)
+    assert gestor.version() == version
+    assert gestor.datos().sentimiento_anio[anio] == anterior
+    assert gestor.estado()['ultimo_error'] is not None
+    # No se vuelve a intentar hasta que el archivo cambie otra vez
+    gestor.version()
+    assert gestor.cargando is None
@@ -0,0 +1,37 @@
+## PRUEBAS DE LA VALIDACIÓN DE LAS FECHAS DE /countreviews
+# Uso: python -m pytest -q tests
+# Importaciones
+import os
+import sys
+
+import pytest
+from fastapi.testclient import TestClient
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+os.environ.setdefault('API_DIRECTORIO_DATOS', os.path.join(RAIZ, 'data'))
+os.environ.setdefault('API_DIRECTORIO_VERSIONES', '')
+
+import api_functions as af
+import main
+
+# Funciones
+@pytest.fixture(scope='module')
+def cliente():
+    return TestClient(main.app)
+
+@pytest.mark.parametrize('fecha_inicio, fecha_fin', [
+    ('2011-13-01', '2012-01-01'),
+    ('ayer', 'hoy'),
+    ('2011-02-30', '2011-03-01'),
+    ('2011-1-5', '2011-12-31'),
+    ('2011-11-05', ''),
+])
+def test_fecha_invalida_responde_422(cliente, fecha_inicio, fecha_fin):
+    respuesta = cliente.get('/countreviews', params={'fecha_inicio': fecha_inicio, 'fecha_fin': fecha_fin})
+    assert respuesta.status_code == 422
+
+def test_fechas_validas_igual_a_la_funcion(cliente):
+    respuesta = cliente.get('/countreviews', params={'fecha_inicio': '2011-11-05', 'fecha_fin': '2012-12-24'})
+    assert respuesta.status_code == 200
+    assert respuesta.json() == af.countreviews('2011-11-05', '2012-12-24')
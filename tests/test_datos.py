@@ -0,0 +1,58 @@
+## PRUEBAS DE LAS CONSULTAS CUANDO FALTAN ARCHIVOS DE DATOS QUE NO ESTÁN EN EL REPOSITORIO
+# Uso: python -m pytest -q tests
+# Importaciones
+import os
+import sys
+
+import pandas as pd
+import pytest
+from fastapi.testclient import TestClient
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+os.environ.setdefault('API_DIRECTORIO_DATOS', os.path.join(RAIZ, 'data'))
+os.environ.setdefault('API_DIRECTORIO_VERSIONES', '')
+
+import main
+from agregados import ARCHIVO_TOP_USUARIOS_GENERO
+from datos import Datos, DatosNoDisponibles
+
+# Funciones
+@pytest.fixture
+def cliente(monkeypatch, tmp_path):
+    # Directorio de datos vacío: faltan los archivos que no están en el repositorio (horas de juego y matriz de usuarios)
+    monkeypatch.setattr(main.af.gestor, 'datos', lambda: Datos(str(tmp_path)))
+    return TestClient(main.app)
+
+@pytest.mark.parametrize('ruta, parametros', [
+    ('/userforgenre', {'genero': 'Action'}),
+    ('/ranking_genero', {'genero': 'Action'}),
+    ('/posicion_genero', {'genero': 'Action', 'user_id': 'alguien'}),
+])
+def test_sin_archivos_responde_503(cliente, ruta, parametros):
+    respuesta = cliente.get(ruta, params=parametros)
+    assert respuesta.status_code == 503
+    assert 'agregados.py' in respuesta.json()['detail']
+
+def test_sin_top_se_calcula_desde_playtime(tmp_path):
+    pd.DataFrame({
+        'genres': ['Action', 'Action', 'Action', 'Indie'],
+        'user_id': ['a', 'b', 'a', 'c'],
+        'user_url': ['http://steamcommunity.com/id/' + u for u in ['a', 'b', 'a', 'c']],
+        'playtime_horas': [1.0, 5.0, 2.0, 7.0],
+    }).to_parquet(tmp_path / 'df_playtime_forever.parquet')
+    datos = Datos(str(tmp_path))
+    assert not (tmp_path / ARCHIVO_TOP_USUARIOS_GENERO).exists()
+    assert [(posicion, user_id) for posicion, user_id, _, _ in datos.top_generos.pagina('Action', 1, 5)] == [(1, 'b'), (2, 'a')]
+    assert datos.top_generos.cantidad('Indie') == 1
+
+def test_sin_playtime_se_lanza_datos_no_disponibles(tmp_path):
+    with pytest.raises(DatosNoDisponibles):
+        Datos(str(tmp_path)).playtime
+
+def test_sin_modelo_de_usuarios_responde_503(cliente):
+    respuesta = cliente.get('/recomendacion_usuario', params={'user': 'alguien'})
+    assert respuesta.status_code == 503
+    assert 'recomendacion.py usuarios' in respuesta.json()['detail']
+    respuesta = cliente.post('/recomendacion_usuario_lote', params={'formato': 'json'}, json={'ids': ['alguien']})
+    assert respuesta.status_code == 503
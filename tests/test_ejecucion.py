@@ -0,0 +1,43 @@
+## PRUEBAS DEL LÍMITE DE CONSULTAS EN CURSO DEL EJECUTOR
+# Uso: python -m pytest -q tests
+# Importaciones
+import asyncio
+import gc
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from ejecucion import Ejecutor, SobreCarga
+
+# Funciones
+async def recorrer(trozos):
+    return [elemento async for trozo in trozos for elemento in trozo]
+
+def test_lote_cuenta_como_consulta_en_curso():
+    async def prueba():
+        ejecutor = Ejecutor(max_workers=1, max_pendientes=1)
+        trozos = ejecutor.iterar(range(10), tamano=3)
+        assert ejecutor.estado()['en_curso'] == 1
+        # Otro lote y otra consulta se rechazan mientras el primero está en curso
+        with pytest.raises(SobreCarga):
+            ejecutor.iterar(range(10))
+        with pytest.raises(SobreCarga):
+            await ejecutor.ejecutar(sum, (1, 2))
+        assert await recorrer(trozos) == list(range(10))
+        # Al terminar el lote se libera su lugar
+        assert ejecutor.estado() == {'en_curso': 0, 'coalescidas': 0, 'rechazadas': 2}
+        assert await ejecutor.ejecutar(sum, (1, 2)) == 3
+    asyncio.run(prueba())
+
+def test_lote_descartado_sin_recorrer_se_libera():
+    async def prueba():
+        ejecutor = Ejecutor(max_workers=1, max_pendientes=1)
+        trozos = ejecutor.iterar(range(10))
+        del trozos
+        gc.collect()
+        assert ejecutor.estado()['en_curso'] == 0
+        assert await recorrer(ejecutor.iterar(range(3))) == [0, 1, 2]
+    asyncio.run(prueba())
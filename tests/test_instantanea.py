@@ -0,0 +1,55 @@
+## PRUEBAS DE LA PUBLICACIÓN DE VERSIONES POR HTTP
+# Uso: python -m pytest -q tests
+# Importaciones
+import os
+import sys
+
+import pytest
+from fastapi.testclient import TestClient
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+os.environ.setdefault('API_DIRECTORIO_DATOS', os.path.join(RAIZ, 'data'))
+os.environ.setdefault('API_DIRECTORIO_VERSIONES', '')
+
+import configuracion
+import main
+
+# Funciones
+@pytest.fixture
+def recargas(monkeypatch):
+    '''
+    Reemplaza la recarga de versiones del gestor por una que solo registra las versiones pedidas.
+    '''
+    pedidas = []
+    monkeypatch.setattr(main.af.gestor, 'recargar', pedidas.append)
+    return pedidas
+
+@pytest.fixture
+def cliente():
+    return TestClient(main.app)
+
+def test_sin_token_configurado_se_rechaza(cliente, recargas, monkeypatch):
+    # Configuración por defecto: API_TOKEN_ADMIN no está definida
+    monkeypatch.setattr(configuracion, 'TOKEN_ADMIN', '')
+    respuesta = cliente.post('/instantanea', params={'version': 'v2'})
+    assert respuesta.status_code == 403
+    assert recargas == []
+
+def test_sin_token_configurado_se_rechaza_con_encabezado(cliente, recargas, monkeypatch):
+    monkeypatch.setattr(configuracion, 'TOKEN_ADMIN', '')
+    respuesta = cliente.post('/instantanea', params={'version': 'v2'}, headers={'X-Token-Admin': ''})
+    assert respuesta.status_code == 403
+    assert recargas == []
+
+def test_token_invalido_se_rechaza(cliente, recargas, monkeypatch):
+    monkeypatch.setattr(configuracion, 'TOKEN_ADMIN', 'secreto')
+    for encabezados in ({}, {'X-Token-Admin': 'otro'}, {'X-Token-Admin': 'secreto2'}):
+        assert cliente.post('/instantanea', params={'version': 'v2'}, headers=encabezados).status_code == 403
+    assert recargas == []
+
+def test_token_valido_publica_la_version(cliente, recargas, monkeypatch):
+    monkeypatch.setattr(configuracion, 'TOKEN_ADMIN', 'secreto')
+    respuesta = cliente.post('/instantanea', params={'version': 'v2'}, headers={'X-Token-Admin': 'secreto'})
+    assert respuesta.status_code == 202
+    assert recargas == ['v2']
@@ -0,0 +1,62 @@
+## PRUEBAS DE LOS ERRORES DE LAS CONSULTAS POR LOTE EN FORMATO NDJSON
+# Uso: python -m pytest -q tests
+# Importaciones
+import json
+import os
+import sys
+
+import pytest
+from fastapi.testclient import TestClient
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+os.environ.setdefault('API_DIRECTORIO_DATOS', os.path.join(RAIZ, 'data'))
+os.environ.setdefault('API_DIRECTORIO_VERSIONES', '')
+
+import main
+from datos import Datos
+
+# Funciones
+@pytest.fixture
+def cliente():
+    return TestClient(main.app, raise_server_exceptions=False)
+
+@pytest.mark.parametrize('codificacion', ['identity', 'gzip'])
+def test_sin_modelo_responde_503_antes_de_empezar(cliente, monkeypatch, tmp_path, codificacion):
+    monkeypatch.setattr(main.af.gestor, 'datos', lambda: Datos(str(tmp_path)))
+    respuesta = cliente.post('/recomendacion_usuario_lote', params={'formato': 'ndjson'}, json={'ids': ['alguien']},
+                             headers={'Accept-Encoding': codificacion})
+    assert respuesta.status_code == 503
+    assert 'recomendacion.py usuarios' in respuesta.json()['detail']
+    assert main.ejecutor.estado()['en_curso'] == 0
+
+def test_error_al_empezar_responde_500(cliente, monkeypatch):
+    def fallar(ids):
+        raise RuntimeError('falla')
+        yield
+    monkeypatch.setattr(main.af, 'recomendacion_usuario_lote', fallar)
+    respuesta = cliente.post('/recomendacion_usuario_lote', params={'formato': 'ndjson'}, json={'ids': ['a']})
+    assert respuesta.status_code == 500
+
+@pytest.mark.parametrize('codificacion', ['identity', 'gzip'])
+def test_error_despues_de_empezar_termina_con_linea_de_error(cliente, monkeypatch, codificacion):
+    def fallar_al_final(ids):
+        # Más resultados que un trozo del ejecutor, así que el error ocurre con la respuesta ya empezada
+        for id_ in ids:
+            yield id_, {}
+        raise RuntimeError('falla')
+    monkeypatch.setattr(main.af, 'recomendacion_usuario_lote', fallar_al_final)
+    ids = [f'u{i}' for i in range(300)]
+    respuesta = cliente.post('/recomendacion_usuario_lote', params={'formato': 'ndjson'}, json={'ids': ids},
+                             headers={'Accept-Encoding': codificacion})
+    assert respuesta.status_code == 200
+    lineas = [json.loads(linea) for linea in respuesta.text.splitlines()]
+    # Se envían los trozos completos anteriores al error (el ejecutor recorre el lote de a 256)
+    assert [linea['id'] for linea in lineas[:-1]] == ids[:256]
+    assert lineas[-1] == {'error': 'Error interno al calcular el lote.'}
+    assert main.ejecutor.estado()['en_curso'] == 0
+
+def test_lote_vacio(cliente):
+    respuesta = cliente.post('/recomendacion_juego_lote', params={'formato': 'ndjson'}, json={'ids': []})
+    assert respuesta.status_code == 200
+    assert respuesta.text == ''
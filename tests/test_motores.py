@@ -0,0 +1,38 @@
+## PRUEBAS DE EQUIVALENCIA DE LOS MOTORES DE CONSULTAS 'indices' Y 'arrow'
+# Uso: python -m pytest -q tests
+# Importaciones
+import os
+import sys
+import warnings
+
+import numpy as np
+import pytest
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+sys.path.insert(0, os.path.join(RAIZ, 'benchmarks'))
+
+import api_functions as af
+from datos import Datos
+from motores import CASOS_LIMITE, CONSULTAS, argumentos, responder
+
+DIRECTORIO = os.path.join(RAIZ, 'data')
+
+# Funciones
+@pytest.fixture(scope='module')
+def motores():
+    return Datos(DIRECTORIO, motor='indices'), Datos(DIRECTORIO, motor='arrow')
+
+@pytest.fixture(scope='module')
+def casos():
+    return argumentos(DIRECTORIO, np.random.default_rng(42), 200)
+
+@pytest.mark.parametrize('nombre', CONSULTAS)
+def test_motores_responden_lo_mismo(motores, casos, nombre):
+    indices, arrow = motores
+    funcion = getattr(af, nombre)
+    # Los rangos sin reviews dividen por cero en los dos motores
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore', RuntimeWarning)
+        for args in casos[nombre] + CASOS_LIMITE[nombre]:
+            assert responder(funcion, args, indices) == responder(funcion, args, arrow), args
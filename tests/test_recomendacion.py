@@ -0,0 +1,142 @@
+## PRUEBAS DE EQUIVALENCIA DE LOS MOTORES DE RECOMENDACIÓN CON EL CÁLCULO ORIGINAL
+# Uso: python -m pytest -q tests
+# Importaciones
+import operator
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+from scipy import sparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import recomendacion
+from datos import Datos
+from recomendacion import (ARCHIVO_RECOMENDACIONES_USUARIOS, IndiceVecinos, MotorUsuarios, construir_indice_vecinos,
+                           construir_indice_vecinos_dispersa, huella_modelo, precalcular_recomendaciones)
+
+# Funciones
+def similitud_coseno(piv_norm):
+    '''
+    Matriz densa de similitud del coseno entre las columnas de piv_norm, como la arman los notebooks (user_sim_df e
+    item_sim_df).
+    '''
+    valores = piv_norm.to_numpy(dtype=np.float64)
+    normas = np.linalg.norm(valores, axis=0)
+    normas[normas == 0] = 1.0
+    valores = valores / normas
+    return pd.DataFrame(valores.T @ valores, index=piv_norm.columns, columns=piv_norm.columns)
+
+def votacion_original(piv_norm, sim_users, n=5):
+    '''
+    Votación de recomendacion_usuario antes del motor: cada usuario similar vota por los juegos con su calificación
+    máxima, y se devuelven los más votados en el orden de sorted.
+    '''
+    most_common = {}
+    for i in sim_users:
+        max_score = piv_norm.loc[:, i].max()
+        for j in piv_norm[piv_norm.loc[:, i] == max_score].index.tolist():
+            most_common[j] = most_common.get(j, 0) + 1
+    return [juego for juego, _ in sorted(most_common.items(), key=operator.itemgetter(1), reverse=True)[:n]]
+
+def piv_norm_aleatorio(n_items=40, n_usuarios=120, semilla=0, valores=None):
+    '''
+    piv_norm sintético (juegos × usuarios). Con `valores` las calificaciones se eligen de esa lista, para que haya
+    empates; si no, son continuas y no hay empates en las similitudes.
+    '''
+    generador = np.random.default_rng(semilla)
+    calificado = generador.random((n_items, n_usuarios)) < 0.3
+    if valores is None:
+        datos = generador.normal(size=(n_items, n_usuarios))
+    else:
+        datos = generador.choice(valores, size=(n_items, n_usuarios))
+    datos = np.where(calificado, datos, 0.0)
+    # Cada usuario califica al menos un juego con un valor distinto de cero
+    datos[generador.integers(0, n_items, size=n_usuarios), np.arange(n_usuarios)] = 1.0
+    return pd.DataFrame(datos, index=[f'juego {i}' for i in range(n_items)], columns=[f'u{j}' for j in range(n_usuarios)])
+
+def motor_aleatorio(n_usuarios=300, n_items=40, semilla=0):
+    generador = np.random.default_rng(semilla)
+    matriz = sparse.random(n_usuarios, n_items, density=0.1, random_state=generador, format='csr')
+    return MotorUsuarios(matriz, [f'u{i}' for i in range(n_usuarios)], [f'i{j}' for j in range(n_items)])
+
+def test_lote_igual_a_consultas_individuales_con_bloque_limitado(monkeypatch):
+    motor = motor_aleatorio()
+    usuarios = list(motor.usuarios)
+    # Alcanza para 3 columnas de similitudes: el bloque pedido de 256 se achica a 3
+    monkeypatch.setattr(recomendacion, 'MEMORIA_BLOQUE_SIMILITUDES', 3 * 8 * len(usuarios))
+    lote = list(motor.similares_lote(usuarios))
+    assert len(lote) == len(usuarios)
+    for usuario, similares in zip(usuarios, lote):
+        np.testing.assert_array_equal(similares, motor.similares(usuario))
+
+def test_lote_con_memoria_menor_a_una_columna(monkeypatch):
+    motor = motor_aleatorio(n_usuarios=50)
+    monkeypatch.setattr(recomendacion, 'MEMORIA_BLOQUE_SIMILITUDES', 1)
+    usuarios = list(motor.usuarios[:7])
+    lote = list(motor.similares_lote(usuarios))
+    for usuario, similares in zip(usuarios, lote):
+        np.testing.assert_array_equal(similares, motor.similares(usuario))
+
+def test_indice_vecinos_igual_a_ordenar_la_matriz_densa():
+    piv_norm = piv_norm_aleatorio()
+    # Similitud entre juegos: las filas de piv_norm
+    item_sim_df = similitud_coseno(piv_norm.T)
+    densa = IndiceVecinos(construir_indice_vecinos(item_sim_df, k=10))
+    dispersa = IndiceVecinos(construir_indice_vecinos_dispersa(sparse.csr_matrix(piv_norm.to_numpy()), piv_norm.index,
+                                                               k=10, bloque=7))
+    for game in item_sim_df.columns:
+        # Consulta de recomendacion_juego antes del índice
+        esperados = item_sim_df.sort_values(by=game, ascending=False).index[1:6].tolist()
+        assert densa.similares(game) == esperados
+        assert dispersa.similares(game) == esperados
+
+def test_similares_igual_a_ordenar_la_matriz_densa():
+    piv_norm = piv_norm_aleatorio()
+    user_sim_df = similitud_coseno(piv_norm)
+    motor = MotorUsuarios.desde_piv_norm(piv_norm)
+    for user in piv_norm.columns:
+        esperados = user_sim_df.sort_values(by=user, ascending=False).index[1:11].tolist()
+        assert motor.usuarios[motor.similares(user)].tolist() == esperados
+
+def test_mas_votados_igual_a_la_votacion_original_con_empates():
+    # Calificaciones discretas: varios juegos empatan en el máximo de cada usuario y varios en cantidad de votos
+    piv_norm = piv_norm_aleatorio(valores=[-0.5, 0.25, 0.5, 1.0])
+    motor = MotorUsuarios.desde_piv_norm(piv_norm)
+    for user in piv_norm.columns:
+        vecinos = motor.similares(user)
+        for n in (1, 5, 40):
+            assert motor.mas_votados(vecinos, n=n) == votacion_original(piv_norm, motor.usuarios[vecinos], n=n)
+
+def test_recomendar_lote_igual_a_recomendar():
+    piv_norm = piv_norm_aleatorio(valores=[-0.5, 0.25, 0.5, 1.0])
+    motor = MotorUsuarios.desde_piv_norm(piv_norm)
+    usuarios = list(piv_norm.columns)
+    for n_similares, n_resultados, bloque in [(10, 5, 256), (3, 2, 7), (1, 40, 1)]:
+        lote = list(motor.recomendar_lote(usuarios, n_similares=n_similares, n_resultados=n_resultados, bloque=bloque))
+        assert lote == [motor.recomendar(user, n_similares=n_similares, n_resultados=n_resultados) for user in usuarios]
+
+def test_huella_del_modelo_guardada_junto_a_la_matriz(tmp_path, monkeypatch):
+    ruta = str(tmp_path / 'piv_norm_csr')
+    motor_aleatorio().guardar(ruta)
+    precalcular_recomendaciones(ruta, str(tmp_path / ARCHIVO_RECOMENDACIONES_USUARIOS), workers=1)
+    assert (tmp_path / 'piv_norm_csr' / 'huella.txt').read_text() == huella_modelo(ruta)
+
+    # La API compara con la huella guardada, sin volver a leer los arreglos
+    def no_recalcular(directorio):
+        raise AssertionError('se recalculó la huella del modelo')
+    monkeypatch.setattr(recomendacion, 'huella_modelo', no_recalcular)
+    assert Datos(str(tmp_path)).recomendaciones_usuarios is not None
+
+    # Con otra matriz guardada las recomendaciones precalculadas se ignoran
+    monkeypatch.undo()
+    motor_aleatorio(semilla=1).guardar(ruta)
+    assert Datos(str(tmp_path)).recomendaciones_usuarios is None
+
+def test_huella_de_una_matriz_guardada_sin_ella(tmp_path):
+    ruta = str(tmp_path / 'piv_norm_csr')
+    motor_aleatorio().guardar(ruta)
+    precalcular_recomendaciones(ruta, str(tmp_path / ARCHIVO_RECOMENDACIONES_USUARIOS), workers=1)
+    (tmp_path / 'piv_norm_csr' / 'huella.txt').unlink()
+    assert Datos(str(tmp_path)).recomendaciones_usuarios is not None
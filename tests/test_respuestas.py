@@ -0,0 +1,47 @@
+## PRUEBAS DEL ETAG DE CADA REPRESENTACIÓN DE LAS RESPUESTAS
+# Uso: python -m pytest -q tests
+# Importaciones
+import os
+import sys
+
+import pytest
+from fastapi.testclient import TestClient
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+os.environ.setdefault('API_DIRECTORIO_DATOS', os.path.join(RAIZ, 'data'))
+os.environ.setdefault('API_DIRECTORIO_VERSIONES', '')
+
+import configuracion
+import main
+from respuestas import responder
+
+# Funciones
+@pytest.mark.parametrize('codificacion', ['gzip', 'br'])
+def test_etag_con_sufijo_solo_si_se_comprimio(monkeypatch, codificacion):
+    contenido = {'clave': 'valor' * 50}
+    monkeypatch.setattr(configuracion, 'COMPRIMIR_DESDE', 10 ** 6)
+    chica = responder(contenido, 'prueba', 'json', codificacion, etag='"abc"')
+    assert 'content-encoding' not in chica.headers
+    assert chica.headers['etag'] == '"abc"'
+    monkeypatch.setattr(configuracion, 'COMPRIMIR_DESDE', 0)
+    comprimida = responder(contenido, 'prueba', 'json', codificacion, etag='"abc"')
+    assert comprimida.headers['content-encoding'] == codificacion
+    assert comprimida.headers['etag'] == f'"abc-{codificacion}"'
+
+def test_etag_de_la_representacion_arrow():
+    respuesta = responder({'clave': 1}, 'prueba', 'arrow', None, etag='"abc"')
+    assert respuesta.headers['etag'] == '"abc-arrow"'
+
+@pytest.mark.parametrize('comprimir_desde', [0, 10 ** 6])
+def test_if_none_match_con_el_etag_enviado(monkeypatch, comprimir_desde):
+    monkeypatch.setattr(configuracion, 'COMPRIMIR_DESDE', comprimir_desde)
+    cliente = TestClient(main.app)
+    parametros, encabezados = {'desarrollador': 'Valve'}, {'Accept-Encoding': 'gzip'}
+    respuesta = cliente.get('/developer', params=parametros, headers=encabezados)
+    assert respuesta.status_code == 200
+    etag = respuesta.headers['etag']
+    assert etag.endswith('-gzip"') == ('content-encoding' in respuesta.headers)
+    validada = cliente.get('/developer', params=parametros, headers={**encabezados, 'If-None-Match': etag})
+    assert validada.status_code == 304
+    assert validada.headers['etag'] == etag
@@ -0,0 +1,70 @@
+## PRUEBAS DE EQUIVALENCIA DE LAS FUNCIONES VECTORIZADAS DE utils CON LAS ORIGINALES
+# Uso: python -m pytest -q tests
+# Importaciones
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import utils
+
+# Fechas de posteo de las reviews: meses completos y abreviados, fechas imposibles y textos sin el formato esperado
+CASOS_FECHA = ['Posted April 21, 2011.', 'Posted November 5, 2013.', 'Posted May 1, 2015.', 'Posted Sept 5, 2012.',
+               'Posted Jan 3, 2014.', 'Posted Dec 31, 1999.', 'Posted February 30, 2015.', 'Posted April 00, 2011.',
+               'Posted April 21.', 'Posted 21 April, 2011.', 'Posted Foo 12, 2011.', 'April 21, 2011',
+               'Posted april 21, 2011.', 'Posted APRIL 21, 2011.', 'Posted 12 5, 2011.', '', 'Posted Abril 21, 2011.',
+               'Posted April  21, 2011.']
+# Fechas de lanzamiento de los juegos, con nulos
+CASOS_ANIO = ['2018-01-04', '2018-1-4', '18-01-04', 'Jan 2018', '2018-01-04 ', '2018-01-04\n', '', 'Soon..',
+              'Dato no disponible', '2018-13-45', None, np.nan]
+# Precios: números, textos como 'Free To Play', nulos y valores que no son texto
+CASOS_PRECIO = [4.99, 0.0, 'Free To Play', 'Free', '19.99', ' 3.5 ', '1e3', 'inf', 'nan', '1_000', None, np.nan,
+                'Starting at $449.00', '', 12, True]
+# Valores que no son texto (la función original falla con ellos; las vectorizadas los tratan como inválidos)
+NO_TEXTOS = [2018, 3.5, True, pd.Timestamp('2015-05-01')]
+
+# Funciones
+def serie(valores):
+    # Índice que no empieza en cero, para verificar que se conserva
+    return pd.Series(valores, index=np.arange(len(valores)) * 3 + 7, dtype=object)
+
+def assert_iguales(obtenida, esperada):
+    assert obtenida.index.equals(esperada.index)
+    for x, y in zip(obtenida.tolist(), esperada.tolist()):
+        assert x == y or (x != x and y != y), (x, y)
+
+def test_convertir_fecha_serie():
+    fechas = serie(CASOS_FECHA)
+    assert_iguales(utils.convertir_fecha_serie(fechas), fechas.apply(utils.convertir_fecha))
+
+def test_convertir_fecha_serie_sin_textos():
+    # Solo nulos, solo números o mezclados con fechas válidas
+    for valores in ([None, np.nan], NO_TEXTOS, ['Posted May 1, 2015.', None] + NO_TEXTOS):
+        resultado = utils.convertir_fecha_serie(serie(valores))
+        assert resultado.tolist() == [utils.convertir_fecha(v) if isinstance(v, str) else 'Formato inválido' for v in valores]
+    assert utils.convertir_fecha_serie(pd.Series([np.nan, np.nan])).tolist() == ['Formato inválido'] * 2
+
+def test_obtener_anio_release_serie():
+    fechas = serie(CASOS_ANIO)
+    assert_iguales(utils.obtener_anio_release_serie(fechas), fechas.apply(utils.obtener_anio_release))
+    # Columna de floats toda nula, como la lee pandas cuando no hay fechas
+    nulas = pd.Series([np.nan, np.nan])
+    assert_iguales(utils.obtener_anio_release_serie(nulas), nulas.apply(utils.obtener_anio_release))
+
+def test_obtener_anio_release_serie_sin_textos():
+    resultado = utils.obtener_anio_release_serie(serie(['2018-01-04'] + NO_TEXTOS))
+    assert resultado.tolist() == ['2018'] + ['Dato no disponible'] * len(NO_TEXTOS)
+
+@pytest.mark.parametrize('valores', [CASOS_PRECIO, [None, np.nan], [4.99, 'Free To Play'], [12, True, 3.5]])
+def test_reemplaza_a_flotante_serie(valores):
+    precios = serie(valores)
+    assert_iguales(utils.reemplaza_a_flotante_serie(precios), precios.apply(utils.reemplaza_a_flotante))
+
+def test_series_vacias():
+    vacia = pd.Series([], dtype=object)
+    for funcion in (utils.convertir_fecha_serie, utils.obtener_anio_release_serie, utils.reemplaza_a_flotante_serie):
+        assert funcion(vacia).empty
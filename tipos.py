@@ -0,0 +1,144 @@
+## TIPOS COMPACTOS DE LAS TABLAS QUE SIRVE LA API
+# Las tablas se guardan con enteros angostos y, en lugar de la URL de perfil de cada usuario, con una columna
+# booleana 'url_perfil' que indica si la URL es /profiles/<user_id> (True) o /id/<user_id> (False). Las columnas de
+# texto se leen como categóricas (con read_dictionary de pyarrow), así que cada valor distinto se guarda una sola vez.
+# Uso: python tipos.py --directorio data
+# Importaciones
+import argparse
+import os
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+# Tipo angosto de cada columna numérica. Solo se aplica si todos los valores entran en el tipo
+TIPOS = {
+    'sentiment_analysis': 'int8',
+    'porcentaje_gratis': 'int8',
+    'ranking': 'int16',
+    'items_count': 'int32',
+    'cantidad': 'int32',
+    'gratis': 'int32',
+    'Negative': 'int32',
+    'Neutral': 'int32',
+    'Positive': 'int32',
+}
+# Columnas de texto que se leen como categóricas
+CATEGORICAS = ['user_id', 'user_url', 'genres', 'developer', 'release_anio', 'publisher']
+# Prefijos de la URL de perfil de un usuario, según tenga o no la columna 'url_perfil'
+PREFIJO_PERFIL = 'http://steamcommunity.com/profiles/'
+PREFIJO_ID = 'http://steamcommunity.com/id/'
+
+# Funciones
+def url_usuario(user_id, perfil):
+    '''
+    Devuelve la URL de perfil de un usuario a partir de su identificador.
+
+    Args:
+        user_id (str): Identificador del usuario.
+        perfil (bool): True si la URL es /profiles/<user_id> (cuentas sin nombre personalizado) y False si es /id/<user_id>.
+    '''
+    return (PREFIJO_PERFIL if perfil else PREFIJO_ID) + user_id
+
+def codificar_urls(user_ids, urls):
+    '''
+    Calcula la columna 'url_perfil' que reemplaza a las URLs de perfil.
+
+    Args:
+        user_ids (pandas.Series): Identificadores de los usuarios.
+        urls (pandas.Series): URL de perfil de cada fila.
+
+    Returns:
+        numpy.ndarray: Un booleano por fila, True si la URL es /profiles/<user_id>.
+
+    Raises:
+        ValueError: Si alguna URL no es /profiles/<user_id> ni /id/<user_id>, así que no se puede derivar del usuario.
+    '''
+    # Se compara cada par distinto (usuario, URL) una sola vez
+    codigos_id, ids = pd.factorize(user_ids)
+    codigos_url, direcciones = pd.factorize(urls)
+    if (codigos_id < 0).any() or (codigos_url < 0).any():
+        raise ValueError('Hay usuarios o URLs nulos')
+    n = max(len(direcciones), 1)
+    pares, inversa = np.unique(codigos_id.astype(np.int64) * n + codigos_url, return_inverse=True)
+    ids = np.asarray(ids, dtype=object)[pares // n].astype(str).astype(object)
+    direcciones = np.asarray(direcciones, dtype=object)[pares % n]
+    perfil = direcciones == PREFIJO_PERFIL + ids
+    es_id = direcciones == PREFIJO_ID + ids
+    if not (perfil | es_id).all():
+        raise ValueError(f"La URL '{direcciones[~(perfil | es_id)][0]}' no se puede derivar del user_id")
+    return perfil[inversa.ravel()]
+
+def compactar(df):
+    '''
+    Devuelve una copia de una tabla con los tipos compactos: los enteros de TIPOS angostos y, si todas las URLs de
+    perfil se pueden derivar del user_id, la columna 'url_perfil' en el lugar de 'user_url'.
+    '''
+    df = df.copy()
+    for columna, tipo in TIPOS.items():
+        if columna in df.columns and pd.api.types.is_integer_dtype(df[columna]) and len(df):
+            limites = np.iinfo(tipo)
+            if limites.min <= df[columna].min() and df[columna].max() <= limites.max:
+                df[columna] = df[columna].astype(tipo)
+    if 'user_url' in df.columns and 'user_id' in df.columns and df['user_url'].notna().all():
+        try:
+            perfil = codificar_urls(df['user_id'], df['user_url'])
+        except ValueError:
+            return df
+        posicion = df.columns.get_loc('user_url')
+        df = df.drop(columns='user_url')
+        df.insert(posicion, 'url_perfil', perfil)
+    return df
+
+def expandir(df):
+    '''
+    Inversa de `compactar`: devuelve la tabla con 'user_url' en lugar de 'url_perfil' y los enteros en int64, como
+    la escriben los notebooks. Las tablas que no están compactadas se devuelven sin cambios.
+    '''
+    df = df.copy()
+    for columna in TIPOS:
+        if columna in df.columns and pd.api.types.is_integer_dtype(df[columna]):
+            df[columna] = df[columna].astype('int64')
+    if 'url_perfil' in df.columns:
+        posicion = df.columns.get_loc('url_perfil')
+        urls = np.where(df['url_perfil'].to_numpy(), PREFIJO_PERFIL, PREFIJO_ID).astype(object) + df['user_id'].astype(object).to_numpy()
+        df = df.drop(columns='url_perfil')
+        df.insert(posicion, 'user_url', urls)
+    return df
+
+def guardar_compacto(df, ruta):
+    '''
+    Guarda una tabla en parquet con los tipos compactos.
+    '''
+    pq.write_table(pa.Table.from_pandas(compactar(df), preserve_index=False), ruta)
+
+def leer_expandido(ruta, columnas=None):
+    '''
+    Lee una tabla parquet con los tipos que escriben los notebooks, esté o no compactada. Si se pide la columna
+    'user_url' de una tabla compacta, se lee 'url_perfil' y se reconstruye la URL.
+    '''
+    if columnas is not None and 'user_url' in columnas and 'user_url' not in pq.read_schema(ruta).names:
+        columnas = [columna if columna != 'user_url' else 'url_perfil' for columna in columnas]
+    return expandir(pd.read_parquet(ruta, columns=columnas))
+
+def main():
+    parser = argparse.ArgumentParser(description='Reescribe los parquet de un directorio con los tipos compactos que lee la API.')
+    parser.add_argument('--directorio', default='data', help='Directorio de los parquet')
+    args = parser.parse_args()
+
+    for archivo in sorted(os.listdir(args.directorio)):
+        if not archivo.endswith('.parquet') or archivo in ('item_sim_df.parquet', 'item_topk.parquet'):
+            continue
+        ruta = os.path.join(args.directorio, archivo)
+        df = pd.read_parquet(ruta)
+        compacto = compactar(df)
+        # Se verifica que la tabla compacta se pueda volver a expandir sin perder nada antes de reemplazar el archivo
+        pd.testing.assert_frame_equal(expandir(compacto), expandir(df))
+        temporal = ruta + '.nuevo'
+        pq.write_table(pa.Table.from_pandas(compacto, preserve_index=False), temporal)
+        os.replace(temporal, ruta)
+        print(f"'{ruta}': {df.memory_usage(deep=True).sum() / 1e6:.1f} MB -> {compacto.memory_usage(deep=True).sum() / 1e6:.1f} MB en memoria")
+
+if __name__ == '__main__':
+    main()
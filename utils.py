@@ -23,6 +23,8 @@ def verificar_tipo_datos(df):
         - 'no_nulos_%': Porcentaje de valores no nulos en cada columna.
         - 'nulos_%': Porcentaje de valores nulos en cada columna.
         - 'nulos': Cantidad de valores nulos en cada columna.
+
+    Para perfilar un archivo sin cargarlo completo en memoria, ver perfilado.perfilar.
     '''
 
     mi_dict = {"nombre_campo": [], "tipo_datos": [], "no_nulos_%": [], "nulos_%": [], "nulos": []}
@@ -132,6 +134,35 @@ def obtener_anio_release(fecha):
         if re.match(r'^\d{4}-\d{2}-\d{2}$', fecha):
             return fecha.split('-')[0]
     return 'Dato no disponible'
+
+def _solo_textos(serie):
+    '''
+    Devuelve la columna como object con nulos en lugar de los valores que no son texto, para poder usar el accessor
+    .str aunque la columna esté vacía, sea toda nula (float) o tenga números.
+    '''
+    serie = serie.astype(object)
+    if pd.api.types.infer_dtype(serie, skipna=True) in ('string', 'empty'):
+        return serie
+    return serie.where(serie.map(lambda valor: isinstance(valor, str)), None)
+
+def obtener_anio_release_serie(fechas):
+    '''
+    Versión vectorizada de obtener_anio_release para una columna completa.
+
+    Usa una sola búsqueda de la expresión regular sobre toda la columna en lugar de llamar a la función fila por fila,
+    y devuelve los mismos valores. Los valores que no son texto se tratan como inválidos.
+
+    Parameters:
+        fechas (pandas.Series): Fechas en formato 'yyyy-mm-dd'.
+
+    Returns:
+        pandas.Series: El año de cada fecha válida y 'Dato no disponible' en el resto, con el mismo índice.
+    '''
+    fechas = _solo_textos(fechas)
+    validas = fechas.str.match(r'^\d{4}-\d{2}-\d{2}$').fillna(False).astype(bool)
+    anios = pd.Series('Dato no disponible', index=fechas.index, dtype=object)
+    anios[validas] = fechas[validas].str.slice(0, 4)
+    return anios
     
 def reemplaza_a_flotante(value):
     '''
@@ -154,6 +185,26 @@ def reemplaza_a_flotante(value):
         return float_value
     except:
         return 0.0
+
+def reemplaza_a_flotante_serie(valores):
+    '''
+    Versión vectorizada de reemplaza_a_flotante para una columna completa.
+
+    Convierte toda la columna con pd.to_numeric. Los pocos valores que pd.to_numeric no convierte (textos como
+    'Free To Play') se resuelven con reemplaza_a_flotante, una vez por valor distinto, para devolver exactamente
+    lo mismo que la función original.
+
+    Parameters:
+        valores (pandas.Series): Los valores a convertir.
+
+    Returns:
+        pandas.Series: Los valores como float, con 0.0 en los nulos y en los que no son numéricos.
+    '''
+    numeros = pd.to_numeric(valores, errors='coerce').astype(float)
+    pendientes = numeros.isna() & valores.notna()
+    if pendientes.any():
+        numeros[pendientes] = valores[pendientes].map({v: reemplaza_a_flotante(v) for v in valores[pendientes].unique()})
+    return numeros.where(valores.notna(), 0.0)
     
 def convertir_fecha(cadena_fecha):
     '''
@@ -176,6 +227,36 @@ def convertir_fecha(cadena_fecha):
     else:
         return 'Formato inválido'
 
+def convertir_fecha_serie(cadenas_fecha):
+    '''
+    Versión vectorizada de convertir_fecha para una columna completa.
+
+    Extrae la fecha de toda la columna con una sola búsqueda de la expresión regular y la convierte con
+    pd.to_datetime usando los formatos "Month Day, Year" y "Mon Day, Year". Las pocas fechas que no tienen esos
+    formatos se resuelven con convertir_fecha, una vez por valor distinto, para devolver exactamente lo mismo que
+    la función original. Los valores que no son texto se tratan como 'Formato inválido'.
+
+    Args:
+    cadenas_fecha (pandas.Series): Cadenas con fechas en el formato "Month Day, Year".
+
+    Returns:
+    pandas.Series: Fechas en el formato "YYYY-MM-DD", 'Fecha inválida' o 'Formato inválido', con el mismo índice.
+    '''
+    extraidas = _solo_textos(cadenas_fecha).str.extract(r'(\w+\s\d{1,2},\s\d{4})', expand=False)
+    fechas = pd.to_datetime(extraidas, format='%B %d, %Y', errors='coerce')
+    abreviadas = fechas.isna() & extraidas.notna()
+    fechas[abreviadas] = pd.to_datetime(extraidas[abreviadas], format='%b %d, %Y', errors='coerce')
+
+    resultado = pd.Series('Formato inválido', index=cadenas_fecha.index, dtype=object)
+    convertidas = fechas.notna()
+    # datetime64[D] como texto ya tiene el formato YYYY-MM-DD, y es mucho más rápido que strftime
+    resultado[convertidas] = fechas[convertidas].to_numpy().astype('datetime64[D]').astype(str)
+    pendientes = extraidas.notna() & ~convertidas
+    if pendientes.any():
+        originales = cadenas_fecha[pendientes]
+        resultado[pendientes] = originales.map({v: convertir_fecha(v) for v in originales.unique()})
+    return resultado
+
 def resumen_cant_porcentaje(df, columna):
     '''
     Cuanta la cantidad de True/False luego calcula el porcentaje.